@@ -50,6 +50,7 @@ packages = [
     'snapcraft.internal.states',
     'snapcraft.project',
     'snapcraft.plugins',
+    'snapcraft.plugins._kernel',
     'snapcraft.plugins._ros',
     'snapcraft.plugins._python',
     'snapcraft.storeapi'
@@ -21,8 +21,9 @@ import sys
 import click
 
 import snapcraft
-from snapcraft.internal import log
+from snapcraft.internal import log, tracing
 from .assertions import assertionscli
+from .cache import cachecli
 from .containers import containerscli
 from .discovery import discoverycli
 from .lifecycle import lifecyclecli
@@ -40,6 +41,7 @@ command_groups = [
     storecli,
     cicli,
     assertionscli,
+    cachecli,
     containerscli,
     discoverycli,
     helpcli,
@@ -55,7 +57,11 @@ command_groups = [
 @click.pass_context
 @add_build_options(hidden=True)
 @click.option('--debug', '-d', is_flag=True, envvar='SNAPCRAFT_DEBUG')
-def run(ctx, debug, catch_exceptions=False, **kwargs):
+@click.option('--trace', metavar='FILE', envvar='SNAPCRAFT_TRACE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Write a trace of where time goes to FILE, in the Chrome '
+                   'trace event format.')
+def run(ctx, debug, trace, catch_exceptions=False, **kwargs):
     """Snapcraft is a delightful packaging tool."""
 
     if debug:
@@ -74,11 +80,24 @@ def run(ctx, debug, catch_exceptions=False, **kwargs):
 
     # In an ideal world, this logger setup would be replaced
     log.configure(log_level=log_level)
+
+    if trace:
+        tracing.enable()
+        # Closing happens once the command is done, even if it failed.
+        ctx.call_on_close(functools.partial(_write_trace, trace))
+
     # The default command
     if not ctx.invoked_subcommand:
         ctx.forward(lifecyclecli.commands['snap'])
 
 
+def _write_trace(path):
+    tracing.write_chrome_trace(path)
+    click.echo(tracing.format_summary(), err=True)
+    click.echo('Trace written to {!r}'.format(path), err=True)
+    tracing.disable()
+
+
 # This would be much easier if they were subcommands
 for command_group in command_groups:
     for command in command_group.commands:
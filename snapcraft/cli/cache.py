@@ -0,0 +1,67 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+import click
+from tabulate import tabulate
+
+from snapcraft.internal import cache as snapcraft_cache
+
+
+def _humanize_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024
+    return '{:.1f} {}'.format(size, unit)
+
+
+@click.group()
+def cachecli():
+    """Cache commands"""
+    pass
+
+
+@cachecli.command()
+@click.option('--prune', is_flag=True,
+              help='Prune the package caches down to their size budget.')
+def cache(prune):
+    """Show the language-package download caches shared by all projects.
+
+    The caches are kept within the size set in SNAPCRAFT_PACKAGE_CACHE_SIZE
+    (10G by default).
+
+    \b
+    Examples:
+        snapcraft cache
+        snapcraft cache --prune
+    """
+    package_cache = snapcraft_cache.PackageDownloadCache()
+    budget = snapcraft_cache.get_package_cache_size_budget()
+
+    if prune:
+        pruned_entries = package_cache.prune(budget=budget)
+        click.echo('Pruned {} cache entries.'.format(len(pruned_entries)))
+
+    usage = package_cache.get_usage()
+    click.echo(tabulate(
+        [(ecosystem, os.path.join(package_cache.package_cache_root,
+                                  ecosystem), _humanize_size(size))
+         for ecosystem, size in usage.items()],
+        headers=['Ecosystem', 'Path', 'Size'], tablefmt='plain'))
+    click.echo()
+    click.echo('Total: {} of {}'.format(
+        _humanize_size(sum(usage.values())), _humanize_size(budget)))
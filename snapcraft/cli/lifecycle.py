@@ -215,6 +215,9 @@ def cleanbuild(remote, debug, **kwargs):
 
     If using a remote, a prior setup is required which is described on:
     https://linuxcontainers.org/lxd/getting-started-cli/#multiple-hosts
+
+    When building with multipass, SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE sets
+    how many build environments are kept for reuse by later builds.
     """
     # cleanbuild is a special snow flake, while all the other commands
     # would work with the host as the build_provider it makes little
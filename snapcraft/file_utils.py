@@ -16,17 +16,19 @@
 
 from contextlib import contextmanager, suppress
 import errno
+import fcntl
 import hashlib
 import logging
+import mmap
 import re
 import os
 import shutil
 import subprocess
 import sys
-from typing import Pattern, Callable, Generator, List
+from typing import Pattern, Callable, Generator, List, Sequence, Union
 from typing import Set  # noqa F401
 
-from snapcraft.internal import common
+from snapcraft.internal import common, tracing
 from snapcraft.internal.errors import (
     RequiredCommandFailure,
     RequiredCommandNotFound,
@@ -41,6 +43,131 @@ if sys.version_info < (3, 6):
 
 logger = logging.getLogger(__name__)
 
+# How much of a file rewrite_file reads to tell what it is.
+_REWRITE_HEADER_SIZE = 512
+# Files at least this large are searched for in place.
+_REWRITE_MMAP_THRESHOLD = 1024 * 1024
+_ELF_MAGIC = b'\x7fELF'
+
+
+class RewriteRule:
+    """A search and replace done by rewrite_tree and rewrite_file.
+
+    bytes patterns are matched against the raw contents of a file and, for
+    large files, searched for in place before reading anything. str
+    patterns are matched against the contents decoded as UTF-8, files which
+    cannot be decoded are left alone.
+    """
+
+    def __init__(self, search_pattern: Pattern,
+                 replacement: Union[str, bytes, Callable], *,
+                 file_pattern: Pattern=None, header: bytes=None) -> None:
+        """Create a RewriteRule.
+
+        :param search_pattern: A re.compile'd pattern to search for.
+        :param replacement: what to replace search_pattern with, as taken
+                            by re.sub.
+        :param file_pattern: if set, only apply to files whose name
+                             matches it.
+        :param bytes header: if set, only apply to files starting with it
+                             (e.g. b'#!').
+        """
+        self.search_pattern = search_pattern
+        self.replacement = replacement
+        self.file_pattern = file_pattern
+        self.header = header
+
+    def matches_name(self, file_name: str) -> bool:
+        return (self.file_pattern is None or
+                self.file_pattern.match(file_name) is not None)
+
+    def matches_header(self, header: bytes) -> bool:
+        return self.header is None or header.startswith(self.header)
+
+    def may_match(self, contents) -> bool:
+        if isinstance(self.search_pattern.pattern, bytes):
+            return self.search_pattern.search(contents) is not None
+        # Only bytes patterns can be searched for without decoding.
+        return True
+
+    def apply(self, contents: bytes) -> bytes:
+        if isinstance(self.search_pattern.pattern, bytes):
+            return self.search_pattern.sub(self.replacement, contents)
+        try:
+            text = contents.decode()
+        except UnicodeDecodeError:
+            # This was probably a binary file. Skip it.
+            return contents
+        replaced = self.search_pattern.sub(self.replacement, text)
+        if replaced == text:
+            return contents
+        return replaced.encode()
+
+
+def rewrite_tree(directory: str, rules: Sequence[RewriteRule]) -> None:
+    """Apply rules to every file in directory, walking it only once.
+
+    Symlinks are skipped, they are either invalid or the linked file will
+    be rewritten on its own.
+
+    :param str directory: The directory to look for files.
+    :param rules: the rules to apply, in order, to each file.
+    """
+    for root, directories, files in os.walk(directory):
+        for file_name in files:
+            file_rules = [r for r in rules if r.matches_name(file_name)]
+            if not file_rules:
+                continue
+            file_path = os.path.join(root, file_name)
+            if not os.path.islink(file_path):
+                rewrite_file(file_path, file_rules)
+
+
+def rewrite_file(file_path: str, rules: Sequence[RewriteRule]) -> bool:
+    """Apply rules, in order, to the contents of file_path.
+
+    Only a header is read to rule out binaries and files not starting with
+    what a rule requires, so rewriting costs little for files no rule
+    applies to.
+
+    :param str file_path: path to the file to rewrite.
+    :param rules: the rules to apply, regardless of their file_pattern.
+    :returns: True if file_path was rewritten.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(_REWRITE_HEADER_SIZE)
+            if header.startswith(_ELF_MAGIC) or b'\0' in header:
+                return False
+            rules = [r for r in rules if r.matches_header(header)]
+            if not rules:
+                return False
+
+            if os.fstat(f.fileno()).st_size < _REWRITE_MMAP_THRESHOLD:
+                original = header + f.read()
+            else:
+                with mmap.mmap(f.fileno(), 0,
+                               access=mmap.ACCESS_READ) as mapped:
+                    rules = [r for r in rules if r.may_match(mapped)]
+                    if not rules:
+                        return False
+                    original = mapped[:]
+
+        replaced = original
+        for rule in rules:
+            replaced = rule.apply(replaced)
+        if replaced == original:
+            return False
+
+        break_hard_link(file_path)
+        with open(file_path, 'wb') as f:
+            f.write(replaced)
+    except PermissionError as e:
+        logger.warning('Unable to open {path} for writing: {error}'.format(
+            path=file_path, error=e))
+        return False
+    return True
+
 
 def replace_in_file(directory: str, file_pattern: Pattern,
                     search_pattern: Pattern,
@@ -54,16 +181,8 @@ def replace_in_file(directory: str, file_pattern: Pattern,
     :param str replacement: The string to replace the matching search_pattern
                             with.
     """
-
-    for root, directories, files in os.walk(directory):
-        for file_name in files:
-            if file_pattern.match(file_name):
-                file_path = os.path.join(root, file_name)
-                # Don't bother trying to rewrite a symlink. It's either invalid
-                # or the linked file will be rewritten on its own.
-                if not os.path.islink(file_path):
-                    search_and_replace_contents(
-                        file_path, search_pattern, replacement)
+    rewrite_tree(directory, [RewriteRule(search_pattern, replacement,
+                                         file_pattern=file_pattern)])
 
 
 def search_and_replace_contents(file_path: str,
@@ -75,22 +194,22 @@ def search_and_replace_contents(file_path: str,
     :param re.RegexObject search_pattern: Pattern for which to search.
     :param str replacement: The string to replace pattern.
     """
-    try:
-        with open(file_path, 'r+') as f:
-            try:
-                original = f.read()
-            except UnicodeDecodeError:
-                # This was probably a binary file. Skip it.
-                return
-
-            replaced = search_pattern.sub(replacement, original)
-            if replaced != original:
-                f.seek(0)
-                f.truncate()
-                f.write(replaced)
-    except PermissionError as e:
-        logger.warning('Unable to open {path} for writing: {error}'.format(
-            path=file_path, error=e))
+    rewrite_file(file_path, [RewriteRule(search_pattern, replacement)])
+
+
+def break_hard_link(file_path: str) -> None:
+    """Give file_path its own copy of its contents if it is hard-linked.
+
+    Files are hard-linked across the steps of a part, this keeps edits done
+    in place to one of them.
+
+    :param str file_path: path to the file about to be edited in place.
+    """
+    if os.stat(file_path).st_nlink < 2:
+        return
+    temp_path = '{}.snapcraft-copy'.format(file_path)
+    shutil.copy2(file_path, temp_path)
+    os.replace(temp_path, file_path)
 
 
 def link_or_copy(source: str, destination: str,
@@ -157,6 +276,45 @@ def _copy(source: str, destination: str, follow_symlinks: bool=False) -> None:
             destination=destination, error=e))
 
 
+# From linux/fs.h, makes a file share the blocks of another on filesystems
+# which support it (e.g. btrfs or xfs).
+_FICLONE = 0x40049409
+
+
+def clone_or_copy(source: str, destination: str) -> None:
+    """Clone source into destination. Copy if it fails to clone.
+
+    Unlike a hard link, the result is a file of its own: writing to one of
+    them leaves the other alone. Cloning shares the blocks of source until
+    either is written to, filesystems which cannot do it get a full copy.
+    Symlinks are copied as symlinks.
+
+    :param str source: The file to clone.
+    :param str destination: The path of the clone.
+    """
+    destination_dir = os.path.dirname(destination)
+    if destination_dir and not os.path.exists(destination_dir):
+        create_similar_directory(
+            os.path.dirname(os.path.abspath(source)), destination_dir)
+    if os.path.islink(source):
+        _copy(source, destination)
+        return
+
+    with suppress(OSError):
+        os.unlink(destination)
+    try:
+        with open(source, 'rb') as source_file, \
+                open(destination, 'wb') as destination_file:
+            fcntl.ioctl(destination_file.fileno(), _FICLONE,
+                        source_file.fileno())
+    except FileNotFoundError:
+        raise SnapcraftCopyFileNotFoundError(source)
+    except OSError:
+        _copy(source, destination)
+        return
+    shutil.copystat(source, destination)
+
+
 def link_or_copy_tree(source_tree: str, destination_tree: str,
                       ignore: Callable[[str, List[str]], List[str]]=None,
                       copy_function: Callable[..., None]=link_or_copy) -> None:
@@ -301,6 +459,7 @@ def calculate_hash(path: str, *, algorithm: str) -> str:
             if not buf:
                 break
             hasher.update(buf)
+            tracing.count('bytes-hashed', len(buf))
     return hasher.hexdigest()
 
 
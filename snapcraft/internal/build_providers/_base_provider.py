@@ -15,11 +15,16 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import abc
+import contextlib
+import os
 import shlex
-from typing import List
+from typing import Callable, List
 
 import petname
 
+from snapcraft.internal import cache
+from ._project_sync import sync_project
+
 
 class Provider():
 
@@ -38,16 +43,31 @@ class Provider():
             self.snap_filename = '{}_{}.snap'.format(
                 project.info.name, project.deb_arch)
 
+    @property
+    def _sync_manifest_path(self) -> str:
+        # Records what was synced into the instance by provision_project.
+        return os.path.join(
+            cache.SnapcraftProjectCache(
+                project_name=self.project.info.name).project_cache_root,
+            'build-providers', '{}.json'.format(self.instance_name))
+
     def __enter__(self):
         self.create()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.destroy()
+        if exc_type is None:
+            self.release()
+        else:
+            self.destroy()
 
     @abc.abstractmethod
-    def _run(self, command: List) -> None:
-        """Run a command on the instance."""
+    def _run(self, command: List, *, stdin=None) -> None:
+        """Run a command on the instance.
+
+        :param list command: the command to run.
+        :param stdin: a file to use as the standard input of command.
+        """
 
     @abc.abstractmethod
     def _launch(self):
@@ -65,9 +85,12 @@ class Provider():
         if the instance to destroy is already destroyed.
         """
 
-    @abc.abstractmethod
-    def provision_project(self, tarball: str) -> None:
-        """Provider steps needed to copy project assests to the instance."""
+    def release(self) -> None:
+        """Provider steps needed once done with a working instance.
+
+        The instance is destroyed, unless the provider keeps it for reuse.
+        """
+        self.destroy()
 
     @abc.abstractmethod
     def build_project(self) -> None:
@@ -92,3 +115,21 @@ class Provider():
             self.instance_name))
         install_cmd = ['sudo', 'snap', 'install', 'snapcraft', '--classic']
         self._run(install_cmd)
+
+    def provision_project(self, *, exclude: Callable[[str], bool]) -> None:
+        """Sync the project in the working directory into the instance.
+
+        Only what changed since the project was last provisioned into the
+        same instance is sent.
+
+        :param exclude: a callable returning True for the paths, relative to
+                        the project, which are not to be sent.
+        """
+        sync_project(source_dir=os.getcwd(), target_dir=self.project_dir,
+                     manifest_path=self._sync_manifest_path, run=self._run,
+                     exclude=exclude)
+
+    def _forget_project(self) -> None:
+        # Once the instance is gone, so is what was synced into it.
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self._sync_manifest_path)
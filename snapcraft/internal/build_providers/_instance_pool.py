@@ -0,0 +1,147 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
+
+from snapcraft.internal import cache
+
+logger = logging.getLogger(__name__)
+
+# Pooled instances are not refreshed, so they are only reused for a day.
+_MAX_AGE = 24 * 60 * 60
+
+
+def get_pool_size() -> int:
+    """Return the number of instances to keep for reuse after a build.
+
+    This is taken from SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE, none are kept
+    by default.
+    """
+    pool_size = os.environ.get('SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE', '0')
+    try:
+        return max(int(pool_size), 0)
+    except ValueError:
+        logger.warning(
+            'Ignoring invalid SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE {!r}.'.format(
+                pool_size))
+        return 0
+
+
+class InstancePool:
+    """Provisioned instances kept to be reused by later builds.
+
+    Instances are pooled under a key which must capture how they were
+    provisioned, and are only reused for the same key until they are
+    max_age seconds old. Taking an instance out of the pool is exclusive,
+    so concurrent builds never share one.
+    """
+
+    def __init__(self, *, provider_name: str, size: int,
+                 max_age: int=_MAX_AGE) -> None:
+        """Create an InstancePool.
+
+        :param str provider_name: the provider the instances belong to.
+        :param int size: the number of instances to keep at most.
+        :param int max_age: seconds after being provisioned for which
+                            instances are reused.
+        """
+        self.size = size
+        self.max_age = max_age
+        self._pool_path = os.path.join(
+            cache.SnapcraftCache().cache_root, 'build-providers',
+            '{}-pool.json'.format(provider_name))
+
+    @contextlib.contextmanager
+    def _entries(self):
+        os.makedirs(os.path.dirname(self._pool_path), exist_ok=True)
+        with cache.file_lock(self._pool_path + '.lock'):
+            try:
+                with open(self._pool_path) as pool_file:
+                    entries = json.load(pool_file)
+            except FileNotFoundError:
+                entries = []
+            except ValueError:
+                logger.debug('Ignoring invalid instance pool {!r}'.format(
+                    self._pool_path))
+                entries = []
+            yield entries
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=os.path.dirname(self._pool_path),
+                    suffix='.partial', delete=False) as f:
+                temp_path = f.name
+                json.dump(entries, f, sort_keys=True)
+            os.replace(temp_path, self._pool_path)
+
+    def prune(self, *, key: str) -> List[str]:
+        """Remove the instances which will not be reused from the pool.
+
+        Those are the ones pooled under another key, the ones too old and
+        the ones over the size of the pool, oldest first.
+
+        :param str key: the key instances are currently pooled under.
+        :returns: the names of the instances removed, which are to be
+                  deleted.
+        """
+        now = time.time()
+        with self._entries() as entries:
+            kept = [e for e in entries if e['key'] == key and
+                    now - e['provisioned-at'] < self.max_age]
+            kept.sort(key=lambda e: e['provisioned-at'], reverse=True)
+            kept = kept[:self.size]
+            pruned = [e['name'] for e in entries if e not in kept]
+            entries[:] = kept
+        return pruned
+
+    def acquire(self, *, key: str) -> Optional[Tuple[str, float]]:
+        """Take the most recently provisioned instance for key out of the pool.
+
+        :param str key: the key the instance is to be pooled under.
+        :returns: the name of the instance and the time it was provisioned
+                  at, or None if there is none.
+        """
+        now = time.time()
+        with self._entries() as entries:
+            for entry in sorted(entries, key=lambda e: e['provisioned-at'],
+                                reverse=True):
+                if (entry['key'] == key and
+                        now - entry['provisioned-at'] < self.max_age):
+                    entries.remove(entry)
+                    return entry['name'], entry['provisioned-at']
+        return None
+
+    def release(self, *, name: str, key: str, provisioned_at: float) -> bool:
+        """Put an instance in the pool, if there is room for it.
+
+        :param str name: the name of the instance.
+        :param str key: the key to pool the instance under.
+        :param float provisioned_at: the time the instance was provisioned.
+        :returns: True if the instance was pooled, otherwise it is up to
+                  the caller to delete it.
+        """
+        if time.time() - provisioned_at >= self.max_age:
+            return False
+        with self._entries() as entries:
+            if len(entries) >= self.size:
+                return False
+            entries.append({'name': name, 'key': key,
+                            'provisioned-at': provisioned_at})
+        return True
@@ -14,34 +14,111 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import shlex
+import logging
+import os
+import time
 
+import snapcraft
+from snapcraft.internal import common
+from .. import errors
 from .._base_provider import Provider
+from .._instance_pool import InstancePool, get_pool_size
 from ._instance_info import InstanceInfo
 from ._multipass_command import MultipassCommand
 
+logger = logging.getLogger(__name__)
+
+_IMAGE = '16.04'
+
+
+def _get_snapcraft_revision() -> str:
+    # snapd sets SNAP_REVISION when running as a snap, the version is all
+    # there is to go by otherwise.
+    if common.is_snap():
+        return os.environ.get('SNAP_REVISION', snapcraft.__version__)
+    return snapcraft.__version__
+
 
 class Multipass(Provider):
     """A multipass provider for snapcraft to execute its lifecycle."""
 
-    def _run(self, command) -> None:
+    def _run(self, command, *, stdin=None) -> None:
         self._multipass_cmd.execute(instance_name=self.instance_name,
-                                    command=command)
+                                    command=command, stdin=stdin)
 
     def _launch(self) -> None:
         self._multipass_cmd.launch(instance_name=self.instance_name,
-                                   image='16.04')
+                                   image=_IMAGE)
 
     def __init__(self, *, project, echoer) -> None:
         super().__init__(project=project, echoer=echoer)
         self._multipass_cmd = MultipassCommand()
         self._instance_info = None  # type: InstanceInfo
+        self._pool = InstancePool(provider_name='multipass',
+                                  size=get_pool_size())
+        # Instances are pooled by what they were provisioned from.
+        self._pool_key = '{}/{}/snapcraft={}'.format(
+            _IMAGE, project.deb_arch, _get_snapcraft_revision())
+        self._provisioned_at = None  # type: float
 
     def create(self) -> None:
-        """Create the multipass instance and setup the build environment."""
+        """Create the multipass instance and setup the build environment.
+
+        An instance kept from a previous build is used if there is one.
+        """
+        for instance_name in self._pool.prune(key=self._pool_key):
+            self._delete_pooled(instance_name)
+
+        pooled = self._pool.acquire(key=self._pool_key)
+        if pooled is not None:
+            instance_name, provisioned_at = pooled
+            try:
+                self._multipass_cmd.start(instance_name=instance_name)
+            except errors.ProviderStartError:
+                # It may have been deleted behind our back.
+                self._delete_pooled(instance_name)
+            else:
+                self.echoer.info('Reusing the build environment {!r}'.format(
+                    instance_name))
+                self.instance_name = instance_name
+                self._provisioned_at = provisioned_at
+                self._instance_info = self._get_instance_info()
+                return
+
         self.launch_instance()
         self._instance_info = self._get_instance_info()
         self.setup_snapcraft()
+        self._provisioned_at = time.time()
+
+    def release(self) -> None:
+        """Keep the instance for reuse if the pool has room, else destroy it.
+
+        What was built is cleaned, but the project is left in place so that
+        provisioning it again only sends what changed.
+        """
+        if self._instance_info is None:
+            return
+
+        if self._pool.size and self._provisioned_at is not None:
+            clean_cmd = 'cd {} && /snap/bin/snapcraft clean && rm -f {}'
+            clean_cmd = clean_cmd.format(self.project_dir, self.snap_filename)
+            try:
+                self._run(['sh', '-c', clean_cmd])
+                self._multipass_cmd.stop(instance_name=self.instance_name)
+            except (errors.ProviderExecError, errors.ProviderStopError):
+                logger.debug('Not keeping {!r} for reuse'.format(
+                    self.instance_name))
+            else:
+                self._instance_info.state = 'STOPPED'
+                if self._pool.release(name=self.instance_name,
+                                      key=self._pool_key,
+                                      provisioned_at=self._provisioned_at):
+                    self.echoer.info(
+                        'Keeping the build environment {!r} for reuse'.format(
+                            self.instance_name))
+                    return
+
+        self.destroy()
 
     def destroy(self) -> None:
         """Destroy the instance, trying to stop it first."""
@@ -51,25 +128,7 @@ class Multipass(Provider):
         if not self._instance_info.is_stopped():
             self._multipass_cmd.stop(instance_name=self.instance_name)
         self._multipass_cmd.delete(instance_name=self.instance_name)
-
-    def provision_project(self, tarball: str) -> None:
-        """Provision the multipass instance with the project to work with."""
-        # TODO add instance check.
-        # Step 0, sanitize the input
-        tarball = shlex.quote(tarball)
-
-        # First create a working directory
-        self._multipass_cmd.execute(command=['mkdir', self.project_dir],
-                                    instance_name=self.instance_name)
-
-        # Then copy the tarball over
-        destination = '{}:{}'.format(self.instance_name, tarball)
-        self._multipass_cmd.copy_files(source=tarball, destination=destination)
-
-        # Finally extract it into project_dir.
-        extract_cmd = ['tar', '-xvf', tarball, '-C', self.project_dir]
-        self._multipass_cmd.execute(command=extract_cmd,
-                                    instance_name=self.instance_name)
+        self._forget_project()
 
     def build_project(self) -> None:
         # TODO add instance check.
@@ -88,6 +147,13 @@ class Multipass(Provider):
                                        destination=self.snap_filename)
         return self.snap_filename
 
+    def _delete_pooled(self, instance_name: str) -> None:
+        try:
+            self._multipass_cmd.delete(instance_name=instance_name)
+        except errors.ProviderDeleteError:
+            logger.debug('Failed to delete pooled instance {!r}'.format(
+                instance_name))
+
     def _get_instance_info(self):
         instance_info_raw = self._multipass_cmd.info(
             instance_name=self.instance_name, output_format='json')
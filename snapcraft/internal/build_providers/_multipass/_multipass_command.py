@@ -26,9 +26,9 @@ from snapcraft.internal.build_providers import errors
 logger = logging.getLogger(__name__)
 
 
-def _run(command: List) -> None:
+def _run(command: List, **kwargs) -> None:
     logger.debug('Running {}'.format(' '.join(command)))
-    subprocess.check_call(command)
+    subprocess.check_call(command, **kwargs)
 
 
 def _run_output(command: List) -> bytes:
@@ -80,6 +80,19 @@ class MultipassCommand:
                 provider_name=self.provider_name,
                 exit_code=process_error.returncode) from process_error
 
+    def start(self, *, instance_name: str) -> None:
+        """Passthrough for running multipass start.
+
+        :param str instance_name: the name of the instance to start.
+        """
+        cmd = [self.provider_cmd, 'start', instance_name]
+        try:
+            _run(cmd)
+        except subprocess.CalledProcessError as process_error:
+            raise errors.ProviderStartError(
+                provider_name=self.provider_name,
+                exit_code=process_error.returncode) from process_error
+
     def stop(self, *, instance_name: str) -> None:
         """Passthrough for running multipass stop.
 
@@ -109,15 +122,17 @@ class MultipassCommand:
                 provider_name=self.provider_name,
                 exit_code=process_error.returncode) from process_error
 
-    def execute(self, *, command: List[str], instance_name: str) -> None:
+    def execute(self, *, command: List[str], instance_name: str,
+                stdin=None) -> None:
         """Passthrough for running multipass exec.
 
         :param list command: the command to exectute on the instance.
         :param str instance_name: the name of the instance to execute command.
+        :param stdin: a file to use as the standard input of command.
         """
         cmd = [self.provider_cmd, 'exec', instance_name, '--'] + command
         try:
-            _run(cmd)
+            _run(cmd, stdin=stdin)
         except subprocess.CalledProcessError as process_error:
             raise errors.ProviderExecError(
                 provider_name=self.provider_name,
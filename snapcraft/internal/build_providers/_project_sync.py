@@ -0,0 +1,180 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Sync a project into an instance by streaming a tar archive to it.
+
+Only what changed since the last sync into the same instance is sent, as
+recorded in a manifest kept on the host.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import stat
+import tarfile
+import tempfile
+import threading
+from typing import Any, BinaryIO, Callable, Dict, List  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+def _get_file_state(path: str) -> List[Any]:
+    st = os.lstat(path)
+    if stat.S_ISREG(st.st_mode):
+        return [st.st_mode, st.st_size, st.st_mtime_ns]
+    elif stat.S_ISLNK(st.st_mode):
+        return [st.st_mode, os.readlink(path)]
+    # Directories change with their contents, which are tracked on their
+    # own.
+    return [st.st_mode]
+
+
+def _get_file_states(source_dir: str,
+                     exclude: Callable[[str], bool]) -> Dict[str, List[Any]]:
+    states = dict()  # type: Dict[str, List[Any]]
+    for root, directories, files in os.walk(source_dir):
+        relative_root = os.path.relpath(root, source_dir)
+        if relative_root == os.curdir:
+            relative_root = ''
+        for name in list(directories):
+            path = os.path.join(relative_root, name)
+            if exclude(path):
+                directories.remove(name)
+            else:
+                # Symlinks to directories are not walked into, and are
+                # sent as symlinks.
+                states[path] = _get_file_state(os.path.join(root, name))
+        for name in files:
+            path = os.path.join(relative_root, name)
+            if not exclude(path):
+                states[path] = _get_file_state(os.path.join(root, name))
+    return states
+
+
+def _load_manifest(manifest_path: str, target_dir: str) -> Dict[str, Any]:
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except FileNotFoundError:
+        return dict()
+    except ValueError:
+        logger.debug('Ignoring invalid sync manifest {!r}'.format(
+            manifest_path))
+        return dict()
+    if manifest.get('target-dir') != target_dir:
+        return dict()
+    return manifest.get('files', dict())
+
+
+def _save_manifest(manifest_path: str, target_dir: str,
+                   states: Dict[str, List[Any]]) -> None:
+    manifest_dir = os.path.dirname(manifest_path)
+    os.makedirs(manifest_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=manifest_dir,
+                                     suffix='.partial', delete=False) as f:
+        temp_path = f.name
+        json.dump({'target-dir': target_dir, 'files': states}, f,
+                  sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+@contextlib.contextmanager
+def _pipe_from(write: Callable[[BinaryIO], None]):
+    # Whatever write writes is read from the yielded file as it is written.
+    read_fd, write_fd = os.pipe()
+    write_errors = []  # type: List[Exception]
+
+    def _writer():
+        try:
+            with os.fdopen(write_fd, 'wb') as write_file:
+                write(write_file)
+        except BrokenPipeError:
+            # The reader stopped reading, which it reports itself.
+            pass
+        except Exception as write_error:
+            write_errors.append(write_error)
+
+    writer = threading.Thread(target=_writer)
+    writer.start()
+    try:
+        with os.fdopen(read_fd, 'rb') as read_file:
+            yield read_file
+    finally:
+        writer.join()
+    if write_errors:
+        raise write_errors[0]
+
+
+def sync_project(*, source_dir: str, target_dir: str, manifest_path: str,
+                 run: Callable[..., None],
+                 exclude: Callable[[str], bool]) -> None:
+    """Sync the project in source_dir into target_dir in an instance.
+
+    The first sync into an instance sends the whole project, later ones send
+    what changed and remove what was removed since the previous one.
+
+    :param str source_dir: the project directory on the host.
+    :param str target_dir: the directory to sync into on the instance,
+                           relative to the working directory of run.
+    :param str manifest_path: where to record what was synced, which must
+                              be unique to the instance.
+    :param run: a callable running the command list it is given on the
+                instance, with its stdin keyword argument as the standard
+                input of the command.
+    :param exclude: a callable returning True for the paths, relative to
+                    source_dir, not to sync.
+    """
+    synced = _load_manifest(manifest_path, target_dir)
+    states = _get_file_states(source_dir, exclude)
+
+    changed = sorted(path for path, state in states.items()
+                     if synced.get(path) != state)
+    # Paths which changed type are removed first, tar will not replace a
+    # directory with a file.
+    removed = sorted((path for path, state in synced.items()
+                      if path not in states or
+                      stat.S_IFMT(state[0]) != stat.S_IFMT(states[path][0])),
+                     reverse=True)
+    logger.debug('Syncing {} changed and {} removed paths to {!r}'.format(
+        len(changed), len(removed), target_dir))
+
+    if not synced:
+        run(['mkdir', '-p', target_dir])
+
+    if removed:
+        def _write_removed(write_file):
+            for path in removed:
+                write_file.write('{}/{}\0'.format(target_dir, path).encode())
+
+        with _pipe_from(_write_removed) as removed_file:
+            run(['xargs', '-0', 'rm', '-rf', '--'], stdin=removed_file)
+
+    if changed:
+        def _write_archive(write_file):
+            # An uncompressed stream, the instance is local and compressing
+            # costs more than it saves.
+            with tarfile.open(fileobj=write_file, mode='w|') as archive:
+                for path in changed:
+                    archive.add(os.path.join(source_dir, path), arcname=path,
+                                recursive=False)
+
+        with _pipe_from(_write_archive) as archive_file:
+            run(['tar', '-x', '-f', '-', '-C', target_dir],
+                stdin=archive_file)
+
+    _save_manifest(manifest_path, target_dir, states)
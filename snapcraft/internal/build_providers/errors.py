@@ -61,6 +61,13 @@ class ProviderLaunchError(_GenericProviderError):
                          exit_code=exit_code)
 
 
+class ProviderStartError(_GenericProviderError):
+
+    def __init__(self, *, provider_name: str, exit_code: int) -> None:
+        super().__init__(action='start', provider_name=provider_name,
+                         exit_code=exit_code)
+
+
 class ProviderStopError(_GenericProviderError):
 
     def __init__(self, *, provider_name: str, exit_code: int) -> None:
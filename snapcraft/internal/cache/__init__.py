@@ -14,7 +14,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from ._apt import AptStagePackageCache  # noqa
-from ._cache import SnapcraftCache      # noqa
+from ._apt import AptStagePackageCache, AptUnpackedPackageCache  # noqa
+from ._cache import (                  # noqa
+    SnapcraftCache,
+    SnapcraftProjectCache,
+    file_lock,
+    remove_tree,
+)
 from ._file import FileCache            # noqa
+from ._initrd import InitrdCache        # noqa
+from ._package import (                 # noqa
+    ECOSYSTEMS as PACKAGE_ECOSYSTEMS,
+    PackageDownloadCache,
+    get_size_budget as get_package_cache_size_budget,
+)
+from ._rosdep import RosdepCache        # noqa
 from ._snap import SnapCache            # noqa
+from ._toolchain import ToolchainCache  # noqa
+from ._wheel import WheelCache, normalize_package_name  # noqa
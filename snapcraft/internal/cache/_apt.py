@@ -14,10 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import hashlib
+import json
 import logging
 import os
+import time
+from typing import Callable, List, Optional  # noqa
 
-from ._cache import SnapcraftStagePackageCache
+from ._cache import SnapcraftStagePackageCache, file_lock, remove_tree
 
 logger = logging.getLogger(__name__)
 
@@ -41,3 +46,109 @@ class AptStagePackageCache(SnapcraftStagePackageCache):
         self.packages_dir = os.path.join(
             self.base_dir, 'var', 'cache', 'apt', 'archives')
         os.makedirs(self.packages_dir, exist_ok=True)
+
+
+class AptUnpackedPackageCache(SnapcraftStagePackageCache):
+    """Cache for unpacked and normalized stage-packages coming from apt.
+
+    Entries are keyed by package, version, architecture and the version of
+    the normalization applied when unpacking, so they can be cloned into
+    the install directory of any part instead of being unpacked again.
+    """
+
+    def __init__(self):
+        """Create a new AptUnpackedPackageCache."""
+        super().__init__()
+        self.unpacked_cache_root = os.path.join(
+            self.stage_package_cache_root, 'apt-unpacked')
+
+    def _get_entry_path(self, *, name, version, arch, normalization):
+        key = json.dumps(dict(name=name, version=version, arch=arch,
+                              normalization=normalization), sort_keys=True)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.unpacked_cache_root, name, digest)
+
+    def get(self, *, name, version, arch, normalization) -> Optional[str]:
+        """Get the path to an unpacked package.
+
+        :param str name: name of the package.
+        :param str version: version of the package.
+        :param str arch: architecture of the package.
+        :param int normalization: version of the normalization applied.
+        :returns: path to the unpacked package or None.
+        """
+        entry_path = self._get_entry_path(
+            name=name, version=version, arch=arch,
+            normalization=normalization)
+        if not os.path.isdir(entry_path):
+            return None
+        # The entry's mtime records the last use, which drives pruning.
+        with contextlib.suppress(OSError):
+            os.utime(entry_path)
+        logger.debug('Cache hit for unpacked stage-package {!r} ({})'.format(
+            name, entry_path))
+        return entry_path
+
+    def cache(self, *, name, version, arch, normalization,
+              populate: Callable[[str], None]) -> str:
+        """Unpack a package into the cache unless it is already there.
+
+        Concurrent callers for the same entry wait for the first one to
+        finish populating it.
+
+        :param populate: callable which unpacks the package into the
+                         directory passed to it.
+        :returns: path to the unpacked package.
+        """
+        entry_path = self._get_entry_path(
+            name=name, version=version, arch=arch,
+            normalization=normalization)
+        with file_lock(entry_path + '.lock'):
+            cached_path = self.get(name=name, version=version, arch=arch,
+                                   normalization=normalization)
+            if cached_path:
+                return cached_path
+
+            # A previous attempt may have been interrupted.
+            partial_path = entry_path + '.partial'
+            remove_tree(partial_path)
+            os.makedirs(partial_path)
+            try:
+                populate(partial_path)
+            except Exception:
+                remove_tree(partial_path)
+                raise
+            os.rename(partial_path, entry_path)
+        return entry_path
+
+    def prune(self, *, max_age: int) -> List[str]:
+        """Prune packages that have not been used for max_age seconds.
+
+        Entries currently being populated are skipped.
+
+        :returns: pruned entries paths list.
+        """
+        pruned_entries = []  # type: List[str]
+        if not os.path.isdir(self.unpacked_cache_root):
+            return pruned_entries
+
+        now = time.time()
+        for name in os.listdir(self.unpacked_cache_root):
+            name_dir = os.path.join(self.unpacked_cache_root, name)
+            for entry in os.listdir(name_dir):
+                entry_path = os.path.join(name_dir, entry)
+                if (entry.endswith(('.lock', '.partial')) or
+                        now - os.stat(entry_path).st_mtime <= max_age):
+                    continue
+                try:
+                    with file_lock(entry_path + '.lock', blocking=False):
+                        remove_tree(entry_path)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    logger.warning(
+                        'Unable to prune unpacked stage-package {}.'.format(
+                            entry_path))
+                    continue
+                pruned_entries.append(entry_path)
+        return pruned_entries
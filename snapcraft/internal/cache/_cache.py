@@ -14,10 +14,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import os
+import shutil
+import stat
+import sys
 
 from xdg import BaseDirectory
 
+if sys.platform == 'linux':
+    import fcntl
+
 
 class SnapcraftCache:
     """Generic cache base class.
@@ -52,3 +59,45 @@ class SnapcraftStagePackageCache(SnapcraftCache):
         super().__init__()
         self.stage_package_cache_root = os.path.join(
             self.cache_root, 'stage-packages')
+
+
+@contextlib.contextmanager
+def file_lock(path, *, shared=False, blocking=True):
+    """Hold an advisory lock on path for the duration of the context.
+
+    The lock file is created if it does not exist. Locking is only
+    implemented on Linux, elsewhere this is a no-op.
+
+    :param str path: path to the lock file.
+    :param bool shared: take a shared (read) lock instead of an exclusive one.
+    :param bool blocking: if False, raise BlockingIOError instead of waiting
+                          for a conflicting lock to be released.
+    """
+    if sys.platform != 'linux':
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def remove_tree(path):
+    """Remove the tree at path, even if its directories are read-only."""
+    def _on_error(function, failed_path, exc_info):
+        parent = os.path.dirname(failed_path)
+        os.chmod(parent, os.stat(parent).st_mode | stat.S_IWUSR)
+        if os.path.isdir(failed_path) and not os.path.islink(failed_path):
+            os.chmod(failed_path,
+                     os.stat(failed_path).st_mode | stat.S_IWUSR)
+        function(failed_path)
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, onerror=_on_error)
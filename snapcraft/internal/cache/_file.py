@@ -31,17 +31,18 @@ class FileCache(SnapcraftCache):
         super().__init__()
         self.file_cache = os.path.join(self.cache_root, 'files')
 
-    def cache(self, *, filename, algorithm, hash):
+    def cache(self, *, filename, algorithm, hash, verify=True):
         """Cache a file revision with hash in XDG cache, unless it already exists.
         :param str filename: path to the file to cache.
         :param str algorithm: algorithm used to calculate the hash as
                               understood by hashlib.
         :param str hash: hash for filename calculated with algorithm.
+        :param bool verify: whether to verify filename matches hash, which
+                            can be skipped if already done by the caller.
         :returns: path to cached file.
         """
         # First we verify
-        calculated_hash = calculate_hash(filename, algorithm=algorithm)
-        if calculated_hash != hash:
+        if verify and calculate_hash(filename, algorithm=algorithm) != hash:
             logger.warning('Skipping caching of {!r} as the expected '
                            'hash does not match the one '
                            'provided'.format(filename))
@@ -0,0 +1,128 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import logging
+import os
+import time
+from typing import Callable, List, Optional  # noqa
+
+from ._cache import SnapcraftCache, file_lock, remove_tree
+
+logger = logging.getLogger(__name__)
+
+
+class InitrdCache(SnapcraftCache):
+    """Cache for unpacked initrds.
+
+    Entries are keyed by the digest of the initrd they were unpacked from,
+    so that the generic initrd from a core snap is only unpacked once.
+    Entries are kept for as long as they keep being used, whichever core
+    they come from.
+    """
+
+    def __init__(self):
+        """Create a new InitrdCache."""
+        super().__init__()
+        self.initrd_cache_root = os.path.join(self.cache_root, 'initrd')
+
+    def get(self, *, digest) -> Optional[str]:
+        """Get the path to an unpacked initrd.
+
+        :param str digest: sha256 digest of the initrd.
+        :returns: path to the unpacked initrd or None.
+        """
+        entry_path = os.path.join(self.initrd_cache_root, digest)
+        if not os.path.isdir(entry_path):
+            return None
+        # The entry's mtime records the last use, which drives pruning.
+        with contextlib.suppress(OSError):
+            os.utime(entry_path)
+        logger.debug('Cache hit for unpacked initrd {}'.format(digest))
+        return entry_path
+
+    def cache(self, *, digest, populate: Callable[[str], None]) -> str:
+        """Unpack an initrd into the cache unless it is already there.
+
+        :param str digest: sha256 digest of the initrd.
+        :param populate: callable which unpacks the initrd into the
+                         directory passed to it.
+        :returns: path to the unpacked initrd.
+        """
+        entry_path = os.path.join(self.initrd_cache_root, digest)
+        with file_lock(entry_path + '.lock'):
+            cached_path = self.get(digest=digest)
+            if cached_path:
+                return cached_path
+
+            # A previous attempt may have been interrupted.
+            partial_path = entry_path + '.partial'
+            remove_tree(partial_path)
+            os.makedirs(partial_path)
+            try:
+                populate(partial_path)
+            except Exception:
+                remove_tree(partial_path)
+                raise
+            os.rename(partial_path, entry_path)
+        return entry_path
+
+    @contextlib.contextmanager
+    def use(self, *, digest, populate: Callable[[str], None]):
+        """Keep an unpacked initrd in the cache while copying from it.
+
+        The entry is held with a shared lock, which prune() does not remove
+        entries under, and populated first if it is not cached.
+        Takes the same arguments as cache().
+        """
+        entry_path = os.path.join(self.initrd_cache_root, digest)
+        while True:
+            with file_lock(entry_path + '.lock', shared=True):
+                # prune() may have removed the entry before it was locked.
+                cached_path = self.get(digest=digest)
+                if cached_path:
+                    yield cached_path
+                    return
+            self.cache(digest=digest, populate=populate)
+
+    def prune(self, *, max_age: int) -> List[str]:
+        """Prune initrds that have not been used for max_age seconds.
+
+        Entries currently being populated or used are skipped.
+
+        :returns: pruned entries paths list.
+        """
+        pruned_entries = []  # type: List[str]
+        if not os.path.isdir(self.initrd_cache_root):
+            return pruned_entries
+
+        for entry in os.listdir(self.initrd_cache_root):
+            entry_path = os.path.join(self.initrd_cache_root, entry)
+            if entry.endswith(('.lock', '.partial')):
+                continue
+            try:
+                with file_lock(entry_path + '.lock', blocking=False):
+                    if time.time() - os.stat(entry_path).st_mtime <= max_age:
+                        continue
+                    remove_tree(entry_path)
+            except BlockingIOError:
+                continue
+            except OSError:
+                logger.warning(
+                    'Unable to prune unpacked initrd {}.'.format(entry_path))
+                continue
+            pruned_entries.append(entry_path)
+        return pruned_entries
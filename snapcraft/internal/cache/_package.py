@@ -0,0 +1,176 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import contextlib
+import glob
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Tuple  # noqa
+
+from snapcraft.internal import errors
+from ._cache import SnapcraftCache, file_lock, remove_tree
+
+logger = logging.getLogger(__name__)
+
+# Globs, relative to each ecosystem's cache, matching the smallest entries
+# that can be removed without corrupting the cache for the tool using it.
+_PRUNABLE_ENTRIES = collections.OrderedDict([
+    ('cargo', ['registry/cache/*/*', 'registry/src/*/*',
+               'git/db/*', 'git/checkouts/*']),
+    ('npm', ['_cacache/content-v2/*/*/*/*', '_cacache/index-v5/*/*/*']),
+    ('pip', ['http/*/*/*/*/*', 'wheels/*/*/*/*']),
+    ('yarn', ['v*/*']),
+])
+
+ECOSYSTEMS = list(_PRUNABLE_ENTRIES.keys())
+
+_DEFAULT_SIZE_BUDGET = '10G'
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def get_size_budget() -> int:
+    """Get the size budget for the package caches, in bytes.
+
+    The budget is taken from SNAPCRAFT_PACKAGE_CACHE_SIZE, if set.
+
+    :raises errors.InvalidPackageCacheSizeError: if the budget is invalid.
+    """
+    size = os.environ.get('SNAPCRAFT_PACKAGE_CACHE_SIZE',
+                          _DEFAULT_SIZE_BUDGET)
+    match = re.match(r'^\s*(\d+)\s*([KMG]?)B?\s*$', size, re.IGNORECASE)
+    if not match:
+        raise errors.InvalidPackageCacheSizeError(size=size)
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+
+
+class PackageDownloadCache(SnapcraftCache):
+    """Cache for language-package downloads shared by every project.
+
+    Each ecosystem (cargo, npm, pip and yarn) gets a directory that the
+    corresponding tool is pointed at, so dependencies survive cleaning parts
+    and are shared across parts and projects.
+    """
+
+    def __init__(self):
+        """Create a PackageDownloadCache."""
+        super().__init__()
+        self.package_cache_root = os.path.join(self.cache_root, 'packages')
+
+    def get(self, *, ecosystem: str) -> str:
+        """Get the cache directory for ecosystem, creating it if needed.
+
+        :param str ecosystem: one of ECOSYSTEMS.
+        :returns: path to the cache directory.
+        """
+        if ecosystem not in _PRUNABLE_ENTRIES:
+            raise ValueError(
+                'Unknown package ecosystem {!r}'.format(ecosystem))
+        path = os.path.join(self.package_cache_root, ecosystem)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get_usage(self) -> Dict[str, int]:
+        """Get the disk usage, in bytes, of every ecosystem's cache."""
+        usage = collections.OrderedDict()  # type: Dict[str, int]
+        for ecosystem in ECOSYSTEMS:
+            usage[ecosystem] = _get_size(
+                os.path.join(self.package_cache_root, ecosystem))
+        return usage
+
+    def prune(self, *, budget: int) -> List[str]:
+        """Remove the least recently used entries until under budget.
+
+        :param int budget: maximum size, in bytes, of all caches combined.
+        :returns: pruned entries paths list.
+        """
+        pruned_entries = []  # type: List[str]
+        if not os.path.isdir(self.package_cache_root):
+            return pruned_entries
+
+        with file_lock(os.path.join(self.package_cache_root, '.lock')):
+            # Files outside of the prunable entries (indexes and the like)
+            # count towards the budget too.
+            total_size = sum(self.get_usage().values())
+            entries = []  # type: List[Tuple[float, int, str]]
+            for ecosystem in ECOSYSTEMS:
+                for path in self._get_prunable_entries(ecosystem):
+                    stat = os.lstat(path)
+                    entries.append((max(stat.st_atime, stat.st_mtime),
+                                    _get_size(path), path))
+
+            for _, size, path in sorted(entries):
+                if total_size <= budget:
+                    break
+                try:
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        remove_tree(path)
+                    else:
+                        os.remove(path)
+                except OSError:
+                    logger.warning(
+                        'Unable to prune package cache entry {}.'.format(
+                            path))
+                    continue
+                total_size -= size
+                pruned_entries.append(path)
+        return pruned_entries
+
+    def prune_if_due(self, *, budget: int, interval: int) -> List[str]:
+        """Prune, at most once every interval seconds.
+
+        Sizing the caches requires walking all of them, this keeps it off
+        the path of every lifecycle run.
+        """
+        stamp = os.path.join(self.package_cache_root, '.last-pruned')
+        with contextlib.suppress(FileNotFoundError):
+            if time.time() - os.stat(stamp).st_mtime < interval:
+                return []
+        pruned_entries = self.prune(budget=budget)
+        os.makedirs(self.package_cache_root, exist_ok=True)
+        with open(stamp, 'w'):
+            pass
+        return pruned_entries
+
+    def _get_prunable_entries(self, ecosystem: str) -> List[str]:
+        ecosystem_dir = os.path.join(self.package_cache_root, ecosystem)
+        matches = set()
+        for pattern in _PRUNABLE_ENTRIES[ecosystem]:
+            matches.update(glob.glob(os.path.join(ecosystem_dir, pattern),
+                                     recursive=True))
+        # Never consider an entry nested inside another one on its own.
+        entries = []  # type: List[str]
+        for path in sorted(matches):
+            if entries and path.startswith(entries[-1] + os.sep):
+                continue
+            entries.append(path)
+        return entries
+
+
+def _get_size(path: str) -> int:
+    if not os.path.isdir(path) or os.path.islink(path):
+        with contextlib.suppress(FileNotFoundError):
+            return os.lstat(path).st_size
+        return 0
+
+    size = 0
+    for root, directories, files in os.walk(path):
+        for name in files:
+            with contextlib.suppress(FileNotFoundError):
+                size += os.lstat(os.path.join(root, name)).st_size
+    return size
@@ -0,0 +1,82 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List  # noqa
+
+from ._cache import SnapcraftCache, file_lock
+
+logger = logging.getLogger(__name__)
+
+
+class RosdepCache(SnapcraftCache):
+    """Cache for rosdep keys resolved into system dependencies.
+
+    Resolutions are keyed by a database key which must capture the rosdep
+    database they were resolved with, along with the rosdistro and Ubuntu
+    release they were resolved for.
+    """
+
+    def __init__(self):
+        """Create a RosdepCache."""
+        super().__init__()
+        self.rosdep_cache_root = os.path.join(self.cache_root, 'rosdep')
+
+    def _get_entry_path(self, database_key):
+        return os.path.join(self.rosdep_cache_root,
+                            '{}.json'.format(database_key))
+
+    def get(self, *, database_key) -> Dict[str, Dict[str, List[str]]]:
+        """Get the cached resolutions for a database.
+
+        :param str database_key: key identifying the rosdep database.
+        :returns: a dict of rosdep keys to dicts of dependency types to
+                  system dependencies, empty if nothing is cached.
+        """
+        try:
+            with open(self._get_entry_path(database_key)) as entry_file:
+                return json.load(entry_file)
+        except FileNotFoundError:
+            return dict()
+        except ValueError:
+            logger.debug('Ignoring invalid rosdep cache {!r}'.format(
+                database_key))
+            return dict()
+
+    def cache(self, *, database_key,
+              resolutions: Dict[str, Dict[str, List[str]]]) -> None:
+        """Add resolutions to the ones cached for a database.
+
+        :param str database_key: key identifying the rosdep database.
+        :param dict resolutions: rosdep keys to dicts of dependency types to
+                                 system dependencies.
+        """
+        entry_path = self._get_entry_path(database_key)
+        try:
+            with file_lock(entry_path + '.lock'):
+                entry = self.get(database_key=database_key)
+                entry.update(resolutions)
+                with tempfile.NamedTemporaryFile(
+                        'w', dir=self.rosdep_cache_root, suffix='.partial',
+                        delete=False) as f:
+                    temp_path = f.name
+                    json.dump(entry, f, sort_keys=True)
+                os.replace(temp_path, entry_path)
+        except OSError:
+            logger.warning('Unable to cache rosdep resolutions.')
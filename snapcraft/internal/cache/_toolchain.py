@@ -0,0 +1,262 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import time
+import uuid
+from typing import Callable, List, Optional, Tuple  # noqa
+
+from ._cache import SnapcraftCache, file_lock, remove_tree
+
+logger = logging.getLogger(__name__)
+
+_COMPLETE_MARKER = '.snapcraft-toolchain'
+
+
+class ToolchainCache(SnapcraftCache):
+    """Cache for toolchains shared by every part and project.
+
+    Entries are keyed by tool, version, architecture and channel and, once
+    populated, are left read-only so they can be safely linked into the
+    part directories of any number of parts. Refreshing a stale toolchain
+    populates a new entry for the key, the ones parts already link to are
+    only removed by prune().
+    """
+
+    def __init__(self):
+        """Create a ToolchainCache."""
+        super().__init__()
+        self.toolchain_cache_root = os.path.join(
+            self.cache_root, 'toolchains')
+
+    def _get_key_dir(self, *, tool, version, arch, channel):
+        key = json.dumps(dict(tool=tool, version=version, arch=arch,
+                              channel=channel), sort_keys=True)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.toolchain_cache_root, tool, digest)
+
+    def get(self, *, tool, version, arch, channel=None, max_age=None):
+        """Get the path to a cached toolchain.
+
+        :param str tool: name of the tool (e.g. rust).
+        :param str version: version of the tool, None for the latest.
+        :param str arch: architecture the toolchain was provisioned for.
+        :param str channel: channel the toolchain was obtained from.
+        :param int max_age: seconds after which the entry is considered
+                            stale, useful for unversioned toolchains.
+        :returns: path to the newest cached toolchain or None.
+        """
+        latest = _find_latest_entry(self._get_key_dir(
+            tool=tool, version=version, arch=arch, channel=channel))
+        if latest is None:
+            return None
+        entry_path, populated_at = latest
+        if max_age is not None and time.time() - populated_at > max_age:
+            return None
+        _record_use(entry_path)
+        logger.debug('Cache hit for toolchain {!r} ({})'.format(
+            tool, entry_path))
+        return entry_path
+
+    def cache(self, *, tool, version, arch, channel=None, max_age=None,
+              populate: Callable[[str], None]) -> str:
+        """Populate a toolchain entry unless it is already cached.
+
+        Concurrent callers for the same entry wait for the first one to
+        finish populating it.
+
+        :param populate: callable which installs the toolchain into the
+                         directory passed to it.
+        :returns: path to the cached toolchain.
+        """
+        key_dir = self._get_key_dir(
+            tool=tool, version=version, arch=arch, channel=channel)
+        with file_lock(key_dir + '.lock'):
+            cached_path = self.get(tool=tool, version=version, arch=arch,
+                                   channel=channel, max_age=max_age)
+            if cached_path:
+                return cached_path
+
+            # Stale entries are left in place for the parts linking to
+            # them, the new one gets a path of its own.
+            entry_path = os.path.join(key_dir, uuid.uuid4().hex)
+            # prune() skips entries locked while they are populated.
+            with file_lock(entry_path + '.lock'):
+                os.makedirs(entry_path)
+                try:
+                    populate(entry_path)
+                except Exception:
+                    remove_tree(entry_path)
+                    os.remove(entry_path + '.lock')
+                    raise
+                _make_read_only(entry_path)
+                with open(os.path.join(entry_path, _COMPLETE_MARKER),
+                          'w') as f:
+                    json.dump({'tool': tool, 'version': version,
+                               'arch': arch, 'channel': channel,
+                               'populated-at': time.time()}, f)
+        return entry_path
+
+    def link(self, *, path, tool, version, arch, channel=None, max_age=None,
+             populate: Callable[[str], None]) -> str:
+        """Symlink path to a toolchain entry, populating it if needed.
+
+        The link is put in place before populating so that tools which
+        record their install prefix can be pointed at path itself.
+        Takes the same arguments as cache().
+        """
+        def link_and_populate(entry_path):
+            _replace_with_link(path, entry_path)
+            populate(entry_path)
+
+        entry_path = self.cache(
+            tool=tool, version=version, arch=arch, channel=channel,
+            max_age=max_age, populate=link_and_populate)
+        _replace_with_link(path, entry_path)
+        return entry_path
+
+    @contextlib.contextmanager
+    def use(self, *, path, tool, version, arch, channel=None, max_age=None,
+            populate: Callable[[str], None]):
+        """Keep the toolchain path links to in the cache while in use.
+
+        The use is recorded and the entry is held with a shared lock, which
+        prune() does not remove entries under. If the entry was pruned
+        since path was linked to it, path is linked again as link() does.
+        Takes the same arguments as link().
+        """
+        while True:
+            if os.path.islink(path):
+                entry_path = os.readlink(path)
+                with file_lock(entry_path + '.lock', shared=True):
+                    # prune() may have removed the entry before it was
+                    # locked.
+                    if _record_use(entry_path):
+                        yield entry_path
+                        return
+                    if not os.path.exists(entry_path):
+                        os.remove(entry_path + '.lock')
+            logger.debug('Linking toolchain {!r} again'.format(tool))
+            self.link(path=path, tool=tool, version=version, arch=arch,
+                      channel=channel, max_age=max_age, populate=populate)
+
+    def prune(self, *, max_age: int) -> List[str]:
+        """Prune toolchains that have not been used for max_age seconds.
+
+        Entries currently being populated or used are skipped.
+
+        :returns: pruned entries paths list.
+        """
+        pruned_entries = []  # type: List[str]
+        if not os.path.isdir(self.toolchain_cache_root):
+            return pruned_entries
+
+        for tool in os.listdir(self.toolchain_cache_root):
+            tool_dir = os.path.join(self.toolchain_cache_root, tool)
+            for key in os.listdir(tool_dir):
+                key_dir = os.path.join(tool_dir, key)
+                if key.endswith('.lock') or not os.path.isdir(key_dir):
+                    continue
+                pruned_entries += _prune_key_dir(key_dir, max_age)
+        return pruned_entries
+
+
+def _find_latest_entry(key_dir) -> Optional[Tuple[str, float]]:
+    try:
+        names = os.listdir(key_dir)
+    except FileNotFoundError:
+        return None
+
+    latest = None  # type: Optional[Tuple[str, float]]
+    for name in names:
+        entry_path = os.path.join(key_dir, name)
+        try:
+            with open(os.path.join(entry_path, _COMPLETE_MARKER)) as f:
+                populated_at = json.load(f)['populated-at']
+        except (OSError, ValueError, KeyError):
+            continue
+        if latest is None or populated_at > latest[1]:
+            latest = (entry_path, populated_at)
+    return latest
+
+
+def _record_use(entry_path) -> bool:
+    # The marker's mtime records the last use, which drives pruning.
+    try:
+        os.utime(os.path.join(entry_path, _COMPLETE_MARKER))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _replace_with_link(path, entry_path):
+    if os.path.islink(path):
+        os.unlink(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.symlink(entry_path, path)
+
+
+def _prune_key_dir(key_dir, max_age) -> List[str]:
+    pruned_entries = []  # type: List[str]
+    for name in os.listdir(key_dir):
+        entry_path = os.path.join(key_dir, name)
+        if name.endswith('.lock') or not os.path.isdir(entry_path):
+            continue
+        try:
+            with file_lock(entry_path + '.lock', blocking=False):
+                if not _is_unused(entry_path, max_age):
+                    continue
+                remove_tree(entry_path)
+                os.remove(entry_path + '.lock')
+        except BlockingIOError:
+            continue
+        except OSError:
+            logger.warning(
+                'Unable to prune toolchain {}.'.format(entry_path))
+            continue
+        pruned_entries.append(entry_path)
+    # The key directory is removed with its last entry.
+    with contextlib.suppress(OSError):
+        os.rmdir(key_dir)
+    return pruned_entries
+
+
+def _is_unused(entry_path, max_age) -> bool:
+    marker = os.path.join(entry_path, _COMPLETE_MARKER)
+    try:
+        return time.time() - os.stat(marker).st_mtime > max_age
+    except FileNotFoundError:
+        # Left by an interrupted attempt at populating it.
+        return True
+
+
+def _make_read_only(path):
+    write_bits = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+    for root, directories, files in os.walk(path, topdown=False):
+        for name in files + directories:
+            entry = os.path.join(root, name)
+            if os.path.islink(entry):
+                continue
+            mode = os.stat(entry).st_mode
+            os.chmod(entry, mode & ~write_bits)
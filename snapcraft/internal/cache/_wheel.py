@@ -0,0 +1,98 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+from ._cache import SnapcraftCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_package_name(name: str) -> str:
+    """Normalize a python package name as done by PEP 503."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+class WheelCache(SnapcraftCache):
+    """Cache for wheels built from source distributions.
+
+    Wheels are keyed by package name and version, and by a build key which
+    must capture everything else the built wheel depends on (python ABI,
+    architecture, build environment).
+    """
+
+    def __init__(self):
+        """Create a WheelCache."""
+        super().__init__()
+        self.wheel_cache_root = os.path.join(self.cache_root, 'wheels')
+
+    def _get_entry_dir(self, *, name, version, build_key):
+        return os.path.join(self.wheel_cache_root,
+                            normalize_package_name(name), version, build_key)
+
+    def get(self, *, name, version, build_key):
+        """Get the path to the cached wheel for a package.
+
+        :param str name: name of the package.
+        :param str version: version of the package.
+        :param str build_key: key identifying the build conditions.
+        :returns: path to the cached wheel or None.
+        """
+        entry_dir = self._get_entry_dir(
+            name=name, version=version, build_key=build_key)
+        try:
+            wheels = [w for w in os.listdir(entry_dir) if w.endswith('.whl')]
+        except FileNotFoundError:
+            return None
+        if not wheels:
+            return None
+        logger.debug('Cache hit for wheel {}=={}'.format(name, version))
+        return os.path.join(entry_dir, wheels[0])
+
+    def cache(self, *, wheel_path, name, version, build_key):
+        """Cache a built wheel, unless one already exists.
+
+        The wheel is copied in under a temporary name and renamed into place
+        so concurrent builds never see a partial file.
+
+        :returns: path to the cached wheel or None if it could not be cached.
+        """
+        entry_dir = self._get_entry_dir(
+            name=name, version=version, build_key=build_key)
+        cached_wheel_path = os.path.join(
+            entry_dir, os.path.basename(wheel_path))
+        if os.path.exists(cached_wheel_path):
+            return cached_wheel_path
+
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    dir=entry_dir, suffix='.partial', delete=False) as f:
+                temp_path = f.name
+            try:
+                shutil.copyfile(wheel_path, temp_path)
+                os.replace(temp_path, cached_wheel_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        except OSError:
+            logger.warning('Unable to cache wheel {}.'.format(wheel_path))
+            return None
+        return cached_wheel_path
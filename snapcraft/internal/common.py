@@ -31,8 +31,9 @@ from typing import Callable, List
 from snapcraft.internal import errors
 
 
+SNAPCRAFT_TRASH_DIR = '.snapcraft-trash'
 SNAPCRAFT_FILES = ['snapcraft.yaml', '.snapcraft.yaml', 'parts', 'stage',
-                   'prime', 'snap']
+                   'prime', 'snap', SNAPCRAFT_TRASH_DIR]
 _DEFAULT_PLUGINDIR = os.path.join(sys.prefix, 'share', 'snapcraft', 'plugins')
 _plugindir = _DEFAULT_PLUGINDIR
 _DEFAULT_SCHEMADIR = os.path.join(sys.prefix, 'share', 'snapcraft', 'schema')
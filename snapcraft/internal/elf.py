@@ -21,7 +21,8 @@ import re
 import shutil
 import subprocess
 import tempfile
-from typing import Dict, FrozenSet, List, Set, Sequence, Tuple, Union  # noqa
+from typing import (  # noqa
+    Dict, FrozenSet, List, Optional, Set, Sequence, Tuple, Union)
 
 import elftools.elf.elffile
 from pkg_resources import parse_version
@@ -32,6 +33,7 @@ from snapcraft.internal import (
     errors,
     os_release,
     repo,
+    tracing,
 )
 
 
@@ -50,9 +52,14 @@ class NeededLibrary:
 
 
 ElfArchitectureTuple = Tuple[str, str, str]
-ElfDataTuple = Tuple[ElfArchitectureTuple, str, str, Dict[str, NeededLibrary], bool]  # noqa: E501
+ElfDataTuple = Tuple[ElfArchitectureTuple, str, str, Dict[str, NeededLibrary], bool, Optional[int]]  # noqa: E501
 SonameCacheDict = Dict[Tuple[ElfArchitectureTuple, str], str]
 
+# p_flags follows p_type in 64-bit program headers, to keep 64-bit fields
+# aligned, while it comes after all the address and size fields in 32-bit
+# ones.
+_P_FLAGS_OFFSETS = {32: 24, 64: 4}
+
 
 # Old pyelftools uses byte strings for section names.  Some data is
 # also returned as bytes, which is handled below.
@@ -196,12 +203,14 @@ class ElfFile:
         """
         self.path = path
         self.dependencies = set()  # type: Set[Library]
+        tracing.count('elf-files-scanned')
         elf_data = self._extract(path)
         self.arch = elf_data[0]
         self.interp = elf_data[1]
         self.soname = elf_data[2]
         self.needed = elf_data[3]
         self.execstack_set = elf_data[4]
+        self._execstack_flags_offset = elf_data[5]
 
     def _extract(self, path: str) -> ElfDataTuple:  # noqa: C901
         arch = None  # type: ElfArchitectureTuple
@@ -209,6 +218,7 @@ class ElfFile:
         soname = str()
         libs = dict()
         execstack_set = False
+        execstack_flags_offset = None  # type: Optional[int]
 
         with open(path, 'rb') as fp:
             elf = elftools.elf.elffile.ELFFile(fp)
@@ -255,15 +265,45 @@ class ElfFile:
                     for version in versions:
                         lib.add_version(_ensure_str(version.name))
 
-            for segment in elf.iter_segments():
+            for index, segment in enumerate(elf.iter_segments()):
                 if segment['p_type'] == 'PT_GNU_STACK':
                     # p_flags holds the bit mask for this segment.
                     # See `man 5 elf`.
                     mode = segment['p_flags']
                     if mode & elftools.elf.constants.P_FLAGS.PF_X:
                         execstack_set = True
+                        execstack_flags_offset = (
+                            elf.header.e_phoff +
+                            index * elf.header.e_phentsize +
+                            _P_FLAGS_OFFSETS[elf.elfclass])
+
+        return (arch, interp, soname, libs, execstack_set,
+                execstack_flags_offset)
+
+    def clear_execstack(self) -> None:
+        """Clear the executable flag of the stack segment, PT_GNU_STACK.
+
+        The flag is cleared in place, at the offset found when the file was
+        read, once any hard link to the file is broken.
+
+        :raises OSError: if the file cannot be written.
+        """
+        if not self.execstack_set:
+            return
+
+        if self.arch[1] == 'ELFDATA2LSB':
+            byteorder = 'little'
+        else:
+            byteorder = 'big'
 
-        return arch, interp, soname, libs, execstack_set
+        file_utils.break_hard_link(self.path)
+        with open(self.path, 'r+b') as elf_file:
+            elf_file.seek(self._execstack_flags_offset)
+            p_flags = int.from_bytes(elf_file.read(4), byteorder)
+            p_flags &= ~elftools.elf.constants.P_FLAGS.PF_X
+            elf_file.seek(self._execstack_flags_offset)
+            elf_file.write(p_flags.to_bytes(4, byteorder))
+        self.execstack_set = False
 
     def is_linker_compatible(self, *, linker_version: str) -> bool:
         """Determines if linker will work given the required glibc version."""
@@ -316,6 +356,7 @@ class ElfFile:
             # ldd output sample:
             # /lib64/ld-linux-x86-64.so.2 (0x00007fb3c5298000)
             # libm.so.6 => /lib/x86_64-linux-gnu/libm.so.6 (0x00007fb3bef03000)
+            tracing.count('ldd-forks')
             ldd_out = common.run_output(['ldd', self.path]).split('\n')
         except subprocess.CalledProcessError:
             logger.warning(
@@ -442,6 +483,7 @@ class Patcher:
 
             cmd = [self._patchelf_cmd] + patchelf_args + [temp_file.name]
             try:
+                tracing.count('patchelf-forks')
                 subprocess.check_call(cmd)
             # There is no need to catch FileNotFoundError as patchelf should be
             # bundled with snapcraft which means its lack of existence is a
@@ -467,6 +509,7 @@ class Patcher:
             shutil.copy2(temp_file.name, elf_file_path)
 
     def _get_existing_rpath(self, elf_file_path):
+        tracing.count('patchelf-forks')
         output = subprocess.check_output([self._patchelf_cmd, '--print-rpath',
                                           elf_file_path])
         return output.decode().strip().split(':')
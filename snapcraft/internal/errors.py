@@ -608,3 +608,15 @@ class NoNextStepError(SnapcraftError):
 
     def __init__(self, step):
         super().__init__(step=step)
+
+
+class InvalidPackageCacheSizeError(SnapcraftError):
+    fmt = (
+        'Invalid package cache size {size!r} set in '
+        'SNAPCRAFT_PACKAGE_CACHE_SIZE.\n'
+        'Set it to a number of bytes, optionally followed by K, M or G '
+        '(e.g. 10G).'
+    )
+
+    def __init__(self, size):
+        super().__init__(size=size)
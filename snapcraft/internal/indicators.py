@@ -13,9 +13,17 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import concurrent.futures
+import contextlib
+import hashlib
+import json
 import os
 import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple  # noqa
 
+import requests
 from urllib.request import urlretrieve
 from progressbar import (
     AnimatedMarker,
@@ -25,6 +33,8 @@ from progressbar import (
     UnknownLength,
 )
 
+from snapcraft.internal import tracing
+
 
 def _init_progress_bar(total_length, destination, message=None):
     if not message:
@@ -50,9 +60,27 @@ def _init_progress_bar(total_length, destination, message=None):
     return ProgressBar(widgets=widgets, maxval=maxval)
 
 
+# Chunks are sized relative to the download, within these bounds, so that
+# large downloads are not dominated by per chunk overhead.
+_MIN_CHUNK_SIZE = 64 * 1024
+_MAX_CHUNK_SIZE = 4 * 1024 * 1024
+# Seconds between progress bar updates.
+_PROGRESS_UPDATE_INTERVAL = 0.1
+
+
+def _get_chunk_size(total_length):
+    return max(_MIN_CHUNK_SIZE, min(_MAX_CHUNK_SIZE, total_length // 100))
+
+
 def download_requests_stream(request_stream, destination, message=None,
-                             total_read=0):
-    """This is a facility to download a request with nice progress bars."""
+                             total_read=0, *,
+                             algorithms: Iterable[str]=()) -> Dict[str, str]:
+    """This is a facility to download a request with nice progress bars.
+
+    :param iterable algorithms: hashlib algorithms to calculate digests of
+                                destination with while downloading.
+    :returns: dict of algorithm to the hex digest of destination.
+    """
 
     # Doing len(request_stream.content) may defeat the purpose of a
     # progress bar
@@ -65,20 +93,258 @@ def download_requests_stream(request_stream, destination, message=None,
         if os.path.exists(destination):
             total_length += total_read
 
+    hashers = {a: getattr(hashlib, a)() for a in algorithms}
+
     progress_bar = _init_progress_bar(total_length, destination, message)
     progress_bar.start()
 
     if os.path.exists(destination):
         mode = 'ab'
+        # When resuming, what is already there is part of the digest too.
+        if hashers:
+            _update_hashers(hashers, destination)
     else:
         mode = 'wb'
+    last_update = 0.0
     with open(destination, mode) as destination_file:
-        for buf in request_stream.iter_content(1024):
+        for buf in request_stream.iter_content(
+                _get_chunk_size(total_length)):
             destination_file.write(buf)
+            for hasher in hashers.values():
+                hasher.update(buf)
             total_read += len(buf)
-            progress_bar.update(total_read)
+            tracing.count('bytes-downloaded', len(buf))
+            now = time.monotonic()
+            if now - last_update >= _PROGRESS_UPDATE_INTERVAL:
+                progress_bar.update(total_read)
+                last_update = now
     progress_bar.finish()
 
+    return {a: h.hexdigest() for a, h in hashers.items()}
+
+
+def _update_hashers(hashers, path):
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(_MAX_CHUNK_SIZE), b''):
+            for hasher in hashers.values():
+                hasher.update(buf)
+
+
+# Downloads smaller than this are not worth splitting into segments.
+_MIN_SEGMENTED_SIZE = 64 * 1024 * 1024
+_SEGMENTS = 4
+_SEGMENT_RETRIES = 5
+# Seconds between saves of the segments journal.
+_JOURNAL_SAVE_INTERVAL = 1.0
+
+
+class _RangesNotSupported(Exception):
+    pass
+
+
+def probe_segmented_download(
+        url, *, session=requests) -> Tuple[int, Optional[str]]:
+    """Probe if url can be downloaded in concurrent segments.
+
+    :param session: object with the requests API to send the probe with.
+    :returns: the size of the download, or 0 if it should be downloaded
+              as a single stream, and the validator (strong ETag or
+              Last-Modified) an interrupted download can be resumed with.
+    """
+    try:
+        response = session.head(url, allow_redirects=True)
+    except requests.exceptions.RequestException:
+        return 0, None
+    if (response.status_code != 200 or
+            response.headers.get('Accept-Ranges') != 'bytes' or
+            response.headers.get('Content-Encoding')):
+        return 0, None
+    try:
+        size = int(response.headers.get('Content-Length', '0'))
+    except ValueError:
+        return 0, None
+    if size < _MIN_SEGMENTED_SIZE:
+        return 0, None
+    return size, _get_validator(response.headers)
+
+
+def _get_validator(headers) -> Optional[str]:
+    # Weak ETags cannot be used with If-Range.
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+class _SegmentsJournal:
+    """Track the progress of each segment of a download.
+
+    The journal is saved next to the download so that an interrupted
+    download can resume each of its segments, as long as the validator
+    of what is downloaded has not changed.
+    """
+
+    def __init__(self, destination, *, url, size, validator, segments,
+                 progress_bar):
+        self._path = destination + '.segments'
+        self._url = url
+        self._size = size
+        self.validator = validator
+        self._progress_bar = progress_bar
+        self._lock = threading.Lock()
+        self._last_update = 0.0
+        self._last_save = 0.0
+        # Set to have the segments stop downloading.
+        self.cancelled = threading.Event()
+
+        # Each segment is a [start, end, downloaded] list, end inclusive.
+        self.segments = self._load()  # type: List[List[int]]
+        if not self.segments or not os.path.exists(destination):
+            segment_size = -(-size // segments)
+            self.segments = [
+                [start, min(start + segment_size, size) - 1, 0]
+                for start in range(0, size, segment_size)]
+
+    def _load(self):
+        try:
+            with open(self._path) as journal_file:
+                journal = json.load(journal_file)
+        except (FileNotFoundError, ValueError):
+            return []
+        # Without a validator there is no telling whether what was
+        # downloaded so far is still current.
+        if (self.validator is None or
+                journal.get('url') != self._url or
+                journal.get('size') != self._size or
+                journal.get('validator') != self.validator):
+            return []
+        return journal.get('segments', [])
+
+    def get_downloaded(self):
+        return sum(segment[2] for segment in self.segments)
+
+    def advance(self, index, length):
+        with self._lock:
+            self.segments[index][2] += length
+            now = time.monotonic()
+            if now - self._last_update >= _PROGRESS_UPDATE_INTERVAL:
+                self._progress_bar.update(self.get_downloaded())
+                self._last_update = now
+            if now - self._last_save >= _JOURNAL_SAVE_INTERVAL:
+                self.save()
+                self._last_save = now
+
+    def save(self):
+        temp_path = self._path + '.tmp'
+        with open(temp_path, 'w') as journal_file:
+            json.dump(dict(url=self._url, size=self._size,
+                           validator=self.validator,
+                           segments=self.segments), journal_file)
+        os.replace(temp_path, self._path)
+
+    def remove(self):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path)
+
+
+def _download_segment(session, url, destination, journal, index):
+    for retry in reversed(range(_SEGMENT_RETRIES)):
+        start, end, downloaded = journal.segments[index]
+        if start + downloaded > end:
+            return
+        headers = {'Range': 'bytes={}-{}'.format(start + downloaded, end)}
+        if journal.validator:
+            # What changed since is sent whole, as when ranges are not
+            # supported, rather than mixed with what was downloaded.
+            headers['If-Range'] = journal.validator
+        try:
+            response = session.get(url, stream=True, headers=headers)
+            response.raise_for_status()
+            if response.status_code != 206:
+                response.close()
+                raise _RangesNotSupported()
+            # Unbuffered, so that what the journal records as downloaded
+            # has been handed to the OS.
+            with open(destination, 'r+b', buffering=0) as destination_file:
+                destination_file.seek(start + downloaded)
+                for buf in response.iter_content(
+                        _get_chunk_size(end - start)):
+                    destination_file.write(buf)
+                    journal.advance(index, len(buf))
+                    tracing.count('bytes-downloaded', len(buf))
+                    if journal.cancelled.is_set():
+                        response.close()
+                        return
+            return
+        except (requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.ConnectionError):
+            if not retry:
+                raise
+            time.sleep(1)
+
+
+def download_segmented(url, destination, message=None, *, size,
+                       validator=None, session=requests, segments=_SEGMENTS,
+                       algorithms: Iterable[str]=()) -> Dict[str, str]:
+    """Download url fetching byte ranges concurrently, with progress bars.
+
+    Progress is recorded in a journal next to destination, an interrupted
+    download resumes each segment where it was left. If the server turns
+    out to not honour ranges, it is downloaded as a single stream.
+
+    :param int size: size of the download, as returned by
+                     probe_segmented_download().
+    :param str validator: validator of the download, as returned by
+                          probe_segmented_download().
+    :param session: object with the requests API to download with.
+    :param int segments: number of concurrent segments.
+    :param iterable algorithms: hashlib algorithms to calculate digests of
+                                destination with.
+    :returns: dict of algorithm to the hex digest of destination.
+    """
+    progress_bar = _init_progress_bar(size, destination, message)
+    journal = _SegmentsJournal(destination, url=url, size=size,
+                               validator=validator, segments=segments,
+                               progress_bar=progress_bar)
+    # Preallocate, so segments can be written to in any order.
+    with open(destination, 'ab') as destination_file:
+        destination_file.truncate(size)
+    journal.save()
+
+    progress_bar.start()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(journal.segments)) as executor:
+            futures = [
+                executor.submit(_download_segment, session, url,
+                                destination, journal, index)
+                for index in range(len(journal.segments))]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                journal.cancelled.set()
+                raise
+    except _RangesNotSupported:
+        journal.remove()
+        os.remove(destination)
+        response = session.get(url, stream=True, allow_redirects=True)
+        response.raise_for_status()
+        return download_requests_stream(response, destination, message,
+                                        algorithms=algorithms)
+    except BaseException:
+        journal.save()
+        raise
+    progress_bar.finish()
+    journal.remove()
+
+    # Segments are not written in order, so digests need a read of the
+    # completed file.
+    hashers = {a: getattr(hashlib, a)() for a in algorithms}
+    if hashers:
+        _update_hashers(hashers, destination)
+    return {a: h.hexdigest() for a, h in hashers.items()}
+
 
 class UrllibDownloader(object):
     """This is a facility to download an uri with nice progress bars."""
@@ -91,6 +357,9 @@ class UrllibDownloader(object):
 
     def download(self):
         urlretrieve(self.uri, self.destination, self._progress_callback)
+        if tracing.is_enabled():
+            tracing.count('bytes-downloaded',
+                          os.path.getsize(self.destination))
 
         if self.progress_bar:
             self.progress_bar.finish()
@@ -16,10 +16,9 @@
 import contextlib
 import logging
 import os
-import shutil
 
 from snapcraft import formatting_utils
-from snapcraft.internal import errors, project_loader, steps
+from snapcraft.internal import errors, project_loader, steps, trash
 from . import constants
 
 
@@ -136,7 +135,7 @@ def _cleanup_common_directories_for_step(step, project_options, parts=None):
 def _cleanup_common(directory, step, message, parts):
     if os.path.isdir(directory):
         logger.info(message)
-        shutil.rmtree(directory)
+        trash.discard(directory)
     for part in parts:
         part.mark_cleaned(step)
 
@@ -147,18 +146,14 @@ def _cleanup_parts_dir(parts_dir, local_plugins_dir, parts):
         for subdirectory in os.listdir(parts_dir):
             path = os.path.join(parts_dir, subdirectory)
             if path != local_plugins_dir:
-                try:
-                    shutil.rmtree(path)
-                except NotADirectoryError:
-                    os.remove(path)
+                trash.discard(path)
     for part in parts:
         part.mark_cleaned(steps.BUILD)
         part.mark_cleaned(steps.PULL)
 
 
 def _cleanup_internal_snapcraft_dir():
-    if os.path.exists(constants.SNAPCRAFT_INTERNAL_DIR):
-        shutil.rmtree(constants.SNAPCRAFT_INTERNAL_DIR)
+    trash.discard(constants.SNAPCRAFT_INTERNAL_DIR)
 
 
 def clean(project_options, parts, step=None):
@@ -167,6 +162,9 @@ def clean(project_options, parts, step=None):
     if not step:
         step = steps.PULL
 
+    # Whatever a previous run left in the trash is deleted while cleaning.
+    trash.purge()
+
     if not parts and step == steps.PULL:
         _cleanup_common_directories_for_step(step, project_options)
         return
@@ -17,25 +17,33 @@ import logging
 import os
 import tarfile
 
-from snapcraft.internal import build_providers, errors, lxd, project_loader
+from snapcraft.internal import (
+    build_providers,
+    common,
+    errors,
+    lxd,
+    project_loader,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
-def _create_tar_filter(tar_filename):
-    def _tar_filter(tarinfo):
-        fn = tarinfo.name
-        if fn.startswith('./parts/') and not fn.startswith('./parts/plugins'):
-            return None
-        elif fn in ('./stage', './prime', tar_filename):
-            return None
-        elif fn.endswith('.snap'):
-            return None
-        elif fn.endswith('_source.tar.bz2'):
-            return None
-        return tarinfo
-    return _tar_filter
+def _is_excluded(path: str) -> bool:
+    # path is relative to the project.
+    if path.startswith('parts/') and not path.startswith('parts/plugins'):
+        return True
+    elif path in ('stage', 'prime', common.SNAPCRAFT_TRASH_DIR):
+        return True
+    elif path.endswith(('.snap', '_source.tar.gz', '_source.tar.bz2')):
+        return True
+    return False
+
+
+def _tar_filter(tarinfo):
+    if _is_excluded(os.path.relpath(tarinfo.name)):
+        return None
+    return tarinfo
 
 
 def containerbuild(step, project_options, output=None, args=[]):
@@ -47,23 +55,25 @@ def containerbuild(step, project_options, output=None, args=[]):
 
 def cleanbuild(*, project, echoer, build_environment, remote='') -> None:
     config = project_loader.load_config(project)
-    tar_filename = _create_tar_file(project.info.name)
 
     if build_environment.is_lxd:
+        tar_filename = _create_tar_file(project.info.name)
         _deprecated_cleanbuild(project, remote, config, tar_filename)
         return
 
     build_provider_class = build_providers.get_provider_for('multipass')
     with build_provider_class(project=project, echoer=echoer) as instance:
-        instance.provision_project(tar_filename)
+        instance.provision_project(exclude=_is_excluded)
         instance.build_project()
         instance.retrieve_snap()
 
 
 def _create_tar_file(project_name: str) -> str:
-    tar_filename = '{}_source.tar.bz2'.format(project_name)
-    with tarfile.open(tar_filename, 'w:bz2') as t:
-        t.add(os.path.curdir, filter=_create_tar_filter(tar_filename))
+    # The container may be on a remote, but compressing thoroughly takes
+    # longer than sending more.
+    tar_filename = '{}_source.tar.gz'.format(project_name)
+    with tarfile.open(tar_filename, 'w:gz', compresslevel=1) as t:
+        t.add(os.path.curdir, filter=_tar_filter)
 
     return tar_filename
 
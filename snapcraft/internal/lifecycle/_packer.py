@@ -22,7 +22,7 @@ import yaml
 from progressbar import AnimatedMarker, ProgressBar
 
 from snapcraft import file_utils
-from snapcraft.internal import common, repo, steps
+from snapcraft.internal import common, repo, steps, tracing
 from snapcraft.internal.indicators import is_dumb_terminal
 from ._runner import execute
 
@@ -66,9 +66,10 @@ def pack(directory, output=None):
         logger.warning('Renaming stale build assertion to {}'.format(_new))
         os.rename(snap_build, _new)
 
-    _run_mksquashfs(
-        mksquashfs_path, directory=directory, snap_name=snap['name'],
-        snap_type=snap['type'], output_snap_name=output_snap_name)
+    with tracing.span('pack', snap=output_snap_name):
+        _run_mksquashfs(
+            mksquashfs_path, directory=directory, snap_name=snap['name'],
+            snap_type=snap['type'], output_snap_name=output_snap_name)
 
     return output_snap_name
 
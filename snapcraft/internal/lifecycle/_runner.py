@@ -32,13 +32,32 @@ from snapcraft.internal import (
     repo,
     states,
     steps,
+    tracing,
+    trash,
+)
+from snapcraft.internal.cache import (
+    AptUnpackedPackageCache,
+    InitrdCache,
+    PackageDownloadCache,
+    SnapCache,
+    ToolchainCache,
+    get_package_cache_size_budget,
 )
-from snapcraft.internal.cache import SnapCache
 from . import constants
 
 
 logger = logging.getLogger(__name__)
 
+# Sizing the package caches walks all of them, so only enforce their size
+# budget once a day.
+_PACKAGE_CACHE_PRUNE_INTERVAL = 24 * 60 * 60
+# Unpacked stage-packages are kept for as long as they keep being used.
+_UNPACKED_STAGE_PACKAGES_MAX_AGE = 30 * 24 * 60 * 60
+# Toolchains are large, so the ones no longer used do not linger as long.
+_TOOLCHAINS_MAX_AGE = 14 * 24 * 60 * 60
+# Unpacked initrds only change with the core snap.
+_INITRDS_MAX_AGE = 30 * 24 * 60 * 60
+
 
 def execute(step, project_options, part_names=None):
     """Execute until step in the lifecycle for part_names or all parts.
@@ -59,14 +78,20 @@ def execute(step, project_options, part_names=None):
                           over.
     :returns: A dict with the snap name, version, type and architectures.
     """
-    config = project_loader.load_config(project_options)
-    installed_packages = repo.Repo.install_build_packages(
-        config.build_tools)
+    # Whatever a previous run left in the trash is deleted while this one
+    # goes on.
+    trash.purge()
+    with tracing.span('load-config'):
+        config = project_loader.load_config(project_options)
+    with tracing.span('install-build-packages'):
+        installed_packages = repo.Repo.install_build_packages(
+            config.build_tools)
     if installed_packages is None:
         raise ValueError(
             'The repo backend is not returning the list of installed packages')
 
-    installed_snaps = repo.snaps.install_snaps(config.build_snaps)
+    with tracing.span('install-build-snaps'):
+        installed_snaps = repo.snaps.install_snaps(config.build_snaps)
 
     os.makedirs(constants.SNAPCRAFT_INTERNAL_DIR, exist_ok=True)
     state_path = os.path.join(constants.SNAPCRAFT_INTERNAL_DIR, 'state')
@@ -75,10 +100,17 @@ def execute(step, project_options, part_names=None):
             states.GlobalState(installed_packages, installed_snaps)))
 
     if _should_get_core(config.data.get('confinement')):
-        _setup_core(project_options.deb_arch,
-                    config.data.get('base', 'core'))
+        with tracing.span('setup-core'):
+            _setup_core(project_options.deb_arch,
+                        config.data.get('base', 'core'))
+
+    # Parts built in this run share the manifest of the machine.
+    pluginhandler.clear_machine_manifest_cache()
+    with tracing.span('execute', step=step.name):
+        _Executor(config, project_options).run(step, part_names)
 
-    _Executor(config, project_options).run(step, part_names)
+    with tracing.span('prune-package-caches'):
+        _prune_package_caches()
 
     return {'name': config.data['name'],
             'version': config.data.get('version'),
@@ -86,6 +118,19 @@ def execute(step, project_options, part_names=None):
             'type': config.data.get('type', '')}
 
 
+def _prune_package_caches():
+    pruned_entries = PackageDownloadCache().prune_if_due(
+        budget=get_package_cache_size_budget(),
+        interval=_PACKAGE_CACHE_PRUNE_INTERVAL)
+    pruned_entries += AptUnpackedPackageCache().prune(
+        max_age=_UNPACKED_STAGE_PACKAGES_MAX_AGE)
+    pruned_entries += ToolchainCache().prune(max_age=_TOOLCHAINS_MAX_AGE)
+    pruned_entries += InitrdCache().prune(max_age=_INITRDS_MAX_AGE)
+    if pruned_entries:
+        logger.debug('Pruned {} entries from the package caches'.format(
+            len(pruned_entries)))
+
+
 def _setup_core(deb_arch, base):
     core_path = common.get_core_path(base)
     if os.path.exists(core_path) and os.listdir(core_path):
@@ -187,7 +232,8 @@ class _Executor:
             if current_step == steps.STAGE:
                 # XXX check only for collisions on the parts that have already
                 # been built --elopio - 20170713
-                pluginhandler.check_for_collisions(self.config.all_parts)
+                with tracing.span('check-collisions'):
+                    pluginhandler.check_for_collisions(self.config.all_parts)
             for part in parts:
                 if current_step not in self._steps_run[part.name]:
                     self._run_step(current_step, part, part_names)
@@ -228,16 +274,18 @@ class _Executor:
 
         part = _replace_in_part(part)
 
-        getattr(part, step.name)()
+        with tracing.span(step.name, category='step', part=part.name):
+            getattr(part, step.name)()
 
     def _create_meta(self, step, part_names):
         if step == steps.PRIME and part_names == self.config.part_names:
             common.env = self.config.snap_env()
-            meta.create_snap_packaging(
-                self.config.data, self.config.parts, self.project_options,
-                self.config.snapcraft_yaml_path,
-                self.config.original_snapcraft_yaml,
-                self.config.validator.schema)
+            with tracing.span('create-meta'):
+                meta.create_snap_packaging(
+                    self.config.data, self.config.parts,
+                    self.project_options, self.config.snapcraft_yaml_path,
+                    self.config.original_snapcraft_yaml,
+                    self.config.validator.schema)
 
     def _handle_dirty(self, part, step, dirty_report, cli_config):
         dirty_action = cli_config.get_outdated_step_action()
@@ -15,16 +15,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import hashlib
+import json
 import logging
 import os
 import petname
 import subprocess
+import time
+from typing import Optional
 
+import snapcraft
+from snapcraft.internal import common
+from snapcraft.internal.repo import snaps
 from . import errors
 from ._containerbuild import Containerbuild
 
 logger = logging.getLogger(__name__)
 
+# Images of provisioned containers are published under an alias with this
+# prefix, to launch containers which need no provisioning from.
+_PROVISIONED_ALIAS_PREFIX = 'snapcraft-provisioned-'
+# They are not refreshed, so they are only used for a day.
+_PROVISIONED_MAX_AGE = 24 * 60 * 60
+# And deleted a day later, leaving builds which picked one just before it
+# expired the time to launch from it.
+_PROVISIONED_PRUNE_AGE = 2 * _PROVISIONED_MAX_AGE
+
 
 class Cleanbuilder(Containerbuild):
 
@@ -36,18 +53,99 @@ class Cleanbuilder(Containerbuild):
                          container_name=container_name, remote=remote)
 
     def _ensure_container(self):
+        provisioned_alias = self._get_provisioned_alias()
+        provisioned_image = self._find_provisioned_image(provisioned_alias)
         try:
             subprocess.check_call([
-                'lxc', 'launch', '-e', self._image, self._container_name])
+                'lxc', 'launch', '-e', provisioned_image or self._image,
+                self._container_name])
         except subprocess.CalledProcessError as e:
             raise errors.ContainerCreationFailedError() from e
         self._configure_container()
         self._wait_for_network()
         self._container_run(['apt-get', 'update'])
+        if provisioned_image:
+            logger.info('Using the provisioned image {}'.format(
+                provisioned_alias))
+            return
         # Because of https://bugs.launchpad.net/snappy/+bug/1628289
         # Needed to run snapcraft as a snap and build-snaps
         self._container_run(['apt-get', 'install', 'squashfuse', '-y'])
         self._inject_snapcraft(new_container=True)
+        if provisioned_alias:
+            self._publish_provisioned_image(provisioned_alias)
+
+    def _get_provisioned_alias(self) -> Optional[str]:
+        # The alias captures everything the container is provisioned from.
+        key = [self._image, self._project_options.target_arch or '']
+        if common.is_snap():
+            for name in ('core', 'snapcraft'):
+                snap = snaps.SnapPackage(name)
+                if not snap.installed:
+                    return None
+                key.append('{}={}'.format(
+                    name, snap.get_local_snap_info()['revision']))
+        else:
+            key.append('snapcraft={}'.format(snapcraft.__version__))
+        return _PROVISIONED_ALIAS_PREFIX + hashlib.sha256(
+            ' '.join(key).encode()).hexdigest()[:32]
+
+    def _find_provisioned_image(self, alias: Optional[str]) -> Optional[str]:
+        """Return the provisioned image for alias, pruning expired ones.
+
+        Images for other aliases, such as the ones for other architectures
+        or revisions of snapcraft, are left to expire.
+        """
+        try:
+            images = json.loads(subprocess.check_output([
+                'lxc', 'image', 'list', '--format=json',
+                '{}:'.format(self._remote)]).decode())
+        except (subprocess.CalledProcessError, ValueError):
+            logger.debug('Failed to list provisioned images')
+            return None
+
+        provisioned_image = None
+        for image in images:
+            try:
+                age = time.time() - int(
+                    image['properties']['snapcraft.provisioned-at'])
+            except (KeyError, TypeError, ValueError):
+                # Only images published by snapcraft have this property.
+                continue
+            aliases = [a['name'] for a in image.get('aliases') or []]
+            if alias in aliases and age < _PROVISIONED_MAX_AGE:
+                provisioned_image = '{}:{}'.format(self._remote, alias)
+            elif age > _PROVISIONED_PRUNE_AGE:
+                logger.debug('Pruning provisioned image {}'.format(
+                    image['fingerprint']))
+                with contextlib.suppress(subprocess.CalledProcessError):
+                    subprocess.check_call([
+                        'lxc', 'image', 'delete', '{}:{}'.format(
+                            self._remote, image['fingerprint'])])
+        return provisioned_image
+
+    def _publish_provisioned_image(self, alias: str) -> None:
+        logger.info('Publishing the provisioned image {}'.format(alias))
+        snapshot = '{}/provisioned'.format(self._container_name)
+        # An expired image may still have the alias, it is kept for the
+        # builds launching from it until it is pruned.
+        with contextlib.suppress(subprocess.CalledProcessError):
+            subprocess.check_call([
+                'lxc', 'image', 'alias', 'delete', '{}:{}'.format(
+                    self._remote, alias)])
+        try:
+            subprocess.check_call([
+                'lxc', 'snapshot', self._container_name, 'provisioned'])
+            subprocess.check_call([
+                'lxc', 'publish', snapshot, '{}:'.format(self._remote),
+                '--alias', alias, 'snapcraft.provisioned-at={}'.format(
+                    int(time.time()))])
+        except subprocess.CalledProcessError:
+            # Another build may have published it first.
+            logger.warning('Failed to publish the provisioned image.')
+        finally:
+            with contextlib.suppress(subprocess.CalledProcessError):
+                subprocess.check_call(['lxc', 'delete', snapshot])
 
     def _setup_project(self):
         logger.info('Setting up container with project assets')
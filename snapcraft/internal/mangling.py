@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import logging
 import re
-import subprocess
 from typing import FrozenSet
 
 from snapcraft import file_utils
@@ -25,33 +24,57 @@ from snapcraft.internal import elf
 logger = logging.getLogger(__name__)
 
 
+# The argless rewrite below will barf if the shebang includes any args to
+# python. For example, if the shebang was `#!/usr/bin/python3 -Es`, just
+# replacing that with `#!/usr/bin/env python3 -Es` isn't going to work as `env`
+# doesn't support arguments like that.
+#
+# The solution is to replace the shebang with one pointing to /bin/sh, and
+# then exec the original shebang with included arguments. This requires
+# some quoting hacks to ensure the file can be interpreted by both sh as
+# well as python, but it's better than shipping our own `env`.
+_SHEBANG_REWRITES = [
+    (re.compile(rb'\A#!.*(python\S*)$', re.MULTILINE),
+     rb'#!/usr/bin/env \1'),
+    (re.compile(rb'\A#!.*(python\S*)[ \t\f\v]+(\S+)$', re.MULTILINE),
+     rb"""#!/bin/sh\n''''exec \1 \2 -- "$0" "$@" # '''"""),
+]
+
+
+_SHEBANG_RULES = [
+    file_utils.RewriteRule(pattern, replacement, header=b'#!')
+    for pattern, replacement in _SHEBANG_REWRITES
+]
+
+
 def rewrite_python_shebangs(root_dir):
     """Recursively change #!/usr/bin/pythonX shebangs to #!/usr/bin/env pythonX
 
     :param str root_dir: Directory that will be crawled for shebangs.
     """
+    file_utils.rewrite_tree(root_dir, _SHEBANG_RULES)
+
+
+def rewrite_python_shebang(file_path: str) -> None:
+    """Change a #!/usr/bin/pythonX shebang in file_path to use env.
 
-    file_pattern = re.compile(r'')
-    argless_shebang_pattern = re.compile(
-        r'\A#!.*(python\S*)$', re.MULTILINE)
-    shebang_pattern_with_args = re.compile(
-        r'\A#!.*(python\S*)[ \t\f\v]+(\S+)$', re.MULTILINE)
-
-    file_utils.replace_in_file(
-        root_dir, file_pattern, argless_shebang_pattern, r'#!/usr/bin/env \1')
-
-    # The above rewrite will barf if the shebang includes any args to python.
-    # For example, if the shebang was `#!/usr/bin/python3 -Es`, just replacing
-    # that with `#!/usr/bin/env python3 -Es` isn't going to work as `env`
-    # doesn't support arguments like that.
-    #
-    # The solution is to replace the shebang with one pointing to /bin/sh, and
-    # then exec the original shebang with included arguments. This requires
-    # some quoting hacks to ensure the file can be interpreted by both sh as
-    # well as python, but it's better than shipping our own `env`.
-    file_utils.replace_in_file(
-        root_dir, file_pattern, shebang_pattern_with_args,
-        r"""#!/bin/sh\n''''exec \1 \2 -- "$0" "$@" # '''""")
+    Only files starting with a shebang are read in full.
+
+    :param str file_path: path to the file to rewrite.
+    """
+    file_utils.rewrite_file(file_path, _SHEBANG_RULES)
+
+
+def rewrite_python_shebang_contents(contents: bytes) -> bytes:
+    """Return contents with a #!/usr/bin/pythonX shebang changed to use env.
+
+    This allows rewriting files as they are being written out.
+    """
+    if not contents.startswith(b'#!'):
+        return contents
+    for pattern, replacement in _SHEBANG_REWRITES:
+        contents = pattern.sub(replacement, contents)
+    return contents
 
 
 def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
@@ -60,7 +83,6 @@ def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
     param elf.ElfFile elf_files: the full list of elf files to analyze
                                  and clear the execstack if present.
     """
-    execstack_path = file_utils.get_tool_path('execstack')
     elf_files_with_execstack = [e for e in elf_files if e.execstack_set]
 
     if elf_files_with_execstack:
@@ -75,8 +97,7 @@ def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
 
     for elf_file in elf_files_with_execstack:
         try:
-            subprocess.check_call([execstack_path, '--clear-execstack',
-                                   elf_file.path])
-        except subprocess.CalledProcessError:
+            elf_file.clear_execstack()
+        except OSError:
             logger.warning('Failed to clear execstack for {!r}'.format(
                 elf_file.path))
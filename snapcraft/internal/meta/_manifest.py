@@ -24,6 +24,7 @@ import snapcraft
 from snapcraft.internal import errors, os_release, steps
 from snapcraft.internal.states import (
     get_global_state,
+    get_machine_assets,
     get_state
 )
 
@@ -62,4 +63,8 @@ def annotate_snapcraft(data, parts_dir: str):
             manifest['parts'][part].update(source_details)
         build_state = get_state(state_dir, steps.BUILD)
         manifest['parts'][part].update(build_state.assets)
+        # States written by older snapcraft have their machine assets in
+        # assets.
+        manifest['parts'][part].update(get_machine_assets(
+            parts_dir, getattr(build_state, 'machine_assets_digest', None)))
     return manifest
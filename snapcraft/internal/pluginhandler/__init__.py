@@ -17,7 +17,7 @@
 import collections
 import contextlib
 import copy
-import filecmp
+import errno
 import logging
 import os
 import shutil
@@ -37,9 +37,16 @@ from snapcraft.internal import (
     sources,
     states,
     steps,
+    tracing,
+    trash,
 )
 from snapcraft.internal.mangling import clear_execstack
 
+from . import _content_index, _fileset, _migration
+from ._machine_manifest import (  # noqa
+    clear_machine_manifest_cache,
+    get_machine_manifest,
+)
 from ._build_attributes import BuildAttributes
 from ._metadata_extraction import extract_metadata
 from ._plugin_loader import load_plugin  # noqa
@@ -320,8 +327,9 @@ class PluginHandler:
         if stage_packages:
             logger.debug('Fetching stage-packages {!r}'.format(stage_packages))
             try:
-                self.stage_packages = self._stage_packages_repo.get(
-                    stage_packages)
+                with tracing.span('fetch-stage-packages', part=self.name):
+                    self.stage_packages = self._stage_packages_repo.get(
+                        stage_packages)
             except repo.errors.PackageNotFoundError as e:
                 raise errors.StagePackageDownloadError(self.name, e.message)
 
@@ -330,7 +338,8 @@ class PluginHandler:
         if stage_packages:
             logger.debug('Unpacking stage-packages to {!r}'.format(
                 self.plugin.installdir))
-            self._stage_packages_repo.unpack(self.plugin.installdir)
+            with tracing.span('unpack-stage-packages', part=self.name):
+                self._stage_packages_repo.unpack(self.plugin.installdir)
 
     def prepare_pull(self, force=False):
         self.makedirs()
@@ -340,11 +349,7 @@ class PluginHandler:
 
     def pull(self, force=False):
         # Ensure any previously-failed pull is cleared out before we try again
-        if (os.path.islink(self.plugin.sourcedir) or
-                os.path.isfile(self.plugin.sourcedir)):
-            os.remove(self.plugin.sourcedir)
-        elif os.path.isdir(self.plugin.sourcedir):
-            shutil.rmtree(self.plugin.sourcedir)
+        trash.discard(self.plugin.sourcedir)
 
         self.makedirs()
         self.notify_part_progress('Pulling')
@@ -355,7 +360,8 @@ class PluginHandler:
 
     def _do_pull(self):
         if self.source_handler:
-            self.source_handler.pull()
+            with tracing.span('pull-source', part=self.name):
+                self.source_handler.pull()
         self.plugin.pull()
 
     def mark_pull_done(self):
@@ -393,14 +399,8 @@ class PluginHandler:
 
         self.notify_part_progress('Cleaning pulled source for', hint)
         # Remove ubuntu cache (where stage packages are fetched)
-        if os.path.exists(self.plugin.osrepodir):
-            shutil.rmtree(self.plugin.osrepodir)
-
-        if os.path.exists(self.plugin.sourcedir):
-            if os.path.islink(self.plugin.sourcedir):
-                os.remove(self.plugin.sourcedir)
-            else:
-                shutil.rmtree(self.plugin.sourcedir)
+        trash.discard(self.plugin.osrepodir)
+        trash.discard(self.plugin.sourcedir)
 
         self.plugin.clean_pull()
         self.mark_cleaned(steps.PULL)
@@ -416,8 +416,11 @@ class PluginHandler:
         self.makedirs()
         self.notify_part_progress('Building')
 
-        if os.path.exists(self.plugin.build_basedir):
-            shutil.rmtree(self.plugin.build_basedir)
+        # Start a new index for what this build installs.
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._content_index_path)
+
+        trash.discard(self.plugin.build_basedir)
 
         # FIXME: It's not necessary to ignore here anymore since it's now done
         # in the Local source. However, it's left here so that it continues to
@@ -455,7 +458,11 @@ class PluginHandler:
     def mark_build_done(self):
         build_properties = self.plugin.get_build_properties()
         plugin_manifest = self.plugin.get_manifest()
-        machine_manifest = self._get_machine_manifest()
+        # The machine manifest is the same for all parts, so it is kept once
+        # for all of them rather than in each state.
+        with tracing.span('machine-manifest'):
+            machine_assets_digest = states.save_machine_assets(
+                os.path.dirname(self.plugin.partdir), get_machine_manifest())
 
         # Extract any requested metadata available in the build directory,
         # followed by the install directory (which takes precedence)
@@ -488,17 +495,10 @@ class PluginHandler:
             part_properties=self._part_properties,
             project=self._project_options,
             plugin_assets=plugin_manifest,
-            machine_assets=machine_manifest,
             metadata=metadata,
             metadata_files=metadata_files,
-            scriptlet_metadata=self._scriptlet_metadata[steps.BUILD]))
-
-    def _get_machine_manifest(self):
-        return {
-            'uname': common.run_output(['uname', '-srvmpio']),
-            'installed-packages': repo.Repo.get_installed_packages(),
-            'installed-snaps': repo.snaps.get_installed_snaps()
-        }
+            scriptlet_metadata=self._scriptlet_metadata[steps.BUILD],
+            machine_assets_digest=machine_assets_digest))
 
     def clean_build(self, hint=''):
         if self.is_clean(steps.BUILD):
@@ -509,15 +509,24 @@ class PluginHandler:
 
         self.notify_part_progress('Cleaning build for', hint)
 
-        if os.path.exists(self.plugin.build_basedir):
-            shutil.rmtree(self.plugin.build_basedir)
+        trash.discard(self.plugin.build_basedir)
+        trash.discard(self.plugin.installdir)
 
-        if os.path.exists(self.plugin.installdir):
-            shutil.rmtree(self.plugin.installdir)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._content_index_path)
 
         self.plugin.clean_build()
         self.mark_cleaned(steps.BUILD)
 
+    @property
+    def _content_index_path(self):
+        return os.path.join(self.plugin.partdir, 'install-index.json')
+
+    def get_content_index(self):
+        """Return the index used to tell if installed files collide."""
+        return _content_index.ContentIndex(
+            self.plugin.installdir, self._content_index_path)
+
     def migratable_fileset_for(self, step):
         plugin_fileset = self.plugin.snap_fileset()
         fileset = self._get_fileset(step.name).copy()
@@ -612,30 +621,34 @@ class PluginHandler:
         _migrate_files(snap_files, snap_dirs, self.stagedir, self.primedir)
 
         if self._snap_type == 'app':
-            dependency_paths = self._handle_elf(snap_files)
+            with tracing.span('handle-elf', part=self.name):
+                dependency_paths = self._handle_elf(snap_files)
         else:
             dependency_paths = set()
 
         self.mark_prime_done(snap_files, snap_dirs, dependency_paths)
 
     def _handle_elf(self, snap_files: Sequence[str]) -> Set[str]:
-        elf_files = elf.get_elf_files(self.primedir, snap_files)
+        with tracing.span('get-elf-files'):
+            elf_files = elf.get_elf_files(self.primedir, snap_files)
         all_dependencies = set()
         # TODO: base snap support
         core_path = common.get_core_path(self._base)
 
         # Clear the cache of all libs that aren't already in the primedir
         self._soname_cache.reset_except_root(self.primedir)
-        for elf_file in elf_files:
-            all_dependencies.update(
-                elf_file.load_dependencies(root_path=self.primedir,
-                                           core_base_path=core_path,
-                                           soname_cache=self._soname_cache))
+        with tracing.span('load-dependencies'):
+            for elf_file in elf_files:
+                all_dependencies.update(elf_file.load_dependencies(
+                    root_path=self.primedir, core_base_path=core_path,
+                    soname_cache=self._soname_cache))
 
-        dependency_paths = self._handle_dependencies(all_dependencies)
+        with tracing.span('handle-dependencies'):
+            dependency_paths = self._handle_dependencies(all_dependencies)
 
         if not self._build_attributes.keep_execstack():
-            clear_execstack(elf_files=elf_files)
+            with tracing.span('clear-execstack'):
+                clear_execstack(elf_files=elf_files)
 
         if self._build_attributes.no_patchelf():
             logger.warning(
@@ -654,7 +667,8 @@ class PluginHandler:
                 primedir=self.primedir,
                 stage_packages=self._part_properties.get(
                     'stage-packages', []))
-            part_patcher.patch()
+            with tracing.span('patchelf'):
+                part_patcher.patch()
 
         return dependency_paths
 
@@ -768,8 +782,7 @@ class PluginHandler:
                 raise
 
             logger.info('Cleaning up for part {!r}'.format(self.name))
-            if os.path.exists(self.plugin.partdir):
-                shutil.rmtree(self.plugin.partdir)
+            trash.discard(self.plugin.partdir)
 
         # Remove the part directory if it's completely empty (i.e. all steps
         # have been cleaned).
@@ -863,65 +876,15 @@ def _expand_part_properties(part_properties, part_schema):
 
 def _migratable_filesets(fileset, srcdir):
     includes, excludes = _get_file_list(fileset)
-
-    include_files = _generate_include_set(srcdir, includes)
-    exclude_files, exclude_dirs = _generate_exclude_set(srcdir, excludes)
-
-    # And chop files, including whole trees if any dirs are mentioned
-    snap_files = include_files - exclude_files
-    for exclude_dir in exclude_dirs:
-        snap_files = set([x for x in snap_files
-                          if not x.startswith(exclude_dir + '/')])
-
-    # Separate dirs from files
-    snap_dirs = set([x for x in snap_files
-                     if os.path.isdir(os.path.join(srcdir, x)) and
-                     not os.path.islink(os.path.join(srcdir, x))])
-    snap_files = snap_files - snap_dirs
-
-    # Make sure we also obtain the parent directories of files
-    for snap_file in snap_files:
-        dirname = os.path.dirname(snap_file)
-        while dirname:
-            snap_dirs.add(dirname)
-            dirname = os.path.dirname(dirname)
-
-    return snap_files, snap_dirs
+    return _fileset.resolve(includes, excludes, srcdir)
 
 
 def _migrate_files(snap_files, snap_dirs, srcdir, dstdir, missing_ok=False,
                    follow_symlinks=False, fixup_func=lambda *args: None):
-
-    for directory in snap_dirs:
-        src = os.path.join(srcdir, directory)
-        dst = os.path.join(dstdir, directory)
-
-        snapcraft.file_utils.create_similar_directory(src, dst)
-
-    for snap_file in snap_files:
-        src = os.path.join(srcdir, snap_file)
-        dst = os.path.join(dstdir, snap_file)
-
-        snapcraft.file_utils.create_similar_directory(os.path.dirname(src),
-                                                      os.path.dirname(dst))
-
-        if missing_ok and not os.path.exists(src):
-            continue
-
-        # If the file is already here and it's a symlink, leave it alone.
-        if os.path.islink(dst):
-            continue
-
-        # Otherwise, remove and re-link it.
-        if os.path.exists(dst):
-            os.remove(dst)
-
-        if src.endswith('.pc'):
-            shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
-        else:
-            file_utils.link_or_copy(src, dst, follow_symlinks=follow_symlinks)
-
-        fixup_func(dst)
+    with tracing.span('migrate-files', dstdir=dstdir):
+        _migration.migrate_files(
+            snap_files, snap_dirs, srcdir, dstdir, missing_ok=missing_ok,
+            follow_symlinks=follow_symlinks, fixup_func=fixup_func)
 
 
 def _organize_filesets(fileset, base_dir):
@@ -959,9 +922,13 @@ def _clean_migrated_files(snap_files, snap_dirs, directory):
     snap_dirs = sorted(snap_dirs, reverse=True)
 
     for snap_dir in snap_dirs:
-        migrated_directory = os.path.join(directory, snap_dir)
-        if not os.listdir(migrated_directory):
-            os.rmdir(migrated_directory)
+        # Directories still holding files from other parts fail to be
+        # removed, which saves listing them all first.
+        try:
+            os.rmdir(os.path.join(directory, snap_dir))
+        except OSError as e:
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                raise
 
 
 def _get_file_list(stage_set):
@@ -983,138 +950,43 @@ def _get_file_list(stage_set):
     return includes, excludes
 
 
-def _generate_include_set(directory, includes):
-    include_files = set()
-    for include in includes:
-        if '*' in include:
-            pattern = os.path.join(directory, include)
-            matches = iglob(pattern, recursive=True)
-            include_files |= set(matches)
-        else:
-            include_files |= set([os.path.join(directory, include), ])
-
-    include_dirs = [x for x in include_files if os.path.isdir(x)]
-    include_files = set([os.path.relpath(x, directory) for x in include_files])
-
-    # Expand includeFiles, so that an exclude like '*/*.so' will still match
-    # files from an include like 'lib'
-    for include_dir in include_dirs:
-        for root, dirs, files in os.walk(include_dir):
-            include_files |= \
-                set([os.path.relpath(os.path.join(root, d), directory)
-                     for d in dirs])
-            include_files |= \
-                set([os.path.relpath(os.path.join(root, f), directory)
-                     for f in files])
-
-    return include_files
-
-
-def _generate_exclude_set(directory, excludes):
-    exclude_files = set()
-
-    for exclude in excludes:
-        pattern = os.path.join(directory, exclude)
-        matches = iglob(pattern, recursive=True)
-        exclude_files |= set(matches)
-
-    exclude_dirs = [os.path.relpath(x, directory)
-                    for x in exclude_files if os.path.isdir(x)]
-    exclude_files = set([os.path.relpath(x, directory)
-                         for x in exclude_files])
-
-    return exclude_files, exclude_dirs
-
-
 def _validate_relative_paths(files):
     for d in files:
         if os.path.isabs(d):
             raise errors.PluginError('path "{}" must be relative'.format(d))
 
 
-def _file_collides(file_this, file_other):
-    if not file_this.endswith('.pc'):
-        return not filecmp.cmp(file_this, file_other, shallow=False)
-
-    pc_file_1 = open(file_this)
-    pc_file_2 = open(file_other)
-
-    try:
-        for lines in zip(pc_file_1, pc_file_2):
-            for line in zip(lines[0].split('\n'), lines[1].split('\n')):
-                if line[0].startswith('prefix='):
-                    continue
-                if line[0] != line[1]:
-                    return True
-    except Exception as e:
-        raise e from e
-    finally:
-        pc_file_1.close()
-        pc_file_2.close()
-    return False
-
-
 def check_for_collisions(parts):
     """Raises a SnapcraftPartConflictError if conflicts are found."""
-    parts_files = {}
-    for part in parts:
-        # Gather our own files up
-        part_files, part_directories = part.migratable_fileset_for(steps.STAGE)
-        part_contents = part_files | part_directories
-
-        # Scan previous parts for collisions
-        for other_part_name in parts_files:
-            common = part_contents & parts_files[other_part_name]['files']
-            conflict_files = []
-            for f in common:
-                this = os.path.join(part.plugin.installdir, f)
-                other = os.path.join(
-                    parts_files[other_part_name]['installdir'],
-                    f)
-
-                if _paths_collide(this, other):
-                    conflict_files.append(f)
-
-            if conflict_files:
-                raise errors.SnapcraftPartConflictError(
-                    other_part_name=other_part_name,
-                    part_name=part.name,
-                    conflict_files=conflict_files)
-
-        # And add our files to the list
-        parts_files[part.name] = {'files': part_contents,
-                                  'installdir': part.plugin.installdir}
-
-
-def _paths_collide(path1: str, path2: str) -> bool:
-    if not (os.path.lexists(path1) and os.path.lexists(path2)):
-        return False
-
-    path1_is_dir = os.path.isdir(path1)
-    path2_is_dir = os.path.isdir(path2)
-    path1_is_link = os.path.islink(path1)
-    path2_is_link = os.path.islink(path2)
-
-    # Paths collide if they're both symlinks, but pointing to different places
-    if path1_is_link and path2_is_link:
-        return os.readlink(path1) != os.readlink(path2)
-
-    # Paths collide if one is a symlink, but not the other
-    elif path1_is_link or path2_is_link:
-        return True
-
-    # Paths collide if one is a directory, but not the other
-    elif path1_is_dir != path2_is_dir:
-        return True
-
-    # Paths collide if neither path is a directory, and the files have
-    # different contents
-    elif not (path1_is_dir and path2_is_dir) and _file_collides(path1, path2):
-        return True
-
-    # Otherwise, paths do not conflict
-    else:
-        return False
+    parts_files = collections.OrderedDict()
+    try:
+        for part in parts:
+            # Gather our own files up
+            part_files, part_directories = part.migratable_fileset_for(
+                steps.STAGE)
+            part_contents = part_files | part_directories
+            index = part.get_content_index()
+
+            # Scan previous parts for collisions
+            for other_part_name in parts_files:
+                common = part_contents & parts_files[other_part_name]['files']
+                other_index = parts_files[other_part_name]['index']
+                conflict_files = [
+                    f for f in common
+                    if _content_index.paths_collide(f, index, other_index)]
+
+                if conflict_files:
+                    raise errors.SnapcraftPartConflictError(
+                        other_part_name=other_part_name,
+                        part_name=part.name,
+                        conflict_files=conflict_files)
+
+            # And add our files to the list
+            parts_files[part.name] = {'files': part_contents,
+                                      'index': index}
+    finally:
+        for part_files in parts_files.values():
+            part_files['index'].save()
 
 
 def _get_includes(fileset):
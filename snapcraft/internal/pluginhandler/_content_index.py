@@ -0,0 +1,174 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Index the contents of install directories to find staging collisions.
+
+The index of a part maps the paths in its install directory to the digest
+of their contents, along with the stat information the digest was taken
+for. Digests are taken the first time a path is compared with another
+part's, and only taken again once the stat information no longer matches.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import stat
+import time
+from typing import Dict, List, Optional  # noqa: F401
+
+from snapcraft import file_utils
+
+logger = logging.getLogger(__name__)
+
+_INDEX_VERSION = 1
+
+# Digests of files modified this recently, in nanoseconds, are not kept as
+# a modification in the same timestamp tick would go unnoticed.
+_RACY_WINDOW = 100 * 10 ** 6
+
+
+class ContentIndex:
+    """The content digests of the files in an install directory."""
+
+    def __init__(self, directory: str, index_path: str) -> None:
+        """Load the index for directory kept in index_path, if any.
+
+        :param str directory: the install directory being indexed.
+        :param str index_path: the file the index is kept in.
+        """
+        self.directory = directory
+        self._index_path = index_path
+        self._entries = dict()  # type: Dict[str, List]
+        self._changed = False
+
+        with contextlib.suppress(FileNotFoundError):
+            with open(index_path) as index_file:
+                try:
+                    index = json.load(index_file)
+                except ValueError:
+                    logger.debug('Ignoring invalid index {!r}'.format(
+                        index_path))
+                    return
+            if index.get('version') == _INDEX_VERSION:
+                self._entries = index['entries']
+
+    def lstat(self, path: str) -> Optional[os.stat_result]:
+        """Return the stat of path, without following symlinks, or None."""
+        try:
+            return os.lstat(os.path.join(self.directory, path))
+        except OSError:
+            return None
+
+    def get_digest(self, path: str, stat_result: os.stat_result) -> str:
+        """Get the digest of the regular file at path.
+
+        :param str path: the path relative to the install directory.
+        :param stat_result: the current stat of path.
+        """
+        signature = [stat_result.st_ino, stat_result.st_size,
+                     stat_result.st_mtime_ns, stat_result.st_ctime_ns]
+        entry = self._entries.get(path)
+        if entry is not None and entry[:-1] == signature:
+            return entry[-1]
+
+        hashed_at = int(time.time() * 10 ** 9)
+        digest = file_utils.calculate_hash(
+            os.path.join(self.directory, path), algorithm='sha256')
+        if stat_result.st_mtime_ns < hashed_at - _RACY_WINDOW:
+            self._entries[path] = signature + [digest]
+            self._changed = True
+        return digest
+
+    def save(self) -> None:
+        """Write the index back if digests were taken."""
+        if not self._changed:
+            return
+        if not os.path.isdir(os.path.dirname(self._index_path)):
+            return
+        # Entries for files that are gone would only pile up.
+        entries = {path: entry for path, entry in self._entries.items()
+                   if os.path.lexists(os.path.join(self.directory, path))}
+        temp_path = '{}.partial'.format(self._index_path)
+        with open(temp_path, 'w') as index_file:
+            json.dump(dict(version=_INDEX_VERSION, entries=entries),
+                      index_file)
+        os.replace(temp_path, self._index_path)
+        self._changed = False
+
+
+def paths_collide(path: str, index: ContentIndex,
+                  other_index: ContentIndex) -> bool:
+    """Tell if path has different contents in two install directories.
+
+    :param str path: the path relative to both install directories.
+    :param ContentIndex index: the index of one install directory.
+    :param ContentIndex other_index: the index of the other one.
+    """
+    this = index.lstat(path)
+    other = other_index.lstat(path)
+    if this is None or other is None:
+        return False
+
+    this_is_link = stat.S_ISLNK(this.st_mode)
+    other_is_link = stat.S_ISLNK(other.st_mode)
+
+    # Paths collide if they're both symlinks, but pointing to different places
+    if this_is_link and other_is_link:
+        return (os.readlink(os.path.join(index.directory, path)) !=
+                os.readlink(os.path.join(other_index.directory, path)))
+
+    # Paths collide if one is a symlink, but not the other
+    elif this_is_link or other_is_link:
+        return True
+
+    # Paths collide if one is a directory, but not the other
+    elif stat.S_ISDIR(this.st_mode) != stat.S_ISDIR(other.st_mode):
+        return True
+
+    # Paths do not conflict if both are directories
+    elif stat.S_ISDIR(this.st_mode):
+        return False
+
+    # Anything but regular files is considered different, like filecmp does
+    elif not (stat.S_ISREG(this.st_mode) and stat.S_ISREG(other.st_mode)):
+        return True
+
+    elif path.endswith('.pc'):
+        return _pc_files_collide(os.path.join(index.directory, path),
+                                 os.path.join(other_index.directory, path))
+
+    # Hard links to the same file, as stage-packages are, are the same
+    elif (this.st_dev, this.st_ino) == (other.st_dev, other.st_ino):
+        return False
+
+    elif this.st_size != other.st_size:
+        return True
+
+    return (index.get_digest(path, this) !=
+            other_index.get_digest(path, other))
+
+
+def _pc_files_collide(file_this: str, file_other: str) -> bool:
+    # The prefix of pkg-config files is rewritten when staging.
+    with open(file_this) as pc_file_1, open(file_other) as pc_file_2:
+        for lines in zip(pc_file_1, pc_file_2):
+            for line in zip(lines[0].split('\n'), lines[1].split('\n')):
+                if line[0].startswith('prefix='):
+                    continue
+                if line[0] != line[1]:
+                    return True
+    return False
@@ -0,0 +1,343 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Resolve stage, prime and snap filesets against a directory.
+
+Includes and excludes keep the semantics of glob(recursive=True): magic
+components do not match hidden names unless they start with a dot, '**'
+matches any number of non-hidden directories and symlinks to directories
+are followed. Included directories bring in everything below them, as
+os.walk would, and excluded directories take out everything below them.
+
+Patterns are compiled once and matched while scanning the directory a
+single time, pruning the subtrees no pattern can reach.
+"""
+
+import collections
+import fnmatch
+import glob
+import os
+import re
+import time
+from typing import Dict, List, Set, Tuple  # noqa: F401
+
+# Results for directories modified this recently, in nanoseconds, are not
+# cached as a modification in the same timestamp tick would go unnoticed.
+_RACY_WINDOW = 100 * 10 ** 6
+_CACHE_SIZE = 8
+
+_RECURSIVE = object()
+
+_cache = collections.OrderedDict()  # type: Dict[Tuple, _Resolution]
+
+
+class _GlobComponent:
+
+    def __init__(self, component: str) -> None:
+        self._match = re.compile(fnmatch.translate(component)).match
+        self._include_hidden = component.startswith('.')
+
+    def matches(self, name: str) -> bool:
+        if name.startswith('.') and not self._include_hidden:
+            return False
+        return self._match(name) is not None
+
+
+class _Pattern:
+
+    def __init__(self, pattern: str, *, literal: bool) -> None:
+        self.dir_only = pattern.endswith('/')
+        self.components = []  # type: List
+        for component in pattern.split('/'):
+            if component in ('', '.'):
+                continue
+            elif literal or not glob.has_magic(component):
+                self.components.append(component)
+            elif component == '**':
+                self.components.append(_RECURSIVE)
+            else:
+                self.components.append(_GlobComponent(component))
+
+
+class _Resolution:
+
+    def __init__(self, files: Set[str], dirs: Set[str],
+                 snapshot: Dict[str, int], cacheable: bool) -> None:
+        self.files = files
+        self.dirs = dirs
+        # Adding, removing or replacing an entry updates the mtime of the
+        # directory it is in, so these tell if the resolution still holds.
+        self.snapshot = snapshot
+        self.cacheable = cacheable
+
+    def is_current(self) -> bool:
+        for path, mtime in self.snapshot.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+
+class Fileset:
+    """A fileset compiled for matching against directories."""
+
+    def __init__(self, includes: List[str], excludes: List[str]) -> None:
+        """Compile includes and excludes.
+
+        :param list includes: patterns to include, those without a '*' are
+                              taken literally and included even if missing.
+        :param list excludes: glob patterns to exclude.
+        """
+        self._literals = [
+            os.path.normpath(i) for i in includes if '*' not in i]
+        self._includes = [
+            _Pattern(i, literal=False) for i in includes if '*' in i]
+        self._includes.extend(_Pattern(i, literal=True)
+                              for i in self._literals
+                              if not i.startswith('..'))
+        self._excludes = [_Pattern(e, literal=False) for e in excludes]
+
+    def resolve(self, directory: str) -> Tuple[Set[str], Set[str]]:
+        """Get the files and directories included from directory.
+
+        :param str directory: the directory to resolve the fileset in.
+        :returns: a tuple with the set of files and the set of directories,
+                  relative to directory. The parents of included files are
+                  part of the directories.
+        """
+        resolution = self._scan(directory)
+        return resolution.files, resolution.dirs
+
+    def _scan(self, directory: str) -> _Resolution:
+        scan = _Scan(self._includes, self._excludes)
+        started_at = int(time.time() * 10 ** 9)
+        scan.scan(directory)
+
+        files = set()  # type: Set[str]
+        dirs = set()  # type: Set[str]
+        for path, is_dir in scan.included.items():
+            if is_dir:
+                dirs.add(path)
+            else:
+                files.add(path)
+
+        # Literal includes that were not found are included as is.
+        for path in self._literals:
+            if (path in scan.included or path in scan.excluded or
+                    _is_in(path, scan.excluded_dirs)):
+                continue
+            full_path = os.path.join(directory, path)
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                dirs.add(path)
+            else:
+                files.add(path)
+
+        parents = set()  # type: Set[str]
+        for path in files:
+            parent = os.path.dirname(path)
+            while parent and parent not in parents:
+                parents.add(parent)
+                parent = os.path.dirname(parent)
+        dirs |= parents
+
+        cacheable = bool(scan.snapshot) and all(
+            mtime < started_at - _RACY_WINDOW
+            for mtime in scan.snapshot.values())
+        return _Resolution(files, dirs, scan.snapshot, cacheable)
+
+
+class _Scan:
+
+    def __init__(self, includes: List[_Pattern],
+                 excludes: List[_Pattern]) -> None:
+        self._includes = includes
+        self._excludes = excludes
+        # Relative paths of included entries, mapped to whether they are
+        # directories (and not symlinks to one).
+        self.included = dict()  # type: Dict[str, bool]
+        self.excluded = set()  # type: Set[str]
+        self.excluded_dirs = set()  # type: Set[str]
+        self.snapshot = dict()  # type: Dict[str, int]
+
+    def scan(self, directory: str) -> None:
+        include_states = _close(
+            self._includes, {(i, 0) for i in range(len(self._includes))})
+        exclude_states = _close(
+            self._excludes, {(i, 0) for i in range(len(self._excludes))})
+
+        # A pattern like '**' matches the directory itself, which glob
+        # reports as '.'.
+        expanding = _matches(self._includes, include_states, True)
+        if expanding:
+            self.included['.'] = True
+        if _matches(self._excludes, exclude_states, True):
+            self.excluded.add('.')
+            self.included.pop('.', None)
+
+        self._walk(directory, '', os.path.realpath(directory),
+                   include_states, exclude_states, expanding)
+
+    def _walk(self, path, relative_dir, real_path, include_states,
+              exclude_states, expanding):
+        try:
+            self.snapshot[path] = os.stat(path).st_mtime_ns
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+
+        for entry in entries:
+            states = self._scan_entry(entry, relative_dir + entry.name,
+                                      include_states, exclude_states,
+                                      expanding)
+            if states is None:
+                continue
+            entry_include_states, entry_exclude_states, entry_expanding = (
+                states)
+            entry_real_path = _get_real_path(entry, real_path)
+            if entry_real_path is None:
+                continue
+            self._walk(entry.path, relative_dir + entry.name + '/',
+                       entry_real_path, entry_include_states,
+                       entry_exclude_states, entry_expanding)
+
+    def _scan_entry(self, entry, relative_path, include_states,
+                    exclude_states, expanding):
+        """Record whether entry is included or excluded.
+
+        Return the states to walk the directory entry with, or None if
+        nothing below it can be included.
+        """
+        is_link = entry.is_symlink()
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+
+        entry_exclude_states = _advance(
+            self._excludes, exclude_states, entry.name)
+        if _matches(self._excludes, entry_exclude_states, is_dir):
+            # Nothing below an excluded directory can be included.
+            self.excluded.add(relative_path)
+            if is_dir:
+                self.excluded_dirs.add(relative_path)
+            return None
+
+        entry_include_states = _advance(
+            self._includes, include_states, entry.name)
+        included = _matches(self._includes, entry_include_states, is_dir)
+        if included or expanding:
+            self.included[relative_path] = is_dir and not is_link
+        if not is_dir:
+            return None
+
+        # Like os.walk, symlinks to directories are only expanded when
+        # they were included themselves, but patterns follow them.
+        entry_expanding = included or (expanding and not is_link)
+        if not entry_expanding and not _is_pending(
+                self._includes, entry_include_states):
+            return None
+        return entry_include_states, entry_exclude_states, entry_expanding
+
+
+def _get_real_path(entry, parent_real_path):
+    """Return the real path of entry, None if it links to a parent."""
+    if not entry.is_symlink():
+        return os.path.join(parent_real_path, entry.name)
+    real_path = os.path.realpath(entry.path)
+    if (parent_real_path == real_path or
+            parent_real_path.startswith(real_path + os.sep)):
+        return None
+    return real_path
+
+
+def _close(patterns, states):
+    """Let '**' components also match no directory at all."""
+    closed = set(states)
+    pending = list(states)
+    while pending:
+        index, position = pending.pop()
+        components = patterns[index].components
+        if (position < len(components) and
+                components[position] is _RECURSIVE):
+            state = (index, position + 1)
+            if state not in closed:
+                closed.add(state)
+                pending.append(state)
+    return closed
+
+
+def _advance(patterns, states, name):
+    if not states:
+        return states
+    advanced = set()
+    for index, position in states:
+        components = patterns[index].components
+        if position == len(components):
+            continue
+        component = components[position]
+        if component is _RECURSIVE:
+            if not name.startswith('.'):
+                advanced.add((index, position))
+        elif isinstance(component, str):
+            if component == name:
+                advanced.add((index, position + 1))
+        elif component.matches(name):
+            advanced.add((index, position + 1))
+    return _close(patterns, advanced)
+
+
+def _matches(patterns, states, is_dir):
+    for index, position in states:
+        pattern = patterns[index]
+        if (position == len(pattern.components) and
+                (is_dir or not pattern.dir_only)):
+            return True
+    return False
+
+
+def _is_pending(patterns, states):
+    return any(position < len(patterns[index].components)
+               for index, position in states)
+
+
+def _is_in(path, directories):
+    parent = os.path.dirname(path)
+    while parent:
+        if parent in directories:
+            return True
+        parent = os.path.dirname(parent)
+    return False
+
+
+def resolve(includes: List[str], excludes: List[str],
+            directory: str) -> Tuple[Set[str], Set[str]]:
+    """Resolve a fileset in directory, reusing results while it is unchanged.
+
+    :returns: a tuple with the set of files and the set of directories,
+              as returned by Fileset.resolve.
+    """
+    key = (os.path.abspath(directory), tuple(includes), tuple(excludes))
+    resolution = _cache.pop(key, None)
+    if resolution is None or not resolution.is_current():
+        resolution = Fileset(includes, excludes)._scan(directory)
+    if resolution.cacheable:
+        _cache[key] = resolution
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    # Callers are free to modify what they get.
+    return set(resolution.files), set(resolution.dirs)
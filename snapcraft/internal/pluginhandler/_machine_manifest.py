@@ -0,0 +1,91 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Take the manifest of the machine parts are built on.
+
+Taking the inventory of the installed debs and snaps is expensive and is
+the same for every part built in a lifecycle run, so it is taken once and
+reused for as long as the dpkg and snapd states are unchanged.
+"""
+
+import copy
+import logging
+import os
+import time
+from typing import Any, Dict, Optional  # noqa: F401
+
+from snapcraft.internal import common, repo
+
+logger = logging.getLogger(__name__)
+
+# Installing or removing debs rewrites the dpkg status, installing or removing
+# snaps rewrites the snapd state.
+_STATE_PATHS = ('/var/lib/dpkg/status', '/var/lib/snapd/state.json')
+
+# Manifests taken while the states were modified this recently, in
+# nanoseconds, are not kept as a modification in the same timestamp tick
+# would go unnoticed.
+_RACY_WINDOW = 100 * 10 ** 6
+
+_cached = None  # type: Optional[_MachineManifest]
+
+
+class _MachineManifest:
+
+    def __init__(self, assets: Dict[str, Any],
+                 snapshot: Dict[str, Optional[int]]) -> None:
+        self.assets = assets
+        self.snapshot = snapshot
+
+    def is_current(self) -> bool:
+        return all(_get_mtime(path) == mtime
+                   for path, mtime in self.snapshot.items())
+
+
+def get_machine_manifest() -> Dict[str, Any]:
+    """Get the uname, installed packages and installed snaps of the host."""
+    global _cached
+    if _cached is None or not _cached.is_current():
+        _cached = None
+        taken_at = int(time.time() * 10 ** 9)
+        snapshot = {path: _get_mtime(path) for path in _STATE_PATHS}
+        assets = {
+            'uname': common.run_output(['uname', '-srvmpio']),
+            'installed-packages': repo.Repo.get_installed_packages(),
+            'installed-snaps': repo.snaps.get_installed_snaps()
+        }
+        manifest = _MachineManifest(assets, snapshot)
+        if all(mtime is None or mtime < taken_at - _RACY_WINDOW
+               for mtime in snapshot.values()):
+            _cached = manifest
+    else:
+        manifest = _cached
+        logger.debug('Reusing the machine manifest')
+    # Callers are free to modify what they get.
+    return copy.deepcopy(manifest.assets)
+
+
+def clear_machine_manifest_cache() -> None:
+    """Have the next manifest taken anew, as done for each lifecycle run."""
+    global _cached
+    _cached = None
+
+
+def _get_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,219 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Migrate the files of a step from one directory to another.
+
+Directories are created once, parents first, and files are then handled
+one directory at a time, hard-linking them relative to the descriptors of
+their source and destination directories. Files that cannot be linked, as
+when staging across devices, are copied from a pool of threads.
+"""
+
+import collections
+import concurrent.futures
+import errno
+import functools
+import logging
+import os
+import shutil
+import stat
+import time
+from typing import Callable, Dict, List, Set, Tuple  # noqa: F401
+
+from snapcraft import file_utils
+from snapcraft.internal import tracing
+from snapcraft.internal.errors import SnapcraftCopyFileNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Descriptors only used to resolve names relative to a directory, these do
+# not need read access to it.
+_DIR_FLAGS = getattr(os, 'O_PATH', os.O_RDONLY) | os.O_DIRECTORY
+
+_SKIPPED = object()
+
+
+def migrate_files(snap_files: Set[str], snap_dirs: Set[str], srcdir: str,
+                  dstdir: str, *, missing_ok: bool=False,
+                  follow_symlinks: bool=False,
+                  fixup_func: Callable[[str], None]=None) -> None:
+    """Link or copy snap_files and snap_dirs from srcdir into dstdir.
+
+    :param set snap_files: files to migrate, relative to srcdir.
+    :param set snap_dirs: directories to migrate, relative to srcdir.
+    :param str srcdir: the directory to migrate from.
+    :param str dstdir: the directory to migrate to.
+    :param bool missing_ok: skip files missing from srcdir.
+    :param bool follow_symlinks: migrate what symlinks point to instead of
+                                 the symlinks themselves.
+    :param callable fixup_func: called with the path of every migrated file
+                                once it is in place.
+    """
+    started_at = time.monotonic()
+
+    files_by_dir = _group_by_directory(snap_files)
+
+    # Sorting puts parents before the directories in them.
+    for directory in sorted(set(snap_dirs) | set(files_by_dir)):
+        file_utils.create_similar_directory(
+            os.path.join(srcdir, directory), os.path.join(dstdir, directory))
+
+    copies = []  # type: List[Tuple[str, concurrent.futures.Future]]
+    migrated = 0
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1) as executor:
+        for directory in sorted(files_by_dir):
+            migrated += _migrate_directory(
+                os.path.join(srcdir, directory),
+                os.path.join(dstdir, directory), files_by_dir[directory],
+                executor, copies, missing_ok=missing_ok,
+                follow_symlinks=follow_symlinks, fixup_func=fixup_func)
+
+        for dst, future in copies:
+            future.result()
+            if fixup_func:
+                fixup_func(dst)
+
+    tracing.count('files-migrated', migrated)
+    tracing.count('files-copied', len(copies))
+    elapsed = time.monotonic() - started_at
+    logger.debug(
+        'Migrated {} files from {!r} to {!r} in {:.2f}s '
+        '({:.0f} files/s, {} copied)'.format(
+            migrated, srcdir, dstdir, elapsed,
+            migrated / max(elapsed, 1e-6), len(copies)))
+
+
+def _group_by_directory(snap_files: Set[str]) -> Dict[str, List[str]]:
+    files_by_dir = collections.defaultdict(
+        list)  # type: Dict[str, List[str]]
+    for snap_file in snap_files:
+        directory, name = os.path.split(snap_file)
+        files_by_dir[directory].append(name)
+    return files_by_dir
+
+
+def _migrate_directory(
+        srcdir: str, dstdir: str, names: List[str],
+        executor: concurrent.futures.Executor,
+        copies: List[Tuple[str, concurrent.futures.Future]], *,
+        missing_ok: bool, follow_symlinks: bool,
+        fixup_func: Callable[[str], None]) -> int:
+    """Migrate the files named names from srcdir into dstdir.
+
+    Linked files are fixed up right away, copies are submitted to executor
+    and added to copies to be fixed up once they are done.
+
+    :returns: the number of files migrated.
+    """
+    migrated = 0
+    migration = _DirectoryMigration(srcdir, dstdir, follow_symlinks)
+    try:
+        for name in sorted(names):
+            copy = migration.migrate(name, missing_ok)
+            if copy is _SKIPPED:
+                continue
+            migrated += 1
+            dst = os.path.join(dstdir, name)
+            if copy is not None:
+                copies.append((dst, executor.submit(copy)))
+            elif fixup_func:
+                fixup_func(dst)
+    finally:
+        migration.close()
+    return migrated
+
+
+class _DirectoryMigration:
+
+    def __init__(self, srcdir: str, dstdir: str,
+                 follow_symlinks: bool) -> None:
+        self._srcdir = srcdir
+        self._dstdir = dstdir
+        self._follow_symlinks = follow_symlinks
+        # Once a link crosses devices, the rest of the directory would too.
+        self._linkable = not follow_symlinks
+        self._src_fd = os.open(srcdir, _DIR_FLAGS)
+        try:
+            self._dst_fd = os.open(dstdir, _DIR_FLAGS)
+        except OSError:
+            os.close(self._src_fd)
+            raise
+
+    def close(self) -> None:
+        os.close(self._src_fd)
+        os.close(self._dst_fd)
+
+    def migrate(self, name: str, missing_ok: bool):
+        """Migrate name, returning the call that copies it if needed.
+
+        :returns: _SKIPPED if the file was left alone, None if it was linked
+                  or a callable that copies it.
+        """
+        src = os.path.join(self._srcdir, name)
+        dst = os.path.join(self._dstdir, name)
+
+        if missing_ok and not self._exists(name):
+            return _SKIPPED
+        if not self._clear_destination(name):
+            return _SKIPPED
+
+        if name.endswith('.pc'):
+            return functools.partial(shutil.copy2, src, dst,
+                                     follow_symlinks=self._follow_symlinks)
+        if not self._linkable:
+            return self._link_or_copy(src, dst)
+        return self._link(name, src, dst)
+
+    def _clear_destination(self, name: str) -> bool:
+        """Make room for name in the destination.
+
+        :returns: False if name is to be left alone.
+        """
+        try:
+            dst_mode = os.lstat(name, dir_fd=self._dst_fd).st_mode
+        except OSError:
+            return True
+        # If the file is already here and it's a symlink, leave it alone.
+        if stat.S_ISLNK(dst_mode):
+            return False
+        # Otherwise, remove and re-link it.
+        os.unlink(name, dir_fd=self._dst_fd)
+        return True
+
+    def _link(self, name: str, src: str, dst: str):
+        try:
+            os.link(name, name, src_dir_fd=self._src_fd,
+                    dst_dir_fd=self._dst_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            raise SnapcraftCopyFileNotFoundError(src)
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                self._linkable = False
+            # link_or_copy handles everything else a link can run into.
+            return self._link_or_copy(src, dst)
+        return None
+
+    def _link_or_copy(self, src: str, dst: str):
+        return functools.partial(file_utils.link_or_copy, src, dst,
+                                 follow_symlinks=self._follow_symlinks)
+
+    def _exists(self, name: str) -> bool:
+        try:
+            os.stat(name, dir_fd=self._src_fd)
+        except OSError:
+            return False
+        return True
@@ -17,17 +17,19 @@
 import contextlib
 import json
 import os
+import selectors
 import subprocess
 import sys
 import tempfile
 import textwrap
-import time
+import threading
 from typing import Any, Callable, Dict  # noqa
 
 from snapcraft.internal import (
     common,
     deprecations,
     errors,
+    tracing,
 )
 
 
@@ -118,6 +120,11 @@ class Runner:
 
     def _run_scriptlet(self, scriptlet_name: str, scriptlet: str,
                        workdir: str) -> None:
+        with tracing.span('scriptlet', scriptlet=scriptlet_name):
+            self._execute_scriptlet(scriptlet_name, scriptlet, workdir)
+
+    def _execute_scriptlet(self, scriptlet_name: str, scriptlet: str,
+                           workdir: str) -> None:
         with tempfile.TemporaryDirectory() as tempdir:
             call_fifo = _NonBlockingRWFifo(
                 os.path.join(tempdir, 'function_call'))
@@ -147,22 +154,31 @@ class Runner:
                                            cwd=workdir)
 
             status = None
+            selector = selectors.DefaultSelector()
+            exit_notifier = _ProcessExitNotifier(process)
             try:
+                selector.register(call_fifo.fileno(), selectors.EVENT_READ)
+                selector.register(
+                    exit_notifier.fileno(), selectors.EVENT_READ)
+                # Block until either snapcraftctl calls in or the scriptlet
+                # exits; nothing here needs to wake up on a timer.
                 while status is None:
-                    function_call = call_fifo.read()
-                    if function_call:
-                        # Handle the function and let caller know that function
-                        # call has been handled (must contain at least a
-                        # newline, anything beyond is considered an error by
-                        # snapcraftctl)
-                        feedback_fifo.write('{}\n'.format(
-                            self._handle_builtin_function(
-                                scriptlet_name, function_call.strip())))
+                    for key, _ in selector.select():
+                        if key.fd != call_fifo.fileno():
+                            continue
+                        function_call = call_fifo.read()
+                        if function_call:
+                            # Handle the function and let caller know that
+                            # function call has been handled (must contain at
+                            # least a newline, anything beyond is considered
+                            # an error by snapcraftctl)
+                            feedback_fifo.write('{}\n'.format(
+                                self._handle_builtin_function(
+                                    scriptlet_name, function_call.strip())))
                     status = process.poll()
-
-                    # Don't loop TOO busily
-                    time.sleep(0.1)
             finally:
+                selector.close()
+                exit_notifier.close()
                 call_fifo.close()
                 feedback_fifo.close()
 
@@ -234,9 +250,48 @@ class _NonBlockingRWFifo:
     def write(self, data: str) -> int:
         return os.write(self._fd, data.encode(sys.getfilesystemencoding()))
 
+    def fileno(self) -> int:
+        return self._fd
+
     def close(self) -> None:
         if self._fd is not None:
             os.close(self._fd)
+            self._fd = None
+
+
+class _ProcessExitNotifier:
+    """Provide a file descriptor that becomes readable once process exits.
+
+    A pidfd is used where the running Python and kernel support it, otherwise
+    a helper thread waits on the process and writes to a pipe.
+    """
+
+    def __init__(self, process: subprocess.Popen) -> None:
+        try:
+            self._fd = os.pidfd_open(process.pid)  # type: ignore
+        except (AttributeError, OSError):
+            self._fd, write_fd = os.pipe()
+            thread = threading.Thread(
+                target=_notify_exit, args=(process, write_fd), daemon=True)
+            thread.start()
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _notify_exit(process: subprocess.Popen, write_fd: int) -> None:
+    try:
+        process.wait()
+        # The reader may already be gone if the scriptlet runner errored out.
+        with contextlib.suppress(OSError):
+            os.write(write_fd, b'\0')
+    finally:
+        os.close(write_fd)
 
 
 def _get_env():
@@ -14,11 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import difflib
 import hashlib
 import logging
 import os
+import pickle
+import sqlite3
 import sys
+import tempfile
 
 import requests
 import yaml
@@ -93,6 +97,42 @@ class _Base:
                sys.getfilesystemencoding())).hexdigest())
         os.makedirs(self.parts_dir, exist_ok=True)
         self.parts_yaml = os.path.join(self.parts_dir, 'parts.yaml')
+        self.parts_index = os.path.join(self.parts_dir, 'parts.db')
+
+    def _is_index_stale(self):
+        try:
+            return (os.stat(self.parts_index).st_mtime <
+                    os.stat(self.parts_yaml).st_mtime)
+        except FileNotFoundError:
+            return True
+
+    def _build_index(self):
+        """Convert the downloaded parts list into an indexed sqlite db.
+
+        Loading the yaml is what dominates the time it takes to resolve a
+        remote part, so it is done once here instead of on every load.
+        """
+        with open(self.parts_yaml) as parts_file:
+            parts = yaml.safe_load(parts_file) or {}
+
+        # Build aside and rename so concurrent readers never see a partial
+        # index.
+        fd, temp_index = tempfile.mkstemp(dir=self.parts_dir, suffix='.db')
+        os.close(fd)
+        try:
+            with contextlib.closing(sqlite3.connect(temp_index)) as db:
+                db.execute('CREATE TABLE parts (name TEXT PRIMARY KEY, '
+                           'length INTEGER, properties BLOB)')
+                db.execute('CREATE INDEX parts_length ON parts (length)')
+                db.executemany(
+                    'INSERT INTO parts VALUES (?, ?, ?)',
+                    ((name, len(name), pickle.dumps(properties))
+                     for name, properties in parts.items()))
+                db.commit()
+            os.replace(temp_index, self.parts_index)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_index)
 
 
 class _Update(_Base):
@@ -117,6 +157,7 @@ class _Update(_Base):
 
         download_requests_stream(self._request, self.parts_yaml,
                                  'Downloading parts list')
+        self._build_index()
         self._save_headers()
 
     def _load_headers(self):
@@ -141,15 +182,20 @@ class _RemoteParts(_Base):
 
         if not os.path.exists(self.parts_yaml):
             update()
+        # Caches from older versions of snapcraft, or updated by hand, only
+        # have the yaml.
+        if self._is_index_stale():
+            self._build_index()
 
-        with open(self.parts_yaml) as parts_file:
-            self._parts = yaml.safe_load(parts_file)
+        self._db = sqlite3.connect(self.parts_index)
 
     def get_part(self, part_name, full=False):
-        try:
-            remote_part = self._parts[part_name].copy()
-        except KeyError:
+        row = self._db.execute(
+            'SELECT properties FROM parts WHERE name = ?',
+            (part_name,)).fetchone()
+        if row is None:
             raise errors.SnapcraftPartMissingError(part_name=part_name)
+        remote_part = pickle.loads(row[0])
         if not full:
             for key in ['description', 'maintainer']:
                 remote_part.pop(key)
@@ -159,13 +205,28 @@ class _RemoteParts(_Base):
         matcher = difflib.SequenceMatcher(isjunk=None, autojunk=False)
         matcher.set_seq2(part_match)
 
+        # A ratio of at least _MATCH_RATIO is only possible for names whose
+        # length is within these bounds, only those and the names containing
+        # part_match need to be looked at.
+        match_len = len(part_match)
+        min_len = int(match_len * _MATCH_RATIO / (2 - _MATCH_RATIO))
+        max_match_len = -int(-match_len * (2 - _MATCH_RATIO) / _MATCH_RATIO)
+        rows = self._db.execute(
+            'SELECT name, properties FROM parts '
+            'WHERE length BETWEEN ? AND ? OR instr(name, ?) > 0',
+            (min_len, max_match_len, part_match))
+
         matching_parts = {}
-        for part_name in self._parts.keys():
+        for part_name, properties in rows:
             matcher.set_seq1(part_name)
-            add_part_name = matcher.ratio() >= _MATCH_RATIO
+            # The quick ratios are cheap upper bounds of ratio().
+            add_part_name = (
+                matcher.real_quick_ratio() >= _MATCH_RATIO and
+                matcher.quick_ratio() >= _MATCH_RATIO and
+                matcher.ratio() >= _MATCH_RATIO)
 
             if add_part_name or (part_match in part_name):
-                matching_parts[part_name] = self._parts[part_name]
+                matching_parts[part_name] = pickle.loads(properties)
                 if len(part_name) > max_len:
                     max_len = len(part_name)
 
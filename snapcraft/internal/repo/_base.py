@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import contextlib
-import fileinput
 import glob
 import itertools
 import logging
@@ -190,7 +189,6 @@ class BaseRepo:
         self._remove_useless_files(unpackdir)
         self._fix_artifacts(unpackdir)
         self._fix_xml_tools(unpackdir)
-        self._fix_shebangs(unpackdir)
 
     def _remove_useless_files(self, unpackdir):
         """Remove files that aren't useful or will clash with other parts."""
@@ -208,6 +206,8 @@ class BaseRepo:
 
         Some unpacked items will also contain suid binaries which we do not
         want in the resulting snap.
+
+        Hard-coded python shebangs are changed to use env in the same walk.
         """
         for root, dirs, files in os.walk(unpackdir):
             # Symlinks to directories will be in dirs, while symlinks to
@@ -219,8 +219,12 @@ class BaseRepo:
                 elif os.path.exists(path):
                     _fix_filemode(path)
 
-                if path.endswith('.pc') and not os.path.islink(path):
+                if os.path.islink(path) or not os.path.isfile(path):
+                    continue
+                if path.endswith('.pc'):
                     fix_pkg_config(unpackdir, path)
+                else:
+                    mangling.rewrite_python_shebang(path)
 
     def _fix_xml_tools(self, unpackdir):
         xml2_config_path = os.path.join(
@@ -252,10 +256,6 @@ class BaseRepo:
         os.remove(path)
         os.symlink(os.path.relpath(target, root), path)
 
-    def _fix_shebangs(self, unpackdir):
-        """Change hard-coded shebangs in unpacked files to use env."""
-        mangling.rewrite_python_shebangs(unpackdir)
-
 
 class DummyRepo(BaseRepo):
 
@@ -283,19 +283,18 @@ def fix_pkg_config(root, pkg_config_file, prefix_trim=None):
     if prefix_trim:
         pattern_trim = re.compile(
             '^prefix={}(?P<prefix>.*)'.format(prefix_trim))
-    pattern = re.compile('^prefix=(?P<prefix>.*)')
-
-    with fileinput.input(pkg_config_file, inplace=True) as input_file:
-        for line in input_file:
-            match = pattern.search(line)
-            if prefix_trim:
-                match_trim = pattern_trim.search(line)
-            if prefix_trim and match_trim:
-                print('prefix={}{}'.format(root, match_trim.group('prefix')))
-            elif match:
-                print('prefix={}{}'.format(root, match.group('prefix')))
-            else:
-                print(line, end='')
+    pattern = re.compile('^prefix=(?P<prefix>.*)', re.MULTILINE)
+
+    def _prefix_with_root(match):
+        prefix = match.group('prefix')
+        if pattern_trim:
+            match_trim = pattern_trim.search(match.group(0))
+            if match_trim:
+                prefix = match_trim.group('prefix')
+        return 'prefix={}{}'.format(root, prefix)
+
+    file_utils.rewrite_file(
+        pkg_config_file, [file_utils.RewriteRule(pattern, _prefix_with_root)])
 
 
 def _fix_filemode(path):
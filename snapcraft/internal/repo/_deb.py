@@ -14,10 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import bz2
+import concurrent.futures
 import contextlib
 import glob
+import gzip
 import hashlib
 import logging
+import lzma
 import os
 import re
 import shutil
@@ -25,18 +29,24 @@ import stat
 import string
 import subprocess
 import sys
+import tarfile
+import time
 import urllib
+import urllib.parse
 import urllib.request
-from typing import Dict, Set, List, Tuple  # noqa: F401
+from typing import Any, Dict, Set, List, Tuple  # noqa: F401
 
 import apt
+import debian.arfile
 from xml.etree import ElementTree
 
 import snapcraft
 from snapcraft import file_utils
-from snapcraft.internal import cache, repo, common, os_release
+from snapcraft.internal import (
+    cache, repo, common, mangling, os_release, tracing)
+from snapcraft.internal.cache import file_lock
 from snapcraft.internal.indicators import is_dumb_terminal
-from ._base import BaseRepo
+from ._base import BaseRepo, fix_pkg_config
 from . import errors
 
 
@@ -57,6 +67,31 @@ _GEOIP_SERVER = "http://geoip.ubuntu.com/lookup"
 _library_list = dict()  # type: Dict[str, Set[str]]
 _HASHSUM_MISMATCH_PATTERN = re.compile(
     r'(E:Failed to fetch.+Hash Sum mismatch)+')
+_DEB_FILE_NAME_PATTERN = re.compile(
+    r'^(?P<name>[^_]+)_(?P<version>[^_]+)_(?P<arch>[^_]+)\.deb$')
+# Bump whenever what _extract_deb does to files changes, to not reuse
+# packages unpacked by older versions of snapcraft.
+_UNPACK_NORMALIZATION = 1
+# The index fetched for a set of sources is reused across parts and runs
+# for this long, in seconds, unless overridden by SNAPCRAFT_APT_INDEX_TTL.
+_DEFAULT_INDEX_TTL = 3600
+_INDEX_LOCK = 'index.lock'
+_INDEX_STAMP = 'index.stamp'
+# Indexes already updated by this run, which are never updated again.
+_updated_indexes = set()  # type: Set[str]
+_UNPACK_CHUNK_SIZE = 1024 * 1024
+_DECOMPRESSORS = {
+    '.bz2': bz2.open,
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+}
+
+
+def _get_index_ttl() -> int:
+    ttl = os.environ.get('SNAPCRAFT_APT_INDEX_TTL', str(_DEFAULT_INDEX_TTL))
+    if not re.match(r'^\s*\d+\s*$', ttl):
+        raise errors.InvalidAptIndexTTLError(ttl=ttl)
+    return int(ttl)
 
 
 class _AptCache:
@@ -98,37 +133,70 @@ class _AptCache:
         # on the system.
         apt.apt_pkg.config.clear('APT::Update::Post-Invoke-Success')
 
+        # apt.Cache(memonly=True) clears these for the whole process, keep
+        # the parsed package cache on disk next to the lists instead.
+        apt.apt_pkg.config.set('Dir::Cache::pkgcache', 'pkgcache.bin')
+        apt.apt_pkg.config.set('Dir::Cache::srcpkgcache', 'srcpkgcache.bin')
+
         self.progress = apt.progress.text.AcquireProgress()
         if is_dumb_terminal():
             # Make output more suitable for logging.
             self.progress.pulse = lambda owner: True
             self.progress._width = 0
 
-        sources_list_file = os.path.join(
-            cache_dir, 'etc', 'apt', 'sources.list')
-
-        os.makedirs(os.path.dirname(sources_list_file), exist_ok=True)
-        with open(sources_list_file, 'w') as f:
-            f.write(self._collected_sources_list())
-
-        # dpkg also needs to be in the rootdir in order to support multiarch
-        # (apt calls dpkg --print-foreign-architectures).
-        dpkg_path = shutil.which('dpkg')
-        if dpkg_path:
-            # Symlink it into place
-            destination = os.path.join(cache_dir, dpkg_path[1:])
-            if not os.path.exists(destination):
-                os.makedirs(os.path.dirname(destination), exist_ok=True)
-                os.symlink(dpkg_path, destination)
-        else:
-            logger.warning(
-                "Cannot find 'dpkg' command needed to support multiarch")
+    def _is_index_fresh(self, cache_dir: str) -> bool:
+        ttl = _get_index_ttl()
+        if cache_dir in _updated_indexes:
+            return True
+        try:
+            updated_at = os.stat(
+                os.path.join(cache_dir, _INDEX_STAMP)).st_mtime
+        except FileNotFoundError:
+            return False
+        return time.time() - updated_at < ttl
+
+    def _update_index(self, cache_dir: str) -> None:
+        # Parts in this or other snapcraft processes reading the index hold
+        # a shared lock on it.
+        with file_lock(os.path.join(cache_dir, _INDEX_LOCK)):
+            if self._is_index_fresh(cache_dir):
+                logger.debug('Reusing the package index in {!r}'.format(
+                    cache_dir))
+                return
+
+            sources_list_file = os.path.join(
+                cache_dir, 'etc', 'apt', 'sources.list')
+
+            os.makedirs(os.path.dirname(sources_list_file), exist_ok=True)
+            with open(sources_list_file, 'w') as f:
+                f.write(self._collected_sources_list())
+
+            # dpkg also needs to be in the rootdir in order to support
+            # multiarch (apt calls dpkg --print-foreign-architectures).
+            dpkg_path = shutil.which('dpkg')
+            if dpkg_path:
+                # Symlink it into place
+                destination = os.path.join(cache_dir, dpkg_path[1:])
+                if not os.path.exists(destination):
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    os.symlink(dpkg_path, destination)
+            else:
+                logger.warning(
+                    "Cannot find 'dpkg' command needed to support multiarch")
 
-        return self._create_cache(cache_dir, sources_list_file)
+            apt_cache = self._create_cache(cache_dir, sources_list_file)
+            # Opening it again after the update writes the parsed package
+            # cache out for the next readers.
+            apt_cache.open()
+            apt_cache.close()
+
+            with open(os.path.join(cache_dir, _INDEX_STAMP), 'w'):
+                pass
+            _updated_indexes.add(cache_dir)
 
     def _create_cache(self, cache_dir: str,
                       sources_list_file: str) -> apt.Cache:
-        apt_cache = apt.Cache(rootdir=cache_dir, memonly=True)
+        apt_cache = apt.Cache(rootdir=cache_dir)
         try:
             apt_cache.update(fetch_progress=self.progress,
                              sources_list=sources_list_file)
@@ -139,7 +207,7 @@ class _AptCache:
                 try:
                     index = apt.apt_pkg.config.find_dir('Dir::State::Lists')
                     shutil.rmtree(index)
-                    apt_cache = apt.Cache(rootdir=cache_dir, memonly=True)
+                    apt_cache = apt.Cache(rootdir=cache_dir)
                     apt_cache.update(fetch_progress=self.progress,
                                      sources_list=sources_list_file)
                 except apt.cache.FetchFailedException as retry:
@@ -151,13 +219,15 @@ class _AptCache:
     @contextlib.contextmanager
     def archive(self, cache_dir):
         try:
-            apt_cache = self._setup_apt(cache_dir)
-            apt_cache.open()
-
-            try:
-                yield apt_cache
-            finally:
-                apt_cache.close()
+            self._setup_apt(cache_dir)
+            self._update_index(cache_dir)
+            with file_lock(os.path.join(cache_dir, _INDEX_LOCK),
+                           shared=True):
+                apt_cache = apt.Cache(rootdir=cache_dir)
+                try:
+                    yield apt_cache
+                finally:
+                    apt_cache.close()
         except Exception as e:
             logger.debug('Exception occurred: {!r}'.format(e))
             raise e
@@ -198,6 +268,7 @@ class _AptCache:
             raise apt.package.FetchError(
                 "The item %r could not be fetched: %s" %
                 (acqfile.destfile, acqfile.error_text))
+        tracing.count('bytes-downloaded', package_candidate.size)
 
         return os.path.abspath(destfile)
 
@@ -374,6 +445,7 @@ class Ubuntu(BaseRepo):
 
         self._cache = cache.AptStagePackageCache(
             sources_digest=self._apt.sources_digest())
+        self._unpacked_cache = cache.AptUnpackedPackageCache()
 
     def is_valid(self, package_name):
         with self._apt.archive(self._cache.base_dir) as apt_cache:
@@ -452,15 +524,84 @@ class Ubuntu(BaseRepo):
         return pkg_list
 
     def unpack(self, unpackdir) -> None:
+        """Unpack the fetched packages into unpackdir, normalizing them.
+
+        Packages are unpacked once into a cache shared by every part and
+        project, concurrently and in process, and cloned into unpackdir
+        from there.
+        """
         pkgs_abs_path = glob.glob(os.path.join(self._downloaddir, '*.deb'))
-        for pkg in pkgs_abs_path:
-            # TODO needs elegance and error control
+        os.makedirs(unpackdir, exist_ok=True)
+        start_time = time.monotonic()
+
+        unpacked = self._get_all_unpacked(pkgs_abs_path)
+        reused_count = len([hit for _, hit in unpacked if hit])
+        if reused_count:
+            logger.info(
+                'Reusing {} of {} stage-packages unpacked in the '
+                'cache.'.format(reused_count, len(unpacked)))
+
+        self._copy_unpacked([path for path, _ in unpacked], unpackdir)
+        self._remove_useless_files(unpackdir)
+        self._fix_xml_tools(unpackdir)
+
+        logger.debug('Unpacked {} packages ({} from the cache) in '
+                     '{:.1f}s'.format(len(unpacked), reused_count,
+                                      time.monotonic() - start_time))
+
+    def _copy_unpacked(self, entry_paths: List[str], unpackdir: str) -> None:
+        # The files are cloned rather than hard-linked so that whatever
+        # edits them in unpackdir does not reach the cache.
+        # Absolute symlinks can point into any of the packages and the
+        # fixes below depend on unpackdir, so they are applied here rather
+        # than in the cache.
+        symlinks = []  # type: List[str]
+        pkg_configs = []  # type: List[str]
+
+        def copy_unpacked(source, destination):
+            file_utils.clone_or_copy(source, destination)
+            if os.path.islink(destination):
+                if os.path.isabs(os.readlink(destination)):
+                    symlinks.append(destination)
+            elif destination.endswith('.pc'):
+                pkg_configs.append(destination)
+
+        for entry_path in entry_paths:
+            file_utils.link_or_copy_tree(
+                entry_path, unpackdir, copy_function=copy_unpacked)
+        for path in symlinks:
+            if os.path.islink(path) and os.path.isabs(os.readlink(path)):
+                self._fix_symlink(path, unpackdir, os.path.dirname(path))
+        for path in pkg_configs:
+            if not os.path.islink(path):
+                fix_pkg_config(unpackdir, path)
+
+    def _get_all_unpacked(self,
+                          pkgs_abs_path: List[str]) -> List[Tuple[str, bool]]:
+        unpacked = []  # type: List[Tuple[str, bool]]
+        max_workers = max(1, min(len(pkgs_abs_path), os.cpu_count() or 1))
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            futures = [executor.submit(self._get_unpacked, pkg)
+                       for pkg in pkgs_abs_path]
             try:
-                subprocess.check_call(
-                    ['dpkg-deb', '--extract', pkg, unpackdir])
-            except subprocess.CalledProcessError:
-                raise errors.UnpackError(pkg)
-        self.normalize(unpackdir)
+                for future in futures:
+                    unpacked.append(future.result())
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+        return unpacked
+
+    def _get_unpacked(self, deb_path: str) -> Tuple[str, bool]:
+        key = _get_unpacked_cache_key(deb_path)
+        cached_path = self._unpacked_cache.get(**key)
+        if cached_path:
+            return cached_path, True
+
+        def populate(path):
+            _extract_deb(deb_path, path)
+
+        return self._unpacked_cache.cache(populate=populate, **key), False
 
     def _manifest_dep_names(self, apt_cache):
         manifest_dep_names = set()
@@ -475,6 +616,173 @@ class Ubuntu(BaseRepo):
         return manifest_dep_names
 
 
+def _get_unpacked_cache_key(deb_path: str) -> Dict[str, Any]:
+    match = _DEB_FILE_NAME_PATTERN.match(os.path.basename(deb_path))
+    if match:
+        return dict(name=match.group('name'),
+                    version=urllib.parse.unquote(match.group('version')),
+                    arch=match.group('arch'),
+                    normalization=_UNPACK_NORMALIZATION)
+
+    # Not named by apt, key on the contents instead.
+    digest = hashlib.sha256()
+    with open(deb_path, 'rb') as deb_file:
+        for chunk in iter(lambda: deb_file.read(_UNPACK_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return dict(name=os.path.splitext(os.path.basename(deb_path))[0],
+                version=digest.hexdigest(), arch=None,
+                normalization=_UNPACK_NORMALIZATION)
+
+
+def _extract_deb(deb_path: str, unpackdir: str) -> None:
+    """Extract the data of the deb at deb_path into unpackdir.
+
+    This is the equivalent of dpkg-deb --extract, which also strips the
+    suid and sgid bits and rewrites python shebangs while writing files.
+    Nothing depending on where the package ends up is fixed, so that the
+    result can be cached.
+
+    :raises errors.UnpackError: if the deb cannot be extracted.
+    """
+    try:
+        with _open_data_tar(deb_path) as tar:
+            directories = _extract_members(tar, unpackdir)
+        # Directory modes last, as in tar, so read-only ones can be filled.
+        for path, mode, mtime in reversed(directories):
+            os.chmod(path, mode)
+            os.utime(path, (mtime, mtime))
+    except (OSError, ValueError, debian.arfile.ArError, tarfile.TarError,
+            subprocess.CalledProcessError) as e:
+        logger.debug('Failed to extract {!r}: {}'.format(deb_path, e))
+        raise errors.UnpackError(deb_path)
+
+
+def _extract_members(tar: tarfile.TarFile,
+                     unpackdir: str) -> List[Tuple[str, int, int]]:
+    # Returns the directories extracted, with the mode and mtime to set
+    # once they are filled.
+    directories = []  # type: List[Tuple[str, int, int]]
+    for member in tar:
+        path = _get_member_path(unpackdir, member.name)
+        if path is None:
+            continue
+        mode = _get_safe_mode(path, member.mode)
+        if member.isdir():
+            os.makedirs(path, exist_ok=True)
+            directories.append((path, mode, member.mtime))
+        else:
+            _extract_member(tar, member, unpackdir, path, mode)
+    return directories
+
+
+def _extract_member(tar: tarfile.TarFile, member: tarfile.TarInfo,
+                    unpackdir: str, path: str, mode: int) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.lexists(path) and not os.path.isdir(path):
+        os.remove(path)
+    if member.issym():
+        os.symlink(member.linkname, path)
+    elif member.islnk():
+        _link_or_copy(_get_member_path(unpackdir, member.linkname), path)
+    elif member.isreg():
+        _write_member(tar, member, path, mode)
+    else:
+        logger.debug('Skipping special file {!r}'.format(member.name))
+
+
+@contextlib.contextmanager
+def _open_data_tar(deb_path):
+    # Importing DebFile causes LP: #1731478 when snapcraft is
+    # run as a snap.
+    deb_ar = debian.arfile.ArFile(deb_path)
+    try:
+        data_member_name = [
+            i for i in deb_ar.getnames() if i.startswith('data.tar')][0]
+    except IndexError:
+        raise ValueError('no data member in {!r}'.format(deb_path))
+
+    if data_member_name.endswith('.zst'):
+        # Not something tarfile can decompress.
+        with _open_fsys_tar(deb_path) as tar:
+            yield tar
+        return
+
+    # tarfile's own stream decompression copies what is left of everything
+    # it has decompressed on each read, which is quadratic for highly
+    # compressible data; the compression modules' file objects are not.
+    extension = os.path.splitext(data_member_name)[1]
+    data_member = deb_ar.getmember(data_member_name)
+    try:
+        with _DECOMPRESSORS.get(extension, _no_decompressor)(
+                data_member) as data:
+            with tarfile.open(fileobj=data, mode='r|') as tar:
+                yield tar
+    finally:
+        data_member.close()
+
+
+@contextlib.contextmanager
+def _open_fsys_tar(deb_path):
+    command = ['dpkg-deb', '--fsys-tarfile', deb_path]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdout, mode='r|') as tar:
+            yield tar
+        while process.stdout.read(tarfile.RECORDSIZE):
+            pass
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+@contextlib.contextmanager
+def _no_decompressor(fileobj):
+    yield fileobj
+
+
+def _get_member_path(unpackdir, name):
+    name = os.path.normpath(name.lstrip('/'))
+    if name == os.curdir:
+        return None
+    if name == os.pardir or name.startswith(os.pardir + os.sep):
+        raise ValueError('unsafe member name {!r}'.format(name))
+    return os.path.join(unpackdir, name)
+
+
+def _get_safe_mode(path, mode):
+    mode = stat.S_IMODE(mode)
+    if mode & 0o4000 or mode & 0o2000:
+        logger.warning('Removing suid/guid from {}'.format(path))
+    return mode & 0o1777
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination, follow_symlinks=False)
+    except OSError:
+        shutil.copy2(source, destination, follow_symlinks=False)
+
+
+def _write_member(tar, member, path, mode):
+    source = tar.extractfile(member)
+    data = source.read(_UNPACK_CHUNK_SIZE)
+    if data.startswith(b'#!'):
+        # Scripts are small, rewrite them whole.
+        data = mangling.rewrite_python_shebang_contents(data + source.read())
+
+    with open(path, 'wb') as destination:
+        while data:
+            destination.write(data)
+            data = source.read(_UNPACK_CHUNK_SIZE)
+    os.chmod(path, mode)
+    os.utime(path, (member.mtime, member.mtime))
+
+
 def _get_local_sources_list():
     sources_list = glob.glob('/etc/apt/sources.list.d/*.list')
     sources_list.append('/etc/apt/sources.list')
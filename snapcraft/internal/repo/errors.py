@@ -101,6 +101,18 @@ class PackageNotFoundError(RepoError):
         return self.message
 
 
+class InvalidAptIndexTTLError(RepoError):
+
+    fmt = (
+        'Invalid apt index TTL {ttl!r} set in SNAPCRAFT_APT_INDEX_TTL.\n'
+        'Set it to a number of seconds (e.g. 3600), 0 updates the index on '
+        'every run.'
+    )
+
+    def __init__(self, ttl: str) -> None:
+        super().__init__(ttl=ttl)
+
+
 class UnpackError(RepoError):
 
     fmt = 'Error while provisioning {package!r}'
@@ -13,6 +13,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
 import os
 import requests
 import shutil
@@ -21,9 +22,14 @@ import snapcraft.internal.common
 from snapcraft.internal.cache import FileCache
 from snapcraft.internal.indicators import (
     download_requests_stream,
-    download_urllib_source
+    download_segmented,
+    download_urllib_source,
+    probe_segmented_download,
 )
-from ._checksum import split_checksum, verify_checksum
+from . import errors
+from ._checksum import split_checksum, verify_checksum, verify_digest
+
+logger = logging.getLogger(__name__)
 
 
 class Base:
@@ -60,9 +66,10 @@ class FileBase(Base):
             # this file and we don't want that.
             shutil.copy2(self.source, source_file)
 
-        # Verify before provisioning
-        if self.source_checksum:
-            verify_checksum(self.source_checksum, source_file)
+            # Verify before provisioning, downloads are verified as they
+            # are fetched.
+            if self.source_checksum:
+                verify_checksum(self.source_checksum, source_file)
 
         # We finally provision, but we don't clean the target so override-pull
         # can actually have meaning when using these sources.
@@ -74,12 +81,7 @@ class FileBase(Base):
         if self.source_checksum:
             algorithm, hash = split_checksum(self.source_checksum)
             cache_file = file_cache.get(algorithm=algorithm, hash=hash)
-            if cache_file:
-                self.file = os.path.join(self.source_dir,
-                                         os.path.basename(cache_file))
-                # We make this copy as the provisioning logic can delete
-                # this file and we don't want that.
-                shutil.copy2(cache_file, self.file)
+            if cache_file and self._copy_cached_file(cache_file):
                 return self.file
 
         # If not we download and store
@@ -88,19 +90,54 @@ class FileBase(Base):
 
         if snapcraft.internal.common.get_url_scheme(self.source) == 'ftp':
             download_urllib_source(self.source, self.file)
+            if self.source_checksum:
+                verify_checksum(self.source_checksum, self.file)
         else:
-            request = requests.get(
-                self.source, stream=True, allow_redirects=True)
-            request.raise_for_status()
-
-            download_requests_stream(request, self.file)
-
-        # We verify the file if source_checksum is defined
-        # and we cache the file for future reuse.
+            # The digest is calculated while downloading, saving a read of
+            # the whole file to verify it.
+            algorithms = [algorithm] if self.source_checksum else []
+            # Large files are fetched in concurrent segments when the
+            # server supports it.
+            size, validator = probe_segmented_download(
+                self.source, session=requests)
+            if size:
+                digests = download_segmented(
+                    self.source, self.file, size=size, validator=validator,
+                    session=requests, algorithms=algorithms)
+            else:
+                request = requests.get(
+                    self.source, stream=True, allow_redirects=True)
+                request.raise_for_status()
+
+                digests = download_requests_stream(
+                    request, self.file, algorithms=algorithms)
+            if self.source_checksum:
+                verify_digest(self.source_checksum, digests[algorithm])
+
+        # We cache the file, verified by now, for future reuse if
+        # source_checksum is defined.
         if self.source_checksum:
-            algorithm, digest = verify_checksum(
-                self.source_checksum, self.file)
             file_cache.cache(filename=self.file,
                              algorithm=algorithm,
-                             hash=hash)
+                             hash=hash, verify=False)
         return self.file
+
+    def _copy_cached_file(self, cache_file):
+        self.file = os.path.join(self.source_dir,
+                                 os.path.basename(cache_file))
+        # We make this copy as the provisioning logic can delete
+        # this file and we don't want that.
+        shutil.copy2(cache_file, self.file)
+
+        # The cache is only verified on the way in, what is copied out of
+        # it may have been truncated or corrupted since.
+        try:
+            verify_checksum(self.source_checksum, self.file)
+        except errors.DigestDoesNotMatchError:
+            logger.warning(
+                'Discarding {!r} from the cache as it does not match its '
+                'checksum.'.format(cache_file))
+            os.remove(cache_file)
+            os.remove(self.file)
+            return False
+        return True
@@ -14,15 +14,30 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import logging
 import os
 import re
 import shutil
+import subprocess
 import tarfile
 import tempfile
+import time
 
 from . import errors
 from ._base import FileBase
 
+logger = logging.getLogger(__name__)
+
+# External decompressors, by magic number, able to use more than one thread
+# and faster than decompressing in process.
+_DECOMPRESSORS = [
+    (b'\x1f\x8b', ['pigz', '-dc']),
+    (b'\xfd7zXZ\x00', ['xz', '-dc', '-T0']),
+    (b'\x28\xb5\x2f\xfd', ['zstd', '-dc']),
+    (b'BZh', ['lbzip2', '-dc']),
+]
+
 
 class Tar(FileBase):
 
@@ -52,11 +67,17 @@ class Tar(FileBase):
                 self.source_dir, os.path.basename(self.source))
 
         if clean_target:
-            tmp_tarball = tempfile.NamedTemporaryFile().name
-            shutil.move(tarball, tmp_tarball)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_tarball, tarball)
+            # The tarball may be in dst, leave it where it is instead of
+            # moving it out and back.
+            os.makedirs(dst, exist_ok=True)
+            for entry in os.listdir(dst):
+                path = os.path.join(dst, entry)
+                if os.path.abspath(path) == os.path.abspath(tarball):
+                    continue
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
 
         self._extract(tarball, dst)
 
@@ -64,43 +85,110 @@ class Tar(FileBase):
             os.remove(tarball)
 
     def _extract(self, tarball, dst):
-        with tarfile.open(tarball) as tar:
-            def filter_members(tar):
-                """Filters members and member names:
-                    - strips common prefix
-                    - bans dangerous names"""
-                members = tar.getmembers()
-                common = os.path.commonprefix([m.name for m in members])
-
-                # commonprefix() works a character at a time and will
-                # consider "d/ab" and "d/abc" to have common prefix "d/ab";
-                # check all members either start with common dir
-                for m in members:
-                    if not (m.name.startswith(common + '/') or
-                            m.isdir() and m.name == common):
-                        # commonprefix() didn't return a dir name; go up one
-                        # level
-                        common = os.path.dirname(common)
-                        break
-
-                for m in members:
-                    if m.name == common:
-                        continue
-                    self._strip_prefix(common, m)
-                    # We mask all files to be writable to be able to easily
-                    # extract on top.
-                    m.mode = m.mode | 0o200
-                    yield m
-
-            tar.extractall(members=filter_members(tar), path=dst)
-
-    def _strip_prefix(self, common, member):
-        if member.name.startswith(common + '/'):
-            member.name = member.name[len(common + '/'):]
-        # strip leading '/', './' or '../' as many times as needed
-        member.name = re.sub(r'^(\.{0,2}/)*', r'', member.name)
-        # do the same for linkname if this is a hardlink
-        if member.islnk() and not member.issym():
-            if member.linkname.startswith(common + '/'):
-                member.linkname = member.linkname[len(common + '/'):]
-            member.linkname = re.sub(r'^(\.{0,2}/)*', r'', member.linkname)
+        """Extract tarball into dst, stripping the common prefix.
+
+        The common prefix is only known once all members have been read, so
+        members are extracted in a single pass to a temporary directory in
+        dst and moved into place from there, instead of reading the tarball
+        once to find the prefix and once more to extract.
+        """
+        start_time = time.monotonic()
+        names = []
+        temp_dir = tempfile.mkdtemp(prefix='.snapcraft-tar-', dir=dst)
+        try:
+            with _open_tarball(tarball) as tar:
+                def filter_members(tar):
+                    """Filters members and member names:
+                        - bans dangerous names
+                        - records the names to find the common prefix"""
+                    for m in tar:
+                        names.append((m.name, m.isdir()))
+                        m.name = _strip_leading_dots(m.name)
+                        # do the same for linkname if this is a hardlink
+                        if m.islnk() and not m.issym():
+                            m.linkname = _strip_leading_dots(m.linkname)
+                        # We mask all files to be writable to be able to
+                        # easily extract on top.
+                        m.mode = m.mode | 0o200
+                        yield m
+
+                tar.extractall(members=filter_members(tar), path=temp_dir)
+
+            common = _get_common_prefix(names)
+            _move_contents(
+                os.path.join(temp_dir, _strip_leading_dots(common + '/')),
+                dst)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        elapsed = time.monotonic() - start_time
+        logger.debug('Extracted {} files from {!r} in {:.1f}s '
+                     '({:.0f} files/s)'.format(
+                         len(names), tarball, elapsed,
+                         len(names) / elapsed if elapsed else 0))
+
+
+@contextlib.contextmanager
+def _open_tarball(tarball):
+    """Open tarball for streaming, decompressing it externally if possible."""
+    with open(tarball, 'rb') as tarball_file:
+        magic = tarball_file.read(6)
+    for decompressor_magic, command in _DECOMPRESSORS:
+        if magic.startswith(decompressor_magic) and shutil.which(command[0]):
+            break
+    else:
+        with tarfile.open(tarball, mode='r|*') as tar:
+            yield tar
+        return
+
+    process = subprocess.Popen(command + [tarball], stdout=subprocess.PIPE)
+    try:
+        with tarfile.open(fileobj=process.stdout, mode='r|') as tar:
+            yield tar
+        # Reading stops at the end of archive marker, the decompressor may
+        # have padding left to write.
+        while process.stdout.read(tarfile.RECORDSIZE):
+            pass
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def _get_common_prefix(names):
+    common = os.path.commonprefix([name for name, _ in names])
+
+    # commonprefix() works a character at a time and will
+    # consider "d/ab" and "d/abc" to have common prefix "d/ab";
+    # check all members either start with common dir
+    for name, isdir in names:
+        if not (name.startswith(common + '/') or isdir and name == common):
+            # commonprefix() didn't return a dir name; go up one
+            # level
+            return os.path.dirname(common)
+    return common
+
+
+def _strip_leading_dots(name):
+    # strip leading '/', './' or '../' as many times as needed
+    return re.sub(r'^(\.{0,2}/)*', r'', name)
+
+
+def _move_contents(src, dst):
+    """Move the contents of src into dst, merging with what is there."""
+    for entry in os.listdir(src):
+        src_path = os.path.join(src, entry)
+        dst_path = os.path.join(dst, entry)
+        src_isdir = os.path.isdir(src_path) and not os.path.islink(src_path)
+        dst_isdir = os.path.isdir(dst_path) and not os.path.islink(dst_path)
+        if src_isdir and dst_isdir:
+            _move_contents(src_path, dst_path)
+            shutil.copystat(src_path, dst_path)
+            continue
+        if dst_isdir:
+            shutil.rmtree(dst_path)
+        os.replace(src_path, dst_path)
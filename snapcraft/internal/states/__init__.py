@@ -16,6 +16,10 @@
 
 from snapcraft.internal.states._build_state import BuildState  # noqa
 from snapcraft.internal.states._global_state import GlobalState  # noqa
+from snapcraft.internal.states._machine_assets import (  # noqa
+    get_machine_assets,
+    save_machine_assets,
+)
 from snapcraft.internal.states._prime_state import PrimeState  # noqa
 from snapcraft.internal.states._pull_state import PullState  # noqa
 from snapcraft.internal.states._stage_state import StageState  # noqa
@@ -48,7 +48,8 @@ class BuildState(PartState):
     def __init__(
             self, property_names, part_properties=None, project=None,
             plugin_assets=None, machine_assets=None, metadata=None,
-            metadata_files=None, scriptlet_metadata=None):
+            metadata_files=None, scriptlet_metadata=None,
+            machine_assets_digest=None):
         # Save this off before calling super() since we'll need it
         # FIXME: for 3.x the name `schema_properties` is leaking
         #        implementation details from a higher layer.
@@ -59,6 +60,9 @@ class BuildState(PartState):
             self.assets = {}
         if machine_assets:
             self.assets.update(machine_assets)
+        # Refers to the machine assets kept once for all parts, see
+        # get_machine_assets().
+        self.machine_assets_digest = machine_assets_digest
 
         if not scriptlet_metadata:
             scriptlet_metadata = snapcraft.extractors.ExtractedMetadata()
@@ -0,0 +1,67 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional  # noqa: F401
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Parts built on the same machine share the same machine assets, which are
+# kept once for all of them in here, under the parts directory.
+_MACHINE_ASSETS_DIR = '.machine-assets'
+
+
+def save_machine_assets(parts_dir: str, machine_assets: Dict[str, Any]) -> str:
+    """Keep machine assets for the build states of parts to refer to.
+
+    :param str parts_dir: the directory holding the parts.
+    :param dict machine_assets: the assets of the machine parts are built on.
+    :returns: the digest the build states refer to the assets by.
+    """
+    data = yaml.safe_dump(machine_assets, default_flow_style=False)
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    assets_dir = os.path.join(parts_dir, _MACHINE_ASSETS_DIR)
+    assets_path = os.path.join(assets_dir, digest)
+    if not os.path.exists(assets_path):
+        os.makedirs(assets_dir, exist_ok=True)
+        temp_path = '{}.partial'.format(assets_path)
+        with open(temp_path, 'w') as assets_file:
+            assets_file.write(data)
+        os.replace(temp_path, assets_path)
+    return digest
+
+
+def get_machine_assets(parts_dir: str,
+                       digest: Optional[str]) -> Dict[str, Any]:
+    """Get the machine assets a build state refers to.
+
+    :param str parts_dir: the directory holding the parts.
+    :param str digest: the digest the build state refers to the assets by.
+    :returns: the machine assets, or an empty dict if there are none.
+    """
+    if not digest:
+        return dict()
+    try:
+        with open(os.path.join(parts_dir, _MACHINE_ASSETS_DIR,
+                               digest)) as assets_file:
+            return yaml.safe_load(assets_file)
+    except FileNotFoundError:
+        logger.debug('Missing machine assets {!r}'.format(digest))
+        return dict()
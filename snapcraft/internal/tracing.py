@@ -0,0 +1,186 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Trace where the time of a snapcraft run goes.
+
+Spans time the phases of a run, such as each step of each part, and
+counters add up the work done, such as files migrated or bytes hashed.
+The trace can be written out as Chrome trace events, which
+chrome://tracing and Perfetto load, and summed up in a table.
+
+Tracing is disabled unless enable() is called, until then spans and
+counters cost no more than checking for it.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
+
+
+class _Tracer:
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.started_at = time.perf_counter()
+        self.events = []  # type: List[Dict[str, Any]]
+        self.counters = dict()  # type: Dict[str, int]
+        self._thread_ids = dict()  # type: Dict[int, int]
+        self._lock = threading.Lock()
+
+    def _get_timestamp(self, at: float) -> float:
+        # Trace events are timed in microseconds.
+        return (at - self.started_at) * 10 ** 6
+
+    def add_span(self, name: str, category: str, args: Dict[str, Any],
+                 start: float, end: float) -> None:
+        with self._lock:
+            tid = self._thread_ids.setdefault(
+                threading.get_ident(), len(self._thread_ids) + 1)
+            self.events.append(dict(
+                name=name, cat=category, ph='X', pid=self.pid, tid=tid,
+                ts=self._get_timestamp(start),
+                dur=self._get_timestamp(end) - self._get_timestamp(start),
+                args=args))
+            # Sampling counters as spans end shows which spans did the work.
+            if self.counters:
+                self.events.append(dict(
+                    name='counters', ph='C', pid=self.pid, tid=tid,
+                    ts=self._get_timestamp(end), args=dict(self.counters)))
+
+    def add_count(self, name: str, value: int) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+class _Span:
+
+    __slots__ = ('_tracer', '_name', '_category', '_args', '_start')
+
+    def __init__(self, tracer: _Tracer, name: str, category: str,
+                 args: Dict[str, Any]) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._args['error'] = exc_type.__name__
+        self._tracer.add_span(self._name, self._category, self._args,
+                              self._start, time.perf_counter())
+
+
+class _NullSpan:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+_tracer = None  # type: Optional[_Tracer]
+
+
+def enable() -> None:
+    """Start tracing, dropping anything traced before."""
+    global _tracer
+    _tracer = _Tracer()
+
+
+def disable() -> None:
+    """Stop tracing and drop what was traced."""
+    global _tracer
+    _tracer = None
+
+
+def is_enabled() -> bool:
+    """Tell if tracing is enabled."""
+    return _tracer is not None
+
+
+def span(name: str, *, category: str='snapcraft', **args):
+    """Time the phase of the run named name, used as a context manager.
+
+    :param str name: the name of the phase, spans with the same name are
+                     summed up together.
+    :param str category: the category of the phase, such as 'step'.
+    :param args: details about this occurrence of the phase, such as the
+                 part it is for.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, category, args)
+
+
+def count(name: str, value: int=1) -> None:
+    """Add value to the counter named name."""
+    if _tracer is not None:
+        _tracer.add_count(name, value)
+
+
+def write_chrome_trace(path: str) -> None:
+    """Write what was traced to path, as Chrome trace events."""
+    if _tracer is None:
+        raise RuntimeError('Tracing is not enabled')
+
+    events = [dict(name='process_name', ph='M', pid=_tracer.pid,
+                   args=dict(name='snapcraft'))]
+    events.extend(_tracer.events)
+    with open(path, 'w') as trace_file:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms'),
+                  trace_file)
+
+
+def format_summary() -> str:
+    """Sum up what was traced in a table of spans and one of counters."""
+    if _tracer is None:
+        raise RuntimeError('Tracing is not enabled')
+
+    # name -> [calls, total, max], in microseconds
+    spans = dict()  # type: Dict[str, List]
+    for event in _tracer.events:
+        if event['ph'] != 'X':
+            continue
+        summed = spans.setdefault(event['name'], [0, 0.0, 0.0])
+        summed[0] += 1
+        summed[1] += event['dur']
+        summed[2] = max(summed[2], event['dur'])
+
+    lines = ['{:<32} {:>8} {:>12} {:>12}'.format(
+        'Span', 'Calls', 'Total (s)', 'Max (s)')]
+    for name, (calls, total, longest) in sorted(
+            spans.items(), key=lambda s: s[1][1], reverse=True):
+        lines.append('{:<32} {:>8} {:>12.3f} {:>12.3f}'.format(
+            name, calls, total / 10 ** 6, longest / 10 ** 6))
+
+    if _tracer.counters:
+        lines.append('')
+        lines.append('{:<32} {:>34}'.format('Counter', 'Value'))
+        for name, value in sorted(_tracer.counters.items()):
+            lines.append('{:<32} {:>34}'.format(name, value))
+    return '\n'.join(lines)
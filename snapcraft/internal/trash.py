@@ -0,0 +1,177 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Remove directories without waiting for them to be deleted.
+
+Directories are renamed into the trash directory of the project, so the
+path they were at is free right away, and deleted by a background thread
+which spreads large trees over a few more. Snapcraft waits for the trash
+to be emptied before exiting, and whatever an interrupted run left in it
+is deleted by the next one.
+"""
+
+import atexit
+import concurrent.futures
+import contextlib
+import logging
+import os
+import threading
+import uuid
+from typing import Optional, Set  # noqa: F401
+
+from snapcraft.internal import common
+from snapcraft.internal.cache import remove_tree
+
+logger = logging.getLogger(__name__)
+
+
+def _get_trash_dir() -> str:
+    # Like the other directories snapcraft keeps, the trash is in the
+    # project, which is the working directory.
+    return os.path.abspath(common.SNAPCRAFT_TRASH_DIR)
+
+
+def _delete_entry(path: str,
+                  executor: concurrent.futures.Executor) -> None:
+    if not os.path.isdir(path) or os.path.islink(path):
+        os.remove(path)
+        return
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                else:
+                    os.remove(entry.path)
+    except PermissionError:
+        # remove_tree makes read-only directories writable as it goes.
+        remove_tree(path)
+        return
+    # Deleting is mostly waiting on the filesystem, so the subdirectories
+    # are deleted concurrently.
+    for future in [executor.submit(remove_tree, subdirectory)
+                   for subdirectory in subdirectories]:
+        future.result()
+    os.rmdir(path)
+
+
+def _empty_trash(trash_dir: str) -> None:
+    try:
+        names = os.listdir(trash_dir)
+    except FileNotFoundError:
+        return
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1) as executor:
+        for name in names:
+            path = os.path.join(trash_dir, name)
+            try:
+                _delete_entry(path, executor)
+            except OSError as e:
+                logger.warning('Unable to delete {!r}: {}'.format(path, e))
+    # The trash is only removed once it is empty.
+    with contextlib.suppress(OSError):
+        os.rmdir(trash_dir)
+
+
+class _Purger:
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = set()  # type: Set[str]
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def purge(self, trash_dir: str) -> None:
+        with self._lock:
+            self._pending.add(trash_dir)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='trash-purger', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                trash_dir = self._pending.pop()
+            _empty_trash(trash_dir)
+
+    def is_purging(self) -> bool:
+        with self._lock:
+            return self._thread is not None
+
+    def wait(self) -> None:
+        while True:
+            with self._lock:
+                thread = self._thread
+            if thread is None:
+                return
+            thread.join()
+
+
+_purger = _Purger()
+
+
+def discard(path: str) -> None:
+    """Remove path, leaving the deletion of a directory to the background.
+
+    Files are removed right away, as are directories which cannot be
+    renamed into the trash, such as the ones on another filesystem.
+
+    :param str path: the path to remove, which must be in the project.
+    """
+    if not os.path.isdir(path) or os.path.islink(path):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        return
+
+    trash_dir = _get_trash_dir()
+    os.makedirs(trash_dir, exist_ok=True)
+    trashed_path = os.path.join(trash_dir, '{}-{}'.format(
+        os.path.basename(os.path.normpath(path)), uuid.uuid4().hex))
+    try:
+        os.rename(path, trashed_path)
+    except OSError as e:
+        logger.debug('Deleting {!r} in place: {}'.format(path, e))
+        remove_tree(path)
+        return
+    _purger.purge(trash_dir)
+
+
+def purge() -> None:
+    """Start deleting whatever is in the trash of the project."""
+    trash_dir = _get_trash_dir()
+    if os.path.isdir(trash_dir):
+        _purger.purge(trash_dir)
+
+
+def wait() -> None:
+    """Wait for the trash to be emptied."""
+    _purger.wait()
+
+
+def _wait_at_exit() -> None:
+    if not _purger.is_purging():
+        return
+    logger.info('Waiting for cleaned up files to be deleted')
+    with contextlib.suppress(KeyboardInterrupt):
+        # What is left is deleted by the next run.
+        _purger.wait()
+
+
+atexit.register(_wait_at_exit)
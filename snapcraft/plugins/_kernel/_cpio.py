@@ -0,0 +1,265 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Read and write cpio archives in the newc format used for initrds.
+
+See the "New ASCII Format" in `man 5 cpio`.
+"""
+
+import collections
+import gzip
+import logging
+import lzma
+import os
+import stat
+from typing import BinaryIO, Dict, List, Tuple  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'070701'
+_MAGIC_WITH_CHECKSUM = b'070702'
+_HEADER_SIZE = 110
+_TRAILER = 'TRAILER!!!'
+_CHUNK_SIZE = 1024 * 1024
+
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+_LZMA_MAGIC = b'\x5d\x00\x00'
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _pad(size: int) -> bytes:
+    return b'\x00' * (-size % 4)
+
+
+def _write_entry(fileobj: BinaryIO, name: str, *, ino: int, mode: int,
+                 uid: int=0, gid: int=0, nlink: int=1, mtime: int=0,
+                 filesize: int=0, rdev: int=0) -> None:
+    encoded_name = name.encode() + b'\x00'
+    header = _MAGIC + ''.join('{:08X}'.format(field) for field in (
+        ino, mode, uid, gid, nlink, mtime, filesize, 0, 0,
+        os.major(rdev), os.minor(rdev), len(encoded_name), 0)).encode()
+    fileobj.write(header + encoded_name +
+                  _pad(_HEADER_SIZE + len(encoded_name)))
+
+
+def _iter_tree(root: str, relative_path: str):
+    entries = os.scandir(os.path.join(root, relative_path))
+    for entry in sorted(entries, key=lambda e: e.name):
+        path = os.path.join(relative_path, entry.name)
+        yield path, entry.stat(follow_symlinks=False)
+        if entry.is_dir(follow_symlinks=False):
+            yield from _iter_tree(root, path)
+
+
+def write_archive(root: str, fileobj: BinaryIO) -> None:
+    """Write the tree at root to fileobj as a newc cpio archive.
+
+    Entries are named relative to root, which is written as '.', and are
+    sorted so that the same tree always gives the same archive. Hard links
+    are written as separate files.
+
+    :param str root: the directory to archive.
+    :param fileobj: a binary file like object to write to.
+    """
+    ino = 0
+    for path, st in [('.', os.stat(root))] + list(_iter_tree(root, '')):
+        ino += 1
+        full_path = os.path.join(root, path)
+        if stat.S_ISREG(st.st_mode):
+            contents = None
+            filesize = st.st_size
+        elif stat.S_ISLNK(st.st_mode):
+            contents = os.readlink(full_path).encode()
+            filesize = len(contents)
+        else:
+            contents = b''
+            filesize = 0
+        _write_entry(fileobj, path, ino=ino, mode=st.st_mode, uid=st.st_uid,
+                     gid=st.st_gid,
+                     nlink=2 if stat.S_ISDIR(st.st_mode) else 1,
+                     mtime=int(st.st_mtime), filesize=filesize,
+                     rdev=st.st_rdev)
+
+        if contents is None:
+            written = 0
+            with open(full_path, 'rb') as source_file:
+                for chunk in iter(lambda: source_file.read(_CHUNK_SIZE), b''):
+                    fileobj.write(chunk)
+                    written += len(chunk)
+            if written != filesize:
+                raise RuntimeError(
+                    '{!r} changed while it was being archived'.format(
+                        full_path))
+        else:
+            fileobj.write(contents)
+        fileobj.write(_pad(filesize))
+
+    _write_entry(fileobj, _TRAILER, ino=0, mode=0)
+
+
+def _read_exact(fileobj: BinaryIO, size: int) -> bytes:
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise RuntimeError('The cpio archive is truncated')
+    return data
+
+
+def _copy_exact(fileobj: BinaryIO, size: int, destination: BinaryIO) -> None:
+    while size:
+        chunk = _read_exact(fileobj, min(size, _CHUNK_SIZE))
+        destination.write(chunk)
+        size -= len(chunk)
+
+
+def _get_destination(dst: str, name: str) -> str:
+    relative_path = os.path.normpath(name.lstrip('/'))
+    if relative_path == '..' or relative_path.startswith('../'):
+        raise RuntimeError(
+            'The cpio archive contains a path outside of it: {!r}'.format(
+                name))
+    return os.path.join(dst, relative_path)
+
+
+_Header = collections.namedtuple('_Header', [
+    'name', 'ino', 'mode', 'nlink', 'filesize', 'devmajor', 'devminor',
+    'rdevmajor', 'rdevminor'])
+
+
+def _read_header(fileobj: BinaryIO) -> _Header:
+    header = _read_exact(fileobj, _HEADER_SIZE)
+    if header[:6] not in (_MAGIC, _MAGIC_WITH_CHECKSUM):
+        raise RuntimeError('The cpio archive is not in the newc format')
+    (ino, mode, _, _, nlink, _, filesize, devmajor, devminor, rdevmajor,
+     rdevminor, namesize, _) = (
+         int(header[6 + i * 8:14 + i * 8], 16) for i in range(13))
+    name = _read_exact(fileobj, namesize).rstrip(b'\x00').decode()
+    _read_exact(fileobj, -(_HEADER_SIZE + namesize) % 4)
+    return _Header(name, ino, mode, nlink, filesize, devmajor, devminor,
+                   rdevmajor, rdevminor)
+
+
+class _Extraction:
+
+    def __init__(self, fileobj: BinaryIO, dst: str) -> None:
+        self._fileobj = fileobj
+        self._dst = dst
+        self._directory_modes = []  # type: List[Tuple[str, int]]
+        # Hard links only carry contents in their last entry.
+        self._links = dict()  # type: Dict[Tuple[int, int, int], List[str]]
+
+    def extract(self, header: _Header) -> None:
+        path = _get_destination(self._dst, header.name)
+        # Like `cpio --make-directories`, parents need not be archived.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.lexists(path) and not os.path.isdir(path):
+            os.unlink(path)
+        if stat.S_ISDIR(header.mode):
+            os.makedirs(path, exist_ok=True)
+            self._directory_modes.append((path, stat.S_IMODE(header.mode)))
+        elif stat.S_ISLNK(header.mode):
+            os.symlink(
+                _read_exact(self._fileobj, header.filesize).decode(), path)
+        elif stat.S_ISREG(header.mode):
+            self._extract_file(header, path)
+        else:
+            self._extract_device(header, path)
+        _read_exact(self._fileobj, -header.filesize % 4)
+
+    def _extract_file(self, header: _Header, path: str) -> None:
+        key = (header.ino, header.devmajor, header.devminor)
+        if header.nlink > 1 and not header.filesize:
+            self._links.setdefault(key, []).append(path)
+            return
+        with open(path, 'wb') as destination:
+            _copy_exact(self._fileobj, header.filesize, destination)
+        os.chmod(path, stat.S_IMODE(header.mode))
+        for link_path in self._links.pop(key, []):
+            os.link(path, link_path)
+
+    def _extract_device(self, header: _Header, path: str) -> None:
+        try:
+            os.mknod(path, header.mode,
+                     os.makedev(header.rdevmajor, header.rdevminor))
+        except PermissionError:
+            logger.debug('Skipping device node {!r}'.format(header.name))
+
+    def finish(self) -> None:
+        # Hard links whose contents never came are empty files.
+        for link_paths in self._links.values():
+            for link_path in link_paths:
+                open(link_path, 'wb').close()
+
+        # Directories may not be writable, their modes are set once they
+        # are filled.
+        for path, mode in reversed(self._directory_modes):
+            os.chmod(path, mode)
+
+
+def extract_archive(fileobj: BinaryIO, dst: str) -> None:
+    """Extract the newc cpio archive read from fileobj into dst.
+
+    Like `cpio --extract`, modes are kept but modification times and owners
+    are not. Device nodes which cannot be created are skipped.
+
+    :param fileobj: a binary file like object positioned at the archive.
+    :param str dst: the directory to extract into.
+    """
+    extraction = _Extraction(fileobj, dst)
+    while True:
+        header = _read_header(fileobj)
+        if header.name == _TRAILER:
+            break
+        extraction.extract(header)
+    extraction.finish()
+
+
+def extract_initrd(path: str, dst: str) -> None:
+    """Extract the initrd at path into dst.
+
+    Archives are read until one compressed with xz, lzma or gzip is found,
+    so that uncompressed archives prepended to it, such as microcode
+    updates, are extracted along with it.
+
+    :param str path: path to the initrd.
+    :param str dst: the directory to extract into.
+    :raises RuntimeError: if the initrd is in an unsupported format.
+    """
+    with open(path, 'rb') as initrd_file:
+        while True:
+            # Archives are padded to a block size with zeros.
+            position = initrd_file.tell()
+            padding = initrd_file.read(512)
+            stripped = padding.lstrip(b'\x00')
+            if not stripped:
+                if padding:
+                    continue
+                return
+            initrd_file.seek(position + len(padding) - len(stripped))
+
+            magic = initrd_file.read(6)
+            initrd_file.seek(-len(magic), os.SEEK_CUR)
+            if magic in (_MAGIC, _MAGIC_WITH_CHECKSUM):
+                extract_archive(initrd_file, dst)
+                continue
+            elif magic.startswith((_XZ_MAGIC, _LZMA_MAGIC)):
+                open_compressed = lzma.open
+            elif magic.startswith(_GZIP_MAGIC):
+                open_compressed = gzip.open
+            else:
+                raise RuntimeError('The initrd file type is unsupported')
+            with open_compressed(initrd_file) as decompressed_file:
+                extract_archive(decompressed_file, dst)
+            return
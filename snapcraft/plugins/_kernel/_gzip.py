@@ -0,0 +1,111 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import os
+import struct
+import zlib
+from concurrent import futures
+from typing import BinaryIO  # noqa: F401
+
+_BLOCK_SIZE = 1024 * 1024
+# Back-references in deflate streams reach at most this far.
+_WINDOW_SIZE = 32 * 1024
+
+# No file name or modification time are recorded, for reproducibility.
+_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\x03'
+
+
+def _deflate(block: bytes, dictionary: bytes, level: int,
+             last: bool) -> bytes:
+    if dictionary:
+        compressor = zlib.compressobj(
+            level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+            zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # A sync flush ends the block on a byte boundary without ending the
+    # stream, so the next block can follow it.
+    return compressor.compress(block) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipWriter:
+    """Compress what is written to a file as gzip, using all processors.
+
+    The input is compressed in blocks in parallel, as pigz does. Each block
+    is primed with the end of the previous one, so the result is a single
+    gzip member compressing about as well as gzip itself.
+    """
+
+    def __init__(self, fileobj: BinaryIO, *, level: int=6,
+                 block_size: int=_BLOCK_SIZE, workers: int=None) -> None:
+        """Create a ParallelGzipWriter.
+
+        :param fileobj: a binary file like object to write the compressed
+                        data to, which is left open.
+        :param int level: the compression level, from 1 to 9.
+        :param int block_size: the size of the blocks compressed in parallel.
+        :param int workers: the number of blocks compressed in parallel,
+                            the number of processors by default.
+        """
+        self._fileobj = fileobj
+        self._level = level
+        self._block_size = block_size
+        self._workers = workers or os.cpu_count() or 1
+        self._executor = futures.ThreadPoolExecutor(self._workers)
+        self._pending = collections.deque()  # type: collections.deque
+        self._buffer = bytearray()
+        self._dictionary = b''
+        self._crc = 0
+        self._size = 0
+        self._fileobj.write(_HEADER)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown()
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[:self._block_size])
+            del self._buffer[:self._block_size]
+            self._submit(block, last=False)
+
+    def _submit(self, block: bytes, *, last: bool) -> None:
+        self._pending.append(self._executor.submit(
+            _deflate, block, self._dictionary, self._level, last))
+        self._dictionary = (self._dictionary + block)[-_WINDOW_SIZE:]
+        # Bound the memory held by blocks waiting to be written.
+        while len(self._pending) > 2 * self._workers:
+            self._fileobj.write(self._pending.popleft().result())
+
+    def close(self) -> None:
+        """Compress what is left and write the gzip trailer."""
+        self._submit(bytes(self._buffer), last=True)
+        self._buffer = bytearray()
+        while self._pending:
+            self._fileobj.write(self._pending.popleft().result())
+        self._fileobj.write(struct.pack(
+            '<II', self._crc & 0xffffffff, self._size & 0xffffffff))
+        self._executor.shutdown()
@@ -0,0 +1,122 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Resolve kernel modules from the files depmod generates.
+
+See `man 5 modules.dep`.
+"""
+
+import fnmatch
+import os
+import re
+from typing import Dict, List, Set, Tuple  # noqa: F401
+
+_MODULE_SUFFIX = re.compile(r'\.ko(\.(gz|xz|zst))?$')
+
+
+def _get_module_name(path: str) -> str:
+    # modprobe treats dashes and underscores in module names the same.
+    return _MODULE_SUFFIX.sub('', os.path.basename(path)).replace('-', '_')
+
+
+def _read_lines(path: str) -> List[str]:
+    try:
+        with open(path) as f:
+            return [line.strip() for line in f
+                    if line.strip() and not line.startswith('#')]
+    except FileNotFoundError:
+        return []
+
+
+class _ModulesIndex:
+
+    def __init__(self, modules_dir: str) -> None:
+        kernel_release = os.path.basename(modules_dir)
+        # module name -> [module path, dependency paths...]
+        self.dependencies = dict()  # type: Dict[str, List[str]]
+        for line in _read_lines(os.path.join(modules_dir, 'modules.dep')):
+            module, _, dependencies = line.partition(':')
+            paths = [module] + dependencies.split()
+            # Old versions of depmod wrote absolute paths.
+            paths = [os.path.relpath(p, os.path.join(
+                '/lib', 'modules', kernel_release))
+                if os.path.isabs(p) else p for p in paths]
+            self.dependencies[_get_module_name(module)] = paths
+
+        self.builtin = set(
+            _get_module_name(line) for line in _read_lines(
+                os.path.join(modules_dir, 'modules.builtin')))
+
+        self.softdeps = dict()  # type: Dict[str, List[str]]
+        for line in _read_lines(os.path.join(modules_dir, 'modules.softdep')):
+            words = line.split()
+            if len(words) < 2 or words[0] != 'softdep':
+                continue
+            self.softdeps[words[1].replace('-', '_')] = [
+                w.replace('-', '_') for w in words[2:]
+                if w not in ('pre:', 'post:')]
+
+        self.aliases = []  # type: List[Tuple[str, str]]
+        for line in _read_lines(os.path.join(modules_dir, 'modules.alias')):
+            words = line.split()
+            if len(words) == 3 and words[0] == 'alias':
+                self.aliases.append((words[1].replace('-', '_'),
+                                     words[2].replace('-', '_')))
+
+    def get_module_names(self, name: str) -> List[str]:
+        name = name.replace('-', '_')
+        if name in self.dependencies or name in self.builtin:
+            return [name]
+        return [module for pattern, module in self.aliases
+                if fnmatch.fnmatchcase(name, pattern)]
+
+
+def resolve_modules(modules_dir: str,
+                    names: List[str]) -> Tuple[Set[str], List[str]]:
+    """Resolve modules into the module files needed to load them.
+
+    Like `modprobe --show-depends`, dependencies, soft dependencies and
+    aliases are followed, and modules built into the kernel need no files.
+
+    :param str modules_dir: the lib/modules/<kernel release> directory
+                            holding modules.dep.
+    :param list names: the names of the modules to resolve.
+    :returns: the paths of the module files needed, relative to
+              modules_dir, and the names which could not be resolved.
+    """
+    index = _ModulesIndex(modules_dir)
+    paths = set()  # type: Set[str]
+    unresolved = []  # type: List[str]
+    seen = set()  # type: Set[str]
+
+    def add(module_name):
+        if module_name in seen:
+            return
+        seen.add(module_name)
+        paths.update(index.dependencies.get(module_name, []))
+        for dependency_path in index.dependencies.get(module_name, [])[1:]:
+            add(_get_module_name(dependency_path))
+        for softdep_name in index.softdeps.get(module_name, []):
+            for softdep_module in index.get_module_names(softdep_name):
+                add(softdep_module)
+
+    for name in names:
+        module_names = index.get_module_names(name)
+        if not module_names:
+            unresolved.append(name)
+        for module_name in module_names:
+            add(module_name)
+    return paths, unresolved
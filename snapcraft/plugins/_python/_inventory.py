@@ -0,0 +1,197 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Inventory the python packages installed in a set of directories.
+
+The inventory holds what `pip list` reports, read directly from the
+*.dist-info and *.egg-info metadata found in the directories and in the
+paths their .pth files add, as python's site module would. An inventory is
+reused for as long as the directories and metadata it was read from are
+unchanged.
+"""
+
+import collections
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple  # noqa: F401
+
+from snapcraft.internal import cache
+
+logger = logging.getLogger(__name__)
+
+# Inventories that read entries modified this recently, in nanoseconds, are
+# not kept as a modification in the same timestamp tick would go unnoticed.
+_RACY_WINDOW = 100 * 10 ** 6
+
+_cache = dict()  # type: Dict[Tuple, _Inventory]
+
+
+class _Inventory:
+
+    def __init__(self, packages: Dict[str, str],
+                 snapshot: Dict[str, Optional[int]], cacheable: bool) -> None:
+        self.packages = packages
+        # Installing, removing or upgrading a package adds or removes
+        # metadata in a directory, which updates the directory's mtime.
+        self.snapshot = snapshot
+        self.cacheable = cacheable
+
+    def is_current(self) -> bool:
+        return all(_get_mtime(path) == mtime
+                   for path, mtime in self.snapshot.items())
+
+
+def get_installed_packages(paths: List[str],
+                           site_dirs: List[str]) -> Dict[str, str]:
+    """Get the packages installed in paths and site_dirs.
+
+    :param list paths: directories searched for packages, in order.
+    :param list site_dirs: site directories searched for packages after
+                           paths, along with the paths their .pth files add.
+    :returns: an OrderedDict of package names to versions, sorted by name.
+              Only the first package found for a name is listed.
+    """
+    key = (tuple(os.path.abspath(p) for p in paths),
+           tuple(os.path.abspath(d) for d in site_dirs))
+    inventory = _cache.pop(key, None)
+    if inventory is None or not inventory.is_current():
+        inventory = _read_inventory(paths, site_dirs)
+    if inventory.cacheable:
+        _cache[key] = inventory
+    # Callers are free to modify what they get.
+    return collections.OrderedDict(inventory.packages)
+
+
+def _read_inventory(paths: List[str], site_dirs: List[str]) -> _Inventory:
+    started_at = int(time.time() * 10 ** 9)
+    snapshot = dict()  # type: Dict[str, Optional[int]]
+    search_path = []  # type: List[str]
+    for path in paths:
+        snapshot[path] = _get_mtime(path)
+        if path not in search_path:
+            search_path.append(path)
+    for site_dir in site_dirs:
+        _add_site_dir(site_dir, search_path, snapshot)
+
+    found = dict()  # type: Dict[str, Tuple[str, str]]
+    for path in search_path:
+        for name, version in _find_distributions(path, snapshot):
+            found.setdefault(cache.normalize_package_name(name),
+                             (name, version))
+
+    packages = collections.OrderedDict(
+        sorted(found.values(), key=lambda p: p[0].lower()))
+    cacheable = all(mtime is None or mtime < started_at - _RACY_WINDOW
+                    for mtime in snapshot.values())
+    return _Inventory(packages, snapshot, cacheable)
+
+
+def _add_site_dir(site_dir: str, search_path: List[str],
+                  snapshot: Dict[str, Optional[int]]) -> None:
+    snapshot[site_dir] = _get_mtime(site_dir)
+    if snapshot[site_dir] is None:
+        return
+    if site_dir not in search_path:
+        search_path.append(site_dir)
+
+    for name in sorted(os.listdir(site_dir)):
+        if not name.endswith('.pth'):
+            continue
+        pth_path = os.path.join(site_dir, name)
+        snapshot[pth_path] = _get_mtime(pth_path)
+        for path in _read_pth_paths(site_dir, pth_path):
+            if path not in search_path and os.path.exists(path):
+                search_path.append(path)
+                snapshot[path] = _get_mtime(path)
+
+
+def _read_pth_paths(site_dir: str, pth_path: str) -> List[str]:
+    try:
+        with open(pth_path) as pth_file:
+            lines = pth_file.readlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+
+    paths = []  # type: List[str]
+    for line in lines:
+        # Like site.addpackage, lines importing modules are executed
+        # rather than added, which does not add packages.
+        if line.startswith(('#', 'import ', 'import\t')):
+            continue
+        line = line.rstrip()
+        if line:
+            paths.append(os.path.join(site_dir, line))
+    return paths
+
+
+def _find_distributions(path: str, snapshot: Dict[str, Optional[int]]):
+    if path.endswith('.egg'):
+        metadata_path = os.path.join(path, 'EGG-INFO', 'PKG-INFO')
+        if os.path.isfile(metadata_path):
+            yield from _read_metadata(metadata_path, snapshot)
+        return
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return
+
+    for entry in sorted(entries, key=lambda e: e.name):
+        metadata_path = _get_metadata_path(entry)
+        if metadata_path is not None:
+            yield from _read_metadata(metadata_path, snapshot)
+
+
+def _get_metadata_path(entry: os.DirEntry) -> Optional[str]:
+    if entry.name.endswith('.dist-info'):
+        return os.path.join(entry.path, 'METADATA')
+    if entry.name.endswith('.egg-info'):
+        # distutils writes .egg-info as a file, setuptools as a directory.
+        if entry.is_dir():
+            return os.path.join(entry.path, 'PKG-INFO')
+        return entry.path
+    return None
+
+
+def _read_metadata(metadata_path: str, snapshot: Dict[str, Optional[int]]):
+    # Metadata can be rewritten in place, as `setup.py develop` does.
+    snapshot[metadata_path] = _get_mtime(metadata_path)
+    headers = dict()  # type: Dict[str, str]
+    try:
+        with open(metadata_path, encoding='utf-8',
+                  errors='replace') as metadata_file:
+            # Only the headers are needed, not the description after them.
+            for line in metadata_file:
+                if not line.strip():
+                    break
+                field, _, value = line.partition(':')
+                headers.setdefault(field.strip().lower(), value.strip())
+    except OSError:
+        return
+
+    if 'name' in headers and 'version' in headers:
+        yield headers['name'], headers['version']
+    else:
+        logger.debug('Ignoring invalid metadata in {!r}'.format(
+            metadata_path))
+
+
+def _get_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
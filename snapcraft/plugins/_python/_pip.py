@@ -16,29 +16,45 @@
 
 import collections
 import contextlib
+import glob
+import hashlib
 import json
 import logging
 import os
+import platform
 import re
 import shutil
 import stat
 import subprocess
 import sys
 import tempfile
-from typing import List, Set
+from typing import Dict, List, Set, Tuple  # noqa
 
 import snapcraft
 from snapcraft import file_utils
-from snapcraft.internal import mangling
+from snapcraft.internal import cache, mangling
 from ._python_finder import (
     get_python_command,
     get_python_headers,
     get_python_home,
 )
-from . import errors
+from . import _inventory, errors
 
 logger = logging.getLogger(__name__)
 
+_SDIST_EXTENSIONS = ('.tar.gz', '.tar.bz2', '.tar.xz', '.tgz', '.zip')
+
+# Environment which, besides the interpreter, affects what a built wheel
+# contains.
+_WHEEL_BUILD_ENVIRONMENT = ('CC', 'CXX', 'CFLAGS', 'CPPFLAGS', 'CXXFLAGS',
+                            'LDFLAGS')
+
+
+def _get_wheel_name_and_version(wheel: str) -> Tuple[str, str]:
+    # Wheel file names are {name}-{version}(-{build})?-{python}-{abi}-{arch}
+    name, version = wheel.split('-')[:2]
+    return cache.normalize_package_name(name), version
+
 
 def _process_common_args(*, packages: List[str],
                          constraints: Set[str],
@@ -336,6 +352,22 @@ class Pip:
         if not args:
             return []  # No operation was requested
 
+        # Wheels previously built from the very same source distributions are
+        # put next to them, pip prefers those over building again.
+        wheel_cache = cache.WheelCache()
+        sdists = self._get_sdists()
+        build_key = self._get_wheel_build_key() if sdists else None
+        cached_sdists = set()  # type: Set[Tuple[str, str]]
+        for name, version in sdists:
+            cached_wheel = wheel_cache.get(
+                name=name, version=version, build_key=build_key)
+            if cached_wheel:
+                file_utils.link_or_copy(
+                    cached_wheel, os.path.join(
+                        self._python_package_dir,
+                        os.path.basename(cached_wheel)))
+                cached_sdists.add((name, version))
+
         wheels = []
         with tempfile.TemporaryDirectory() as temp_dir:
 
@@ -357,18 +389,93 @@ class Pip:
                 file_utils.link_or_copy(
                     os.path.join(temp_dir, wheel),
                     os.path.join(self._python_package_dir, wheel))
+                name, version = _get_wheel_name_and_version(wheel)
+                if ((name, version) in sdists and
+                        (name, version) not in cached_sdists):
+                    wheel_cache.cache(
+                        wheel_path=os.path.join(temp_dir, wheel), name=name,
+                        version=version, build_key=build_key)
 
         return [os.path.join(self._python_package_dir, wheel)
                 for wheel in wheels]
 
+    def _get_sdists(self) -> Set[Tuple[str, str]]:
+        sdists = set()  # type: Set[Tuple[str, str]]
+        for entry in os.listdir(self._python_package_dir):
+            for extension in _SDIST_EXTENSIONS:
+                if entry.endswith(extension):
+                    name, _, version = entry[:-len(extension)].rpartition('-')
+                    if name and version:
+                        sdists.add((cache.normalize_package_name(name),
+                                    version))
+                    break
+        return sdists
+
+    def _get_wheel_build_key(self) -> str:
+        # A built wheel depends on the interpreter it was built for, the
+        # architecture and the compiler related environment. The project
+        # directory is replaced so the same build in another checkout can
+        # reuse it.
+        env = self.env()
+        exported_env = dict(
+            e.split('=', 1) for e in snapcraft.internal.common.env
+            if '=' in e)
+        key = json.dumps({
+            'python': file_utils.calculate_hash(
+                os.path.realpath(self._python_command), algorithm='sha256'),
+            'arch': platform.machine(),
+            'env': {v: env.get(v, '') for v in _WHEEL_BUILD_ENVIRONMENT},
+            'exported-env': {v: exported_env.get(v, '')
+                             for v in _WHEEL_BUILD_ENVIRONMENT},
+        }, sort_keys=True).replace(os.getcwd(), '$SNAPCRAFT_PROJECT_DIR')
+        return hashlib.sha256(key.encode()).hexdigest()
+
     def list(self, *, user=False):
         """Determine which packages have been installed.
 
+        Packages are read from the metadata in the site directories of the
+        python in use, pip is only run if they cannot be found.
+
         :param boolean user: Whether or not to limit results to user base.
 
         :return: Dict of installed python packages and their versions
         :rtype: dict
         """
+        lib_dir = self._get_python_lib_dir()
+        if not lib_dir:
+            return self._list_with_pip(user=user)
+
+        # Where python's site module looks, including Debian's dist-packages,
+        # with the user site packages first.
+        version = os.path.basename(lib_dir)[len('python'):]
+        site_dirs = [os.path.join(
+            self._install_dir, 'lib', 'python' + version, 'site-packages')]
+        if user:
+            return _inventory.get_installed_packages([], site_dirs)
+
+        site_dirs.extend(os.path.join(self._python_home, d) for d in (
+            os.path.join('local', 'lib', 'python' + version, 'dist-packages'),
+            os.path.join('lib', 'python' + self._python_major_version,
+                         'dist-packages'),
+            os.path.join('lib', 'python' + version, 'dist-packages'),
+            os.path.join('lib', 'python' + version, 'site-packages')))
+        return _inventory.get_installed_packages([lib_dir], site_dirs)
+
+    def _get_python_lib_dir(self):
+        # The standard library of the python in use, named after its
+        # version.
+        name = os.path.basename(os.path.realpath(self._python_command))
+        if re.match(r'python\d+\.\d+$', name):
+            lib_dirs = [os.path.join(self._python_home, 'lib', name)]
+        else:
+            lib_dirs = sorted(glob.glob(os.path.join(
+                self._python_home, 'lib',
+                'python{}.*'.format(self._python_major_version))))
+        lib_dirs = [d for d in lib_dirs
+                    if os.path.isfile(os.path.join(d, 'os.py'))]
+        return lib_dirs[-1] if lib_dirs else None
+
+    def _list_with_pip(self, *, user):
         command = ['list']
         if user:
             command.append('--user')
@@ -419,6 +526,10 @@ class Pip:
         env = os.environ.copy()
         env['PYTHONUSERBASE'] = self._install_dir
         env['PYTHONHOME'] = self._python_home
+        # Downloads are kept in a cache shared across parts and projects, so
+        # cleaning a part does not mean fetching everything again.
+        env['PIP_CACHE_DIR'] = cache.PackageDownloadCache().get(
+            ecosystem='pip')
 
         env['PATH'] = '{}:{}'.format(
             os.path.join(self._install_dir, 'usr', 'bin'),
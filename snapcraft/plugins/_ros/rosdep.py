@@ -14,14 +14,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import hashlib
+import json
 import os
 import logging
 import re
 import shutil
 import subprocess
 import sys
+from typing import Dict, Iterable, Optional, Set  # noqa
 
 from snapcraft.internal import (
+    cache,
     errors,
     repo
 )
@@ -61,6 +66,11 @@ class Rosdep:
                                                  'sources.list.d')
         self._rosdep_cache_path = os.path.join(self._rosdep_path, 'cache')
 
+        # Resolutions only hold for the database they were resolved with,
+        # which setup() updates.
+        self._resolutions = dict()  # type: Dict[str, Dict[str, Set[str]]]
+        self._database_key = None  # type: Optional[str]
+
     def setup(self):
         # Make sure we can run multiple times without error, while leaving the
         # capability to re-initialize, by making sure we clear the sources.
@@ -99,16 +109,19 @@ class Rosdep:
             raise RuntimeError(
                 'Error updating rosdep database:\n{}'.format(output))
 
-    def get_dependencies(self, package_name=None):
-        """Obtain dependencies for a given package, or entire workspace.
+        self._resolutions.clear()
+        self._database_key = None
+
+    def get_dependencies(self, *package_names):
+        """Obtain dependencies for given packages, or entire workspace.
 
-        :param str package_name: Package name for which dependences will be
-                                 obtained. If not provided, will obtain
-                                 dependencies for the entire workspace.
+        :param str package_names: Package names for which dependences will be
+                                  obtained. If not provided, will obtain
+                                  dependencies for the entire workspace.
         """
         command = ['keys']
-        if package_name:
-            command.append(package_name)
+        if package_names:
+            command.extend(package_names)
         else:
             # Adding a few flags that will make rosdep search the entire
             # workspace:
@@ -125,50 +138,158 @@ class Rosdep:
             else:
                 return set()
         except subprocess.CalledProcessError:
+            if len(package_names) > 1:
+                # Find out which package is missing.
+                dependencies = set()  # type: Set[str]
+                for package_name in package_names:
+                    dependencies |= self.get_dependencies(package_name)
+                return dependencies
             raise FileNotFoundError(
-                'Unable to find Catkin package "{}"'.format(package_name))
+                'Unable to find Catkin package "{}"'.format(
+                    package_names[0] if package_names else None))
 
     def resolve_dependency(self, dependency_name):
+        """Resolve a dependency into system dependencies.
+
+        :param str dependency_name: the rosdep key to resolve.
+        :returns: a dict of dependency types to system dependencies.
+        :raises RosdepDependencyNotFoundError: if it cannot be resolved.
+        """
+        return self.resolve_dependencies([dependency_name])[dependency_name]
+
+    def resolve_dependencies(self, dependency_names: Iterable[str]
+                             ) -> Dict[str, Dict[str, Set[str]]]:
+        """Resolve dependencies into system dependencies.
+
+        Dependencies that were not resolved before with the same rosdep
+        database, by this or by any other part, are resolved with a single
+        rosdep run.
+
+        :param dependency_names: the rosdep keys to resolve.
+        :returns: a dict of rosdep keys to dicts of dependency types to system
+                  dependencies.
+        :raises RosdepDependencyNotFoundError: if one cannot be resolved.
+        """
+        dependency_names = sorted(set(dependency_names))
+        unresolved = [d for d in dependency_names
+                      if d not in self._resolutions]
+        if unresolved:
+            self._resolve(unresolved)
+
+        # Callers are free to modify what they get.
+        return {name: {key: set(value) for key, value in
+                       self._resolutions[name].items()}
+                for name in dependency_names}
+
+    def _resolve(self, dependency_names):
+        database_key = self._get_database_key()
+        rosdep_cache = cache.RosdepCache()
+        if database_key:
+            cached = rosdep_cache.get(database_key=database_key)
+            for name in dependency_names:
+                if name in cached:
+                    self._resolutions[name] = {
+                        key: set(value) for key, value in cached[name].items()}
+
+        resolutions = dict()  # type: Dict[str, Dict[str, Set[str]]]
+        unresolved = [d for d in dependency_names
+                      if d not in self._resolutions]
+        if len(unresolved) > 1:
+            resolutions.update(self._resolve_batch(unresolved))
+        # Dependencies missing from a batch are resolved on their own to tell
+        # why they cannot be.
+        for name in unresolved:
+            if name not in resolutions:
+                resolutions[name] = self._resolve_one(name)
+
+        self._resolutions.update(resolutions)
+        if database_key and resolutions:
+            rosdep_cache.cache(
+                database_key=database_key,
+                resolutions={name: {key: sorted(value) for key, value in
+                                    resolution.items()}
+                             for name, resolution in resolutions.items()})
+
+    def _resolve_one(self, dependency_name):
         try:
-            # rosdep needs three pieces of information here:
-            #
-            # 1) The dependency we're trying to lookup.
-            # 2) The rosdistro being used.
-            # 3) The version of Ubuntu being used, even if we're running on
-            #    something else.
-            output = self._run(['resolve', dependency_name, '--rosdistro',
-                                self._ros_distro, '--os',
-                                'ubuntu:{}'.format(self._ubuntu_distro)])
+            output = self._run(['resolve', dependency_name] +
+                               self._get_resolve_options())
         except subprocess.CalledProcessError:
             raise RosdepDependencyNotFoundError(dependency_name)
 
-        # The output of rosdep follows the pattern:
+        return _parse_resolution(dependency_name, output)
+
+    def _resolve_batch(self, dependency_names):
+        try:
+            output = self._run(['resolve'] + dependency_names +
+                               self._get_resolve_options())
+        except subprocess.CalledProcessError as e:
+            # rosdep carries on past the keys it cannot resolve and fails at
+            # the end, after having output the ones it could.
+            output = e.output.decode('utf8').strip()
+
+        # When resolving more than one key, each key's output is introduced
+        # with a header:
         #
+        #    #ROSDEP[key1]
         #    #apt
         #    package1
-        #    package2
-        #    #pip
-        #    pip-package1
-        #    pip-package2
+        #    #ROSDEP[key2]
+        #    ...
+        #
+        # Keys that cannot be resolved get no dependency types.
+        sections = dict()  # type: Dict[str, str]
+        name = None
+        for line in output.split('\n'):
+            match = _SECTION_PATTERN.match(line.strip())
+            if match:
+                name = match.group(1)
+                sections[name] = ''
+            elif name is not None:
+                sections[name] += line + '\n'
+
+        resolutions = dict()  # type: Dict[str, Dict[str, Set[str]]]
+        for name in dependency_names:
+            if sections.get(name, '').strip():
+                with contextlib.suppress(RosdepUnexpectedResultError):
+                    resolutions[name] = _parse_resolution(
+                        name, sections[name].strip())
+        return resolutions
+
+    def _get_resolve_options(self):
+        # rosdep needs three pieces of information here:
         #
-        # Split these out into a dict of dependency type -> dependencies.
-        delimiters = re.compile(r'\n|\s')
-        lines = delimiters.split(output)
-        dependencies = {}
-        dependency_set = None
-        for line in lines:
-            line = line.strip()
-            if line.startswith('#'):
-                key = line.strip('# ')
-                dependencies[key] = set()
-                dependency_set = dependencies[key]
-            elif line:
-                if dependency_set is None:
-                    raise RosdepUnexpectedResultError(dependency_name, output)
-                else:
-                    dependency_set.add(line)
-
-        return dependencies
+        # 1) The dependencies we're trying to lookup.
+        # 2) The rosdistro being used.
+        # 3) The version of Ubuntu being used, even if we're running on
+        #    something else.
+        return ['--rosdistro', self._ros_distro,
+                '--os', 'ubuntu:{}'.format(self._ubuntu_distro)]
+
+    def _get_database_key(self):
+        if self._database_key:
+            return self._database_key
+
+        # This is where `rosdep update` keeps the database it fetched.
+        sources_cache_path = os.path.join(
+            self._rosdep_cache_path, 'rosdep', 'sources.cache')
+        digest = hashlib.sha256(json.dumps(
+            [self._ros_distro, self._ubuntu_distro]).encode())
+        found = False
+        for root, directories, files in os.walk(sources_cache_path):
+            directories.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                digest.update(os.path.relpath(
+                    file_path, sources_cache_path).encode())
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(2 ** 20), b''):
+                        digest.update(chunk)
+                found = True
+
+        if found:
+            self._database_key = digest.hexdigest()
+        return self._database_key
 
     def _run(self, arguments):
         env = os.environ.copy()
@@ -194,3 +315,36 @@ class Rosdep:
 
         return subprocess.check_output(['rosdep'] + arguments,
                                        env=env).decode('utf8').strip()
+
+
+_SECTION_PATTERN = re.compile(r'^#ROSDEP\[(.+)\]$')
+
+
+def _parse_resolution(dependency_name, output):
+    # The output of rosdep follows the pattern:
+    #
+    #    #apt
+    #    package1
+    #    package2
+    #    #pip
+    #    pip-package1
+    #    pip-package2
+    #
+    # Split these out into a dict of dependency type -> dependencies.
+    delimiters = re.compile(r'\n|\s')
+    lines = delimiters.split(output)
+    dependencies = {}
+    dependency_set = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('#'):
+            key = line.strip('# ')
+            dependencies[key] = set()
+            dependency_set = dependencies[key]
+        elif line:
+            if dependency_set is None:
+                raise RosdepUnexpectedResultError(dependency_name, output)
+            else:
+                dependency_set.add(line)
+
+    return dependencies
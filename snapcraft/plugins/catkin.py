@@ -74,6 +74,7 @@ import re
 import shutil
 import subprocess
 import textwrap
+from typing import Dict, Optional  # noqa
 
 import snapcraft
 from snapcraft.plugins import _ros
@@ -786,85 +787,67 @@ class CatkinPlugin(snapcraft.BasePlugin):
 def _find_system_dependencies(catkin_packages, rosdep, catkin):
     """Find system dependencies for a given set of Catkin packages."""
 
-    resolved_dependencies = {}
-    dependencies = set()
-
     logger.info('Determining system dependencies for Catkin packages...')
-    if catkin_packages is not None:
-        for package in catkin_packages:
-            # Query rosdep for the list of dependencies for this package
-            dependencies |= rosdep.get_dependencies(package)
-    else:
+    dependencies = _get_package_dependencies(catkin_packages, rosdep)
+
+    if catkin and dependencies:
+        dependencies = _remove_underlay_dependencies(dependencies, catkin)
+
+    # In this situation, the packages depend on something that we weren't
+    # instructed to build. It's probably a system dependency, but the
+    # developer could have also forgotten to tell us to build it.
+    try:
+        resolved_dependencies = rosdep.resolve_dependencies(dependencies)
+    except _ros.rosdep.RosdepDependencyNotFoundError as e:
+        raise CatkinInvalidSystemDependencyError(e.dependency)
+
+    # Finally, return that dict of dependencies
+    return _flatten_dependencies(resolved_dependencies)
+
+
+def _get_package_dependencies(catkin_packages, rosdep):
+    if catkin_packages is None:
         # Rather than getting dependencies for an explicit list of packages,
         # let's get the dependencies for the entire workspace.
-        dependencies |= rosdep.get_dependencies()
+        return rosdep.get_dependencies()
+
+    # Query rosdep for the list of dependencies for these packages
+    if catkin_packages:
+        dependencies = rosdep.get_dependencies(*sorted(catkin_packages))
+    else:
+        dependencies = set()
+    # No need to resolve dependencies we know are local
+    return dependencies - set(catkin_packages)
+
+
+def _remove_underlay_dependencies(dependencies, catkin):
+    # Before trying to resolve these dependencies into system
+    # dependencies, see if they're already in the underlay.
+    in_underlay = catkin.find_packages(dependencies)
+    for dependency in sorted(in_underlay):
+        # Package was found-- don't pull anything extra to satisfy
+        # this dependency.
+        logger.debug(
+            'Satisfied dependency {!r} in underlay'.format(dependency))
+    return dependencies - set(in_underlay)
 
-    for dependency in dependencies:
-        _resolve_package_dependencies(
-            catkin_packages, dependency, catkin, rosdep,
-            resolved_dependencies)
 
+def _flatten_dependencies(resolved_dependencies):
     # We currently have nested dict structure of:
     #    dependency name -> package type -> package names
     #
     # We want to return a flattened dict of package type -> package names.
     flattened_dependencies = {}
-    for dependency_types in resolved_dependencies.values():
+    for dependency, dependency_types in sorted(resolved_dependencies.items()):
         for key, value in dependency_types.items():
+            if key not in _SUPPORTED_DEPENDENCY_TYPES:
+                raise CatkinUnsupportedDependencyTypeError(key, dependency)
             if key not in flattened_dependencies:
                 flattened_dependencies[key] = set()
             flattened_dependencies[key] |= value
-
-    # Finally, return that dict of dependencies
     return flattened_dependencies
 
 
-def _resolve_package_dependencies(catkin_packages, dependency, catkin, rosdep,
-                                  resolved_dependencies):
-    # No need to resolve this dependency if we know it's local, or if
-    # we've already resolved it into a system dependency
-    if (dependency in resolved_dependencies or
-            (catkin_packages and dependency in catkin_packages)):
-        return
-
-    if _dependency_is_in_underlay(catkin, dependency):
-        # Package was found-- don't pull anything extra to satisfy
-        # this dependency.
-        logger.debug(
-            'Satisfied dependency {!r} in underlay'.format(
-                dependency))
-        return
-
-    # In this situation, the package depends on something that we
-    # weren't instructed to build. It's probably a system dependency,
-    # but the developer could have also forgotten to tell us to build
-    # it.
-    try:
-        these_dependencies = rosdep.resolve_dependency(dependency)
-    except _ros.rosdep.RosdepDependencyNotFoundError:
-        raise CatkinInvalidSystemDependencyError(dependency)
-
-    for key, value in these_dependencies.items():
-        if key not in _SUPPORTED_DEPENDENCY_TYPES:
-            raise CatkinUnsupportedDependencyTypeError(key, dependency)
-
-        resolved_dependencies[dependency] = {key: value}
-
-
-def _dependency_is_in_underlay(catkin, dependency):
-    if catkin:
-        # Before trying to resolve this dependency into a system
-        # dependency, see if it's already in the underlay.
-        try:
-            catkin.find(dependency)
-        except CatkinPackageNotFoundError:
-            # No package by that name is available
-            pass
-        else:
-            return True
-    return False
-
-
 def _handle_rosinstall_files(wstool, rosinstall_files):
     """Merge given rosinstall files into our workspace."""
 
@@ -1001,7 +984,12 @@ class _Catkin:
         self._project = project
         self._catkin_install_path = os.path.join(self._catkin_path, 'install')
 
+        # Maps package names to where they were found in the workspaces, or
+        # to None if they were not.
+        self._package_index = dict()  # type: Dict[str, Optional[str]]
+
     def setup(self):
+        self._package_index.clear()
         os.makedirs(self._catkin_install_path, exist_ok=True)
 
         # With the introduction of an underlay, we no longer know where Catkin
@@ -1016,12 +1004,65 @@ class _Catkin:
         ubuntu.unpack(self._catkin_install_path)
 
     def find(self, package_name):
+        path = self._package_index.get(package_name)
+        if path:
+            return path
+        elif package_name in self._package_index:
+            raise CatkinPackageNotFoundError(package_name)
+
         try:
-            return self._run(['--first-only', package_name]).strip()
+            path = self._run(['catkin_find', '--first-only', package_name])
         except subprocess.CalledProcessError:
+            self._package_index[package_name] = None
             raise CatkinPackageNotFoundError(package_name)
+        self._package_index[package_name] = path
+        return path
 
-    def _run(self, arguments):
+    def find_packages(self, package_names):
+        """Find which of the given packages are in the workspaces.
+
+        The workspaces are searched for every package not looked up before
+        with a single interpreter, rather than with a catkin_find run each.
+
+        :param package_names: names of the packages to look up.
+        :returns: a dict of the names found to where they were found.
+        """
+        unknown = sorted(n for n in set(package_names)
+                         if n not in self._package_index)
+        if len(unknown) > 1:
+            try:
+                output = self._run(
+                    [self._get_python(), '-c', _FIND_PACKAGES_SCRIPT] +
+                    unknown, stderr=subprocess.DEVNULL)
+            except subprocess.CalledProcessError:
+                logger.debug('Unable to look up packages in one go')
+            else:
+                for package_name in unknown:
+                    self._package_index[package_name] = None
+                for line in output.splitlines():
+                    package_name, _, path = line.partition('\t')
+                    if package_name in self._package_index:
+                        self._package_index[package_name] = path
+
+        found = dict()
+        for package_name in set(package_names):
+            with contextlib.suppress(CatkinPackageNotFoundError):
+                found[package_name] = self.find(package_name)
+        return found
+
+    def _get_python(self):
+        # Use whichever python catkin_find itself runs with.
+        catkin_find_path = os.path.join(
+            self._catkin_install_path, 'opt', 'ros', self._ros_distro, 'bin',
+            'catkin_find')
+        with contextlib.suppress(OSError, UnicodeDecodeError):
+            with open(catkin_find_path) as f:
+                shebang = f.readline()
+            if shebang.startswith('#!'):
+                return shebang[2:].strip()
+        return 'python'
+
+    def _run(self, command, *, stderr=subprocess.STDOUT):
         with tempfile.NamedTemporaryFile(mode='w+') as f:
             lines = ['export PYTHONPATH={}'.format(os.path.join(
                 self._catkin_install_path, 'usr', 'lib', 'python2.7',
@@ -1048,8 +1089,31 @@ class _Catkin:
             f.write('\n'.join(lines))
             f.flush()
             return subprocess.check_output(
-                ['/bin/bash', f.name, 'catkin_find'] + arguments,
-                stderr=subprocess.STDOUT).decode('utf8').strip()
+                ['/bin/bash', f.name] + command,
+                stderr=stderr).decode('utf8').strip()
+
+
+# Looks up each package named in its arguments like `catkin_find
+# --first-only` does, sharing what is learned about the workspaces between
+# lookups, and outputs a "name<TAB>path" line for those found. This runs
+# with catkin's python, which may be python 2.
+_FIND_PACKAGES_SCRIPT = textwrap.dedent("""\
+    import sys
+    from catkin.find_in_workspaces import find_in_workspaces
+    from catkin.workspace import get_workspaces
+
+    workspaces = get_workspaces()
+    workspace_to_source_spaces = {}
+    source_path_to_packages = {}
+    for package_name in sys.argv[1:]:
+        paths = find_in_workspaces(
+            project=package_name, _workspaces=workspaces,
+            first_matching_workspace_only=True, first_match_only=True,
+            workspace_to_source_spaces=workspace_to_source_spaces,
+            source_path_to_packages=source_path_to_packages)
+        if paths:
+            sys.stdout.write('{0}\\t{1}\\n'.format(package_name, paths[0]))
+""")
 
 
 def _get_highest_version_path(path):
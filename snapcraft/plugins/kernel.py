@@ -56,6 +56,7 @@ The following kernel specific options are provided by this plugin:
       list of device trees to build, the format is <device-tree-name>.dts.
 """
 
+import functools
 import glob
 import logging
 import os
@@ -64,13 +65,14 @@ import subprocess
 import tempfile
 
 import snapcraft
-from snapcraft.plugins import kbuild
+from snapcraft.internal import cache
+from snapcraft.plugins import _kernel, kbuild
 
 logger = logging.getLogger(__name__)
 
 
-_compression_command = {
-    'gz': 'gzip',
+_compressors = {
+    'gz': _kernel.ParallelGzipWriter,
 }
 
 default_kernel_image_target = {
@@ -171,10 +173,6 @@ class KernelPlugin(kbuild.KBuildPlugin):
             'kernel-initrd-modules', 'kernel-initrd-firmware',
             'kernel-device-trees', 'kernel-initrd-compression']
 
-    @property
-    def compression_cmd(self):
-        return _compression_command[self.options.kernel_initrd_compression]
-
     def __init__(self, name, options, project):
         super().__init__(name, options, project)
 
@@ -235,7 +233,6 @@ class KernelPlugin(kbuild.KBuildPlugin):
         initrd_unpacked_path = os.path.join(self.builddir, 'initrd-staging')
         if os.path.exists(initrd_unpacked_path):
             shutil.rmtree(initrd_unpacked_path)
-        os.makedirs(initrd_unpacked_path)
 
         with tempfile.TemporaryDirectory() as temp_dir:
             unsquashfs_path = snapcraft.file_utils.get_tool_path('unsquashfs')
@@ -246,53 +243,60 @@ class KernelPlugin(kbuild.KBuildPlugin):
             tmp_initrd_path = os.path.join(
                 temp_dir, 'squashfs-root', initrd_path)
 
-            decompressed = False
-            # Roll over valid decompression mecanisms until one works
-            for decompressor in ('xz', 'gzip'):
-                try:
-                    subprocess.check_call(
-                        'cat {0} | {1} -dc | cpio -i'.format(
-                            tmp_initrd_path, decompressor),
-                        shell=True, cwd=initrd_unpacked_path)
-                except subprocess.CalledProcessError:
-                    pass
-                else:
-                    decompressed = True
-                    break
-
-            if not decompressed:
-                raise RuntimeError('The initrd file type is unsupported')
+            # The generic initrd only changes with the core snap, it is
+            # unpacked once per core revision.
+            digest = snapcraft.file_utils.calculate_hash(
+                tmp_initrd_path, algorithm='sha256')
+            with cache.InitrdCache().use(
+                    digest=digest, populate=functools.partial(
+                        _kernel.extract_initrd,
+                        tmp_initrd_path)) as cached_path:
+                # The staging tree is only added to, so it can share the
+                # cached files.
+                snapcraft.file_utils.link_or_copy_tree(
+                    cached_path, initrd_unpacked_path)
 
         return initrd_unpacked_path
 
-    def _make_initrd(self):
-
-        logger.info('Generating driver initrd for kernel release: {}'.format(
-            self.kernel_release))
-
-        initrd_unpacked_path = self._unpack_generic_initrd()
-
-        modprobe_outs = []
+    def _get_initrd_module_paths(self):
+        modules_path = os.path.join(
+            self.installdir, 'lib', 'modules', self.kernel_release)
+        module_paths, unresolved = _kernel.resolve_modules(
+            modules_path, self.options.kernel_initrd_modules)
+        module_paths = set(os.path.join(modules_path, p)
+                           for p in module_paths)
 
         # modprobe is typically in /sbin, which may not always be available on
         # the PATH. Add it for this call.
         env = os.environ.copy()
         env['PATH'] += ':/sbin'
-        for module in self.options.kernel_initrd_modules:
+        # Only what modules.dep does not resolve needs modprobe.
+        for module in unresolved:
             modprobe_out = self.run_output([
                 'modprobe', '-n', '--show-depends', '-d', self.installdir,
                 '-S', self.kernel_release, module], env=env)
-            modprobe_outs.extend(modprobe_out.split(os.linesep))
+            module_paths.update(
+                line.split()[1] for line in modprobe_out.split(os.linesep)
+                if line.startswith('insmod '))
+
+        return module_paths
+
+    def _make_initrd(self):
+
+        logger.info('Generating driver initrd for kernel release: {}'.format(
+            self.kernel_release))
+
+        initrd_unpacked_path = self._unpack_generic_initrd()
 
-        modprobe_outs = [_ for _ in modprobe_outs if _]
+        module_paths = self._get_initrd_module_paths()
         modules_path = os.path.join('lib', 'modules', self.kernel_release)
-        for src in set(_.split()[1] for _ in modprobe_outs):
+        for src in module_paths:
             dst = os.path.join(initrd_unpacked_path,
                                os.path.relpath(src, self.installdir))
             os.makedirs(os.path.dirname(dst), exist_ok=True)
             os.link(src, dst)
 
-        if modprobe_outs:
+        if module_paths:
             for module_info in ['modules.dep', 'modules.dep.bin']:
                 module_info_path = os.path.join(modules_path, module_info)
                 src = os.path.join(self.installdir, module_info_path)
@@ -311,10 +315,10 @@ class KernelPlugin(kbuild.KBuildPlugin):
 
         initrd = 'initrd-{}.img'.format(self.kernel_release)
         initrd_path = os.path.join(self.installdir, initrd)
-        subprocess.check_call(
-            'find . | cpio --create --format=newc | '
-            '{} > {}'.format(self.compression_cmd, initrd_path), shell=True,
-            cwd=initrd_unpacked_path)
+        compressor = _compressors[self.options.kernel_initrd_compression]
+        with open(initrd_path, 'wb') as initrd_file:
+            with compressor(initrd_file) as compressed_file:
+                _kernel.write_archive(initrd_unpacked_path, compressed_file)
         unversioned_initrd_path = os.path.join(self.installdir, 'initrd.img')
         os.link(initrd_path, unversioned_initrd_path)
 
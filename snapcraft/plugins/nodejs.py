@@ -55,8 +55,8 @@ import sys
 
 import snapcraft
 from snapcraft import sources
-from snapcraft.file_utils import link_or_copy_tree
-from snapcraft.internal import errors
+from snapcraft.file_utils import link_or_copy, link_or_copy_tree
+from snapcraft.internal import cache, errors
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +70,8 @@ _NODEJS_ARCHES = {
     'arm64': 'arm64',
 }
 _YARN_URL = 'https://yarnpkg.com/latest.tar.gz'
+# yarn is always fetched from its latest release, refresh it daily.
+_YARN_MAX_AGE = 24 * 60 * 60
 
 
 class NodePlugin(snapcraft.BasePlugin):
@@ -159,15 +161,28 @@ class NodePlugin(snapcraft.BasePlugin):
     def pull(self):
         super().pull()
         os.makedirs(self._npm_dir, exist_ok=True)
-        self._nodejs_tar.download()
+        self._fetch_tarball(self._nodejs_release_uri, tool='nodejs',
+                            version=self.options.node_engine)
         if self.options.node_package_manager == 'yarn':
-            self._yarn_tar.download()
+            self._fetch_tarball(_YARN_URL, tool='yarn', version=None,
+                                max_age=_YARN_MAX_AGE)
         # do the install in the pull phase to download all dependencies.
         if self.options.node_package_manager == 'npm':
             self._npm_install(rootdir=self.sourcedir)
         else:
             self._yarn_install(rootdir=self.sourcedir)
 
+    def _fetch_tarball(self, url, *, tool, version, max_age=None):
+        # The tarballs are shared by every part through the toolchain cache,
+        # only a link to them is kept in the part.
+        cached_dir = cache.ToolchainCache().cache(
+            tool=tool, version=version, arch=self.project.deb_arch,
+            max_age=max_age,
+            populate=lambda path: sources.Tar(url, path).download())
+        tarball_name = os.path.basename(url)
+        link_or_copy(os.path.join(cached_dir, tarball_name),
+                     os.path.join(self._npm_dir, tarball_name))
+
     def clean_pull(self):
         super().clean_pull()
 
@@ -200,13 +215,14 @@ class NodePlugin(snapcraft.BasePlugin):
             self.installdir, clean_target=False, keep_tarball=True)
         npm_cmd = ['npm'] + self.options.npm_flags
         npm_install = npm_cmd + ['--cache-min=Infinity', 'install']
+        env = self._build_environment(rootdir)
         for pkg in self.options.node_packages:
-            self.run(npm_install + ['--global'] + [pkg], cwd=rootdir)
+            self.run(npm_install + ['--global'] + [pkg], cwd=rootdir, env=env)
         if os.path.exists(os.path.join(rootdir, 'package.json')):
-            self.run(npm_install, cwd=rootdir)
-            self.run(npm_install + ['--global'], cwd=rootdir)
+            self.run(npm_install, cwd=rootdir, env=env)
+            self.run(npm_install + ['--global'], cwd=rootdir, env=env)
         for target in self.options.npm_run:
-            self.run(npm_cmd + ['run', target], cwd=rootdir)
+            self.run(npm_cmd + ['run', target], cwd=rootdir, env=env)
         return self._get_installed_node_packages('npm', self.installdir)
 
     def _yarn_install(self, rootdir):
@@ -220,6 +236,7 @@ class NodePlugin(snapcraft.BasePlugin):
             yarn_cmd.extend(['--proxy', os.environ['http_proxy']])
         if 'https_proxy' in os.environ:
             yarn_cmd.extend(['--https-proxy', os.environ['https_proxy']])
+        env = self._build_environment(rootdir)
         flags = []
         if rootdir == self.builddir:
             yarn_add = yarn_cmd + ['global', 'add']
@@ -231,7 +248,7 @@ class NodePlugin(snapcraft.BasePlugin):
         else:
             yarn_add = yarn_cmd + ['add']
         for pkg in self.options.node_packages:
-            self.run(yarn_add + [pkg] + flags, cwd=rootdir)
+            self.run(yarn_add + [pkg] + flags, cwd=rootdir, env=env)
 
         # local packages need to be added as if they were remote, we
         # remove the local package.json so `yarn add` doesn't pollute it.
@@ -241,7 +258,7 @@ class NodePlugin(snapcraft.BasePlugin):
             shutil.copy(self._source_package_json,
                         os.path.join(rootdir, 'package.json'))
             self.run(yarn_add + ['file:{}'.format(rootdir)] + flags,
-                     cwd=rootdir)
+                     cwd=rootdir, env=env)
 
         # npm run would require to bring back package.json
         if self.options.npm_run and os.path.exists(self._source_package_json):
@@ -251,8 +268,7 @@ class NodePlugin(snapcraft.BasePlugin):
             os.link(self._source_package_json,
                     os.path.join(rootdir, 'package.json'))
         for target in self.options.npm_run:
-            self.run(yarn_cmd + ['run', target], cwd=rootdir,
-                     env=self._build_environment(rootdir))
+            self.run(yarn_cmd + ['run', target], cwd=rootdir, env=env)
         return self._get_installed_node_packages('npm', self.installdir)
 
     def _get_installed_node_packages(self, package_manager, cwd):
@@ -283,6 +299,11 @@ class NodePlugin(snapcraft.BasePlugin):
 
     def _build_environment(self, rootdir):
         env = os.environ.copy()
+        # Packages fetched by npm and yarn are shared across parts and
+        # projects.
+        package_cache = cache.PackageDownloadCache()
+        env['npm_config_cache'] = package_cache.get(ecosystem='npm')
+        env['YARN_CACHE_FOLDER'] = package_cache.get(ecosystem='yarn')
         if rootdir.endswith('src'):
             hidden_path = os.path.join(rootdir, 'node_modules', '.bin')
             if env.get('PATH'):
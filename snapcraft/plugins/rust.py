@@ -38,15 +38,18 @@ Additionally, this plugin uses the following plugin-specific keywords:
 
 import collections
 import os
+import platform
 import shutil
 from contextlib import suppress
 
 import snapcraft
 from snapcraft import sources
 from snapcraft import shell_utils
-from snapcraft.internal import errors
+from snapcraft.internal import cache, errors
 
 _RUSTUP = 'https://static.rust-lang.org/rustup.sh'
+# Toolchains that are not pinned to a revision are refreshed daily.
+_UNPINNED_TOOLCHAIN_MAX_AGE = 24 * 60 * 60
 
 
 class RustPlugin(snapcraft.BasePlugin):
@@ -109,8 +112,9 @@ class RustPlugin(snapcraft.BasePlugin):
         if self.options.rust_features:
             cmd.append("--features")
             cmd.append(' '.join(self.options.rust_features))
-        self.run(cmd, env=self._build_env())
-        self._record_manifest()
+        with self._use_rust():
+            self.run(cmd, env=self._build_env())
+            self._record_manifest()
 
     def _write_cross_compile_config(self):
         if not self.project.is_cross_compiling:
@@ -164,7 +168,11 @@ class RustPlugin(snapcraft.BasePlugin):
         env.update({"RUSTC": self._rustc,
                     "RUSTDOC": self._rustdoc,
                     "RUST_PATH": self._rustlib,
-                    'RUSTFLAGS': self._rustflags()})
+                    'RUSTFLAGS': self._rustflags(),
+                    # Crates fetched by cargo are shared across parts and
+                    # projects.
+                    'CARGO_HOME': cache.PackageDownloadCache().get(
+                        ecosystem='cargo')})
         return env
 
     def _rustflags(self):
@@ -177,12 +185,17 @@ class RustPlugin(snapcraft.BasePlugin):
 
     def pull(self):
         super().pull()
-        self._fetch_rust()
-        self._fetch_deps()
+        cache.ToolchainCache().link(
+            path=self._rustpath, **self._get_toolchain_args())
+        with self._use_rust():
+            self._fetch_deps()
 
     def clean_pull(self):
         super().clean_pull()
 
+        # The toolchain itself lives in the shared toolchain cache.
+        if os.path.islink(self._rustpath):
+            os.unlink(self._rustpath)
         with suppress(FileNotFoundError):
             shutil.rmtree(self._rustpath)
 
@@ -192,7 +205,7 @@ class RustPlugin(snapcraft.BasePlugin):
         with suppress(FileNotFoundError):
             shutil.rmtree(self._cargo_dir)
 
-    def _fetch_rust(self):
+    def _get_toolchain_args(self):
         options = []
 
         if self.options.rust_revision:
@@ -206,7 +219,30 @@ class RustPlugin(snapcraft.BasePlugin):
                 raise errors.SnapcraftEnvironmentError(
                     '{} is not a valid rust channel'.format(
                         self.options.rust_channel))
-        os.makedirs(self._rustpath, exist_ok=True)
+
+        # The toolchain runs on the host, only the standard library for the
+        # target changes when cross-compiling.
+        arch = platform.machine()
+        if self.project.is_cross_compiling:
+            arch = '{}:{}'.format(arch, self._target)
+
+        max_age = None
+        if not self.options.rust_revision:
+            max_age = _UNPINNED_TOOLCHAIN_MAX_AGE
+
+        return dict(
+            tool='rust', version=self.options.rust_revision or None,
+            arch=arch, channel=self.options.rust_channel or None,
+            max_age=max_age, populate=lambda path: self._install_rust(options))
+
+    def _use_rust(self):
+        # The toolchain is linked from the shared cache at pull time, this
+        # keeps it from being pruned while it is used and links it again if
+        # it already was.
+        return cache.ToolchainCache().use(
+            path=self._rustpath, **self._get_toolchain_args())
+
+    def _install_rust(self, options):
         self._rustup_get.download()
         cmd = [self._rustup,
                '--prefix={}'.format(self._rustpath),
@@ -224,4 +260,5 @@ class RustPlugin(snapcraft.BasePlugin):
 
         self.run([self._cargo, 'fetch',
                   '--manifest-path',
-                  os.path.join(sourcedir, 'Cargo.toml')])
+                  os.path.join(sourcedir, 'Cargo.toml')],
+                 env=self._build_env())
@@ -6,6 +6,7 @@ from requests.packages.urllib3.util.retry import Retry
 import urllib.parse
 import os
 
+from snapcraft.internal import tracing
 from . import _agent
 from . import errors
 
@@ -41,6 +42,8 @@ class Client():
         self._snapcraft_headers = {
             'User-Agent': _agent.get_user_agent(),
         }
+        # For when the session is used on its own, e.g. for downloads.
+        self.session.headers.update(self._snapcraft_headers)
 
     def request(self, method, url, params=None, headers=None, **kwargs):
         """Send a request to url relative to the root url.
@@ -62,9 +65,11 @@ class Client():
 
         final_url = urllib.parse.urljoin(self.root_url, url)
         try:
-            response = self.session.request(
-                method, final_url, headers=headers,
-                params=params, **kwargs)
+            with tracing.span('store-request', category='store',
+                              method=method, url=final_url):
+                response = self.session.request(
+                    method, final_url, headers=headers,
+                    params=params, **kwargs)
         except (ConnectionError, RetryError) as e:
             raise errors.StoreNetworkError(e) from e
 
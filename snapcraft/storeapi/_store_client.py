@@ -9,7 +9,11 @@ import requests
 
 import snapcraft
 from snapcraft import config
-from snapcraft.internal.indicators import download_requests_stream
+from snapcraft.internal.indicators import (
+    download_requests_stream,
+    download_segmented,
+    probe_segmented_download,
+)
 
 from . import logger
 from . import _upload
@@ -229,6 +233,24 @@ class StoreClient():
             return
         logger.info('Downloading {}'.format(name))
 
+        size, validator = probe_segmented_download(download_url)
+        if size:
+            # The session is used directly, segments only retry on the
+            # network errors of requests, which the client turns into
+            # StoreNetworkError.
+            digests = download_segmented(
+                download_url, download_path, size=size, validator=validator,
+                session=self.cpi.session, algorithms=['sha512'])
+        else:
+            digests = self._download_snap_stream(download_url, download_path)
+
+        if digests['sha512'] == expected_sha512:
+            logger.info('Successfully downloaded {} at {}'.format(
+                name, download_path))
+        else:
+            raise errors.SHAMismatchError(download_path, expected_sha512)
+
+    def _download_snap_stream(self, download_url, download_path):
         # we only resume when redirected to our CDN since we use internap's
         # special sauce.
         resume_possible = False
@@ -255,8 +277,11 @@ class StoreClient():
                 logger.debug('Redirections for {!r}: {}'.format(
                     download_url, ', '.join(redirections)))
             try:
-                download_requests_stream(request, download_path,
-                                         total_read=total_read)
+                # The digest is calculated while downloading, saving a
+                # read of the whole snap to verify it.
+                digests = download_requests_stream(
+                    request, download_path, total_read=total_read,
+                    algorithms=['sha512'])
                 not_downloaded = False
             except requests.exceptions.ChunkedEncodingError as e:
                 logger.debug('Error while downloading: {!r}. '
@@ -266,12 +291,7 @@ class StoreClient():
                 if not retry_count:
                     raise e
                 sleep(1)
-
-        if self._is_downloaded(download_path, expected_sha512):
-            logger.info('Successfully downloaded {} at {}'.format(
-                name, download_path))
-        else:
-            raise errors.SHAMismatchError(download_path, expected_sha512)
+        return digests
 
     def _is_downloaded(self, path, expected_sha512):
         if not os.path.exists(path):
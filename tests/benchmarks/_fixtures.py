@@ -0,0 +1,142 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Generate the synthetic trees and files benchmarks run on.
+
+Everything generated only depends on the arguments given, so that
+benchmarks run on the same fixtures from one run to the next.
+"""
+
+import os
+import random
+import shutil
+import tarfile
+
+_FILES_PER_DIR = 50
+
+# A usr/ tree looking like the result of unpacking stage-packages.
+_TOP_DIRS = ['usr/bin', 'usr/include', 'usr/lib', 'usr/share/doc',
+             'usr/share/man', 'usr/share/locale']
+_EXTENSIONS = ['.so', '.a', '.la', '.h', '.txt', '']
+
+
+def make_contents(size, seed=0):
+    """Return size bytes of incompressible contents, the same for a seed."""
+    if not size:
+        return b''
+    return random.Random(seed).getrandbits(size * 8).to_bytes(size, 'little')
+
+
+def make_install_tree(root, files, *, contents=b''):
+    """Create a tree of at least files files in root, all with contents.
+
+    :returns: the paths of the files created, relative to root.
+    """
+    paths = []
+    package = 0
+    while len(paths) < files:
+        for top_dir in _TOP_DIRS:
+            directory = os.path.join(top_dir, 'pkg{}'.format(package))
+            os.makedirs(os.path.join(root, directory))
+            for i in range(_FILES_PER_DIR):
+                path = os.path.join(directory, 'file{}{}'.format(
+                    i, _EXTENSIONS[i % len(_EXTENSIONS)]))
+                with open(os.path.join(root, path), 'wb') as f:
+                    f.write(contents)
+                paths.append(path)
+        package += 1
+    return paths
+
+
+def make_elf_files(root, files):
+    """Create files ELF files in root, along with as many other files.
+
+    The ELF files are copies of a dynamically linked executable from the
+    host, the other files are shell scripts.
+
+    :returns: the paths of the files created, relative to root.
+    """
+    executable = os.path.realpath(shutil.which('true'))
+    paths = []
+    for i in range(files):
+        directory = os.path.join('usr', 'bin', 'pkg{}'.format(
+            i // _FILES_PER_DIR))
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+        elf_path = os.path.join(directory, 'binary{}'.format(i))
+        shutil.copyfile(executable, os.path.join(root, elf_path))
+        script_path = os.path.join(directory, 'script{}'.format(i))
+        with open(os.path.join(root, script_path), 'w') as f:
+            f.write('#!/bin/sh\nexec binary{} "$@"\n'.format(i))
+        paths.extend([elf_path, script_path])
+    return paths
+
+
+def make_text_files(root, files, *, prefix='/usr'):
+    """Create files pkg-config files in root which refer to prefix.
+
+    :returns: the paths of the files created, relative to root.
+    """
+    paths = []
+    for i in range(files):
+        directory = os.path.join('lib', 'pkgconfig{}'.format(
+            i // _FILES_PER_DIR))
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+        path = os.path.join(directory, 'lib{}.pc'.format(i))
+        with open(os.path.join(root, path), 'w') as f:
+            f.write('prefix={prefix}\n'
+                    'libdir=${{prefix}}/lib\n'
+                    'includedir=${{prefix}}/include\n\n'
+                    'Name: lib{i}\n'
+                    'Version: 1.0\n'
+                    'Libs: -L${{libdir}} -l{i}\n'
+                    'Cflags: -I${{includedir}}\n'.format(prefix=prefix, i=i))
+        paths.append(path)
+    return paths
+
+
+def make_snapcraft_yaml(path, parts):
+    """Write a snapcraft.yaml with parts nil parts, each after the previous.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('name: benchmark\n'
+                'version: "1.0"\n'
+                'summary: benchmark\n'
+                'description: A snap to benchmark snapcraft with.\n'
+                'grade: devel\n'
+                'confinement: strict\n'
+                'parts:\n')
+        for i in range(parts):
+            f.write('  part{}:\n'
+                    '    plugin: nil\n'
+                    '    stage-packages: [package{}]\n'
+                    '    stage: ["*", "-usr/share/doc"]\n'.format(i, i))
+            if i:
+                f.write('    after: [part{}]\n'.format(i - 1))
+
+
+def make_tarball(path, files, file_size):
+    """Write a gzipped tarball of files files of file_size bytes each.
+
+    All files are in a single top-level directory, as in release tarballs.
+    """
+    contents = make_contents(file_size)
+    tree = path + '.tree'
+    make_install_tree(os.path.join(tree, 'project-1.0'), files,
+                      contents=contents)
+    with tarfile.open(path, 'w:gz') as tar:
+        tar.add(os.path.join(tree, 'project-1.0'), arcname='project-1.0')
+    shutil.rmtree(tree)
@@ -0,0 +1,85 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure download throughput against a local HTTP server.
+
+Run with:
+
+    python3 -m tests.benchmarks.download [<size in MiB>]
+"""
+
+import http.server
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from snapcraft.internal import indicators
+
+_CHUNK = os.urandom(1024 * 1024)
+
+
+class _PayloadRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    size = 0
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(self.size))
+        self.end_headers()
+        for _ in range(self.size // len(_CHUNK)):
+            self.wfile.write(_CHUNK)
+
+    def log_message(self, *args):
+        pass
+
+
+def _benchmark(url, destination, algorithms):
+    # Downloads append to existing files.
+    if os.path.exists(destination):
+        os.remove(destination)
+    start = time.monotonic()
+    request = requests.get(url, stream=True)
+    request.raise_for_status()
+    indicators.download_requests_stream(
+        request, destination, algorithms=algorithms)
+    return os.path.getsize(destination) / (time.monotonic() - start)
+
+
+def main(size_mib=256):
+    _PayloadRequestHandler.size = size_mib * len(_CHUNK)
+    server = http.server.HTTPServer(('127.0.0.1', 0), _PayloadRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+    url = 'http://{}:{}/payload'.format(*server.server_address)
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            destination = os.path.join(temp_dir, 'payload')
+            for algorithms in ([], ['sha512'], ['sha512', 'sha3_384']):
+                rate = _benchmark(url, destination, algorithms)
+                print('{:<20} {:8.1f} MB/s'.format(
+                    ', '.join(algorithms) or 'no digests', rate / 10 ** 6))
+    finally:
+        server.shutdown()
+        server.server_close()
+        server_thread.join()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,67 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure fileset resolution on a large install tree.
+
+Run with:
+
+    python3 -m tests.benchmarks.fileset [<number of files>]
+"""
+
+import sys
+import tempfile
+import time
+
+# pluginhandler cannot be the first of snapcraft's modules to be imported.
+from snapcraft.internal import lifecycle  # noqa: F401
+from snapcraft.internal.pluginhandler import _fileset
+from tests.benchmarks import _fixtures
+
+_FILESETS = [
+    ['*'],
+    ['*', '-usr/share/doc', '-usr/share/man', '-usr/include'],
+    ['usr/lib', 'usr/bin', '-**/*.a', '-**/*.la'],
+    ['*'] + ['-usr/lib/pkg{}'.format(i) for i in range(100)],
+]
+
+
+def main(files=500000):
+    with tempfile.TemporaryDirectory() as root:
+        start = time.monotonic()
+        _fixtures.make_install_tree(root, files)
+        print('Created {} files in {:.1f}s'.format(
+            files, time.monotonic() - start))
+
+        # Let the tree age past the window in which results are not cached.
+        time.sleep(0.2)
+        for fileset in _FILESETS:
+            includes = [f for f in fileset if not f.startswith('-')]
+            excludes = [f[1:] for f in fileset if f.startswith('-')]
+            timings = []
+            for _ in range(2):
+                start = time.monotonic()
+                snap_files, snap_dirs = _fileset.resolve(
+                    includes, excludes, root)
+                timings.append(time.monotonic() - start)
+            description = ' '.join(fileset)
+            if len(description) > 40:
+                description = description[:37] + '...'
+            print('{:<40} {:>7} files {:6.2f}s, cached {:6.2f}s'.format(
+                description, len(snap_files), *timings))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
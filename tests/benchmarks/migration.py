@@ -0,0 +1,55 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure migrating a large install tree into stage.
+
+Run with:
+
+    python3 -m tests.benchmarks.migration [<number of files>]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# pluginhandler cannot be the first of snapcraft's modules to be imported.
+from snapcraft.internal import lifecycle  # noqa: F401
+from snapcraft.internal.pluginhandler import _fileset, _migration
+from tests.benchmarks import _fixtures
+
+
+def main(files=300000):
+    with tempfile.TemporaryDirectory() as root:
+        installdir = os.path.join(root, 'install')
+        stagedir = os.path.join(root, 'stage')
+        _fixtures.make_install_tree(installdir, files)
+        snap_files, snap_dirs = _fileset.resolve(['*'], [], installdir)
+
+        for description in ('empty stage', 'populated stage'):
+            start = time.monotonic()
+            _migration.migrate_files(
+                snap_files, snap_dirs, installdir, stagedir)
+            elapsed = time.monotonic() - start
+            print('{:<20} {:>7} files {:6.2f}s {:>9.0f} files/s'.format(
+                description, len(snap_files), elapsed,
+                len(snap_files) / elapsed))
+        shutil.rmtree(stagedir)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,341 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the hot paths of the lifecycle on synthetic fixtures.
+
+Every benchmark generates its fixtures in a temporary directory and times
+a number of rounds, nothing is fetched from the network. Results can be
+saved as JSON and later runs compared against them, a median slower than
+the saved one by more than the threshold is reported as a regression.
+
+Run with:
+
+    python3 -m tests.benchmarks.suite [--rounds <rounds>] [--scale <scale>]
+        [--output <results.json>] [--compare <baseline.json>]
+        [--threshold <fraction>] [<benchmark> ...]
+"""
+
+import argparse
+import collections
+import contextlib
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import fixtures
+
+# pluginhandler cannot be the first of snapcraft's modules to be imported.
+from snapcraft.internal import lifecycle  # noqa: F401
+import snapcraft
+from snapcraft import config, file_utils
+from snapcraft.internal import (
+    elf,
+    pluginhandler,
+    project_loader,
+    sources,
+    states,
+    steps,
+)
+from snapcraft.internal.pluginhandler import _fileset
+from snapcraft.storeapi import _upload
+from snapcraft.storeapi._up_down_client import UpDownClient
+from tests import fixture_setup
+from tests.benchmarks import _fixtures
+
+# Bumped when results saved by a previous format cannot be compared.
+_FORMAT = 1
+
+_BENCHMARKS = collections.OrderedDict()
+
+
+class _Case:
+
+    def __init__(self, run, reset=None):
+        # run is timed, reset is run before each round to undo the
+        # previous one.
+        self.run = run
+        self.reset = reset
+
+
+def _benchmark(name, **sizes):
+    """Register the function setting up the benchmark called name.
+
+    The function is called with the directory to set up fixtures in, an
+    ExitStack for the clean ups and sizes, scaled, as keyword arguments.
+    It returns the _Case to time.
+    """
+    def decorator(func):
+        _BENCHMARKS[name] = (func, sizes)
+        return func
+    return decorator
+
+
+def _load_config(root, parts):
+    _fixtures.make_snapcraft_yaml(
+        os.path.join(root, 'snap', 'snapcraft.yaml'), parts)
+    os.chdir(root)
+    return project_loader.load_config(snapcraft.ProjectOptions())
+
+
+@_benchmark('elf.get_elf_files', files=1000)
+def _get_elf_files(root, stack, *, files):
+    file_list = _fixtures.make_elf_files(root, files)
+    return _Case(lambda: elf.get_elf_files(root, file_list))
+
+
+@_benchmark('pluginhandler._migratable_filesets', files=100000)
+def _migratable_filesets(root, stack, *, files):
+    _fixtures.make_install_tree(root, files)
+    fileset = ['*', '-usr/share/doc', '-usr/share/man', '-usr/include']
+    # Resolutions are otherwise reused from the previous round.
+    return _Case(lambda: pluginhandler._migratable_filesets(fileset, root),
+                 reset=_fileset._cache.clear)
+
+
+@_benchmark('pluginhandler._migrate_files', files=100000)
+def _migrate_files(root, stack, *, files):
+    installdir = os.path.join(root, 'install')
+    stagedir = os.path.join(root, 'stage')
+    _fixtures.make_install_tree(installdir, files)
+    snap_files, snap_dirs = pluginhandler._migratable_filesets(
+        ['*'], installdir)
+    return _Case(
+        lambda: pluginhandler._migrate_files(
+            snap_files, snap_dirs, installdir, stagedir),
+        reset=lambda: shutil.rmtree(stagedir, ignore_errors=True))
+
+
+@_benchmark('pluginhandler.check_for_collisions', parts=20, files=2000)
+def _check_for_collisions(root, stack, *, parts, files):
+    # Every part installs the same files with the same contents, which all
+    # need to be compared.
+    project_config = _load_config(root, parts)
+    contents = _fixtures.make_contents(4096)
+    for part in project_config.parts.all_parts:
+        _fixtures.make_install_tree(
+            part.plugin.installdir, files, contents=contents)
+
+    def reset():
+        # Digests are otherwise reused from the previous round.
+        for part in project_config.parts.all_parts:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(part._content_index_path)
+        _fileset._cache.clear()
+
+    return _Case(lambda: pluginhandler.check_for_collisions(
+        project_config.parts.all_parts), reset=reset)
+
+
+@_benchmark('file_utils.replace_in_file', files=5000)
+def _replace_in_file(root, stack, *, files):
+    tree = os.path.join(root, 'tree')
+
+    def reset():
+        shutil.rmtree(tree, ignore_errors=True)
+        _fixtures.make_text_files(tree, files, prefix='/usr')
+
+    return _Case(
+        lambda: file_utils.replace_in_file(
+            tree, re.compile(r'.*\.pc$'),
+            re.compile(r'^prefix=.*$', re.MULTILINE), 'prefix=/snap/usr'),
+        reset=reset)
+
+
+@_benchmark('states.get_state', parts=200, files=1000)
+def _get_state(root, stack, *, parts, files):
+    project_config = _load_config(root, parts)
+    project = project_config._project_options
+    part_files = ['usr/lib/file{}.so'.format(i) for i in range(files)]
+    part_dirs = ['usr', 'usr/lib']
+    for part in project_config.parts.all_parts:
+        properties = part._part_properties
+        part.makedirs()
+        part.mark_done(steps.PULL, states.PullState(
+            part.plugin.get_pull_properties(), properties, project,
+            stage_packages=['package{}=1.0'.format(i) for i in range(20)]))
+        part.mark_done(steps.BUILD, states.BuildState(
+            part.plugin.get_build_properties(), properties, project))
+        part.mark_done(steps.STAGE, states.StageState(
+            part_files, part_dirs, properties, project))
+        part.mark_done(steps.PRIME, states.PrimeState(
+            part_files, part_dirs, set(), properties, project))
+
+    def run():
+        for part in project_config.parts.all_parts:
+            for step in steps.STEPS:
+                states.get_state(part.plugin.statedir, step)
+
+    return _Case(run)
+
+
+@_benchmark('project_loader.load_config', parts=200)
+def _load_config_benchmark(root, stack, *, parts):
+    _fixtures.make_snapcraft_yaml(
+        os.path.join(root, 'snap', 'snapcraft.yaml'), parts)
+    os.chdir(root)
+    return _Case(
+        lambda: project_loader.load_config(snapcraft.ProjectOptions()))
+
+
+@_benchmark('sources.Tar.provision', files=10000)
+def _tar_provision(root, stack, *, files):
+    tarball = os.path.join(root, 'project-1.0.tar.gz')
+    _fixtures.make_tarball(tarball, files, 4096)
+    source_dir = os.path.join(root, 'src')
+    source = sources.Tar(tarball, source_dir)
+    return _Case(
+        lambda: source.provision(source_dir, keep_tarball=True, src=tarball),
+        reset=lambda: shutil.rmtree(source_dir, ignore_errors=True))
+
+
+@_benchmark('storeapi.upload_files', mib=64)
+def _upload_files(root, stack, *, mib):
+    snap_path = os.path.join(root, 'benchmark_1.0_amd64.snap')
+    chunk = _fixtures.make_contents(1024 * 1024)
+    with open(snap_path, 'wb') as snap_file:
+        for _ in range(mib):
+            snap_file.write(chunk)
+    server = stack.enter_context(fixture_setup.FakeStoreUploadServerRunning())
+    stack.enter_context(fixtures.EnvironmentVariable(
+        'UBUNTU_STORE_UPLOAD_ROOT_URL', server.url))
+    client = UpDownClient(config.Config())
+    return _Case(lambda: _upload.upload_files(snap_path, client))
+
+
+def _run_benchmark(name, rounds, scale):
+    setup, sizes = _BENCHMARKS[name]
+    sizes = {k: max(1, int(v * scale)) for k, v in sizes.items()}
+    timings = []
+    with tempfile.TemporaryDirectory() as root:
+        with contextlib.ExitStack() as stack:
+            stack.callback(os.chdir, os.getcwd())
+            case = setup(root, stack, **sizes)
+            # Let the fixtures age past the window in which results are not
+            # cached.
+            time.sleep(0.2)
+            for _ in range(rounds):
+                if case.reset:
+                    case.reset()
+                gc.collect()
+                gc.disable()
+                try:
+                    start = time.perf_counter()
+                    case.run()
+                    timings.append(time.perf_counter() - start)
+                finally:
+                    gc.enable()
+    return dict(sizes=sizes, rounds=rounds, min=round(min(timings), 6),
+                median=round(statistics.median(timings), 6))
+
+
+def _compare(results, baseline, threshold):
+    """Print how results compare to baseline, return the regressions."""
+    regressions = []
+    print('{:<40} {:>10} {:>10} {:>8}'.format(
+        'Benchmark', 'Baseline', 'Median', 'Change'))
+    for name, result in sorted(results.items()):
+        base = baseline['benchmarks'].get(name)
+        if 'error' in result:
+            print('{:<40} {:>10} {:>10}'.format(name, '', 'error'))
+            continue
+        if base is None or 'error' in base:
+            print('{:<40} {:>10} {:>10.3f} {:>8}'.format(
+                name, 'none', result['median'], 'new'))
+            continue
+        if base['sizes'] != result['sizes']:
+            print('{:<40} {:>10.3f} {:>10.3f} {:>8}'.format(
+                name, base['median'], result['median'], 'sizes'))
+            continue
+        change = result['median'] / base['median'] - 1
+        line = '{:<40} {:>10.3f} {:>10.3f} {:>+7.0%}'.format(
+            name, base['median'], result['median'], change)
+        if change > threshold:
+            regressions.append(name)
+            line += ' regression'
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python3 -m tests.benchmarks.suite',
+        description='Measure the hot paths of the lifecycle.')
+    parser.add_argument(
+        'benchmarks', metavar='benchmark', nargs='*',
+        help='benchmarks to run, all of them by default: {}'.format(
+            ', '.join(_BENCHMARKS)))
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='times each benchmark is run (default: 5)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='factor applied to fixture sizes (default: 1)')
+    parser.add_argument('--output', metavar='FILE',
+                        help='save the results to FILE as JSON')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results to those saved in FILE')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown, as a fraction of the baseline, '
+                             'reported as a regression (default: 0.1)')
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks or list(_BENCHMARKS)
+    unknown = [n for n in names if n not in _BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: {}'.format(', '.join(unknown)))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('format') != _FORMAT:
+            parser.error('{} was saved in an unsupported format'.format(
+                args.compare))
+
+    results = collections.OrderedDict()
+    for name in names:
+        try:
+            results[name] = _run_benchmark(name, args.rounds, args.scale)
+        except Exception as e:
+            results[name] = dict(error='{}: {}'.format(type(e).__name__, e))
+            print('{:<40} {}'.format(name, results[name]['error']))
+        else:
+            print('{:<40} {:>8.3f}s median {:>8.3f}s min'.format(
+                name, results[name]['median'], results[name]['min']))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(dict(format=_FORMAT, python=platform.python_version(),
+                           machine=platform.machine(), benchmarks=results),
+                      output_file, indent=2, sort_keys=True)
+            output_file.write('\n')
+
+    regressions = []
+    if baseline is not None:
+        print()
+        regressions = _compare(results, baseline, args.threshold)
+
+    failed = [n for n, r in results.items() if 'error' in r]
+    return 1 if regressions or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
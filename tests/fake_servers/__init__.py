@@ -53,6 +53,43 @@ class FakeFileHTTPRequestHandler(BaseHTTPRequestHandler):
         self.wfile.write(data.encode())
 
 
+class FakeRangesHTTPRequestHandler(BaseHTTPRequestHandler):
+    """Serve the server's payload, honouring byte ranges.
+
+    Requested ranges are recorded in the server's requested_ranges, and
+    ranges are ignored if its supports_ranges is False or if the If-Range
+    sent does not match its etag.
+    """
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', len(self.server.payload))
+        self.send_header('ETag', self.server.etag)
+        if self.server.supports_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        data = self.server.payload
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range', self.server.etag)
+        if (range_header and self.server.supports_ranges and
+                if_range == self.server.etag):
+            start, end = range_header.split('=')[1].split('-')
+            start, end = int(start), int(end)
+            self.server.requested_ranges.append((start, end))
+            data = data[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                start, end, len(self.server.payload)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', len(data))
+        self.send_header('ETag', self.server.etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+
 class FakePartsServer(http.server.HTTPServer):
 
     def __init__(self, server_address):
@@ -15,6 +15,7 @@ from ._fixtures import (  # noqa: F401
     FakeFilesystem,
     FakeLXD,
     FakeMetadataExtractor,
+    FakeMultipass,
     FakeProjectOptions,
     FakeParts,
     FakePartsServerRunning,
@@ -43,4 +44,5 @@ from ._fixtures import (  # noqa: F401
     TempXDG,
     TestStore,
     WithoutSnapInstalled,
+    make_deb,
 )
@@ -18,6 +18,7 @@ import collections
 import contextlib
 import copy
 import io
+import json
 import os
 import platform
 import pkgutil
@@ -25,6 +26,7 @@ import shutil
 import string
 import subprocess
 import sys
+import tarfile
 import tempfile
 import textwrap
 import threading
@@ -55,6 +57,45 @@ from tests.subprocess_utils import (
 )
 
 
+def make_deb(path, entries=()):
+    """Write a deb at path with entries as (name, type, mode, data) tuples.
+
+    data is the contents of regular files and the target of links.
+    """
+    control_tar = io.BytesIO()
+    with tarfile.open(fileobj=control_tar, mode='w:xz') as tar:
+        control = 'Package: {}\n'.format(
+            os.path.splitext(os.path.basename(path))[0]).encode()
+        info = tarfile.TarInfo('./control')
+        info.size = len(control)
+        tar.addfile(info, io.BytesIO(control))
+
+    data_tar = io.BytesIO()
+    with tarfile.open(fileobj=data_tar, mode='w:xz') as tar:
+        for name, entry_type, mode, data in entries:
+            info = tarfile.TarInfo(name)
+            info.type = entry_type
+            info.mode = mode
+            if entry_type == tarfile.REGTYPE:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+            else:
+                if data:
+                    info.linkname = data
+                tar.addfile(info)
+
+    with open(path, 'wb') as f:
+        f.write(b'!<arch>\n')
+        for name, contents in (('debian-binary', b'2.0\n'),
+                               ('control.tar.xz', control_tar.getvalue()),
+                               ('data.tar.xz', data_tar.getvalue())):
+            f.write('{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n'.format(
+                name, 0, 0, 0, 100644, len(contents)).encode())
+            f.write(contents)
+            if len(contents) % 2:
+                f.write(b'\n')
+
+
 class TempCWD(fixtures.Fixture):
 
     def __init__(self, rootdir=None):
@@ -571,6 +612,8 @@ class FakeLXD(fixtures.Fixture):
         self.files = []
         self.kernel_arch = 'x86_64'
         self.devices = '{}'
+        # Images in the image store of the remote, as listed by lxc.
+        self.images = []
 
     def _setUp(self):
         patcher = mock.patch('subprocess.check_call')
@@ -616,39 +659,75 @@ class FakeLXD(fixtures.Fixture):
         self.addCleanup(patcher.stop)
 
     def call_effect(self, *args, **kwargs):
-        if args[0] == ['lxc', 'remote', 'get-default']:
+        if args[0][0] == 'sha384sum':
+            return 'deadbeef {}'.format(args[0][1]).encode('utf-8')
+        handlers = {
+            'remote': self._lxc_remote,
+            'info': self._lxc_info,
+            'list': self._lxc_list,
+            'init': self._lxc_create_start_stop,
+            'start': self._lxc_create_start_stop,
+            'launch': self._lxc_create_start_stop,
+            'stop': self._lxc_create_start_stop,
+            'exec': self._lxc_exec,
+            'image': self._lxc_image,
+            'publish': self._lxc_publish,
+        }
+        if args[0][0] == 'lxc' and args[0][1] in handlers:
+            return handlers[args[0][1]](args)
+        return ''.encode('utf-8')
+
+    def _lxc_remote(self, args):
+        if args[0][2:] == ['get-default']:
             return 'local'.encode('utf-8')
-        elif args[0][:2] == ['lxc', 'info']:
-            return 'Architecture: {}'.format(
-                self.kernel_arch).encode('utf-8')
-        elif args[0][:3] == ['lxc', 'list', '--format=json']:
-            if self.status and args[0][3] == self.name:
-                return string.Template('''
-                    [{"name": "$NAME",
-                      "status": "$STATUS",
-                      "devices": $DEVICES}]
-                    ''').substitute({
-                        # Container name without remote prefix
-                        'NAME': self.name.split(':')[-1],
-                        'STATUS': self.status,
-                        'DEVICES': self.devices,
-                    }).encode('utf-8')
-            return '[]'.encode('utf-8')
-        elif (args[0][0] == 'lxc' and
-              args[0][1] in ['init', 'start', 'launch', 'stop']):
-            return self._lxc_create_start_stop(args)
-        elif args[0][:2] == ['lxc', 'exec']:
-            return self._lxc_exec(args)
-        elif args[0][:4] == ['lxc', 'image', 'list', '--format=json']:
+        return ''.encode('utf-8')
+
+    def _lxc_info(self, args):
+        return 'Architecture: {}'.format(self.kernel_arch).encode('utf-8')
+
+    def _lxc_list(self, args):
+        if args[0][2:3] != ['--format=json']:
+            return ''.encode('utf-8')
+        if self.status and args[0][3] == self.name:
+            return string.Template('''
+                [{"name": "$NAME",
+                  "status": "$STATUS",
+                  "devices": $DEVICES}]
+                ''').substitute({
+                    # Container name without remote prefix
+                    'NAME': self.name.split(':')[-1],
+                    'STATUS': self.status,
+                    'DEVICES': self.devices,
+                }).encode('utf-8')
+        return '[]'.encode('utf-8')
+
+    def _lxc_image(self, args):
+        if args[0][2:4] == ['list', '--format=json']:
+            if args[0][4].endswith(':'):
+                return json.dumps(self.images).encode('utf-8')
             return (
                 '[{"architecture":"test-architecture",'
                 '"fingerprint":"test-fingerprint",'
                 '"created_at":"test-created-at"}]').encode('utf-8')
-        elif args[0][0] == 'sha384sum':
-            return 'deadbeef {}'.format(args[0][1]).encode('utf-8')
+        elif args[0][2:3] == ['delete']:
+            fingerprint = args[0][3].split(':')[-1]
+            self.images = [i for i in self.images
+                           if i['fingerprint'] != fingerprint]
+        elif args[0][2:4] == ['alias', 'delete']:
+            name = args[0][4].split(':')[-1]
+            for image in self.images:
+                image['aliases'] = [a for a in image['aliases']
+                                    if a['name'] != name]
         else:
             return ''.encode('utf-8')
 
+    def _lxc_publish(self, args):
+        self.images.append({
+            'fingerprint': 'fingerprint-{}'.format(len(self.images)),
+            'aliases': [{'name': args[0][args[0].index('--alias') + 1]}],
+            'properties': dict(p.split('=', 1) for p in args[0][6:]),
+        })
+
     def check_output_side_effect(self):
         return self.call_effect
 
@@ -688,6 +767,31 @@ class FakeLXD(fixtures.Fixture):
         return Popen(args)
 
 
+class FakeMultipass(fixtures.Fixture):
+    """Put a stand-in for multipass in PATH.
+
+    Instances are directories in root_path, and commands executed in them
+    run on the host from those directories.
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        self.root_path = self.useFixture(fixtures.TempDir()).path
+        self.useFixture(fixtures.EnvironmentVariable(
+            'FAKE_MULTIPASS_ROOT', self.root_path))
+
+        binaries_path = os.path.join(get_snapcraft_path(),
+                                     'tests', 'bin', 'multipass')
+        new_path = '{}:{}'.format(binaries_path, os.environ.get('PATH'))
+        self.useFixture(fixtures.EnvironmentVariable('PATH', new_path))
+
+        # Avoid changing the signal handlers of the test runner.
+        patcher = mock.patch('signal.signal')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
 class GitRepo(fixtures.Fixture):
     '''Create a git repo in the current directory'''
 
@@ -900,7 +1004,7 @@ class FakeAptCache(fixtures.Fixture):
         def fetch_binary(package_candidate, destination):
             path = os.path.join(
                 self.path, '{}.deb'.format(package_candidate.name))
-            open(path, 'w').close()
+            make_deb(path)
             return path
 
         patcher = mock.patch('snapcraft.repo._deb._AptCache.fetch_binary')
@@ -1103,41 +1207,42 @@ def _fake_elffile_extract(self, path):
         glibc.add_version('GLIBC_2.2.5')
         glibc.add_version('GLIBC_2.26')
         return (arch, '/lib64/ld-linux-x86-64.so.2', '',
-                {glibc.name: glibc}, False)
+                {glibc.name: glibc}, False, None)
     elif name == 'fake_elf-2.23':
         glibc = elf.NeededLibrary(name='libc.so.6')
         glibc.add_version('GLIBC_2.2.5')
         glibc.add_version('GLIBC_2.23')
         return (arch, '/lib64/ld-linux-x86-64.so.2', '',
-                {glibc.name: glibc}, False)
+                {glibc.name: glibc}, False, None)
     elif name == 'fake_elf-1.1':
         glibc = elf.NeededLibrary(name='libc.so.6')
         glibc.add_version('GLIBC_1.1')
         glibc.add_version('GLIBC_0.1')
         return (arch, '/lib64/ld-linux-x86-64.so.2', '',
-                {glibc.name: glibc}, False)
+                {glibc.name: glibc}, False, None)
     elif name == 'fake_elf-static':
-        return arch, '', '', {}, False
+        return arch, '', '', {}, False, None
     elif name == 'fake_elf-shared-object':
         openssl = elf.NeededLibrary(name='libssl.so.1.0.0')
         openssl.add_version('OPENSSL_1.0.0')
-        return arch, '', 'libfake_elf.so.0', {openssl.name: openssl}, False
+        return (arch, '', 'libfake_elf.so.0', {openssl.name: openssl},
+                False, None)
     elif name == 'fake_elf-with-execstack':
         glibc = elf.NeededLibrary(name='libc.so.6')
         glibc.add_version('GLIBC_2.23')
         return (arch, '/lib64/ld-linux-x86-64.so.2', '',
-                {glibc.name: glibc}, True)
+                {glibc.name: glibc}, True, None)
     elif name == 'fake_elf-with-bad-execstack':
         glibc = elf.NeededLibrary(name='libc.so.6')
         glibc.add_version('GLIBC_2.23')
         return (arch, '/lib64/ld-linux-x86-64.so.2', '',
-                {glibc.name: glibc}, True)
+                {glibc.name: glibc}, True, None)
     elif name == 'libc.so.6':
-        return arch, '', 'libc.so.6', {}, False
+        return arch, '', 'libc.so.6', {}, False, None
     elif name == 'libssl.so.1.0.0':
-        return arch, '', 'libssl.so.1.0.0', {}, False
+        return arch, '', 'libssl.so.1.0.0', {}, False, None
     else:
-        return arch, '', '', {}, False
+        return arch, '', '', {}, False, None
 
 
 class FakeElf(fixtures.Fixture):
@@ -1166,10 +1271,9 @@ class FakeElf(fixtures.Fixture):
         self.useFixture(fixtures.EnvironmentVariable('PATH', new_path))
 
         # Copy strip
-        for f in ['strip', 'execstack']:
-            shutil.copy(os.path.join(binaries_path, f),
-                        os.path.join(new_binaries_path, f))
-            os.chmod(os.path.join(new_binaries_path, f), 0o755)
+        shutil.copy(os.path.join(binaries_path, 'strip'),
+                    os.path.join(new_binaries_path, 'strip'))
+        os.chmod(os.path.join(new_binaries_path, 'strip'), 0o755)
 
         # Some values in ldd need to be set with core_path
         with open(os.path.join(binaries_path, 'ldd')) as rf:
@@ -28,7 +28,7 @@ import testscenarios
 import testtools
 
 import snapcraft
-from snapcraft.internal import common, elf, steps
+from snapcraft.internal import common, elf, steps, trash
 from snapcraft.internal.project_loader import grammar_processing
 from tests import fake_servers, fixture_setup
 from tests.file_utils import get_snapcraft_path
@@ -158,6 +158,10 @@ class TestCase(testscenarios.WithScenarios, testtools.TestCase):
         self.useFixture(fixtures.EnvironmentVariable('SNAPCRAFT_DEBUG'))
         self.useFixture(fixture_setup.FakeSnapcraftctl())
 
+        # Cleaned up directories are deleted in the background, which has to
+        # be done before the temporary directory is removed.
+        self.addCleanup(trash.wait)
+
     def make_snapcraft_yaml(self, content, encoding='utf-8'):
         with contextlib.suppress(FileExistsError):
             os.mkdir('snap')
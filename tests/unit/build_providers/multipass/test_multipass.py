@@ -14,11 +14,20 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import subprocess
+import time
 from textwrap import dedent
 from unittest import mock
 
+import fixtures
+from testtools.matchers import Equals, FileContains, FileExists, Not
+
+import snapcraft
+from tests import fixture_setup
 from tests.unit.build_providers import BaseProviderBaseTest
 from snapcraft.internal.build_providers import errors
+from snapcraft.internal.build_providers._instance_pool import InstancePool
 from snapcraft.internal.build_providers._multipass import (
     Multipass, MultipassCommand)
 
@@ -59,7 +68,7 @@ _DEFAULT_INSTANCE_INFO = dedent("""\
     """)  # noqa: E501
 
 
-class MultipassTest(BaseProviderBaseTest):
+class MultipassBaseTest(BaseProviderBaseTest):
 
     def setUp(self):
         super().setUp()
@@ -75,10 +84,15 @@ class MultipassTest(BaseProviderBaseTest):
         self.multipass_cmd_mock().info.return_value = \
             _DEFAULT_INSTANCE_INFO.encode()
 
+
+class MultipassTest(MultipassBaseTest):
+
     def test_instance_with_contextmanager(self):
+        open('snapcraft.yaml', 'w').close()
+
         with Multipass(project=self.project,
                        echoer=self.echoer_mock) as instance:
-            instance.provision_project('source.tar')
+            instance.provision_project(exclude=lambda path: False)
             instance.build_project()
             instance.retrieve_snap()
 
@@ -88,13 +102,14 @@ class MultipassTest(BaseProviderBaseTest):
             mock.call(
                 instance_name=self.instance_name,
                 command=['sudo', 'snap', 'install', 'snapcraft',
-                         '--classic']),
+                         '--classic'], stdin=None),
             mock.call(
                 instance_name=self.instance_name,
-                command=['mkdir', 'project-name']),
+                command=['mkdir', '-p', 'project-name'], stdin=None),
             mock.call(
                 instance_name=self.instance_name,
-                command=['tar', '-xvf', 'source.tar', '-C', 'project-name']),
+                command=['tar', '-x', '-f', '-', '-C', 'project-name'],
+                stdin=mock.ANY),
             mock.call(
                 instance_name=self.instance_name,
                 command=['sh', '-c', 'cd project-name; /snap/bin/snapcraft '
@@ -104,14 +119,10 @@ class MultipassTest(BaseProviderBaseTest):
         self.multipass_cmd_mock().info.assert_called_once_with(
             instance_name=self.instance_name, output_format='json')
 
-        self.multipass_cmd_mock().copy_files.assert_has_calls([
-            mock.call(destination='{}:source.tar'.format(self.instance_name),
-                      source='source.tar'),
-            mock.call(destination='project-name_{}.snap'.format(
-                        self.project.deb_arch),
-                      source='{}:project-name/project-name_{}.snap'.format(
-                        self.instance_name, self.project.deb_arch)),
-        ])
+        self.multipass_cmd_mock().copy_files.assert_called_once_with(
+            destination='project-name_{}.snap'.format(self.project.deb_arch),
+            source='{}:project-name/project-name_{}.snap'.format(
+                self.instance_name, self.project.deb_arch))
         self.multipass_cmd_mock().stop.assert_called_once_with(
             instance_name=self.instance_name)
         self.multipass_cmd_mock().delete.assert_called_once_with(
@@ -122,19 +133,19 @@ class MultipassTest(BaseProviderBaseTest):
 
         # In the real world, MultipassCommand would return an error when
         # calling this on an instance that does not exist.
-        multipass.provision_project('source.tar')
+        open('snapcraft.yaml', 'w').close()
+        multipass.provision_project(exclude=lambda path: False)
 
         self.multipass_cmd_mock().execute.assert_has_calls([
             mock.call(
                 instance_name=self.instance_name,
-                command=['mkdir', 'project-name']),
+                command=['mkdir', '-p', 'project-name'], stdin=None),
             mock.call(
                 instance_name=self.instance_name,
-                command=['tar', '-xvf', 'source.tar', '-C', 'project-name']),
+                command=['tar', '-x', '-f', '-', '-C', 'project-name'],
+                stdin=mock.ANY),
             ])
-        self.multipass_cmd_mock().copy_files.assert_called_once_with(
-            destination='{}:source.tar'.format(self.instance_name),
-            source='source.tar')
+        self.multipass_cmd_mock().copy_files.assert_not_called()
 
         self.multipass_cmd_mock().launch.assert_not_called()
         self.multipass_cmd_mock().info.assert_not_called()
@@ -189,3 +200,197 @@ class MultipassTest(BaseProviderBaseTest):
 
         self.multipass_cmd_mock().stop.assert_not_called()
         self.multipass_cmd_mock().delete.assert_not_called()
+
+
+class MultipassPoolTest(MultipassBaseTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE', '1'))
+        self.pool = InstancePool(provider_name='multipass', size=1)
+        self.pool_key = '16.04/{}/snapcraft={}'.format(
+            self.project.deb_arch, snapcraft.__version__)
+        self.clean_call = mock.call(
+            instance_name=self.instance_name,
+            command=['sh', '-c', 'cd project-name && /snap/bin/snapcraft '
+                     'clean && rm -f project-name_{}.snap'.format(
+                         self.project.deb_arch)],
+            stdin=None)
+
+    def test_new_instance_kept_for_reuse(self):
+        with Multipass(project=self.project, echoer=self.echoer_mock):
+            pass
+
+        self.multipass_cmd_mock().launch.assert_called_once_with(
+            image='16.04', instance_name=self.instance_name)
+        self.multipass_cmd_mock().execute.assert_has_calls([self.clean_call])
+        self.multipass_cmd_mock().stop.assert_called_once_with(
+            instance_name=self.instance_name)
+        self.multipass_cmd_mock().delete.assert_not_called()
+        self.assertThat(self.pool.acquire(key=self.pool_key)[0],
+                        Equals(self.instance_name))
+
+    def test_pooled_instance_reused(self):
+        self.pool.release(name=self.instance_name, key=self.pool_key,
+                          provisioned_at=time.time())
+
+        with Multipass(project=self.project, echoer=self.echoer_mock):
+            pass
+
+        self.multipass_cmd_mock().start.assert_called_once_with(
+            instance_name=self.instance_name)
+        self.multipass_cmd_mock().launch.assert_not_called()
+        # snapcraft is already setup, only the clean is executed.
+        self.multipass_cmd_mock().execute.assert_called_once_with(
+            **self.clean_call[2])
+        self.multipass_cmd_mock().delete.assert_not_called()
+        self.echoer_mock.info.assert_any_call(
+            'Reusing the build environment {!r}'.format(self.instance_name))
+
+    def test_pooled_instance_failing_to_start(self):
+        self.pool.release(name='pooled-instance', key=self.pool_key,
+                          provisioned_at=time.time())
+        self.multipass_cmd_mock().start.side_effect = (
+            errors.ProviderStartError(provider_name='multipass',
+                                      exit_code=1))
+
+        with Multipass(project=self.project, echoer=self.echoer_mock):
+            pass
+
+        self.multipass_cmd_mock().delete.assert_called_once_with(
+            instance_name='pooled-instance')
+        self.multipass_cmd_mock().launch.assert_called_once_with(
+            image='16.04', instance_name=self.instance_name)
+
+    def test_stale_instances_pruned(self):
+        self.pool.release(name='other-image', key='18.04/other',
+                          provisioned_at=time.time())
+
+        with Multipass(project=self.project, echoer=self.echoer_mock):
+            pass
+
+        self.multipass_cmd_mock().delete.assert_called_once_with(
+            instance_name='other-image')
+        self.multipass_cmd_mock().launch.assert_called_once_with(
+            image='16.04', instance_name=self.instance_name)
+
+    def test_instances_pooled_by_snapcraft_revision(self):
+        self.useFixture(fixtures.EnvironmentVariable('SNAP_NAME', 'snapcraft'))
+        self.useFixture(fixtures.EnvironmentVariable('SNAP_REVISION', '10'))
+        self.pool.release(name='other-revision',
+                          key='16.04/{}/snapcraft=9'.format(
+                              self.project.deb_arch),
+                          provisioned_at=time.time())
+
+        with Multipass(project=self.project, echoer=self.echoer_mock):
+            pass
+
+        self.multipass_cmd_mock().start.assert_not_called()
+        self.multipass_cmd_mock().launch.assert_called_once_with(
+            image='16.04', instance_name=self.instance_name)
+        self.assertThat(
+            self.pool.acquire(key='16.04/{}/snapcraft=10'.format(
+                self.project.deb_arch))[0],
+            Equals(self.instance_name))
+
+    def test_instance_failing_to_clean_destroyed(self):
+        def execute(*, command, instance_name, stdin=None):
+            if 'clean' in command[-1]:
+                raise errors.ProviderExecError(
+                    provider_name='multipass', command=command, exit_code=1)
+        self.multipass_cmd_mock().execute.side_effect = execute
+
+        with Multipass(project=self.project, echoer=self.echoer_mock):
+            pass
+
+        self.multipass_cmd_mock().delete.assert_called_once_with(
+            instance_name=self.instance_name)
+        self.assertThat(self.pool.acquire(key=self.pool_key), Equals(None))
+
+    def test_instance_failing_build_destroyed(self):
+        def build():
+            with Multipass(project=self.project, echoer=self.echoer_mock):
+                raise errors.ProviderExecError(
+                    provider_name='multipass', command=['snapcraft'],
+                    exit_code=1)
+
+        self.assertRaises(errors.ProviderExecError, build)
+
+        self.multipass_cmd_mock().delete.assert_called_once_with(
+            instance_name=self.instance_name)
+        self.assertThat(self.pool.acquire(key=self.pool_key), Equals(None))
+
+
+class MultipassWithFakeCommandTest(BaseProviderBaseTest):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fake_multipass = fixture_setup.FakeMultipass()
+        self.useFixture(self.fake_multipass)
+
+        os.makedirs('src')
+        with open(os.path.join('src', 'main.c'), 'w') as f:
+            f.write('main')
+        os.makedirs(os.path.join('parts', 'part1'))
+
+        self.multipass = Multipass(project=self.project,
+                                   echoer=self.echoer_mock)
+        self.multipass.launch_instance()
+        self.multipass._instance_info = self.multipass._get_instance_info()
+        self.project_path = os.path.join(
+            self.fake_multipass.root_path, self.instance_name,
+            'project-name')
+
+    def test_provision_project(self):
+        self.multipass.provision_project(
+            exclude=lambda path: path.startswith('parts/'))
+
+        self.assertThat(os.path.join(self.project_path, 'src', 'main.c'),
+                        FileContains('main'))
+        self.assertFalse(os.path.exists(os.path.join(
+            self.project_path, 'parts', 'part1')))
+
+    def test_provision_project_again(self):
+        self.multipass.provision_project(exclude=lambda path: False)
+        os.unlink(os.path.join('src', 'main.c'))
+        open('snapcraft.yaml', 'w').close()
+
+        self.multipass.provision_project(exclude=lambda path: False)
+
+        self.assertThat(os.path.join(self.project_path, 'src', 'main.c'),
+                        Not(FileExists()))
+        self.assertThat(os.path.join(self.project_path, 'snapcraft.yaml'),
+                        FileExists())
+
+    def test_destroy_forgets_project(self):
+        self.multipass.provision_project(exclude=lambda path: False)
+
+        self.multipass.destroy()
+
+        self.assertThat(self.multipass._sync_manifest_path,
+                        Not(FileExists()))
+        self.assertFalse(os.path.exists(os.path.join(
+            self.fake_multipass.root_path, self.instance_name)))
+
+    def test_pooled_instance_reused(self):
+        # Keep an instance around as a previous build would have.
+        subprocess.check_call(['multipass', 'launch', '16.04', '--name',
+                               'pooled-instance'])
+        InstancePool(provider_name='multipass', size=1).release(
+            name='pooled-instance',
+            key='16.04/{}/snapcraft={}'.format(
+                self.project.deb_arch, snapcraft.__version__),
+            provisioned_at=time.time())
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE', '1'))
+
+        multipass = Multipass(project=self.project, echoer=self.echoer_mock)
+        multipass.create()
+        multipass.provision_project(exclude=lambda path: False)
+
+        self.assertThat(os.path.join(
+            self.fake_multipass.root_path, 'pooled-instance', 'project-name',
+            'src', 'main.c'), FileContains('main'))
@@ -105,6 +105,28 @@ class MultipassCommandLaunchTest(MultipassCommandPassthroughBaseTest):
         self.check_output_mock.assert_not_called()
 
 
+class MultipassCommandStartTest(MultipassCommandPassthroughBaseTest):
+
+    def test_start(self):
+        self.multipass_command.start(instance_name=self.instance_name)
+
+        self.check_call_mock.assert_called_once_with([
+            'multipass', 'start', self.instance_name
+        ])
+        self.check_output_mock.assert_not_called()
+
+    def test_start_fails(self):
+        cmd = ['multipass', 'start', self.instance_name]
+        self.check_call_mock.side_effect = subprocess.CalledProcessError(
+            1, cmd)
+
+        self.assertRaises(errors.ProviderStartError,
+                          self.multipass_command.start,
+                          instance_name=self.instance_name)
+        self.check_call_mock.assert_called_once_with(cmd)
+        self.check_output_mock.assert_not_called()
+
+
 class MultipassCommandStopTest(MultipassCommandPassthroughBaseTest):
 
     def test_stop(self):
@@ -222,3 +244,36 @@ class MultipassCommandInfoTest(MultipassCommandPassthroughBaseTest):
                           instance_name=self.instance_name)
         self.check_output_mock.assert_called_once_with(cmd)
         self.check_call_mock.assert_not_called()
+
+
+class MultipassCommandExecuteTest(MultipassCommandPassthroughBaseTest):
+
+    def test_execute(self):
+        self.multipass_command.execute(instance_name=self.instance_name,
+                                       command=['ls', '-l'])
+
+        self.check_call_mock.assert_called_once_with([
+            'multipass', 'exec', self.instance_name, '--', 'ls', '-l'
+        ], stdin=None)
+        self.check_output_mock.assert_not_called()
+
+    def test_execute_with_stdin(self):
+        stdin = mock.Mock()
+
+        self.multipass_command.execute(instance_name=self.instance_name,
+                                       command=['tar', '-x'], stdin=stdin)
+
+        self.check_call_mock.assert_called_once_with([
+            'multipass', 'exec', self.instance_name, '--', 'tar', '-x'
+        ], stdin=stdin)
+
+    def test_execute_fails(self):
+        # multipass can fail due to several reasons and will display the
+        # appropriate error message.
+        self.check_call_mock.side_effect = subprocess.CalledProcessError(
+            cmd=['ls'], returncode=1)
+
+        self.assertRaises(errors.ProviderExecError,
+                          self.multipass_command.execute,
+                          instance_name=self.instance_name,
+                          command=['ls'])
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
 from unittest import mock
 
 from testtools.matchers import Equals
@@ -30,7 +31,7 @@ class ProviderImpl(Provider):
         self.launch_mock = mock.Mock()
         self.run_mock = mock.Mock()
 
-    def _run(self, command):
+    def _run(self, command, *, stdin=None):
         self.run_mock(command)
 
     def _launch(self):
@@ -76,3 +77,20 @@ class BaseProviderTest(BaseProviderBaseTest):
             ['sudo', 'snap', 'install', 'snapcraft', '--classic'])
         self.echoer_mock.info.assert_called_once_with(
             'Setting up snapcraft in {!r}'.format(self.instance_name))
+
+    def test_provision_project(self):
+        os.makedirs('src')
+        open(os.path.join('src', 'main.c'), 'w').close()
+        provider = ProviderImpl(project=self.project, echoer=self.echoer_mock)
+
+        # The cache holding what was synced is in the working directory.
+        provider.provision_project(
+            exclude=lambda path: path.startswith('.'))
+        provider.provision_project(
+            exclude=lambda path: path.startswith('.'))
+
+        # Nothing changed for the second one.
+        self.assertThat(provider.run_mock.call_args_list, Equals([
+            mock.call(['mkdir', '-p', 'project-name']),
+            mock.call(['tar', '-x', '-f', '-', '-C', 'project-name']),
+        ]))
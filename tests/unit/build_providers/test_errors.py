@@ -45,6 +45,14 @@ class ErrorFormattingTest(unit.TestCase):
                 "with 'multipass': returned exit code 1.\n"
                 "Ensure that 'multipass' is setup correctly and try "
                 "again."))),
+        ('ProviderStartError', dict(
+            exception=errors.ProviderStartError,
+            kwargs=dict(provider_name='multipass', exit_code=1),
+            expected_message=(
+                "An error occurred when trying to start the instance "
+                "with 'multipass': returned exit code 1.\n"
+                "Ensure that 'multipass' is setup correctly and try "
+                "again."))),
         ('ProviderStopError', dict(
             exception=errors.ProviderStopError,
             kwargs=dict(provider_name='multipass', exit_code=1),
@@ -0,0 +1,127 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+from unittest import mock
+
+import fixtures
+from testtools.matchers import Equals
+
+from snapcraft.internal.build_providers._instance_pool import (
+    InstancePool,
+    get_pool_size,
+)
+from tests import unit
+
+
+class GetPoolSizeTest(unit.TestCase):
+
+    def test_default(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE', None))
+
+        self.assertThat(get_pool_size(), Equals(0))
+
+    def test_set(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE', '2'))
+
+        self.assertThat(get_pool_size(), Equals(2))
+
+    def test_invalid(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_BUILD_INSTANCE_POOL_SIZE', 'many'))
+
+        self.assertThat(get_pool_size(), Equals(0))
+
+
+class InstancePoolTest(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.pool = InstancePool(provider_name='fake', size=3, max_age=100)
+        self.now = time.time()
+        patcher = mock.patch('time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_acquire_nothing_pooled(self):
+        self.assertThat(self.pool.acquire(key='key'), Equals(None))
+
+    def test_release_and_acquire(self):
+        self.assertTrue(self.pool.release(name='instance', key='key',
+                                          provisioned_at=self.now))
+
+        self.assertThat(self.pool.acquire(key='key'),
+                        Equals(('instance', self.now)))
+        # Only once.
+        self.assertThat(self.pool.acquire(key='key'), Equals(None))
+
+    def test_acquire_most_recent(self):
+        self.pool.release(name='old', key='key',
+                          provisioned_at=self.now - 10)
+        self.pool.release(name='new', key='key', provisioned_at=self.now)
+
+        self.assertThat(self.pool.acquire(key='key'),
+                        Equals(('new', self.now)))
+
+    def test_acquire_other_key(self):
+        self.pool.release(name='instance', key='key',
+                          provisioned_at=self.now)
+
+        self.assertThat(self.pool.acquire(key='other-key'), Equals(None))
+
+    def test_acquire_too_old(self):
+        self.pool.release(name='instance', key='key',
+                          provisioned_at=self.now)
+        self.now += 100
+
+        self.assertThat(self.pool.acquire(key='key'), Equals(None))
+
+    def test_release_full(self):
+        self.pool.release(name='first', key='key', provisioned_at=self.now)
+        self.pool.release(name='second', key='key', provisioned_at=self.now)
+        self.pool.release(name='third', key='key', provisioned_at=self.now)
+
+        self.assertFalse(self.pool.release(name='fourth', key='key',
+                                           provisioned_at=self.now))
+
+    def test_release_too_old(self):
+        self.assertFalse(self.pool.release(name='instance', key='key',
+                                           provisioned_at=self.now - 100))
+
+    def test_prune(self):
+        self.pool.release(name='other-key', key='other-key',
+                          provisioned_at=self.now)
+        self.pool.release(name='too-old', key='key',
+                          provisioned_at=self.now - 50)
+        self.now += 60
+        self.pool.release(name='kept', key='key', provisioned_at=self.now)
+
+        self.assertThat(self.pool.prune(key='key'),
+                        Equals(['other-key', 'too-old']))
+        self.assertThat(self.pool.prune(key='key'), Equals([]))
+        self.assertThat(self.pool.acquire(key='key'),
+                        Equals(('kept', self.now)))
+
+    def test_prune_over_size(self):
+        self.pool.release(name='old', key='key',
+                          provisioned_at=self.now - 10)
+        self.pool.release(name='new', key='key', provisioned_at=self.now)
+
+        smaller_pool = InstancePool(provider_name='fake', size=1)
+
+        self.assertThat(smaller_pool.prune(key='key'), Equals(['old']))
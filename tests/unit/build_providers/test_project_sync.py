@@ -0,0 +1,149 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import subprocess
+
+from testtools.matchers import (
+    DirExists,
+    Equals,
+    FileContains,
+    FileExists,
+    Not,
+)
+
+from snapcraft.internal.build_providers._project_sync import sync_project
+from tests import unit
+
+
+class SyncProjectTest(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.source_dir = os.path.abspath('project')
+        self.instance_dir = os.path.abspath('instance')
+        self.target_dir = os.path.join(self.instance_dir, 'project-name')
+        self.manifest_path = os.path.abspath(os.path.join('cache',
+                                                          'manifest.json'))
+        os.makedirs(os.path.join(self.source_dir, 'src'))
+        os.makedirs(os.path.join(self.source_dir, 'parts', 'part1'))
+        os.makedirs(self.instance_dir)
+        self._write('snapcraft.yaml', 'name: project-name')
+        self._write(os.path.join('src', 'main.c'), 'main')
+        self._write(os.path.join('parts', 'part1', 'built'), 'built')
+        os.symlink('main.c', os.path.join(self.source_dir, 'src', 'link'))
+        self.commands = []
+
+    def _write(self, path, contents):
+        path = os.path.join(self.source_dir, path)
+        with open(path, 'w') as f:
+            f.write(contents)
+
+    def _run(self, command, *, stdin=None):
+        self.commands.append(command)
+        subprocess.check_call(command, stdin=stdin, cwd=self.instance_dir,
+                              stdout=subprocess.DEVNULL)
+
+    def _sync(self, **kwargs):
+        self.commands = []
+        sync_project(source_dir=self.source_dir,
+                     target_dir=kwargs.get('target_dir', 'project-name'),
+                     manifest_path=self.manifest_path, run=self._run,
+                     exclude=lambda path: path.startswith('parts/'))
+        return [command[0] for command in self.commands]
+
+    def test_first_sync(self):
+        self.assertThat(self._sync(), Equals(['mkdir', 'tar']))
+
+        self.assertThat(os.path.join(self.target_dir, 'snapcraft.yaml'),
+                        FileContains('name: project-name'))
+        self.assertThat(os.path.join(self.target_dir, 'src', 'main.c'),
+                        FileContains('main'))
+        self.assertThat(os.readlink(os.path.join(
+            self.target_dir, 'src', 'link')), Equals('main.c'))
+        self.assertThat(os.path.join(self.target_dir, 'parts'), DirExists())
+        self.assertThat(os.path.join(self.target_dir, 'parts', 'part1'),
+                        Not(DirExists()))
+        self.assertThat(self.manifest_path, FileExists())
+
+    def test_sync_without_changes(self):
+        self._sync()
+
+        self.assertThat(self._sync(), Equals([]))
+
+    def test_sync_changes_only(self):
+        self._sync()
+        self._write(os.path.join('src', 'main.c'), 'changed')
+        # Contents the instance changed are not looked at.
+        with open(os.path.join(self.target_dir, 'snapcraft.yaml'), 'w') as f:
+            f.write('changed in instance')
+
+        self.assertThat(self._sync(), Equals(['tar']))
+
+        self.assertThat(os.path.join(self.target_dir, 'src', 'main.c'),
+                        FileContains('changed'))
+        self.assertThat(os.path.join(self.target_dir, 'snapcraft.yaml'),
+                        FileContains('changed in instance'))
+
+    def test_sync_removals(self):
+        self._sync()
+        os.unlink(os.path.join(self.source_dir, 'src', 'main.c'))
+        os.unlink(os.path.join(self.source_dir, 'src', 'link'))
+
+        self.assertThat(self._sync(), Equals(['xargs']))
+
+        self.assertThat(os.path.join(self.target_dir, 'src'), DirExists())
+        self.assertThat(os.listdir(os.path.join(self.target_dir, 'src')),
+                        Equals([]))
+
+    def test_sync_type_change(self):
+        self._sync()
+        os.unlink(os.path.join(self.source_dir, 'src', 'main.c'))
+        os.makedirs(os.path.join(self.source_dir, 'src', 'main.c'))
+        self._write(os.path.join('src', 'main.c', 'file'), 'file')
+
+        self._sync()
+
+        self.assertThat(os.path.join(self.target_dir, 'src', 'main.c',
+                                     'file'), FileContains('file'))
+
+    def test_sync_to_other_target(self):
+        self._sync()
+
+        self.assertThat(self._sync(target_dir='other'),
+                        Equals(['mkdir', 'tar']))
+
+        self.assertThat(os.path.join(self.instance_dir, 'other', 'src',
+                                     'main.c'), FileContains('main'))
+
+    def test_sync_with_invalid_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path))
+        with open(self.manifest_path, 'w') as f:
+            f.write('invalid')
+
+        self.assertThat(self._sync(), Equals(['mkdir', 'tar']))
+
+    def test_failed_sync_not_recorded(self):
+        def _run(command, *, stdin=None):
+            raise subprocess.CalledProcessError(1, command)
+
+        self.assertRaises(subprocess.CalledProcessError, sync_project,
+                          source_dir=self.source_dir,
+                          target_dir='project-name',
+                          manifest_path=self.manifest_path, run=_run,
+                          exclude=lambda path: False)
+
+        self.assertThat(self.manifest_path, Not(FileExists()))
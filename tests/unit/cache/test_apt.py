@@ -0,0 +1,102 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+from unittest import mock
+
+from testtools.matchers import (
+    DirExists,
+    Equals,
+    FileContains,
+    Is,
+    Not,
+    StartsWith,
+)
+
+from snapcraft.internal import cache
+from tests import unit
+
+
+def _populate(path):
+    os.makedirs(os.path.join(path, 'usr', 'bin'))
+    with open(os.path.join(path, 'usr', 'bin', 'hello'), 'w') as f:
+        f.write('hello')
+
+
+class AptUnpackedPackageCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.unpacked_cache = cache.AptUnpackedPackageCache()
+        self.populate = mock.Mock(side_effect=_populate)
+        self.key = dict(name='hello', version='2.10-1', arch='amd64',
+                        normalization=1)
+
+    def test_get_nothing_cached(self):
+        self.assertThat(self.unpacked_cache.get(**self.key), Is(None))
+
+    def test_cache_and_retrieve(self):
+        path = self.unpacked_cache.cache(populate=self.populate, **self.key)
+
+        self.assertThat(path, StartsWith(
+            self.unpacked_cache.unpacked_cache_root))
+        self.assertThat(os.path.join(path, 'usr', 'bin', 'hello'),
+                        FileContains('hello'))
+        self.assertThat(self.unpacked_cache.get(**self.key), Equals(path))
+
+    def test_cache_populates_once(self):
+        for _ in range(3):
+            self.unpacked_cache.cache(populate=self.populate, **self.key)
+
+        self.populate.assert_called_once_with(mock.ANY)
+
+    def test_cache_keys(self):
+        paths = {
+            self.unpacked_cache.cache(
+                populate=self.populate, **dict(self.key, **change))
+            for change in [
+                dict(),
+                dict(version='2.10-2'),
+                dict(arch='armhf'),
+                dict(normalization=2),
+            ]}
+
+        self.assertThat(len(paths), Equals(4))
+
+    def test_cache_failed_populate_is_not_cached(self):
+        self.populate.side_effect = RuntimeError()
+
+        self.assertRaises(
+            RuntimeError, self.unpacked_cache.cache, populate=self.populate,
+            **self.key)
+        self.assertThat(self.unpacked_cache.get(**self.key), Is(None))
+
+    def test_prune(self):
+        old_path = self.unpacked_cache.cache(
+            populate=self.populate, **self.key)
+        new_path = self.unpacked_cache.cache(
+            populate=self.populate, **dict(self.key, version='2.10-2'))
+        last_used = time.time() - 100
+        os.utime(old_path, (last_used, last_used))
+
+        pruned = self.unpacked_cache.prune(max_age=10)
+
+        self.assertThat(pruned, Equals([old_path]))
+        self.assertThat(old_path, Not(DirExists()))
+        self.assertThat(new_path, DirExists())
+
+    def test_prune_nothing_cached(self):
+        self.assertThat(self.unpacked_cache.prune(max_age=0), Equals([]))
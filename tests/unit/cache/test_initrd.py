@@ -0,0 +1,112 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+
+from testtools.matchers import Equals, FileContains, FileExists, Not
+
+from snapcraft.internal import cache
+from snapcraft.internal.cache._cache import file_lock
+from tests import unit
+
+
+def _populate(path):
+    with open(os.path.join(path, 'init'), 'w') as f:
+        f.write('init')
+
+
+class InitrdCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.initrd_cache = cache.InitrdCache()
+
+    def test_get_nothing_cached(self):
+        self.assertThat(self.initrd_cache.get(digest='digest'), Equals(None))
+
+    def test_cache_and_retrieve(self):
+        path = self.initrd_cache.cache(digest='digest', populate=_populate)
+
+        self.assertThat(os.path.join(path, 'init'), FileContains('init'))
+        self.assertThat(self.initrd_cache.get(digest='digest'), Equals(path))
+
+    def test_cache_populates_once(self):
+        calls = []
+        self.initrd_cache.cache(digest='digest', populate=_populate)
+
+        self.initrd_cache.cache(digest='digest', populate=calls.append)
+
+        self.assertThat(calls, Equals([]))
+
+    def test_failed_populate_not_cached(self):
+        def populate(path):
+            _populate(path)
+            raise RuntimeError('interrupted')
+
+        self.assertRaises(RuntimeError, self.initrd_cache.cache,
+                          digest='digest', populate=populate)
+
+        self.assertThat(self.initrd_cache.get(digest='digest'), Equals(None))
+        self.assertThat(os.path.join(
+            self.initrd_cache.initrd_cache_root, 'digest.partial'),
+            Not(FileExists()))
+
+    def _age(self, path, seconds):
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def test_get_records_use(self):
+        path = self.initrd_cache.cache(digest='digest', populate=_populate)
+        self._age(path, 100)
+
+        self.initrd_cache.get(digest='digest')
+
+        self.assertTrue(time.time() - os.stat(path).st_mtime < 50)
+
+    def test_use_populates_entry(self):
+        with self.initrd_cache.use(digest='digest',
+                                   populate=_populate) as path:
+            self.assertThat(os.path.join(path, 'init'), FileContains('init'))
+
+    def test_use_prevents_pruning(self):
+        path = self.initrd_cache.cache(digest='digest', populate=_populate)
+        with self.initrd_cache.use(digest='digest', populate=_populate):
+            self._age(path, 100)
+
+            self.assertThat(self.initrd_cache.prune(max_age=50), Equals([]))
+        self.assertTrue(os.path.exists(path))
+
+    def test_prune(self):
+        old_path = self.initrd_cache.cache(digest='old', populate=_populate)
+        new_path = self.initrd_cache.cache(digest='new', populate=_populate)
+        self._age(old_path, 100)
+
+        pruned = self.initrd_cache.prune(max_age=50)
+
+        self.assertThat(pruned, Equals([old_path]))
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(new_path))
+
+    def test_prune_skips_entry_being_populated(self):
+        path = self.initrd_cache.cache(digest='digest', populate=_populate)
+        self._age(path, 100)
+
+        with file_lock(path + '.lock'):
+            self.assertThat(self.initrd_cache.prune(max_age=50), Equals([]))
+        self.assertTrue(os.path.exists(path))
+
+    def test_prune_nothing_cached(self):
+        self.assertThat(self.initrd_cache.prune(max_age=50), Equals([]))
@@ -0,0 +1,142 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+
+import fixtures
+from testtools.matchers import DirExists, Equals, FileExists, Not
+
+from snapcraft.internal import cache, errors
+from tests import unit
+
+
+class PackageDownloadCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.package_cache = cache.PackageDownloadCache()
+
+    def _make_entry(self, ecosystem, entry, *, size, age=0):
+        path = os.path.join(
+            self.package_cache.get(ecosystem=ecosystem), entry)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'0' * size)
+        timestamp = time.time() - age
+        os.utime(path, (timestamp, timestamp))
+        return path
+
+    def test_get(self):
+        path = self.package_cache.get(ecosystem='cargo')
+
+        self.assertThat(path, Equals(os.path.join(
+            self.package_cache.package_cache_root, 'cargo')))
+        self.assertThat(path, DirExists())
+
+    def test_get_unknown_ecosystem(self):
+        self.assertRaises(ValueError, self.package_cache.get,
+                          ecosystem='cpan')
+
+    def test_get_usage(self):
+        self._make_entry('pip', os.path.join('http', 'a', 'b', 'c', 'd', 'e'),
+                         size=10)
+        self._make_entry('npm', os.path.join('_cacache', 'index-v5', 'a',
+                                             'b', 'c'), size=5)
+
+        usage = self.package_cache.get_usage()
+
+        self.assertThat(list(usage.keys()), Equals(cache.PACKAGE_ECOSYSTEMS))
+        self.assertThat(usage['pip'], Equals(10))
+        self.assertThat(usage['npm'], Equals(5))
+        self.assertThat(usage['cargo'], Equals(0))
+
+    def test_prune_least_recently_used(self):
+        old = self._make_entry(
+            'cargo', os.path.join('registry', 'cache', 'index', 'old.crate'),
+            size=10, age=100)
+        new = self._make_entry(
+            'cargo', os.path.join('registry', 'cache', 'index', 'new.crate'),
+            size=10)
+
+        pruned = self.package_cache.prune(budget=15)
+
+        self.assertThat(pruned, Equals([old]))
+        self.assertThat(old, Not(FileExists()))
+        self.assertThat(new, FileExists())
+
+    def test_prune_under_budget(self):
+        self._make_entry(
+            'cargo', os.path.join('registry', 'cache', 'index', 'a.crate'),
+            size=10)
+
+        self.assertThat(self.package_cache.prune(budget=10), Equals([]))
+
+    def test_prune_removes_whole_entries(self):
+        crate = self._make_entry(
+            'cargo', os.path.join('registry', 'src', 'index', 'crate-1.0',
+                                  'src', 'lib.rs'), size=10, age=100)
+        crate_dir = os.path.join(
+            self.package_cache.get(ecosystem='cargo'), 'registry', 'src',
+            'index', 'crate-1.0')
+        os.chmod(os.path.dirname(crate), 0o555)
+
+        pruned = self.package_cache.prune(budget=0)
+
+        self.assertThat(pruned, Equals([crate_dir]))
+        self.assertThat(crate_dir, Not(DirExists()))
+
+    def test_prune_if_due(self):
+        self._make_entry(
+            'yarn', os.path.join('v1', 'npm-pkg-1.0'), size=10, age=100)
+
+        self.assertThat(
+            len(self.package_cache.prune_if_due(budget=0, interval=60)),
+            Equals(1))
+
+        self._make_entry(
+            'yarn', os.path.join('v1', 'npm-pkg-2.0'), size=10, age=100)
+        self.assertThat(
+            self.package_cache.prune_if_due(budget=0, interval=60),
+            Equals([]))
+
+
+class PackageCacheSizeBudgetTestCase(unit.TestCase):
+
+    scenarios = [
+        ('default', dict(size=None, expected=10 * 1024 ** 3)),
+        ('bytes', dict(size='1000', expected=1000)),
+        ('kilobytes', dict(size='2K', expected=2048)),
+        ('megabytes', dict(size='3m', expected=3 * 1024 ** 2)),
+        ('gigabytes', dict(size='4GB', expected=4 * 1024 ** 3)),
+    ]
+
+    def test_get_size_budget(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_PACKAGE_CACHE_SIZE', self.size))
+
+        self.assertThat(cache.get_package_cache_size_budget(),
+                        Equals(self.expected))
+
+
+class PackageCacheInvalidSizeBudgetTestCase(unit.TestCase):
+
+    def test_invalid_size_budget(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_PACKAGE_CACHE_SIZE', 'lots'))
+
+        raised = self.assertRaises(errors.InvalidPackageCacheSizeError,
+                                   cache.get_package_cache_size_budget)
+        self.assertThat(raised.size, Equals('lots'))
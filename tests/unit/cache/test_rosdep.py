@@ -0,0 +1,55 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import Equals
+
+from snapcraft.internal import cache
+from tests import unit
+
+
+class RosdepCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rosdep_cache = cache.RosdepCache()
+
+    def test_get_nothing_cached(self):
+        self.assertThat(self.rosdep_cache.get(database_key='key'),
+                        Equals({}))
+
+    def test_cache_and_retrieve(self):
+        self.rosdep_cache.cache(
+            database_key='key', resolutions={'foo': {'apt': ['bar']}})
+        self.rosdep_cache.cache(
+            database_key='key', resolutions={'baz': {'pip': ['qux']}})
+
+        self.assertThat(self.rosdep_cache.get(database_key='key'), Equals({
+            'foo': {'apt': ['bar']},
+            'baz': {'pip': ['qux']},
+        }))
+        self.assertThat(self.rosdep_cache.get(database_key='other-key'),
+                        Equals({}))
+
+    def test_invalid_entry_ignored(self):
+        os.makedirs(self.rosdep_cache.rosdep_cache_root)
+        with open(os.path.join(self.rosdep_cache.rosdep_cache_root,
+                               'key.json'), 'w') as f:
+            f.write('invalid')
+
+        self.assertThat(self.rosdep_cache.get(database_key='key'),
+                        Equals({}))
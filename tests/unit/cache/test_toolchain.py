@@ -0,0 +1,237 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+from unittest import mock
+
+from testtools.matchers import (
+    DirExists,
+    Equals,
+    FileContains,
+    Is,
+    Not,
+    StartsWith,
+)
+
+from snapcraft.internal import cache
+from tests import unit
+
+
+def _populate(path):
+    os.makedirs(os.path.join(path, 'bin'))
+    with open(os.path.join(path, 'bin', 'tool'), 'w') as f:
+        f.write('tool')
+
+
+class ToolchainCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.toolchain_cache = cache.ToolchainCache()
+        self.populate = mock.Mock(side_effect=_populate)
+
+    def test_get_nothing_cached(self):
+        self.assertThat(
+            self.toolchain_cache.get(tool='rust', version='1.0',
+                                     arch='x86_64'),
+            Is(None))
+
+    def test_cache_and_retrieve(self):
+        path = self.toolchain_cache.cache(
+            tool='rust', version='1.0', arch='x86_64',
+            populate=self.populate)
+
+        self.assertThat(path, StartsWith(
+            self.toolchain_cache.toolchain_cache_root))
+        self.assertThat(os.path.join(path, 'bin', 'tool'),
+                        FileContains('tool'))
+        self.assertThat(
+            self.toolchain_cache.get(tool='rust', version='1.0',
+                                     arch='x86_64'),
+            Equals(path))
+
+    def test_cache_populates_once(self):
+        for _ in range(3):
+            self.toolchain_cache.cache(
+                tool='rust', version='1.0', arch='x86_64',
+                populate=self.populate)
+
+        self.populate.assert_called_once_with(mock.ANY)
+
+    def test_cache_keys(self):
+        paths = {
+            self.toolchain_cache.cache(populate=self.populate, **key)
+            for key in [
+                dict(tool='rust', version='1.0', arch='x86_64'),
+                dict(tool='rust', version='1.1', arch='x86_64'),
+                dict(tool='rust', version='1.0', arch='aarch64'),
+                dict(tool='rust', version='1.0', arch='x86_64',
+                     channel='nightly'),
+            ]}
+
+        self.assertThat(len(paths), Equals(4))
+
+    def test_cache_is_read_only(self):
+        path = self.toolchain_cache.cache(
+            tool='rust', version='1.0', arch='x86_64',
+            populate=self.populate)
+
+        for entry in ('bin', os.path.join('bin', 'tool')):
+            self.assertThat(
+                os.stat(os.path.join(path, entry)).st_mode & 0o222,
+                Equals(0))
+
+    def test_cache_failed_populate_is_not_cached(self):
+        self.populate.side_effect = RuntimeError()
+
+        self.assertRaises(
+            RuntimeError, self.toolchain_cache.cache, tool='rust',
+            version='1.0', arch='x86_64', populate=self.populate)
+        self.assertThat(
+            self.toolchain_cache.get(tool='rust', version='1.0',
+                                     arch='x86_64'),
+            Is(None))
+
+    def test_cache_max_age_refreshes(self):
+        self.toolchain_cache.cache(
+            tool='yarn', version=None, arch='all', populate=self.populate)
+        with mock.patch('time.time', return_value=time.time() + 100):
+            self.toolchain_cache.cache(
+                tool='yarn', version=None, arch='all', max_age=10,
+                populate=self.populate)
+
+        self.assertThat(self.populate.call_count, Equals(2))
+
+    def test_cache_max_age_refreshes_into_new_entry(self):
+        old_path = self.toolchain_cache.link(
+            path=os.path.join('parts', 'part', 'rust'), tool='rust',
+            version=None, arch='x86_64', populate=self.populate)
+        with mock.patch('time.time', return_value=time.time() + 100):
+            new_path = self.toolchain_cache.cache(
+                tool='rust', version=None, arch='x86_64', max_age=10,
+                populate=self.populate)
+
+        self.assertThat(new_path, Not(Equals(old_path)))
+        self.assertThat(os.path.join(old_path, 'bin', 'tool'),
+                        FileContains('tool'))
+        self.assertThat(
+            self.toolchain_cache.get(tool='rust', version=None,
+                                     arch='x86_64'),
+            Equals(new_path))
+
+    def test_link(self):
+        path = self.toolchain_cache.link(
+            path=os.path.join('parts', 'part', 'rust'), tool='rust',
+            version='1.0', arch='x86_64', populate=self.populate)
+
+        self.assertThat(os.readlink(os.path.join('parts', 'part', 'rust')),
+                        Equals(path))
+
+    def test_link_replaces_directory(self):
+        os.makedirs(os.path.join('parts', 'part', 'rust'))
+
+        self.toolchain_cache.link(
+            path=os.path.join('parts', 'part', 'rust'), tool='rust',
+            version='1.0', arch='x86_64', populate=self.populate)
+
+        self.assertTrue(os.path.islink(os.path.join('parts', 'part', 'rust')))
+
+    def test_prune(self):
+        old_path = self.toolchain_cache.cache(
+            tool='rust', version='1.0', arch='x86_64',
+            populate=self.populate)
+        new_path = self.toolchain_cache.cache(
+            tool='rust', version='1.1', arch='x86_64',
+            populate=self.populate)
+        last_used = time.time() - 100
+        os.utime(os.path.join(old_path, '.snapcraft-toolchain'),
+                 (last_used, last_used))
+
+        pruned = self.toolchain_cache.prune(max_age=10)
+
+        self.assertThat(pruned, Equals([old_path]))
+        self.assertThat(old_path, Not(DirExists()))
+        self.assertThat(new_path, DirExists())
+
+    def test_prune_nothing_cached(self):
+        self.assertThat(self.toolchain_cache.prune(max_age=0), Equals([]))
+
+    def test_prune_skips_entry_being_populated(self):
+        pruned = []
+
+        def populate(path):
+            pruned.extend(self.toolchain_cache.prune(max_age=-1))
+            _populate(path)
+
+        path = self.toolchain_cache.cache(
+            tool='rust', version='1.0', arch='x86_64', populate=populate)
+
+        self.assertThat(pruned, Equals([]))
+        self.assertThat(path, DirExists())
+
+    def _age(self, path):
+        last_used = time.time() - 100
+        os.utime(os.path.join(path, '.snapcraft-toolchain'),
+                 (last_used, last_used))
+
+    def test_use_records_use(self):
+        link_path = os.path.join('parts', 'part', 'rust')
+        path = self.toolchain_cache.link(
+            path=link_path, tool='rust', version='1.0', arch='x86_64',
+            populate=self.populate)
+        self._age(path)
+
+        with self.toolchain_cache.use(
+                path=link_path, tool='rust', version='1.0', arch='x86_64',
+                populate=self.populate) as used_path:
+            self.assertThat(used_path, Equals(path))
+
+        self.assertThat(self.toolchain_cache.prune(max_age=10), Equals([]))
+
+    def test_use_prevents_pruning(self):
+        link_path = os.path.join('parts', 'part', 'rust')
+        path = self.toolchain_cache.link(
+            path=link_path, tool='rust', version='1.0', arch='x86_64',
+            populate=self.populate)
+
+        with self.toolchain_cache.use(
+                path=link_path, tool='rust', version='1.0', arch='x86_64',
+                populate=self.populate):
+            self._age(path)
+            self.assertThat(
+                self.toolchain_cache.prune(max_age=10), Equals([]))
+
+        self.assertThat(os.path.join(link_path, 'bin', 'tool'),
+                        FileContains('tool'))
+
+    def test_use_links_pruned_entry_again(self):
+        link_path = os.path.join('parts', 'part', 'rust')
+        path = self.toolchain_cache.link(
+            path=link_path, tool='rust', version='1.0', arch='x86_64',
+            populate=self.populate)
+        self._age(path)
+        self.assertThat(self.toolchain_cache.prune(max_age=10),
+                        Equals([path]))
+
+        with self.toolchain_cache.use(
+                path=link_path, tool='rust', version='1.0', arch='x86_64',
+                populate=self.populate) as used_path:
+            self.assertThat(os.path.join(link_path, 'bin', 'tool'),
+                            FileContains('tool'))
+
+        self.assertThat(self.populate.call_count, Equals(2))
+        self.assertThat(os.readlink(link_path), Equals(used_path))
+        self.assertThat(os.path.exists(path + '.lock'), Equals(False))
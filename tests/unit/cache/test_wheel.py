@@ -0,0 +1,73 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+from testtools.matchers import Equals, FileContains, Is
+
+from snapcraft.internal import cache
+from tests import unit
+
+
+class WheelCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.wheel_cache = cache.WheelCache()
+        self.wheel_path = 'Foo_Bar-1.0-cp36-cp36m-linux_x86_64.whl'
+        with open(self.wheel_path, 'w') as f:
+            f.write('wheel')
+
+    def test_get_nothing_cached(self):
+        self.assertThat(
+            self.wheel_cache.get(name='foo-bar', version='1.0',
+                                 build_key='key'),
+            Is(None))
+
+    def test_cache_and_retrieve(self):
+        cached_path = self.wheel_cache.cache(
+            wheel_path=self.wheel_path, name='Foo_Bar', version='1.0',
+            build_key='key')
+
+        self.assertThat(cached_path, FileContains('wheel'))
+        self.assertThat(
+            self.wheel_cache.get(name='foo-bar', version='1.0',
+                                 build_key='key'),
+            Equals(cached_path))
+
+    def test_cache_leaves_no_partial_files(self):
+        cached_path = self.wheel_cache.cache(
+            wheel_path=self.wheel_path, name='foo-bar', version='1.0',
+            build_key='key')
+
+        self.assertThat(os.listdir(os.path.dirname(cached_path)),
+                        Equals([self.wheel_path]))
+
+    def test_build_key_mismatch(self):
+        self.wheel_cache.cache(
+            wheel_path=self.wheel_path, name='foo-bar', version='1.0',
+            build_key='key')
+
+        self.assertThat(
+            self.wheel_cache.get(name='foo-bar', version='1.0',
+                                 build_key='other-key'),
+            Is(None))
+
+
+class NormalizePackageNameTestCase(unit.TestCase):
+
+    def test_normalize(self):
+        self.assertThat(cache.normalize_package_name('Foo_Bar.baz--qux'),
+                        Equals('foo-bar-baz-qux'))
@@ -0,0 +1,53 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+import fixtures
+from testtools.matchers import Contains, Equals, FileExists, Not
+
+from snapcraft.internal import cache
+from . import CommandBaseTestCase
+
+
+class CacheCommandTestCase(CommandBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.crate = os.path.join(
+            cache.PackageDownloadCache().get(ecosystem='cargo'), 'registry',
+            'cache', 'index', 'crate.crate')
+        os.makedirs(os.path.dirname(self.crate))
+        with open(self.crate, 'wb') as f:
+            f.write(b'0' * 2048)
+
+    def test_cache_shows_usage(self):
+        result = self.run_command(['cache'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains('cargo'))
+        self.assertThat(result.output, Contains('2.0 KiB'))
+        self.assertThat(result.output, Contains('Total: 2.0 KiB of 10.0 GiB'))
+        self.assertThat(self.crate, FileExists())
+
+    def test_cache_prune(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_PACKAGE_CACHE_SIZE', '1K'))
+
+        result = self.run_command(['cache', '--prune'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains('Pruned 1 cache entries.'))
+        self.assertThat(self.crate, Not(FileExists()))
@@ -22,8 +22,10 @@ from testtools.matchers import Contains, Equals, DirExists, FileExists, Not
 
 import snapcraft
 from snapcraft.internal import (
+    common,
     errors,
     steps,
+    trash,
 )
 from tests import fixture_setup
 from . import CommandBaseTestCase
@@ -104,6 +106,15 @@ class CleanCommandTestCase(CleanCommandBaseTestCase):
         self.assertThat(self.stage_dir, Not(DirExists()))
         self.assertThat(self.prime_dir, Not(DirExists()))
 
+    def test_clean_all_empties_trash(self):
+        self.make_snapcraft_yaml(n=3)
+
+        result = self.run_command(['clean'])
+        trash.wait()
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
 
 class ContainerizedCleanCommandTestCase(CleanCommandBaseTestCase):
 
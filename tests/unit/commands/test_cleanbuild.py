@@ -78,6 +78,7 @@ class CleanBuildCommandTestCase(CleanBuildCommandBaseTestCase):
             'snap-test.snap',
             'snap-test_1.0_source.tar.bz2',
             'snap-test_0.9_source.tar.bz2',
+            'snap-test_0.8_source.tar.gz',
         ]
         for d in dirs:
             os.makedirs(d)
@@ -95,7 +96,7 @@ class CleanBuildCommandTestCase(CleanBuildCommandBaseTestCase):
             'Retrieved snap-test_1.0_amd64.snap\n',
             self.fake_logger.output)
 
-        with tarfile.open('snap-test_source.tar.bz2') as tar:
+        with tarfile.open('snap-test_source.tar.gz') as tar:
             tar_members = tar.getnames()
 
         for f in self.files_no_tar:
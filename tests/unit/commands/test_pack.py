@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import json
 import os.path
 import subprocess
 from textwrap import dedent
@@ -69,6 +70,25 @@ class PackCommandTestCase(PackCommandBaseTestCase):
 
         self.assertThat('my_snap_99_multi.snap', FileExists())
 
+    def test_snap_from_dir_with_trace(self):
+        with open(self.snap_yaml, 'w') as f:
+            f.write(dedent("""\
+                name: my_snap
+                version: 99
+                architectures: [amd64, armhf]
+            """))
+
+        result = self.run_command(
+            ['--trace', 'trace.json', self.command, self.snap_dir])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains(
+            "Trace written to 'trace.json'"))
+        with open('trace.json') as trace_file:
+            events = json.load(trace_file)['traceEvents']
+        self.assertThat([e['name'] for e in events if e['ph'] == 'X'],
+                        Equals(['pack']))
+
     def test_snap_from_dir_with_no_arch(self):
         with open(self.snap_yaml, 'w') as f:
             f.write(dedent("""\
@@ -18,6 +18,7 @@ import json
 import logging
 import os
 import requests
+import time
 from subprocess import CalledProcessError
 from unittest.mock import (
     call,
@@ -82,10 +83,14 @@ class CleanbuilderTestCase(LXDTestCase):
         project_folder = '/root/build_project'
         self.make_containerbuild().execute()
 
+        # The provisioned container is published for later builds.
+        provisioned_alias = self.fake_lxd.images[0]['aliases'][0]['name']
         self.assertIn('Waiting for a network connection...\n'
                       'Network connection established\n'
+                      'Publishing the provisioned image {}\n'
                       'Setting up container with project assets\n'
-                      'Retrieved snap.snap\n', self.fake_logger.output)
+                      'Retrieved snap.snap\n'.format(provisioned_alias),
+                      self.fake_logger.output)
 
         args = []
         if self.target_arch:
@@ -106,6 +111,13 @@ class CleanbuilderTestCase(LXDTestCase):
                   '{"fingerprint": "test-fingerprint", '
                   '"architecture": "test-architecture", '
                   '"created_at": "test-created-at"}']),
+            call(['lxc', 'image', 'alias', 'delete', '{}:{}'.format(
+                self.remote, provisioned_alias)]),
+            call(['lxc', 'snapshot', container_name, 'provisioned']),
+            call(['lxc', 'publish', '{}/provisioned'.format(container_name),
+                  '{}:'.format(self.remote), '--alias', provisioned_alias,
+                  ANY]),
+            call(['lxc', 'delete', '{}/provisioned'.format(container_name)]),
             call(['lxc', 'file', 'push', os.path.realpath('project.tar'),
                   '{}/root/build_project/project.tar'.format(container_name)]),
         ])
@@ -132,6 +144,105 @@ class CleanbuilderTestCase(LXDTestCase):
                   'ubuntu:xenial/{}'.format(_get_deb_arch(self.server))]),
         ])
 
+    @patch('snapcraft.internal.lxd.Containerbuild._container_run')
+    @patch('snapcraft.internal.lxd.Containerbuild._inject_snapcraft')
+    @patch('petname.Generate')
+    def test_cleanbuild_from_provisioned_image(self, mock_pet, mock_inject,
+                                               mock_container_run):
+        mock_pet.return_value = 'my-pet'
+        self.make_containerbuild().execute()
+        provisioned_alias = self.fake_lxd.images[0]['aliases'][0]['name']
+        mock_inject.reset_mock()
+        mock_container_run.reset_mock()
+        self.fake_lxd.check_call_mock.reset_mock()
+
+        self.make_containerbuild().execute()
+
+        container_name = '{}:snapcraft-my-pet'.format(self.remote)
+        self.fake_lxd.check_call_mock.assert_any_call([
+            'lxc', 'launch', '-e',
+            '{}:{}'.format(self.remote, provisioned_alias), container_name])
+        self.assertIn('Using the provisioned image {}\n'.format(
+            provisioned_alias), self.fake_logger.output)
+        # Nothing is provisioned, and so nothing is published.
+        mock_inject.assert_not_called()
+        self.assertNotIn(call(['apt-get', 'install', 'squashfuse', '-y']),
+                         mock_container_run.mock_calls)
+        mock_container_run.assert_any_call(['apt-get', 'update'])
+        self.assertThat(len(self.fake_lxd.images), Equals(1))
+
+    @patch('snapcraft.internal.lxd.Containerbuild._container_run')
+    @patch('snapcraft.internal.lxd.Containerbuild._inject_snapcraft')
+    def test_expired_provisioned_images_pruned(self, mock_inject,
+                                               mock_container_run):
+        self.fake_lxd.images = [
+            {'fingerprint': 'other', 'properties': {
+                'snapcraft.provisioned-at': str(int(time.time()))},
+             'aliases': [{'name': 'snapcraft-provisioned-other'}]},
+            {'fingerprint': 'expired', 'properties': {
+                'snapcraft.provisioned-at': '0'},
+             'aliases': [{'name': 'snapcraft-provisioned-expired'}]},
+            {'fingerprint': 'unrelated', 'aliases': [{'name': 'unrelated'}]},
+        ]
+
+        self.make_containerbuild().execute()
+
+        self.fake_lxd.check_call_mock.assert_any_call([
+            'lxc', 'image', 'delete', '{}:expired'.format(self.remote)])
+        # Images for other architectures or revisions of snapcraft are
+        # left alone until they expire.
+        self.assertThat(
+            [i['fingerprint'] for i in self.fake_lxd.images],
+            Equals(['other', 'unrelated', 'fingerprint-2']))
+
+    @patch('snapcraft.internal.lxd.Containerbuild._container_run')
+    @patch('snapcraft.internal.lxd.Containerbuild._inject_snapcraft')
+    def test_stale_provisioned_image_published_again(self, mock_inject,
+                                                     mock_container_run):
+        self.make_containerbuild().execute()
+        provisioned_alias = self.fake_lxd.images[0]['aliases'][0]['name']
+        self.fake_lxd.images[0]['properties'][
+            'snapcraft.provisioned-at'] = str(int(time.time()) - 25 * 60 * 60)
+        mock_inject.reset_mock()
+
+        self.make_containerbuild().execute()
+
+        mock_inject.assert_called_once_with(new_container=True)
+        # The stale image is kept for builds still launching from it, but
+        # the alias moves to the new one.
+        self.assertThat(
+            [i['aliases'] for i in self.fake_lxd.images],
+            Equals([[], [{'name': provisioned_alias}]]))
+
+    @patch('snapcraft.internal.lxd.Containerbuild._container_run')
+    @patch('snapcraft.internal.lxd.Containerbuild._inject_snapcraft')
+    def test_provisioned_alias_keyed_on_snapcraft_version(
+            self, mock_inject, mock_container_run):
+        self.make_containerbuild().execute()
+        with patch('snapcraft.__version__', 'other-version'):
+            self.make_containerbuild().execute()
+
+        self.assertThat(mock_inject.call_count, Equals(2))
+        self.assertThat(len({i['aliases'][0]['name']
+                             for i in self.fake_lxd.images}), Equals(2))
+
+    @patch('snapcraft.internal.lxd.Containerbuild._container_run')
+    @patch('snapcraft.internal.lxd.Containerbuild._inject_snapcraft')
+    def test_failed_publish_just_warns(self, mock_inject,
+                                       mock_container_run):
+        def call_effect(*args, **kwargs):
+            if args[0][:2] == ['lxc', 'publish']:
+                raise CalledProcessError(returncode=1, cmd=args[0])
+            return self.fake_lxd.check_output_side_effect()(*args, **kwargs)
+
+        self.fake_lxd.check_call_mock.side_effect = call_effect
+
+        self.make_containerbuild().execute()
+
+        self.assertIn('Failed to publish the provisioned image.',
+                      self.fake_logger.output)
+        self.assertThat(self.fake_lxd.images, Equals([]))
+
     def test_failed_container_never_created(self):
         def call_effect(*args, **kwargs):
             if args[0][:2] == ['lxc', 'launch']:
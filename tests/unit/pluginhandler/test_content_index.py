@@ -0,0 +1,129 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+from unittest import mock
+
+from testtools.matchers import Equals, FileExists, Not
+
+from snapcraft import file_utils
+from snapcraft.internal.pluginhandler import _content_index
+from tests import unit
+
+
+class ContentIndexTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.mkdir('parts')
+        for name in ('install1', 'install2'):
+            os.makedirs(name)
+            with open(os.path.join(name, 'foo'), 'w') as f:
+                f.write('foo')
+            self.age(os.path.join(name, 'foo'))
+
+        patcher = mock.patch.object(
+            file_utils, 'calculate_hash', wraps=file_utils.calculate_hash)
+        self.calculate_hash_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def age(self, path):
+        past = time.time() - 60
+        os.utime(path, (past, past))
+
+    def load(self, name):
+        return _content_index.ContentIndex(
+            name, os.path.join('parts', name + '.json'))
+
+    def collide(self, path='foo'):
+        index1 = self.load('install1')
+        index2 = self.load('install2')
+        collide = _content_index.paths_collide(path, index1, index2)
+        index1.save()
+        index2.save()
+        return collide
+
+    def test_same_contents(self):
+        self.assertFalse(self.collide())
+
+    def test_different_contents(self):
+        with open('install2/foo', 'w') as f:
+            f.write('bar')
+
+        self.assertTrue(self.collide())
+
+    def test_digests_reused(self):
+        self.collide()
+        self.calculate_hash_mock.reset_mock()
+
+        self.assertFalse(self.collide())
+        self.calculate_hash_mock.assert_not_called()
+
+    def test_changed_file_hashed_again(self):
+        self.collide()
+
+        with open('install2/foo', 'w') as f:
+            f.write('bar')
+
+        self.assertTrue(self.collide())
+
+    def test_recently_changed_file_not_kept(self):
+        with open('install2/foo', 'w') as f:
+            f.write('foo')
+
+        self.collide()
+
+        self.assertThat('parts/install2.json', Not(FileExists()))
+        self.assertThat(list(self.load('install1')._entries), Equals(['foo']))
+
+    def test_different_sizes_not_hashed(self):
+        with open('install2/foo', 'w') as f:
+            f.write('foobar')
+
+        self.assertTrue(self.collide())
+        self.calculate_hash_mock.assert_not_called()
+
+    def test_hard_links_not_hashed(self):
+        os.remove('install2/foo')
+        os.link('install1/foo', 'install2/foo')
+
+        self.assertFalse(self.collide())
+        self.calculate_hash_mock.assert_not_called()
+
+    def test_missing_path(self):
+        self.assertFalse(self.collide('bar'))
+        self.assertThat('parts/install1.json', Not(FileExists()))
+
+    def test_invalid_index_ignored(self):
+        with open('parts/install1.json', 'w') as f:
+            f.write('invalid')
+
+        self.assertFalse(self.collide())
+        self.assertThat(list(self.load('install1')._entries), Equals(['foo']))
+
+    def test_directory_and_file(self):
+        os.remove('install2/foo')
+        os.mkdir('install2/foo')
+
+        self.assertTrue(self.collide())
+
+    def test_symlinks(self):
+        for name, target in (('install1', 'bar'), ('install2', 'baz')):
+            os.symlink(target, os.path.join(name, 'link'))
+
+        self.assertTrue(self.collide('link'))
@@ -0,0 +1,159 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import os
+import time
+from unittest import mock
+
+from testtools.matchers import Equals
+
+from snapcraft.internal.pluginhandler import _fileset
+from tests import unit
+
+
+class FilesetTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs('install/usr/lib/foo')
+        os.makedirs('install/usr/share/doc')
+        os.makedirs('install/.hidden')
+        for path in ('.top', 'usr/lib/libfoo.so', 'usr/lib/libfoo.a',
+                     'usr/lib/.libbar.so', 'usr/lib/foo/libbaz.so',
+                     'usr/share/doc/README', '.hidden/file'):
+            open(os.path.join('install', path), 'w').close()
+        os.symlink('usr/lib', 'install/lib')
+
+    def resolve(self, includes, excludes=None):
+        return _fileset.Fileset(includes, excludes or []).resolve('install')
+
+    def test_everything(self):
+        files, dirs = self.resolve(['*'])
+
+        # Like glob, '*' does not match hidden entries at the top, and
+        # matched symlinks to directories are expanded too.
+        self.assertThat(files, Equals({
+            'lib', 'lib/libfoo.so', 'lib/libfoo.a', 'lib/.libbar.so',
+            'lib/foo/libbaz.so', 'usr/lib/libfoo.so', 'usr/lib/libfoo.a',
+            'usr/lib/.libbar.so', 'usr/lib/foo/libbaz.so',
+            'usr/share/doc/README'}))
+        self.assertThat(dirs, Equals({
+            'lib', 'lib/foo', 'usr', 'usr/lib', 'usr/lib/foo', 'usr/share',
+            'usr/share/doc'}))
+
+    def test_recursive_exclude(self):
+        files, dirs = self.resolve(['usr'], ['**/*.so'])
+
+        self.assertThat(files, Equals({
+            'usr/lib/libfoo.a', 'usr/lib/.libbar.so',
+            'usr/share/doc/README'}))
+        self.assertThat(dirs, Equals({
+            'usr', 'usr/lib', 'usr/lib/foo', 'usr/share', 'usr/share/doc'}))
+
+    def test_excluded_directory(self):
+        files, dirs = self.resolve(['*'], ['usr/share', 'lib'])
+
+        self.assertThat(files, Equals({
+            'usr/lib/libfoo.so', 'usr/lib/libfoo.a', 'usr/lib/.libbar.so',
+            'usr/lib/foo/libbaz.so'}))
+        self.assertThat(dirs, Equals({'usr', 'usr/lib', 'usr/lib/foo'}))
+
+    def test_symlinks_followed_by_patterns(self):
+        files, dirs = self.resolve(['lib/*.so'])
+
+        self.assertThat(files, Equals({'lib/libfoo.so'}))
+        self.assertThat(dirs, Equals({'lib'}))
+
+    def test_included_symlink_expanded(self):
+        files, dirs = self.resolve(['lib'])
+
+        self.assertThat(files, Equals({
+            'lib', 'lib/libfoo.so', 'lib/libfoo.a', 'lib/.libbar.so',
+            'lib/foo/libbaz.so'}))
+        self.assertThat(dirs, Equals({'lib', 'lib/foo'}))
+
+    def test_hidden_pattern(self):
+        files, dirs = self.resolve(['.*'])
+
+        self.assertThat(files, Equals({'.top', '.hidden/file'}))
+        self.assertThat(dirs, Equals({'.hidden'}))
+
+    def test_missing_literal_included(self):
+        files, dirs = self.resolve(['usr/bin/foo', 'usr/lib/*.a'])
+
+        self.assertThat(files, Equals({'usr/bin/foo', 'usr/lib/libfoo.a'}))
+        self.assertThat(dirs, Equals({'usr', 'usr/bin', 'usr/lib'}))
+
+    def test_symlink_loop(self):
+        os.symlink('..', 'install/usr/lib/foo/up')
+
+        files, dirs = self.resolve(['usr/**/libbaz.so'])
+
+        self.assertThat(files, Equals({'usr/lib/foo/libbaz.so'}))
+
+
+class ResolveTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs('install/foo')
+        open('install/foo/1', 'w').close()
+        self.age('install', 'install/foo')
+
+        patcher = mock.patch.object(
+            _fileset, '_cache', collections.OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def age(self, *paths):
+        past = time.time() - 60
+        for path in paths:
+            os.utime(path, (past, past))
+
+    def test_unchanged_directory_reused(self):
+        _fileset.resolve(['*'], [], 'install')
+
+        with mock.patch.object(_fileset, '_Scan') as mock_scan:
+            files, dirs = _fileset.resolve(['*'], [], 'install')
+
+        mock_scan.assert_not_called()
+        self.assertThat(files, Equals({'foo/1'}))
+        self.assertThat(dirs, Equals({'foo'}))
+
+    def test_changed_directory_resolved_again(self):
+        _fileset.resolve(['*'], [], 'install')
+
+        open('install/foo/2', 'w').close()
+        files, dirs = _fileset.resolve(['*'], [], 'install')
+
+        self.assertThat(files, Equals({'foo/1', 'foo/2'}))
+
+    def test_recently_changed_directory_not_cached(self):
+        open('install/foo/2', 'w').close()
+        _fileset.resolve(['*'], [], 'install')
+
+        self.assertThat(_fileset._cache, Equals({}))
+
+    def test_results_can_be_modified(self):
+        files, dirs = _fileset.resolve(['*'], [], 'install')
+        files.clear()
+
+        files, dirs = _fileset.resolve(['*'], [], 'install')
+
+        self.assertThat(files, Equals({'foo/1'}))
@@ -0,0 +1,99 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2016-2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+from unittest import mock
+
+from testtools.matchers import Equals
+
+from snapcraft.internal.pluginhandler import _machine_manifest
+from tests import fixture_setup, unit
+
+
+class MachineManifestTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        with open('status', 'w') as f:
+            f.write('status')
+        past = time.time() - 60
+        os.utime('status', (past, past))
+        patcher = mock.patch.object(
+            _machine_manifest, '_STATE_PATHS', ('status', 'state.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('snapcraft.internal.common.run_output',
+                             return_value='Linux test uname 4.10 x86_64')
+        self.run_output_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fake_apt_cache = fixture_setup.FakeAptCache()
+        self.useFixture(self.fake_apt_cache)
+        self.fake_apt_cache.add_package(
+            fixture_setup.FakeAptCachePackage(
+                'patchelf', '0.9', installed=True))
+
+        self.fake_snapd = fixture_setup.FakeSnapd()
+        self.useFixture(self.fake_snapd)
+        self.fake_snapd.snaps_result = []
+
+        _machine_manifest.clear_machine_manifest_cache()
+        self.addCleanup(_machine_manifest.clear_machine_manifest_cache)
+
+    def test_get_machine_manifest(self):
+        self.assertThat(_machine_manifest.get_machine_manifest(), Equals({
+            'uname': 'Linux test uname 4.10 x86_64',
+            'installed-packages': ['patchelf=0.9'],
+            'installed-snaps': [],
+        }))
+
+    def test_taken_once(self):
+        manifest = _machine_manifest.get_machine_manifest()
+        manifest['installed-packages'].append('foo=1.0')
+
+        self.assertThat(
+            _machine_manifest.get_machine_manifest()['installed-packages'],
+            Equals(['patchelf=0.9']))
+        self.run_output_mock.assert_called_once_with(['uname', '-srvmpio'])
+
+    def test_taken_again_once_state_changes(self):
+        _machine_manifest.get_machine_manifest()
+
+        with open('state.json', 'w') as f:
+            f.write('state')
+        self.fake_snapd.snaps_result = [
+            {'name': 'core', 'revision': '1'}]
+
+        self.assertThat(
+            _machine_manifest.get_machine_manifest()['installed-snaps'],
+            Equals(['core=1']))
+
+    def test_not_kept_if_state_recently_changed(self):
+        os.utime('status')
+        _machine_manifest.get_machine_manifest()
+        _machine_manifest.get_machine_manifest()
+
+        self.assertThat(self.run_output_mock.call_count, Equals(2))
+
+    def test_clear_cache(self):
+        _machine_manifest.get_machine_manifest()
+        _machine_manifest.clear_machine_manifest_cache()
+        _machine_manifest.get_machine_manifest()
+
+        self.assertThat(self.run_output_mock.call_count, Equals(2))
@@ -0,0 +1,151 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import os
+import stat
+from unittest import mock
+
+from testtools.matchers import Equals, FileContains
+
+from snapcraft.internal import errors
+from snapcraft.internal.pluginhandler import _migration
+from tests import unit
+
+
+class MigrateFilesTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs('install/usr/lib/pkgconfig')
+        os.makedirs('stage')
+        for path in ('foo', 'usr/lib/libfoo.so', 'usr/lib/pkgconfig/foo.pc'):
+            with open(os.path.join('install', path), 'w') as f:
+                f.write(path)
+        self.files = {'foo', 'usr/lib/libfoo.so', 'usr/lib/pkgconfig/foo.pc'}
+        self.dirs = {'usr', 'usr/lib', 'usr/lib/pkgconfig'}
+
+    def test_files_linked(self):
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage')
+
+        for path in ('foo', 'usr/lib/libfoo.so'):
+            self.assertTrue(os.path.samefile(
+                os.path.join('install', path), os.path.join('stage', path)))
+
+    def test_pc_files_copied(self):
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage')
+
+        self.assertThat('stage/usr/lib/pkgconfig/foo.pc',
+                        FileContains('usr/lib/pkgconfig/foo.pc'))
+        self.assertFalse(os.path.samefile(
+            'install/usr/lib/pkgconfig/foo.pc',
+            'stage/usr/lib/pkgconfig/foo.pc'))
+
+    def test_fixup_called_once_file_is_in_place(self):
+        fixed = []
+
+        def fixup_func(path):
+            self.assertTrue(os.path.exists(path))
+            fixed.append(path)
+
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage',
+                                 fixup_func=fixup_func)
+
+        self.assertThat(sorted(fixed), Equals([
+            os.path.join('stage', 'foo'),
+            os.path.join('stage', 'usr/lib', 'libfoo.so'),
+            os.path.join('stage', 'usr/lib/pkgconfig', 'foo.pc')]))
+
+    def test_cross_device_files_copied(self):
+        real_link = os.link
+        links = []
+
+        def link(*args, **kwargs):
+            links.append(args)
+            if kwargs.get('src_dir_fd') is not None:
+                raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+            return real_link(*args, **kwargs)
+
+        os.makedirs('install/usr/bin')
+        for name in ('a', 'b', 'c'):
+            open(os.path.join('install/usr/bin', name), 'w').close()
+        self.files |= {'usr/bin/a', 'usr/bin/b', 'usr/bin/c'}
+
+        with mock.patch('os.link', side_effect=link):
+            _migration.migrate_files(
+                self.files, self.dirs, 'install', 'stage')
+
+        for path in self.files:
+            self.assertTrue(os.path.exists(os.path.join('stage', path)))
+        # Only the first link attempted in a directory is made relative to
+        # its descriptor, the rest go straight to link_or_copy.
+        self.assertThat(
+            len([a for a in links if a[0] == a[1]]), Equals(3))
+
+    def test_existing_symlink_left_alone(self):
+        os.makedirs('stage/usr/lib')
+        os.symlink('libbar.so', 'stage/usr/lib/libfoo.so')
+        fixup_func = mock.Mock()
+
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage',
+                                 fixup_func=fixup_func)
+
+        self.assertThat(os.readlink('stage/usr/lib/libfoo.so'),
+                        Equals('libbar.so'))
+        self.assertThat(fixup_func.call_count, Equals(2))
+
+    def test_existing_file_replaced(self):
+        with open('stage/foo', 'w') as f:
+            f.write('staged')
+
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage')
+
+        self.assertThat('stage/foo', FileContains('foo'))
+
+    def test_missing_file(self):
+        self.files.add('usr/lib/libmissing.so')
+
+        raised = self.assertRaises(
+            errors.SnapcraftCopyFileNotFoundError,
+            _migration.migrate_files, self.files, self.dirs,
+            'install', 'stage')
+
+        self.assertThat(raised.path,
+                        Equals(os.path.join('install/usr/lib',
+                                            'libmissing.so')))
+
+    def test_missing_file_ok(self):
+        self.files.add('usr/lib/libmissing.so')
+
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage',
+                                 missing_ok=True)
+
+        self.assertFalse(os.path.exists('stage/usr/lib/libmissing.so'))
+        self.assertTrue(os.path.exists('stage/usr/lib/libfoo.so'))
+
+    def test_directories_created_like_source(self):
+        os.chmod('install/usr/lib', 0o750)
+        os.makedirs('install/usr/share/empty')
+        os.chmod('install/usr/share/empty', 0o700)
+        self.dirs |= {'usr/share', 'usr/share/empty'}
+
+        _migration.migrate_files(self.files, self.dirs, 'install', 'stage')
+
+        self.assertThat(stat.S_IMODE(os.stat('stage/usr/lib').st_mode),
+                        Equals(0o750))
+        self.assertThat(stat.S_IMODE(os.stat('stage/usr/share/empty').st_mode),
+                        Equals(0o700))
@@ -2465,6 +2465,21 @@ class CollisionTestCase(unit.TestCase):
         self.assertThat(raised.part_name, Equals('part4'))
         self.assertThat(raised.file_paths, Equals('    file.pc'))
 
+    def test_collision_digests_kept_with_part(self):
+        for part in (self.part1, self.part2):
+            os.makedirs(part.plugin.partdir)
+            path = os.path.join(part.plugin.installdir, 'same')
+            with open(path, 'w') as f:
+                f.write('same')
+            os.utime(path, (0, 0))
+
+        pluginhandler.check_for_collisions([self.part1, self.part2])
+
+        for part in (self.part1, self.part2):
+            self.assertThat(
+                os.path.join(part.plugin.partdir, 'install-index.json'),
+                FileExists())
+
     def test_collision_with_part_not_built(self):
         part_built = self.load_part(
             'part_built', part_properties={'stage': ['collision']})
@@ -180,6 +180,23 @@ class RunnerTestCase(unit.TestCase):
 
         self.assertThat(os.path.join('builddir', 'fake-build'), FileExists())
 
+    def test_builtin_function_from_build_without_pidfd(self):
+        os.mkdir('builddir')
+
+        runner = _runner.Runner(
+            part_properties={'override-build': 'snapcraftctl build'},
+            sourcedir='sourcedir',
+            builddir='builddir',
+            stagedir='stagedir',
+            primedir='primedir',
+            builtin_functions={'build': _fake_build})
+
+        with mock.patch('os.pidfd_open', side_effect=OSError(),
+                        create=True):
+            runner.build()
+
+        self.assertThat(os.path.join('builddir', 'fake-build'), FileExists())
+
     def test_install(self):
         os.mkdir('builddir')
 
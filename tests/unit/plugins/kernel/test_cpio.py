@@ -0,0 +1,197 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import gzip
+import io
+import lzma
+import os
+
+from testtools.matchers import (
+    Equals,
+    FileContains,
+    FileExists,
+    Not,
+)
+
+from snapcraft.plugins import _kernel
+from snapcraft.plugins._kernel import _cpio
+from tests import unit
+
+
+def _make_tree(root):
+    os.makedirs(os.path.join(root, 'bin'))
+    os.makedirs(os.path.join(root, 'lib', 'modules'))
+    with open(os.path.join(root, 'bin', 'init'), 'w') as f:
+        f.write('init')
+    os.chmod(os.path.join(root, 'bin', 'init'), 0o755)
+    os.symlink('bin/init', os.path.join(root, 'init'))
+    with open(os.path.join(root, 'lib', 'odd'), 'w') as f:
+        f.write('odd sized')
+
+
+def _archive(root):
+    fileobj = io.BytesIO()
+    _kernel.write_archive(root, fileobj)
+    return fileobj.getvalue()
+
+
+class CpioTestCase(unit.TestCase):
+
+    def test_round_trip(self):
+        _make_tree('src')
+
+        _kernel.extract_archive(io.BytesIO(_archive('src')), 'dst')
+
+        self.assertThat(os.path.join('dst', 'bin', 'init'),
+                        FileContains('init'))
+        self.assertThat(os.stat(os.path.join('dst', 'bin', 'init')).st_mode
+                        & 0o777, Equals(0o755))
+        self.assertThat(os.readlink(os.path.join('dst', 'init')),
+                        Equals('bin/init'))
+        self.assertThat(os.path.join('dst', 'lib', 'odd'),
+                        FileContains('odd sized'))
+        self.assertTrue(os.path.isdir(os.path.join('dst', 'lib', 'modules')))
+
+    def test_archive_is_reproducible(self):
+        _make_tree('src')
+        archive = _archive('src')
+        os.utime(os.path.join('src', 'bin', 'init'), (0, 0))
+        os.utime(os.path.join('src', 'bin', 'init'))
+
+        self.assertThat(_archive('src'), Equals(archive))
+
+    def test_archive_ends_with_trailer(self):
+        _make_tree('src')
+
+        archive = _archive('src')
+
+        self.assertTrue(archive.startswith(b'070701'))
+        self.assertThat(len(archive) % 4, Equals(0))
+        self.assertIn(b'TRAILER!!!\x00', archive[-16:])
+
+    def test_hard_links_written_as_files(self):
+        os.makedirs('src')
+        with open(os.path.join('src', 'a'), 'w') as f:
+            f.write('linked')
+        os.link(os.path.join('src', 'a'), os.path.join('src', 'b'))
+
+        _kernel.extract_archive(io.BytesIO(_archive('src')), 'dst')
+
+        self.assertThat(os.path.join('dst', 'a'), FileContains('linked'))
+        self.assertThat(os.path.join('dst', 'b'), FileContains('linked'))
+
+    def test_extract_deferred_hard_links(self):
+        fileobj = io.BytesIO()
+        # Like GNU cpio, only the last entry of a hard link has contents.
+        _cpio._write_entry(fileobj, 'a', ino=1, mode=0o100644, nlink=2)
+        _cpio._write_entry(fileobj, 'b', ino=1, mode=0o100644, nlink=2,
+                           filesize=4)
+        fileobj.write(b'data')
+        _cpio._write_entry(fileobj, _cpio._TRAILER, ino=0, mode=0)
+        fileobj.seek(0)
+
+        _kernel.extract_archive(fileobj, 'dst')
+
+        self.assertThat(os.path.join('dst', 'a'), FileContains('data'))
+        self.assertThat(os.stat(os.path.join('dst', 'a')).st_ino,
+                        Equals(os.stat(os.path.join('dst', 'b')).st_ino))
+
+    def test_extract_path_outside_archive(self):
+        fileobj = io.BytesIO()
+        _cpio._write_entry(fileobj, '../escaped', ino=1, mode=0o100644)
+        _cpio._write_entry(fileobj, _cpio._TRAILER, ino=0, mode=0)
+        fileobj.seek(0)
+
+        self.assertRaises(RuntimeError, _kernel.extract_archive,
+                          fileobj, 'dst')
+        self.assertThat('escaped', Not(FileExists()))
+
+    def test_extract_truncated(self):
+        _make_tree('src')
+
+        self.assertRaises(RuntimeError, _kernel.extract_archive,
+                          io.BytesIO(_archive('src')[:-200]), 'dst')
+
+    def test_extract_not_newc(self):
+        self.assertRaises(RuntimeError, _kernel.extract_archive,
+                          io.BytesIO(b'0' * 200), 'dst')
+
+
+class ExtractInitrdTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        _make_tree('src')
+        os.makedirs(os.path.join('early', 'kernel'))
+        with open(os.path.join('early', 'kernel', 'microcode'), 'w') as f:
+            f.write('microcode')
+
+    def _write_initrd(self, *parts):
+        with open('initrd.img', 'wb') as f:
+            for part in parts:
+                f.write(part)
+
+    def _assert_extracted(self):
+        self.assertThat(os.path.join('dst', 'bin', 'init'),
+                        FileContains('init'))
+
+    def test_gzip(self):
+        self._write_initrd(gzip.compress(_archive('src')))
+
+        _kernel.extract_initrd('initrd.img', 'dst')
+
+        self._assert_extracted()
+
+    def test_xz(self):
+        self._write_initrd(lzma.compress(_archive('src')))
+
+        _kernel.extract_initrd('initrd.img', 'dst')
+
+        self._assert_extracted()
+
+    def test_lzma(self):
+        self._write_initrd(lzma.compress(_archive('src'),
+                                         format=lzma.FORMAT_ALONE))
+
+        _kernel.extract_initrd('initrd.img', 'dst')
+
+        self._assert_extracted()
+
+    def test_uncompressed(self):
+        self._write_initrd(_archive('src'))
+
+        _kernel.extract_initrd('initrd.img', 'dst')
+
+        self._assert_extracted()
+
+    def test_early_archive_with_padding(self):
+        early = _archive('early')
+        self._write_initrd(early, b'\x00' * (1024 - len(early) % 512),
+                           lzma.compress(_archive('src')))
+
+        _kernel.extract_initrd('initrd.img', 'dst')
+
+        self._assert_extracted()
+        self.assertThat(os.path.join('dst', 'kernel', 'microcode'),
+                        FileContains('microcode'))
+
+    def test_unsupported(self):
+        self._write_initrd(b'not an initrd')
+
+        raised = self.assertRaises(RuntimeError, _kernel.extract_initrd,
+                                   'initrd.img', 'dst')
+
+        self.assertThat(str(raised),
+                        Equals('The initrd file type is unsupported'))
@@ -0,0 +1,72 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import gzip
+import io
+import os
+
+from testtools.matchers import Equals, LessThan
+
+from snapcraft.plugins import _kernel
+from tests import unit
+
+
+def _compress(data, *, chunk_size=1000, **kwargs):
+    fileobj = io.BytesIO()
+    with _kernel.ParallelGzipWriter(fileobj, **kwargs) as writer:
+        for offset in range(0, len(data), chunk_size):
+            writer.write(data[offset:offset + chunk_size])
+    return fileobj.getvalue()
+
+
+class ParallelGzipWriterTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Compressible, but not trivially so.
+        self.data = b''.join(
+            '{} {}\n'.format(i, i * 7919 % 1009).encode()
+            for i in range(20000))
+
+    def test_decompresses(self):
+        compressed = _compress(self.data, block_size=4096, workers=4)
+
+        self.assertThat(gzip.decompress(compressed), Equals(self.data))
+
+    def test_empty(self):
+        self.assertThat(gzip.decompress(_compress(b'')), Equals(b''))
+
+    def test_reproducible(self):
+        self.assertThat(_compress(self.data, block_size=4096, workers=4),
+                        Equals(_compress(self.data, block_size=4096,
+                                         workers=1)))
+
+    def test_compresses_like_gzip(self):
+        compressed = _compress(self.data, block_size=4096, workers=4)
+
+        # Priming each block with the previous one keeps the ratio close.
+        self.assertThat(len(compressed),
+                        LessThan(len(gzip.compress(self.data)) * 1.1))
+
+    def test_fileobj_left_open(self):
+        with open('data.gz', 'wb') as f:
+            with _kernel.ParallelGzipWriter(f) as writer:
+                writer.write(self.data)
+            self.assertFalse(f.closed)
+
+        with gzip.open('data.gz') as f:
+            self.assertThat(f.read(), Equals(self.data))
+        self.assertThat(os.path.getsize('data.gz'),
+                        LessThan(len(self.data)))
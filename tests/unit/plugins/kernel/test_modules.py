@@ -0,0 +1,93 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+
+from testtools.matchers import Equals
+
+from snapcraft.plugins import _kernel
+from tests import unit
+
+
+class ResolveModulesTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.modules_dir = os.path.join('lib', 'modules', '4.4.0')
+        os.makedirs(self.modules_dir)
+        self._write('modules.dep', [
+            'kernel/fs/squashfs/squashfs.ko: kernel/lib/zstd.ko',
+            'kernel/lib/zstd.ko:',
+            'kernel/drivers/nls_utf8.ko:',
+            'kernel/drivers/usb-storage.ko.xz: kernel/drivers/usb_common.ko',
+            'kernel/drivers/usb_common.ko:',
+            '/lib/modules/4.4.0/kernel/drivers/old.ko:',
+        ])
+
+    def _write(self, name, lines):
+        with open(os.path.join(self.modules_dir, name), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _resolve(self, *names):
+        return _kernel.resolve_modules(self.modules_dir, list(names))
+
+    def test_dependencies(self):
+        self.assertThat(self._resolve('squashfs'), Equals((
+            {'kernel/fs/squashfs/squashfs.ko', 'kernel/lib/zstd.ko'}, [])))
+
+    def test_dashes_and_underscores(self):
+        self.assertThat(self._resolve('usb_storage'), Equals((
+            {'kernel/drivers/usb-storage.ko.xz',
+             'kernel/drivers/usb_common.ko'}, [])))
+
+    def test_absolute_paths(self):
+        self.assertThat(self._resolve('old'), Equals((
+            {'kernel/drivers/old.ko'}, [])))
+
+    def test_builtin(self):
+        self._write('modules.builtin', ['kernel/fs/ext4/ext4.ko'])
+
+        self.assertThat(self._resolve('ext4'), Equals((set(), [])))
+
+    def test_softdep(self):
+        self._write('modules.softdep', [
+            '# Soft dependencies extracted from modules themselves.',
+            'softdep squashfs pre: nls-utf8',
+        ])
+
+        self.assertThat(self._resolve('squashfs'), Equals((
+            {'kernel/fs/squashfs/squashfs.ko', 'kernel/lib/zstd.ko',
+             'kernel/drivers/nls_utf8.ko'}, [])))
+
+    def test_alias(self):
+        self._write('modules.alias', ['alias fs-squashfs squashfs',
+                                      'alias usb:v*p* usb-storage'])
+
+        self.assertThat(self._resolve('fs-squashfs', 'usb:v1234p5678'),
+                        Equals(({'kernel/fs/squashfs/squashfs.ko',
+                                 'kernel/lib/zstd.ko',
+                                 'kernel/drivers/usb-storage.ko.xz',
+                                 'kernel/drivers/usb_common.ko'}, [])))
+
+    def test_unresolved(self):
+        self.assertThat(self._resolve('squashfs', 'missing'), Equals((
+            {'kernel/fs/squashfs/squashfs.ko', 'kernel/lib/zstd.ko'},
+            ['missing'])))
+
+    def test_no_modules_dep(self):
+        os.unlink(os.path.join(self.modules_dir, 'modules.dep'))
+
+        self.assertThat(self._resolve('squashfs'),
+                        Equals((set(), ['squashfs'])))
@@ -14,8 +14,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import os
+import shutil
 import subprocess
+import time
 
 import fixtures
 from unittest import mock
@@ -23,10 +26,14 @@ from unittest import mock
 from testtools.matchers import (
     Contains,
     Equals,
+    FileContains,
     HasLength,
+    Not,
 )
 
+from snapcraft.internal import cache
 from snapcraft.plugins._python import (
+    _inventory,
     _pip,
     errors,
 )
@@ -695,6 +702,64 @@ class PipWheelTestCase(PipCommandBaseTestCase):
         self._assert_mock_run_with(self.expected_args, **self.expected_kwargs)
 
 
+class PipWheelCacheTestCase(PipCommandBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.package_dir = os.path.join('part_dir', 'python-packages')
+        open(os.path.join(self.package_dir, 'foo-1.0.tar.gz'), 'w').close()
+        self.mock_run.side_effect = self._fake_wheel
+
+    def _fake_wheel(self, args, **kwargs):
+        wheel_dir = args[args.index('--wheel-dir') + 1]
+        with open(os.path.join(wheel_dir,
+                               'foo-1.0-cp36-cp36m-linux_x86_64.whl'),
+                  'w') as f:
+            f.write('wheel')
+
+    def test_built_wheel_is_cached(self):
+        self.pip.wheel(['foo'])
+
+        self.assertThat(
+            cache.WheelCache().get(
+                name='foo', version='1.0',
+                build_key=self.pip._get_wheel_build_key()),
+            FileContains('wheel'))
+
+    def test_cached_wheel_is_provided_to_pip(self):
+        self.pip.wheel(['foo'])
+        shutil.rmtree(self.package_dir)
+        os.makedirs(self.package_dir)
+        open(os.path.join(self.package_dir, 'foo-1.0.tar.gz'), 'w').close()
+
+        wheel_cache = cache.WheelCache()
+        with mock.patch.object(wheel_cache, 'cache') as mock_cache:
+            with mock.patch('snapcraft.internal.cache.WheelCache',
+                            return_value=wheel_cache):
+                self.pip.wheel(['foo'])
+
+        self.assertThat(
+            os.path.join(self.package_dir,
+                         'foo-1.0-cp36-cp36m-linux_x86_64.whl'),
+            FileContains('wheel'))
+        mock_cache.assert_not_called()
+
+    def test_build_environment_changes_key(self):
+        build_key = self.pip._get_wheel_build_key()
+        self.useFixture(fixtures.EnvironmentVariable('CFLAGS', '-O3'))
+
+        self.assertThat(self.pip._get_wheel_build_key(),
+                        Not(Equals(build_key)))
+
+    def test_wheel_without_sdist_is_not_cached(self):
+        os.remove(os.path.join(self.package_dir, 'foo-1.0.tar.gz'))
+
+        self.pip.wheel(['foo'])
+
+        self.assertFalse(os.path.exists(cache.WheelCache().wheel_cache_root))
+
+
 class PipListTestCase(PipCommandBaseTestCase):
 
     def test_none(self):
@@ -757,6 +822,102 @@ class PipListTestCase(PipCommandBaseTestCase):
         self.assertThat(raised.output, Equals('foo 1.0'))
 
 
+class PipListInventoryTestCase(PipCommandBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        lib_dir = os.path.join('install_dir', 'usr', 'lib', 'pythontest.1')
+        os.makedirs(lib_dir)
+        open(os.path.join(lib_dir, 'os.py'), 'w').close()
+        self.user_site = os.path.join(
+            'install_dir', 'lib', 'pythontest.1', 'site-packages')
+        self.system_site = os.path.join(
+            'install_dir', 'usr', 'lib', 'pythontest', 'dist-packages')
+
+        patcher = mock.patch.object(_inventory, '_cache', dict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_dist_info(self, site_dir, name, version):
+        dist_info = os.path.join(
+            site_dir, '{}-{}.dist-info'.format(name, version))
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.0\nName: {}\nVersion: {}\n\n'
+                    'Name: not-a-header\n'.format(name, version))
+
+    def add_egg_info(self, site_dir, name, version):
+        os.makedirs(site_dir, exist_ok=True)
+        egg_info = os.path.join(
+            site_dir, '{}-{}.egg-info'.format(name, version))
+        with open(egg_info, 'w') as f:
+            f.write('Metadata-Version: 1.0\nName: {}\nVersion: {}\n'.format(
+                name, version))
+
+    def test_packages_read_from_site_dirs(self):
+        self.add_dist_info(self.user_site, 'wheel', '0.31.0')
+        self.add_dist_info(self.system_site, 'Django', '2.0')
+        self.add_egg_info(self.system_site, 'setuptools', '39.0.1')
+
+        self.assertThat(self.pip.list(), Equals(collections.OrderedDict([
+            ('Django', '2.0'), ('setuptools', '39.0.1'),
+            ('wheel', '0.31.0')])))
+        self.mock_run.assert_not_called()
+
+    def test_user(self):
+        self.add_dist_info(self.user_site, 'wheel', '0.31.0')
+        self.add_dist_info(self.system_site, 'Django', '2.0')
+
+        self.assertThat(self.pip.list(user=True), Equals({'wheel': '0.31.0'}))
+
+    def test_user_site_first(self):
+        self.add_dist_info(self.user_site, 'foo', '2.0')
+        self.add_dist_info(self.system_site, 'foo', '1.0')
+
+        self.assertThat(self.pip.list(), Equals({'foo': '2.0'}))
+
+    def test_develop_installs(self):
+        os.makedirs(os.path.join('src', 'foo.egg-info'))
+        with open(os.path.join('src', 'foo.egg-info', 'PKG-INFO'), 'w') as f:
+            f.write('Name: foo\nVersion: 1.0\n')
+        os.makedirs(self.user_site)
+        with open(os.path.join(self.user_site, 'easy-install.pth'),
+                  'w') as f:
+            f.write('import sys\n{}\n'.format(os.path.abspath('src')))
+
+        self.assertThat(self.pip.list(), Equals({'foo': '1.0'}))
+
+    def test_installs_seen(self):
+        self.add_dist_info(self.user_site, 'foo', '1.0')
+        self.pip.list()
+
+        self.add_dist_info(self.user_site, 'bar', '1.0')
+
+        self.assertThat(self.pip.list(),
+                        Equals({'bar': '1.0', 'foo': '1.0'}))
+
+    def test_unchanged_site_dirs_reused(self):
+        self.add_dist_info(self.user_site, 'foo', '1.0')
+        past = time.time() - 60
+        for root, directories, files in os.walk('install_dir'):
+            for name in directories + files:
+                os.utime(os.path.join(root, name), (past, past))
+        self.pip.list()
+
+        with mock.patch.object(_inventory, '_read_inventory') as mock_read:
+            self.assertThat(self.pip.list(), Equals({'foo': '1.0'}))
+        mock_read.assert_not_called()
+
+    def test_pip_used_without_lib_dir(self):
+        shutil.rmtree(os.path.join('install_dir', 'usr', 'lib'))
+        self.mock_run.return_value = '[{"name": "foo", "version": "1.0"}]'
+
+        self.assertThat(self.pip.list(), Equals({'foo': '1.0'}))
+        self.mock_run.assert_called_once_with(
+            ['list', '--format=json'], runner=mock.ANY)
+
+
 class _CheckPythonhomeEnv():
     def __init__(self, test, expected_pythonhome):
         self.test = test
@@ -18,7 +18,7 @@ import os
 import subprocess
 
 from unittest import mock
-from testtools.matchers import Equals
+from testtools.matchers import Equals, HasLength
 
 from snapcraft.plugins._ros import rosdep
 
@@ -198,6 +198,111 @@ class RosdepTestCase(unit.TestCase):
                 'pip': {'lib2'},
             }))
 
+    def test_get_dependencies_multiple_packages(self):
+        self.check_output_mock.return_value = b'bar\nbaz'
+
+        self.assertThat(self.rosdep.get_dependencies('foo', 'qux'),
+                        Equals({'bar', 'baz'}))
+
+        self.check_output_mock.assert_called_once_with(
+            ['rosdep', 'keys', 'foo', 'qux'], env=mock.ANY)
+
+    def test_get_dependencies_multiple_packages_one_invalid(self):
+        def _fake_keys(command, env):
+            if 'bar' in command:
+                raise subprocess.CalledProcessError(1, 'foo')
+            return b'baz'
+        self.check_output_mock.side_effect = _fake_keys
+
+        raised = self.assertRaises(
+            FileNotFoundError,
+            self.rosdep.get_dependencies, 'foo', 'bar')
+
+        self.assertThat(str(raised),
+                        Equals('Unable to find Catkin package "bar"'))
+
+    def test_resolve_dependencies(self):
+        self.check_output_mock.return_value = (
+            b'#ROSDEP[bar]\n#apt\nlib1\n#ROSDEP[foo]\n#apt\nlib2 lib3\n'
+            b'#pip\nlib4')
+
+        self.assertThat(self.rosdep.resolve_dependencies(['foo', 'bar']),
+                        Equals({
+                            'foo': {'apt': {'lib2', 'lib3'}, 'pip': {'lib4'}},
+                            'bar': {'apt': {'lib1'}},
+                        }))
+
+        self.check_output_mock.assert_called_once_with(
+            ['rosdep', 'resolve', 'bar', 'foo', '--rosdistro', 'kinetic',
+             '--os', 'ubuntu:xenial'],
+            env=mock.ANY)
+
+    def test_resolve_dependencies_memoized(self):
+        self.check_output_mock.return_value = (
+            b'#ROSDEP[bar]\n#apt\nlib1\n#ROSDEP[foo]\n#apt\nlib2')
+        self.rosdep.resolve_dependencies(['foo', 'bar'])
+        self.check_output_mock.reset_mock()
+
+        self.assertThat(self.rosdep.resolve_dependency('foo'),
+                        Equals({'apt': {'lib2'}}))
+        self.check_output_mock.assert_not_called()
+
+    def test_resolve_dependencies_invalid_dependency(self):
+        def _fake_resolve(command, env):
+            if 'foo' in command:
+                raise subprocess.CalledProcessError(
+                    1, command,
+                    output=b'#ROSDEP[bar]\n#apt\nlib1\n#ROSDEP[foo]')
+            return b'#apt\nlib1'
+        self.check_output_mock.side_effect = _fake_resolve
+
+        raised = self.assertRaises(
+            rosdep.RosdepDependencyNotFoundError,
+            self.rosdep.resolve_dependencies, ['foo', 'bar'])
+
+        self.assertThat(
+            str(raised),
+            Equals("rosdep cannot resolve 'foo' into a valid dependency"))
+        # Only the failing dependency was resolved again
+        self.assertThat(self.check_output_mock.call_args_list, HasLength(2))
+
+    def test_resolve_dependencies_cached_across_instances(self):
+        sources_cache_path = os.path.join(
+            self.rosdep._rosdep_cache_path, 'rosdep', 'sources.cache')
+        os.makedirs(sources_cache_path)
+        with open(os.path.join(sources_cache_path, 'index'), 'w') as f:
+            f.write('index')
+        self.check_output_mock.return_value = (
+            b'#ROSDEP[bar]\n#apt\nlib1\n#ROSDEP[foo]\n#apt\nlib2')
+        self.rosdep.resolve_dependencies(['foo', 'bar'])
+        self.check_output_mock.reset_mock()
+
+        other_rosdep = rosdep.Rosdep(
+            ros_distro='kinetic',
+            ros_package_path='other_package_path',
+            rosdep_path='rosdep_path',
+            ubuntu_distro='xenial',
+            ubuntu_sources='sources',
+            project=self.project)
+        self.assertThat(other_rosdep.resolve_dependencies(['foo', 'bar']),
+                        Equals({'foo': {'apt': {'lib2'}},
+                                'bar': {'apt': {'lib1'}}}))
+        self.check_output_mock.assert_not_called()
+
+        # An updated database resolves anew
+        with open(os.path.join(sources_cache_path, 'index'), 'w') as f:
+            f.write('updated index')
+        self.check_output_mock.return_value = b'#apt\nlib3'
+        other_rosdep = rosdep.Rosdep(
+            ros_distro='kinetic',
+            ros_package_path='other_package_path',
+            rosdep_path='rosdep_path',
+            ubuntu_distro='xenial',
+            ubuntu_sources='sources',
+            project=self.project)
+        self.assertThat(other_rosdep.resolve_dependency('foo'),
+                        Equals({'apt': {'lib3'}}))
+
     def test_run(self):
         rosdep = self.rosdep
         rosdep._run(['qux'])
@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import ast
-import builtins
 import os
 import os.path
 import re
@@ -612,18 +611,21 @@ class CatkinPluginTestCase(CatkinPluginBaseTestCase):
                                      self.project_options)
         os.makedirs(plugin.rosdir)
 
-        # Place a file to be discovered by _use_in_snap_python().
-        open(os.path.join(plugin.rosdir, 'foo'), 'w').close()
+        # Place binaries to be discovered by _use_in_snap_python(), which
+        # are not valid UTF-8 either.
+        contents = {
+            'elf': b'\x7fELF\xff#!/usr/bin/python',
+            'binary': b'#!/usr/bin/python\0\xff',
+        }
+        for name, data in contents.items():
+            with open(os.path.join(plugin.rosdir, name), 'wb') as f:
+                f.write(data)
+
+        plugin._use_in_snap_python()
 
-        file_mock = mock.mock_open()
-        with mock.patch.object(builtins, 'open', file_mock):
-            # Reading a binary file may throw a UnicodeDecodeError. Make sure
-            # that's handled.
-            file_mock.return_value.read.side_effect = UnicodeDecodeError(
-                'foo', b'bar', 1, 2, 'baz')
-            # An exception will be raised if the function can't handle the
-            # binary file.
-            plugin._use_in_snap_python()
+        for name, data in contents.items():
+            with open(os.path.join(plugin.rosdir, name), 'rb') as f:
+                self.assertThat(f.read(), Equals(data))
 
     def test_use_in_snap_python_rewrites_10_ros_sh(self):
         plugin = catkin.CatkinPlugin('test-part', self.properties,
@@ -1486,84 +1488,94 @@ class FindSystemDependenciesTestCase(unit.TestCase):
         self.rosdep_mock = mock.MagicMock()
         self.rosdep_mock.get_dependencies.return_value = {'bar'}
 
+        def _fake_resolve_dependencies(dependency_names):
+            return {name: {'apt': {'baz'}} for name in dependency_names}
+
+        self.rosdep_mock.resolve_dependencies.side_effect = (
+            _fake_resolve_dependencies)
+
         self.catkin_mock = mock.MagicMock()
-        exception = catkin.CatkinPackageNotFoundError('foo')
-        self.catkin_mock.find.side_effect = exception
+        self.catkin_mock.find_packages.return_value = {}
 
     def test_find_system_dependencies_system_only(self):
-        self.rosdep_mock.resolve_dependency.return_value = {
-            'apt': {'baz'},
-        }
-
         self.assertThat(catkin._find_system_dependencies(
             {'foo'}, self.rosdep_mock, self.catkin_mock), Equals(
             {'apt': {'baz'}}))
 
         self.rosdep_mock.get_dependencies.assert_called_once_with('foo')
-        self.rosdep_mock.resolve_dependency.assert_called_once_with('bar')
-        self.catkin_mock.find.assert_called_once_with('bar')
+        self.rosdep_mock.resolve_dependencies.assert_called_once_with({'bar'})
+        self.catkin_mock.find_packages.assert_called_once_with({'bar'})
 
     def test_find_system_dependencies_system_only_no_packages(self):
-        self.rosdep_mock.resolve_dependency.return_value = {
-            'apt': {'baz'},
-        }
-
         self.assertThat(catkin._find_system_dependencies(
             None, self.rosdep_mock, self.catkin_mock), Equals(
             {'apt': {'baz'}}))
 
         self.rosdep_mock.get_dependencies.assert_called_once_with()
-        self.rosdep_mock.resolve_dependency.assert_called_once_with('bar')
-        self.catkin_mock.find.assert_called_once_with('bar')
+        self.rosdep_mock.resolve_dependencies.assert_called_once_with({'bar'})
+        self.catkin_mock.find_packages.assert_called_once_with({'bar'})
+
+    def test_find_system_dependencies_empty_packages(self):
+        self.assertThat(catkin._find_system_dependencies(
+            set(), self.rosdep_mock, self.catkin_mock), HasLength(0))
+
+        self.rosdep_mock.get_dependencies.assert_not_called()
+        self.catkin_mock.find_packages.assert_not_called()
 
     def test_find_system_dependencies_local_only(self):
         self.assertThat(catkin._find_system_dependencies(
             {'foo', 'bar'}, self.rosdep_mock, self.catkin_mock),
             HasLength(0))
 
-        self.rosdep_mock.get_dependencies.assert_has_calls(
-            [mock.call('foo'), mock.call('bar')], any_order=True)
-        self.rosdep_mock.resolve_dependency.assert_not_called()
-        self.catkin_mock.find.assert_not_called()
+        self.rosdep_mock.get_dependencies.assert_called_once_with(
+            'bar', 'foo')
+        self.rosdep_mock.resolve_dependencies.assert_called_once_with(set())
+        self.catkin_mock.find_packages.assert_not_called()
 
     def test_find_system_dependencies_satisfied_in_stage(self):
-        self.catkin_mock.find.side_effect = None
-        self.catkin_mock.find.return_value = 'baz'
+        self.catkin_mock.find_packages.return_value = {'bar': 'baz'}
 
         self.assertThat(catkin._find_system_dependencies(
             {'foo'}, self.rosdep_mock, self.catkin_mock), HasLength(0))
 
         self.rosdep_mock.get_dependencies.assert_called_once_with('foo')
-        self.catkin_mock.find.assert_called_once_with('bar')
-        self.rosdep_mock.resolve_dependency.assert_not_called()
+        self.catkin_mock.find_packages.assert_called_once_with({'bar'})
+        self.rosdep_mock.resolve_dependencies.assert_called_once_with(set())
 
     def test_find_system_dependencies_mixed(self):
         self.rosdep_mock.get_dependencies.return_value = {'bar', 'baz', 'qux'}
-        self.rosdep_mock.resolve_dependency.return_value = {
-            'apt': {'quux'},
+        self.rosdep_mock.resolve_dependencies.side_effect = None
+        self.rosdep_mock.resolve_dependencies.return_value = {
+            'baz': {'apt': {'quux'}},
         }
+        self.catkin_mock.find_packages.return_value = {'qux': 'qux'}
 
-        def _fake_find(package_name):
-            if package_name == 'qux':
-                return package_name
-            raise catkin.CatkinPackageNotFoundError(package_name)
-
-        self.catkin_mock.find.side_effect = _fake_find
         self.assertThat(catkin._find_system_dependencies(
             {'foo', 'bar'}, self.rosdep_mock, self.catkin_mock),
             Equals({'apt': {'quux'}}))
 
-        self.rosdep_mock.get_dependencies.assert_has_calls(
-            [mock.call('foo'), mock.call('bar')], any_order=True)
-        self.rosdep_mock.resolve_dependency.assert_called_once_with('baz')
-        self.catkin_mock.find.assert_has_calls(
-            [mock.call('baz'), mock.call('qux')], any_order=True)
+        self.rosdep_mock.get_dependencies.assert_called_once_with(
+            'bar', 'foo')
+        self.rosdep_mock.resolve_dependencies.assert_called_once_with({'baz'})
+        self.catkin_mock.find_packages.assert_called_once_with({'baz', 'qux'})
+
+    def test_find_system_dependencies_merges_types(self):
+        self.rosdep_mock.get_dependencies.return_value = {'bar', 'baz'}
+        self.rosdep_mock.resolve_dependencies.side_effect = None
+        self.rosdep_mock.resolve_dependencies.return_value = {
+            'bar': {'apt': {'qux'}, 'pip': {'quux'}},
+            'baz': {'apt': {'corge'}},
+        }
+
+        self.assertThat(catkin._find_system_dependencies(
+            {'foo'}, self.rosdep_mock, self.catkin_mock),
+            Equals({'apt': {'qux', 'corge'}, 'pip': {'quux'}}))
 
     def test_find_system_dependencies_missing_local_dependency(self):
         # Setup a dependency on a non-existing package, and it doesn't resolve
         # to a system dependency.'
-        exception = _ros.rosdep.RosdepDependencyNotFoundError('foo')
-        self.rosdep_mock.resolve_dependency.side_effect = exception
+        exception = _ros.rosdep.RosdepDependencyNotFoundError('bar')
+        self.rosdep_mock.resolve_dependencies.side_effect = exception
 
         raised = self.assertRaises(
             catkin.CatkinInvalidSystemDependencyError,
@@ -1578,8 +1590,9 @@ class FindSystemDependenciesTestCase(unit.TestCase):
             "database."))
 
     def test_find_system_dependencies_raises_if_unsupported_type(self):
-        self.rosdep_mock.resolve_dependency.return_value = {
-            'unsupported-type': {'baz'},
+        self.rosdep_mock.resolve_dependencies.side_effect = None
+        self.rosdep_mock.resolve_dependencies.return_value = {
+            'bar': {'unsupported-type': {'baz'}},
         }
 
         raised = self.assertRaises(
@@ -1833,3 +1846,34 @@ class CatkinFindTestCase(unit.TestCase):
         self.assertThat(
             ' '.join(positional_args),
             Contains('catkin_find --first-only foo'))
+
+    def test_find_packages(self):
+        self.check_output_mock.return_value = b'foo\tpath/foo\n'
+
+        self.assertThat(self.catkin.find_packages({'foo', 'bar'}),
+                        Equals({'foo': 'path/foo'}))
+
+        self.check_output_mock.assert_called_once_with(
+            mock.ANY, stderr=subprocess.DEVNULL)
+        positional_args = self.check_output_mock.call_args[0][0]
+        self.assertThat(positional_args[-2:], Equals(['bar', 'foo']))
+
+        # What was looked up is not looked up again
+        self.check_output_mock.reset_mock()
+        self.assertThat(self.catkin.find('foo'), Equals('path/foo'))
+        self.assertRaises(
+            catkin.CatkinPackageNotFoundError, self.catkin.find, 'bar')
+        self.check_output_mock.assert_not_called()
+
+    def test_find_packages_falls_back_to_catkin_find(self):
+        def _fake_run(command, stderr):
+            if 'catkin_find' not in command:
+                raise subprocess.CalledProcessError(1, 'foo')
+            elif 'foo' in command:
+                return b'path/foo'
+            raise subprocess.CalledProcessError(1, 'bar')
+        self.check_output_mock.side_effect = _fake_run
+
+        self.assertThat(self.catkin.find_packages({'foo', 'bar'}),
+                        Equals({'foo': 'path/foo'}))
+        self.assertThat(self.check_output_mock.call_args_list, HasLength(3))
@@ -15,9 +15,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import contextlib
+import gzip
 import logging
+import lzma
 import os
-import subprocess
+import shutil
 from unittest import mock
 
 import fixtures
@@ -27,7 +29,8 @@ from textwrap import dedent
 
 import snapcraft
 from snapcraft import storeapi
-from snapcraft.plugins import kernel
+from snapcraft.internal import cache
+from snapcraft.plugins import _kernel, kernel
 from tests import unit
 
 
@@ -53,8 +56,17 @@ class KernelPluginTestCase(unit.TestCase):
         self.options = Options()
         self.project_options = snapcraft.ProjectOptions()
 
+        self.initrd_open = lzma.open
+
+        def fake_unsquashfs(*args, **kwargs):
+            if args[0][0] == 'unsquashfs':
+                self._make_generic_initrd(os.path.join(
+                    kwargs['cwd'], 'squashfs-root', 'boot',
+                    'initrd.img-core'))
+
         patcher = mock.patch('subprocess.check_call')
         self.check_call_mock = patcher.start()
+        self.check_call_mock.side_effect = fake_unsquashfs
         self.addCleanup(patcher.stop)
 
         patcher = mock.patch.object(kernel.KernelPlugin, 'run')
@@ -73,7 +85,10 @@ class KernelPluginTestCase(unit.TestCase):
         def tempdir():
             self.tempdir = 'temporary-directory'
             os.mkdir(self.tempdir)
-            yield self.tempdir
+            try:
+                yield self.tempdir
+            finally:
+                shutil.rmtree(self.tempdir)
 
         patcher = mock.patch('tempfile.TemporaryDirectory')
         self.tempdir_mock = patcher.start()
@@ -136,24 +151,34 @@ class KernelPluginTestCase(unit.TestCase):
         for property in expected_build_properties:
             self.assertIn(property, resulting_build_properties)
 
+    def _make_generic_initrd(self, path):
+        tree = path + '.tree'
+        os.makedirs(os.path.join(tree, 'bin'))
+        with open(os.path.join(tree, 'bin', 'init'), 'w') as f:
+            f.write('generic')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.initrd_open(path, 'wb') as f:
+            _kernel.write_archive(tree, f)
+
     def _assert_generic_check_call(self, builddir, installdir, os_snap_path):
-        self.assertThat(self.check_call_mock.call_count, Equals(4))
+        self.assertThat(self.check_call_mock.call_count, Equals(2))
         self.check_call_mock.assert_has_calls([
             mock.call('yes "" | make -j2 oldconfig', shell=True,
                       cwd=builddir),
             mock.call(['unsquashfs', os_snap_path,
                        'boot'],
                       cwd='temporary-directory'),
-            mock.call('cat temporary-directory/squashfs-root/boot'
-                      '/initrd.img-core | xz -dc | cpio -i',
-                      cwd=os.path.join(builddir, 'initrd-staging'),
-                      shell=True),
-            mock.call('find . | cpio --create --format=newc | '
-                      'gzip > {}'.format(os.path.join(
-                          installdir, 'initrd-4.4.2.img')),
-                      cwd=os.path.join(builddir, 'initrd-staging'), shell=True)
         ])
 
+    def _assert_initrd_contains(self, installdir, *paths):
+        extracted = os.path.join(self.path, 'extracted-initrd')
+        os.mkdir(extracted)
+        with gzip.open(os.path.join(installdir, 'initrd-4.4.2.img')) as f:
+            _kernel.extract_archive(f, extracted)
+        for path in ('bin/init',) + paths:
+            self.assertTrue(os.path.exists(os.path.join(extracted, path)),
+                            'Missing {} in initrd'.format(path))
+
     def _assert_common_assets(self, installdir):
         for asset in ['initrd-4.4.2.img', 'initrd.img', 'kernel.img',
                       'bzImage-4.4.2', 'System.map-4.4.2']:
@@ -213,48 +238,62 @@ class KernelPluginTestCase(unit.TestCase):
         self.base_build_mock.side_effect = create_assets
 
     def test_unpack_gzip_initrd(self):
-        def check_call_effect(*args, **kwargs):
-            if 'xz' in args[0]:
-                raise subprocess.CalledProcessError(1, args)
+        self.initrd_open = gzip.open
+        plugin = kernel.KernelPlugin('test-part', self.options,
+                                     self.project_options)
 
-        self.check_call_mock.side_effect = check_call_effect
+        initrd_path = plugin._unpack_generic_initrd()
 
+        self.assertThat(initrd_path, Equals(
+            os.path.join(plugin.builddir, 'initrd-staging')))
+        self.assertThat(os.path.join(initrd_path, 'bin', 'init'),
+                        FileContains('generic'))
+
+    def test_unpack_lzma_initrd(self):
         plugin = kernel.KernelPlugin('test-part', self.options,
                                      self.project_options)
-        plugin._unpack_generic_initrd()
 
-        self.check_call_mock.assert_has_calls([
-            mock.call('cat temporary-directory/squashfs-root/boot/'
-                      'initrd.img-core | gzip -dc | cpio -i',
-                      cwd=os.path.join(plugin.builddir, 'initrd-staging'),
-                      shell=True)
-        ])
+        initrd_path = plugin._unpack_generic_initrd()
 
-    def test_unpack_lzma_initrd(self):
+        self.assertThat(os.path.join(initrd_path, 'bin', 'init'),
+                        FileContains('generic'))
+
+    def test_unpack_unsupported_initrd_type(self):
+        self.initrd_open = open
         plugin = kernel.KernelPlugin('test-part', self.options,
                                      self.project_options)
 
+        with mock.patch.object(_kernel, 'write_archive',
+                               side_effect=lambda tree, f: f.write(b'foo')):
+            self.assertRaises(
+                RuntimeError,
+                plugin._unpack_generic_initrd)
+
+    def test_unpack_initrd_cached(self):
+        plugin = kernel.KernelPlugin('test-part', self.options,
+                                     self.project_options)
         plugin._unpack_generic_initrd()
+        os.remove(os.path.join(
+            plugin.builddir, 'initrd-staging', 'bin', 'init'))
 
-        self.check_call_mock.assert_has_calls([
-            mock.call('cat temporary-directory/squashfs-root/boot/'
-                      'initrd.img-core | xz -dc | cpio -i',
-                      cwd=os.path.join(plugin.builddir, 'initrd-staging'),
-                      shell=True)
-        ])
+        with mock.patch.object(_kernel, 'extract_initrd') as extract_mock:
+            initrd_path = plugin._unpack_generic_initrd()
 
-    def test_unpack_unsupported_initrd_type(self):
-        def check_call_effect(*args, **kwargs):
-            if 'unsquashfs' not in args[0]:
-                raise subprocess.CalledProcessError(1, args)
+        extract_mock.assert_not_called()
+        self.assertThat(os.path.join(initrd_path, 'bin', 'init'),
+                        FileContains('generic'))
 
-        self.check_call_mock.side_effect = check_call_effect
+    def test_unpack_initrd_other_cores_kept(self):
         plugin = kernel.KernelPlugin('test-part', self.options,
                                      self.project_options)
+        plugin._unpack_generic_initrd()
+        self.initrd_open = gzip.open
+
+        plugin._unpack_generic_initrd()
 
-        self.assertRaises(
-            RuntimeError,
-            plugin._unpack_generic_initrd)
+        self.assertThat(
+            [e for e in os.listdir(cache.InitrdCache().initrd_cache_root)
+             if not e.endswith('.lock')], HasLength(2))
 
     def test_pack_initrd_modules(self):
         self.options.kernel_initrd_modules = [
@@ -322,6 +361,35 @@ class KernelPluginTestCase(unit.TestCase):
         self.run_output_mock.assert_has_calls([
             mock.call(modprobe_cmd + ['vfat'], env=mock.ANY)])
 
+    def test_pack_initrd_modules_from_modules_dep(self):
+        self.options.kernel_initrd_modules = ['squashfs']
+
+        plugin = kernel.KernelPlugin('test-part', self.options,
+                                     self.project_options)
+
+        # Fake some assets
+        plugin.kernel_release = '4.4'
+        modules_path = os.path.join(plugin.installdir, 'lib', 'modules', '4.4')
+        os.makedirs(os.path.join(modules_path, 'kernel', 'fs'))
+        with open(os.path.join(modules_path, 'modules.dep'), 'w') as f:
+            f.write('kernel/fs/squashfs.ko: kernel/fs/zlib.ko\n'
+                    'kernel/fs/zlib.ko:\n')
+        open(os.path.join(modules_path, 'modules.dep.bin'), 'w').close()
+        for module in ('squashfs.ko', 'zlib.ko'):
+            open(os.path.join(modules_path, 'kernel', 'fs', module),
+                 'w').close()
+        os.makedirs('staging')
+
+        with mock.patch.object(plugin, '_unpack_generic_initrd') as m_unpack:
+            m_unpack.return_value = 'staging'
+            plugin._make_initrd()
+
+        self.run_output_mock.assert_not_called()
+        for path in ('kernel/fs/squashfs.ko', 'kernel/fs/zlib.ko',
+                     'modules.dep', 'modules.dep.bin'):
+            self.assertTrue(os.path.exists(os.path.join(
+                'staging', 'lib', 'modules', '4.4', path)))
+
     @mock.patch.object(
         snapcraft.ProjectOptions,
         'kernel_arch', new='not_arm')
@@ -381,22 +449,13 @@ class KernelPluginTestCase(unit.TestCase):
 
         plugin.build()
 
-        self.assertThat(self.check_call_mock.call_count, Equals(4))
+        self.assertThat(self.check_call_mock.call_count, Equals(2))
         self.check_call_mock.assert_has_calls([
             mock.call('yes "" | make -j2 V=1 oldconfig', shell=True,
                       cwd=plugin.builddir),
             mock.call(['unsquashfs', plugin.os_snap,
                        'boot'],
                       cwd='temporary-directory'),
-            mock.call('cat temporary-directory/squashfs-root/boot/'
-                      'initrd.img-core | xz -dc | cpio -i',
-                      cwd=os.path.join(plugin.builddir, 'initrd-staging'),
-                      shell=True),
-            mock.call('find . | cpio --create --format=newc | '
-                      'gzip > {}'.format(os.path.join(
-                          plugin.installdir, 'initrd-4.4.2.img')),
-                      cwd=os.path.join(plugin.builddir, 'initrd-staging'),
-                      shell=True)
         ])
 
         self.assertThat(self.run_mock.call_count, Equals(2))
@@ -703,15 +762,6 @@ ACCEPT=n
         self._simulate_build(
             plugin.sourcedir, plugin.builddir, plugin.installdir)
 
-        def fake_unpack(*args, **kwargs):
-            modules_dir = os.path.join(
-                plugin.builddir, 'initrd-staging', 'lib', 'modules', '4.4.2')
-            if os.path.exists(modules_dir):
-                return
-            os.makedirs(modules_dir)
-
-        self.check_call_mock.side_effect = fake_unpack
-
         def fake_output(*args, **kwargs):
             if args[0][:3] == ['modprobe', '-n', '--show-depends']:
                 module_path = os.path.join(
@@ -762,6 +812,9 @@ ACCEPT=n
                 'modprobe', '-n', '--show-depends', '-d',
                 plugin.installdir, '-S', '4.4.2', 'my-fake-module'],
                 env=_check_env(self))])
+        self._assert_initrd_contains(
+            plugin.installdir, 'lib/modules/4.4.2/some-module.ko',
+            'lib/modules/4.4.2/modules.dep')
 
         config_file = os.path.join(plugin.builddir, '.config')
         self.assertTrue(os.path.exists(config_file))
@@ -788,15 +841,6 @@ ACCEPT=n
         self._simulate_build(
             plugin.sourcedir, plugin.builddir, plugin.installdir)
 
-        def fake_unpack(*args, **kwargs):
-            modules_dir = os.path.join(
-                plugin.builddir, 'initrd-staging', 'lib', 'modules', '4.4.2')
-            if os.path.exists(modules_dir):
-                return
-            os.makedirs(modules_dir)
-
-        self.check_call_mock.side_effect = fake_unpack
-
         plugin.build()
 
         self._assert_generic_check_call(plugin.builddir, plugin.installdir,
@@ -825,6 +869,9 @@ ACCEPT=n
         self._assert_common_assets(plugin.installdir)
         self.assertTrue(os.path.exists(os.path.join(
             plugin.installdir, 'firmware', 'fake-fw-dir')))
+        self._assert_initrd_contains(
+            plugin.installdir, 'lib/firmware/fake-fw.bin',
+            'lib/firmware/fake-fw-dir')
 
     @mock.patch.object(
         snapcraft.ProjectOptions,
@@ -23,7 +23,7 @@ from testscenarios.scenarios import multiply_scenarios
 from testtools.matchers import DirExists, Equals, HasLength
 
 import snapcraft
-from snapcraft.internal import errors
+from snapcraft.internal import cache, errors
 from snapcraft.plugins import nodejs
 from tests import (
     fixture_setup,
@@ -63,6 +63,10 @@ class NodePluginBaseTestCase(unit.TestCase):
         self.tar_mock = patcher.start()
         self.addCleanup(patcher.stop)
 
+        patcher = mock.patch('snapcraft.plugins.nodejs.link_or_copy')
+        self.link_or_copy_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
         patcher = mock.patch('sys.stdout')
         patcher.start()
         self.addCleanup(patcher.stop)
@@ -87,6 +91,17 @@ class NodePluginTestCase(NodePluginBaseTestCase):
         for v in ('http_proxy', 'https_proxy'):
             self.useFixture(fixtures.EnvironmentVariable(v, getattr(self, v)))
 
+    def get_run_env(self, rootdir):
+        package_cache = cache.PackageDownloadCache()
+        env = dict(npm_config_cache=package_cache.get(ecosystem='npm'),
+                   YARN_CACHE_FOLDER=package_cache.get(ecosystem='yarn'))
+        for v in ('http_proxy', 'https_proxy'):
+            if getattr(self, v) is not None:
+                env[v] = getattr(self, v)
+        if rootdir.endswith('src'):
+            env['PATH'] = os.path.join(rootdir, 'node_modules', '.bin')
+        return env
+
     def test_pull_local_sources(self):
         self.options.node_package_manager = self.package_manager
 
@@ -99,20 +114,23 @@ class NodePluginTestCase(NodePluginBaseTestCase):
 
         if self.package_manager == 'npm':
             expected_tar_calls = [
-                mock.call(self.nodejs_url, plugin._npm_dir),
+                mock.call(self.nodejs_url, mock.ANY),
                 mock.call().download(),
+                mock.call(self.nodejs_url, plugin._npm_dir),
                 mock.call().provision(
                     plugin.installdir, clean_target=False, keep_tarball=True),
             ]
         else:
             expected_tar_calls = [
-                mock.call(self.nodejs_url, plugin._npm_dir),
+                mock.call(self.nodejs_url, mock.ANY),
                 mock.call().download(),
-                mock.call('https://yarnpkg.com/latest.tar.gz',
-                          plugin._npm_dir),
+                mock.call('https://yarnpkg.com/latest.tar.gz', mock.ANY),
                 mock.call().download(),
+                mock.call(self.nodejs_url, plugin._npm_dir),
                 mock.call().provision(plugin.installdir, clean_target=False,
                                       keep_tarball=True),
+                mock.call('https://yarnpkg.com/latest.tar.gz',
+                          plugin._npm_dir),
                 mock.call().provision(plugin._npm_dir,
                                       clean_target=False, keep_tarball=True),
             ]
@@ -136,8 +154,10 @@ class NodePluginTestCase(NodePluginBaseTestCase):
         if self.package_manager == 'npm':
             cmd = ['npm', '--cache-min=Infinity', 'install']
             expected_run_calls = [
-                mock.call(cmd, cwd=plugin.builddir),
-                mock.call(cmd + ['--global'], cwd=plugin.builddir),
+                mock.call(cmd, cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
+                mock.call(cmd + ['--global'], cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
             ]
             expected_tar_calls = [
                 mock.call(self.nodejs_url, plugin._npm_dir),
@@ -157,7 +177,8 @@ class NodePluginTestCase(NodePluginBaseTestCase):
                            '--offline', '--prod',
                            '--global-folder', plugin.installdir,
                            '--prefix', plugin.installdir],
-                          cwd=plugin.builddir)
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir))
             ]
             expected_tar_calls = [
                 mock.call(self.nodejs_url, plugin._npm_dir),
@@ -189,8 +210,10 @@ class NodePluginTestCase(NodePluginBaseTestCase):
         if self.package_manager == 'npm':
             cmd = ['npm', '--test-flag', '--cache-min=Infinity', 'install']
             expected_run_calls = [
-                mock.call(cmd, cwd=plugin.builddir),
-                mock.call(cmd + ['--global'], cwd=plugin.builddir),
+                mock.call(cmd, cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
+                mock.call(cmd + ['--global'], cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
             ]
             expected_tar_calls = [
                 mock.call(self.nodejs_url, plugin._npm_dir),
@@ -212,7 +235,8 @@ class NodePluginTestCase(NodePluginBaseTestCase):
                            '--offline', '--prod',
                            '--global-folder', plugin.installdir,
                            '--prefix', plugin.installdir],
-                          cwd=plugin.builddir)
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir))
             ]
             expected_tar_calls = [
                 mock.call(self.nodejs_url, plugin._npm_dir),
@@ -243,12 +267,15 @@ class NodePluginTestCase(NodePluginBaseTestCase):
             cmd = ['npm', '--cache-min=Infinity', 'install',
                    '--global', 'my-pkg']
             expected_run_calls = [
-                mock.call(cmd, cwd=plugin.sourcedir),
-                mock.call(cmd, cwd=plugin.builddir),
+                mock.call(cmd, cwd=plugin.sourcedir,
+                          env=self.get_run_env(plugin.sourcedir)),
+                mock.call(cmd, cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
             ]
             expected_tar_calls = [
-                mock.call(self.nodejs_url, plugin._npm_dir),
+                mock.call(self.nodejs_url, mock.ANY),
                 mock.call().download(),
+                mock.call(self.nodejs_url, plugin._npm_dir),
                 mock.call().provision(
                     plugin.installdir, clean_target=False, keep_tarball=True),
             ]
@@ -260,22 +287,26 @@ class NodePluginTestCase(NodePluginBaseTestCase):
                 cmd.extend(['--https-proxy', self.https_proxy])
             expected_run_calls = [
                 mock.call(cmd + ['add', 'my-pkg'],
-                          cwd=plugin.sourcedir),
+                          cwd=plugin.sourcedir,
+                          env=self.get_run_env(plugin.sourcedir)),
                 mock.call(cmd +
                           ['global', 'add', 'my-pkg',
                            '--offline', '--prod',
                            '--global-folder', plugin.installdir,
                            '--prefix', plugin.installdir],
-                          cwd=plugin.builddir)
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir))
             ]
             expected_tar_calls = [
-                mock.call(self.nodejs_url, plugin._npm_dir),
+                mock.call(self.nodejs_url, mock.ANY),
                 mock.call().download(),
-                mock.call('https://yarnpkg.com/latest.tar.gz',
-                          plugin._npm_dir),
+                mock.call('https://yarnpkg.com/latest.tar.gz', mock.ANY),
                 mock.call().download(),
+                mock.call(self.nodejs_url, plugin._npm_dir),
                 mock.call().provision(plugin.installdir, clean_target=False,
                                       keep_tarball=True),
+                mock.call('https://yarnpkg.com/latest.tar.gz',
+                          plugin._npm_dir),
                 mock.call().provision(plugin._npm_dir,
                                       clean_target=False, keep_tarball=True),
                 mock.call().provision(plugin.installdir, clean_target=False,
@@ -303,27 +334,26 @@ class NodePluginTestCase(NodePluginBaseTestCase):
             cmd = ['npm', 'run']
             expected_run_calls = [
                 mock.call(cmd + ['command_one'],
-                          cwd=plugin.sourcedir),
+                          cwd=plugin.sourcedir,
+                          env=self.get_run_env(plugin.sourcedir)),
                 mock.call(cmd + ['avocado'],
-                          cwd=plugin.sourcedir),
+                          cwd=plugin.sourcedir,
+                          env=self.get_run_env(plugin.sourcedir)),
             ]
         else:
             cmd = [os.path.join(plugin.partdir, 'npm', 'bin', 'yarn')]
-            hidden_bin_path = os.path.join(
-                plugin.sourcedir, 'node_modules', '.bin')
-            env = dict(PATH=hidden_bin_path)
             if self.http_proxy is not None:
                 cmd.extend(['--proxy', self.http_proxy])
-                env['http_proxy'] = self.http_proxy
             if self.https_proxy is not None:
                 cmd.extend(['--https-proxy', self.https_proxy])
-                env['https_proxy'] = self.https_proxy
             cmd.append('run')
             expected_run_calls = [
                 mock.call(cmd + ['command_one'],
-                          cwd=plugin.sourcedir, env=env),
+                          cwd=plugin.sourcedir,
+                          env=self.get_run_env(plugin.sourcedir)),
                 mock.call(cmd + ['avocado'],
-                          cwd=plugin.sourcedir, env=env),
+                          cwd=plugin.sourcedir,
+                          env=self.get_run_env(plugin.sourcedir)),
             ]
 
         self.run_mock.assert_has_calls(expected_run_calls)
@@ -344,25 +374,26 @@ class NodePluginTestCase(NodePluginBaseTestCase):
             cmd = ['npm', 'run']
             expected_run_calls = [
                 mock.call(cmd + ['command_one'],
-                          cwd=plugin.builddir),
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
                 mock.call(cmd + ['avocado'],
-                          cwd=plugin.builddir),
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
             ]
         else:
             cmd = [os.path.join(plugin.partdir, 'npm', 'bin', 'yarn')]
-            env = dict()
             if self.http_proxy is not None:
                 cmd.extend(['--proxy', self.http_proxy])
-                env['http_proxy'] = self.http_proxy
             if self.https_proxy is not None:
                 cmd.extend(['--https-proxy', self.https_proxy])
-                env['https_proxy'] = self.https_proxy
             cmd.append('run')
             expected_run_calls = [
                 mock.call(cmd + ['command_one'],
-                          cwd=plugin.builddir, env=env),
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
                 mock.call(cmd + ['avocado'],
-                          cwd=plugin.builddir, env=env),
+                          cwd=plugin.builddir,
+                          env=self.get_run_env(plugin.builddir)),
             ]
 
         self.run_mock.assert_has_calls(expected_run_calls)
@@ -417,6 +448,48 @@ class NodePluginTestCase(NodePluginBaseTestCase):
         self.assertFalse(os.path.exists(plugin._npm_dir))
 
 
+class NodePluginToolchainCacheTestCase(NodePluginBaseTestCase):
+
+    def test_pull_shares_nodejs_tarball(self):
+        for part_name in ('part-one', 'part-two'):
+            plugin = nodejs.NodePlugin(part_name, self.options,
+                                       self.project_options)
+            os.makedirs(plugin.sourcedir)
+            plugin.pull()
+
+        self.tar_mock.return_value.download.assert_called_once_with()
+        self.link_or_copy_mock.assert_has_calls([
+            mock.call(mock.ANY, os.path.join(
+                self.parts_dir, part_name, 'npm',
+                os.path.basename(self.nodejs_url)))
+            for part_name in ('part-one', 'part-two')])
+
+
+class NodePluginPackageCacheTestCase(NodePluginBaseTestCase):
+
+    def test_build_shares_package_caches(self):
+        plugin = nodejs.NodePlugin('test-part', self.options,
+                                   self.project_options)
+        package_cache = cache.PackageDownloadCache()
+
+        env = plugin._build_environment(plugin.builddir)
+
+        self.assertThat(env['npm_config_cache'], Equals(
+            package_cache.get(ecosystem='npm')))
+        self.assertThat(env['YARN_CACHE_FOLDER'], Equals(
+            package_cache.get(ecosystem='yarn')))
+
+    def test_env_does_not_point_at_package_caches(self):
+        plugin = nodejs.NodePlugin('test-part', self.options,
+                                   self.project_options)
+
+        env = plugin.env(plugin.installdir)
+
+        self.assertFalse(
+            [e for e in env
+             if e.startswith(('npm_config_cache=', 'YARN_CACHE_FOLDER='))])
+
+
 class NodePluginManifestTestCase(NodePluginBaseTestCase):
 
     scenarios = multiply_scenarios(
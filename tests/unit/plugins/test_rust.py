@@ -29,6 +29,7 @@ from testtools.matchers import (
 )
 
 import snapcraft
+from snapcraft.internal import cache
 from snapcraft.plugins import rust
 from tests import unit
 
@@ -103,7 +104,8 @@ class RustPluginCrossCompileTestCase(unit.TestCase):
                 [plugin._cargo, 'fetch',
                  '--manifest-path',
                  os.path.join(plugin.sourcedir, 'Cargo.toml')],
-                cwd=os.path.join(plugin.partdir, 'build')),
+                cwd=os.path.join(plugin.partdir, 'build'),
+                env=plugin._build_env()),
         ])
 
         plugin.build()
@@ -149,6 +151,12 @@ class RustPluginTestCase(unit.TestCase):
         self.options = Options()
         self.project_options = snapcraft.ProjectOptions()
 
+    def link_toolchain(self, plugin):
+        # Builds use the toolchain linked when pulling.
+        cache.ToolchainCache().link(
+            path=plugin._rustpath, tool='rust', version=None, arch='test',
+            populate=lambda path: None)
+
     def test_schema(self):
         schema = rust.RustPlugin.schema()
 
@@ -184,6 +192,7 @@ class RustPluginTestCase(unit.TestCase):
         plugin.options.rust_features = ['conditional-compilation']
         os.makedirs(plugin.sourcedir)
 
+        self.link_toolchain(plugin)
         plugin.build()
 
         self.assertThat(run_mock.call_count, Equals(1))
@@ -216,7 +225,8 @@ class RustPluginTestCase(unit.TestCase):
             '--disable-sudo', '--save']),
             mock.call([plugin._cargo, 'fetch',
                        '--manifest-path',
-                       os.path.join(plugin.sourcedir, 'Cargo.toml')])])
+                       os.path.join(plugin.sourcedir, 'Cargo.toml')],
+                      env=plugin._build_env())])
 
     @mock.patch.object(rust.sources, 'Script')
     @mock.patch.object(rust.RustPlugin, 'run')
@@ -238,7 +248,8 @@ class RustPluginTestCase(unit.TestCase):
             '--channel=nightly']),
             mock.call([plugin._cargo, 'fetch',
                        '--manifest-path',
-                       os.path.join(plugin.sourcedir, 'Cargo.toml')])])
+                       os.path.join(plugin.sourcedir, 'Cargo.toml')],
+                      env=plugin._build_env())])
 
     @mock.patch.object(rust.sources, 'Script')
     @mock.patch.object(rust.RustPlugin, 'run')
@@ -261,7 +272,7 @@ class RustPluginTestCase(unit.TestCase):
             mock.call([
                 plugin._cargo, 'fetch',
                 '--manifest-path', os.path.join(plugin.sourcedir, 'Cargo.toml')
-            ])])
+            ], env=plugin._build_env())])
 
     @mock.patch.object(rust.sources, 'Script')
     @mock.patch.object(rust.RustPlugin, 'run')
@@ -279,7 +290,59 @@ class RustPluginTestCase(unit.TestCase):
                 plugin._cargo, 'fetch',
                 '--manifest-path',
                 os.path.join(plugin.sourcedir, 'test-subdir', 'Cargo.toml')
-            ])])
+            ], env=plugin._build_env())])
+
+    def test_build_env_shares_cargo_home(self):
+        plugin = rust.RustPlugin('test-part', self.options,
+                                 self.project_options)
+
+        self.assertThat(plugin._build_env()['CARGO_HOME'], Equals(
+            cache.PackageDownloadCache().get(ecosystem='cargo')))
+
+    def test_env_does_not_point_at_cargo_home(self):
+        plugin = rust.RustPlugin('test-part', self.options,
+                                 self.project_options)
+
+        self.assertFalse([e for e in plugin.env(plugin.installdir)
+                          if e.startswith('CARGO_HOME=')])
+
+    @mock.patch.object(rust.sources, 'Script')
+    @mock.patch.object(rust.RustPlugin, 'run')
+    def test_pull_shares_toolchain(self, run_mock, script_mock):
+        self.options.rust_revision = '1.13.0'
+        plugins = [
+            rust.RustPlugin(part_name, self.options, self.project_options)
+            for part_name in ('part-one', 'part-two')]
+
+        for plugin in plugins:
+            os.makedirs(plugin.sourcedir)
+            plugin.pull()
+
+        rustup_calls = [c for c in run_mock.mock_calls
+                        if c[1][0][0].endswith('rustup.sh')]
+        self.assertThat(len(rustup_calls), Equals(1))
+        self.assertThat(os.path.realpath(plugins[0]._rustpath),
+                        Equals(os.path.realpath(plugins[1]._rustpath)))
+
+    @mock.patch.object(rust.sources, 'Script')
+    @mock.patch.object(rust.RustPlugin, 'run')
+    @mock.patch.object(rust.RustPlugin, 'run_output')
+    def test_build_links_pruned_toolchain_again(self, _, run_mock,
+                                                script_mock):
+        plugin = rust.RustPlugin('test-part', self.options,
+                                 self.project_options)
+        os.makedirs(plugin.sourcedir)
+        plugin.pull()
+        # Prune everything, as a run of snapcraft for another project can.
+        cache.ToolchainCache().prune(max_age=-1)
+        run_mock.reset_mock()
+
+        plugin.build()
+
+        self.assertThat(
+            [c[1][0][0] for c in run_mock.mock_calls],
+            Equals([plugin._rustup, plugin._cargo]))
+        self.assertTrue(os.path.islink(plugin._rustpath))
 
     @mock.patch('snapcraft.ProjectOptions.deb_arch', 'fantasy-arch')
     def test_cross_compiling_unsupported_arch_raises_exception(self):
@@ -296,6 +359,7 @@ class RustPluginTestCase(unit.TestCase):
                                  self.project_options)
         os.makedirs(plugin.sourcedir)
 
+        self.link_toolchain(plugin)
         plugin.build()
 
         self.assertThat(run_mock.call_count, Equals(1))
@@ -321,6 +385,7 @@ class RustPluginTestCase(unit.TestCase):
                 'Cargo.lock'), 'w') as cargo_lock_file:
             cargo_lock_file.write('test cargo lock contents')
 
+        self.link_toolchain(plugin)
         plugin.build()
 
         self.assertThat(
@@ -335,6 +400,7 @@ class RustPluginTestCase(unit.TestCase):
         os.makedirs(plugin.sourcedir)
         os.makedirs(plugin.builddir)
 
+        self.link_toolchain(plugin)
         plugin.build()
 
         self.assertThat(
@@ -350,6 +416,7 @@ class RustPluginTestCase(unit.TestCase):
 
         os.mkdir(os.path.join(plugin.builddir, 'Cargo.lock'))
 
+        self.link_toolchain(plugin)
         plugin.build()
 
         self.assertThat(
@@ -372,6 +439,7 @@ class RustPluginTestCase(unit.TestCase):
         with mock.patch.object(
                 rust.RustPlugin, 'run_output') as run_output_mock:
             run_output_mock.side_effect = side_effect
+            self.link_toolchain(plugin)
             plugin.build()
 
         expected_manifest = collections.OrderedDict()
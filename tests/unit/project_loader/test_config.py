@@ -1913,6 +1913,32 @@ parts:
                 'Expected LD_LIBRARY_PATH in {!r} to include {!r}'.format(
                     paths, item))
 
+    def test_config_snap_environment_without_package_caches(self):
+        self.make_snapcraft_yaml(dedent("""\
+            name: test
+            version: "1"
+            summary: test
+            description: test
+            confinement: strict
+            grade: stable
+
+            parts:
+              rust-part:
+                plugin: rust
+              nodejs-part:
+                plugin: nodejs
+            """))
+        config = _config.Config()
+
+        # The environment ends up in the snap, which cannot use the
+        # package caches of the host that built it.
+        environment = config.snap_env()
+        for variable in ('CARGO_HOME', 'npm_config_cache',
+                         'YARN_CACHE_FOLDER'):
+            self.assertFalse(
+                [e for e in environment if e.startswith(variable + '=')],
+                'Current environment is {!r}'.format(environment))
+
     def test_config_snap_environment_with_no_library_paths(self):
         config = _config.Config()
 
@@ -15,13 +15,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import apt
+import logging
 import os
+import stat
+import tarfile
 from subprocess import CalledProcessError
 from unittest.mock import ANY, DEFAULT, call, patch, MagicMock
 
+import fixtures
 from testtools.matchers import (
     Contains,
     Equals,
+    FileContains,
     FileExists,
     Not,
 )
@@ -54,6 +59,12 @@ class UbuntuTestCase(RepoBaseTestCase):
         self.mock_cache.return_value.get_changes.return_value = [
             self.mock_package]
 
+        # Every test starts out without any index updated in this run.
+        patcher = patch('snapcraft.internal.repo._deb._updated_indexes',
+                        set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch('snapcraft.internal.repo._deb._AptCache.fetch_binary')
     @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
     def test_cache_update_failed(self, mock_apt_pkg, mock_fetch_binary):
@@ -127,9 +138,11 @@ class UbuntuTestCase(RepoBaseTestCase):
         ])
 
         self.mock_cache.assert_has_calls([
-            call(memonly=True, rootdir=ANY),
+            call(rootdir=ANY),
             call().update(fetch_progress=ANY, sources_list=ANY),
             call().open(),
+            call().close(),
+            call(rootdir=ANY),
         ])
 
         # __getitem__ is tricky
@@ -165,9 +178,11 @@ class UbuntuTestCase(RepoBaseTestCase):
             call.config.clear('APT::Update::Post-Invoke-Success'),
         ])
         self.mock_cache.assert_has_calls([
-            call(memonly=True, rootdir=ANY),
+            call(rootdir=ANY),
             call().update(fetch_progress=ANY, sources_list=ANY),
             call().open(),
+            call().close(),
+            call(rootdir=ANY),
         ])
 
         # __getitem__ is tricky
@@ -181,6 +196,79 @@ class UbuntuTestCase(RepoBaseTestCase):
             os.path.join(self.tempdir, 'download', 'fake-package.deb'),
             FileExists())
 
+    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binary')
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_get_reuses_index(self, mock_apt_pkg, mock_fetch_binary):
+        fake_package_path = os.path.join(self.path, 'fake-package.deb')
+        open(fake_package_path, 'w').close()
+        mock_fetch_binary.return_value = fake_package_path
+        self.mock_cache().is_virtual_package.return_value = False
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        for part in ('part1', 'part2'):
+            ubuntu = repo.Ubuntu(os.path.join(self.tempdir, part),
+                                 project_options=project_options)
+            ubuntu.get(['fake-package'])
+
+        self.assertThat(self.mock_cache().update.call_count, Equals(1))
+
+    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binary')
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_get_reuses_index_across_runs(self, mock_apt_pkg,
+                                          mock_fetch_binary):
+        fake_package_path = os.path.join(self.path, 'fake-package.deb')
+        open(fake_package_path, 'w').close()
+        mock_fetch_binary.return_value = fake_package_path
+        self.mock_cache().is_virtual_package.return_value = False
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.get(['fake-package'])
+        # A new run only knows about the index from its stamp.
+        repo._deb._updated_indexes.clear()
+        ubuntu.get(['fake-package'])
+
+        self.assertThat(self.mock_cache().update.call_count, Equals(1))
+
+    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binary')
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_get_updates_expired_index(self, mock_apt_pkg,
+                                       mock_fetch_binary):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_APT_INDEX_TTL', '0'))
+        fake_package_path = os.path.join(self.path, 'fake-package.deb')
+        open(fake_package_path, 'w').close()
+        mock_fetch_binary.return_value = fake_package_path
+        self.mock_cache().is_virtual_package.return_value = False
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        ubuntu.get(['fake-package'])
+        # The index is still updated only once per run.
+        ubuntu.get(['fake-package'])
+        self.assertThat(self.mock_cache().update.call_count, Equals(1))
+
+        repo._deb._updated_indexes.clear()
+        ubuntu.get(['fake-package'])
+        self.assertThat(self.mock_cache().update.call_count, Equals(2))
+
+    @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+    def test_invalid_index_ttl(self, mock_apt_pkg):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_APT_INDEX_TTL', '1h'))
+
+        project_options = snapcraft.ProjectOptions(
+            use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        raised = self.assertRaises(
+            errors.InvalidAptIndexTTLError,
+            ubuntu.get,
+            ['fake-package'])
+        self.assertThat(raised.ttl, Equals('1h'))
+
     @patch('snapcraft.repo._deb._get_geoip_country_code_prefix')
     def test_sources_is_none_uses_default(self, mock_cc):
         mock_cc.return_value = 'ar'
@@ -332,6 +420,144 @@ class AutokeepTestCase(RepoBaseTestCase):
             Not(FileExists()), 'Sub-dependency should not have been fetched')
 
 
+class UnpackTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.downloaddir = os.path.join(self.tempdir, 'download')
+        os.makedirs(self.downloaddir)
+        self.unpackdir = os.path.join(self.tempdir, 'unpack')
+        self.ubuntu = repo.Ubuntu(self.tempdir)
+
+    def test_unpack(self):
+        fixture_setup.make_deb(os.path.join(self.downloaddir, 'libfoo.deb'), [
+            ('./', tarfile.DIRTYPE, 0o755, None),
+            ('./usr/', tarfile.DIRTYPE, 0o755, None),
+            ('./usr/lib/', tarfile.DIRTYPE, 0o755, None),
+            ('./usr/lib/libfoo.so.1', tarfile.REGTYPE, 0o644, b'libfoo'),
+            ('./usr/lib/libfoo-hardlink.so.1', tarfile.LNKTYPE, 0o644,
+             './usr/lib/libfoo.so.1'),
+            ('./usr/lib/pkgconfig/', tarfile.DIRTYPE, 0o755, None),
+            ('./usr/lib/pkgconfig/foo.pc', tarfile.REGTYPE, 0o644,
+             b'prefix=/usr\nlibdir=${prefix}/lib\n'),
+        ])
+        fixture_setup.make_deb(os.path.join(self.downloaddir, 'foo.deb'), [
+            ('./usr/bin/', tarfile.DIRTYPE, 0o755, None),
+            ('./usr/bin/foo', tarfile.REGTYPE, 0o4755,
+             b'#!/usr/bin/python3\nimport this'),
+            ('./usr/lib/libfoo.so', tarfile.SYMTYPE, 0o777,
+             '/usr/lib/libfoo.so.1'),
+        ])
+
+        self.ubuntu.unpack(self.unpackdir)
+
+        foo_path = os.path.join(self.unpackdir, 'usr', 'bin', 'foo')
+        self.assertThat(
+            foo_path, FileContains('#!/usr/bin/env python3\nimport this'))
+        self.assertThat(
+            stat.S_IMODE(os.stat(foo_path).st_mode), Equals(0o755))
+        self.assertThat(
+            os.readlink(os.path.join(self.unpackdir, 'usr', 'lib',
+                                     'libfoo.so')),
+            Equals('libfoo.so.1'))
+        self.assertThat(
+            os.path.join(self.unpackdir, 'usr', 'lib',
+                         'libfoo-hardlink.so.1'),
+            FileContains('libfoo'))
+        self.assertThat(
+            os.path.join(self.unpackdir, 'usr', 'lib', 'pkgconfig', 'foo.pc'),
+            FileContains('prefix={}/usr\nlibdir=${{prefix}}/lib\n'.format(
+                self.unpackdir)))
+
+    def test_unpack_overlapping_packages(self):
+        for name in ('foo', 'bar'):
+            deb_path = os.path.join(self.downloaddir, name + '.deb')
+            fixture_setup.make_deb(deb_path, [
+                ('./usr/share/doc/', tarfile.DIRTYPE, 0o755, None),
+                ('./usr/share/doc/README', tarfile.REGTYPE, 0o644, b'doc'),
+                ('./usr/share/doc/LINK', tarfile.SYMTYPE, 0o777, 'README'),
+            ])
+
+        self.ubuntu.unpack(self.unpackdir)
+
+        self.assertThat(
+            os.path.join(self.unpackdir, 'usr', 'share', 'doc', 'README'),
+            FileContains('doc'))
+        self.assertThat(
+            sorted(os.listdir(
+                os.path.join(self.unpackdir, 'usr', 'share', 'doc'))),
+            Equals(['LINK', 'README']))
+
+    def test_unpack_reuses_cache(self):
+        fixture_setup.make_deb(
+            os.path.join(self.downloaddir, 'foo_1%3a1.0_amd64.deb'), [
+                ('./usr/lib/libfoo.so.1', tarfile.REGTYPE, 0o644, b'libfoo'),
+                ('./usr/lib/pkgconfig/foo.pc', tarfile.REGTYPE, 0o644,
+                 b'prefix=/usr\n'),
+            ])
+        fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(fake_logger)
+        other_unpackdir = os.path.join(self.tempdir, 'other-unpack')
+
+        with patch('snapcraft.internal.repo._deb._extract_deb',
+                   wraps=repo._deb._extract_deb) as mock_extract_deb:
+            self.ubuntu.unpack(self.unpackdir)
+            self.ubuntu.unpack(other_unpackdir)
+
+        mock_extract_deb.assert_called_once_with(
+            os.path.join(self.downloaddir, 'foo_1%3a1.0_amd64.deb'), ANY)
+        self.assertThat(
+            fake_logger.output,
+            Contains('Reusing 1 of 1 stage-packages unpacked in the cache.'))
+        for unpackdir in (self.unpackdir, other_unpackdir):
+            self.assertThat(
+                os.path.join(unpackdir, 'usr', 'lib', 'pkgconfig', 'foo.pc'),
+                FileContains('prefix={}/usr\n'.format(unpackdir)))
+
+    def test_unpack_writes_do_not_reach_cache(self):
+        fixture_setup.make_deb(
+            os.path.join(self.downloaddir, 'foo_1.0_amd64.deb'), [
+                ('./usr/lib/libfoo.so.1', tarfile.REGTYPE, 0o644, b'libfoo'),
+            ])
+        other_unpackdir = os.path.join(self.tempdir, 'other-unpack')
+
+        self.ubuntu.unpack(self.unpackdir)
+        with open(os.path.join(self.unpackdir, 'usr', 'lib',
+                               'libfoo.so.1'), 'w') as f:
+            f.write('patched')
+        self.ubuntu.unpack(other_unpackdir)
+
+        self.assertThat(
+            os.path.join(other_unpackdir, 'usr', 'lib', 'libfoo.so.1'),
+            FileContains('libfoo'))
+        entry_path = self.ubuntu._unpacked_cache.get(
+            name='foo', version='1.0', arch='amd64',
+            normalization=repo._deb._UNPACK_NORMALIZATION)
+        self.assertThat(
+            os.path.join(entry_path, 'usr', 'lib', 'libfoo.so.1'),
+            FileContains('libfoo'))
+
+    def test_unpack_invalid_deb(self):
+        deb_path = os.path.join(self.downloaddir, 'invalid.deb')
+        with open(deb_path, 'w') as f:
+            f.write('not a deb')
+
+        raised = self.assertRaises(
+            errors.UnpackError, self.ubuntu.unpack, self.unpackdir)
+
+        self.assertThat(raised.package, Equals(deb_path))
+
+    def test_unpack_unsafe_member(self):
+        fixture_setup.make_deb(os.path.join(self.downloaddir, 'unsafe.deb'), [
+            ('../escaped', tarfile.REGTYPE, 0o644, b'escaped'),
+        ])
+
+        self.assertRaises(
+            errors.UnpackError, self.ubuntu.unpack, self.unpackdir)
+        self.assertThat(
+            os.path.join(self.tempdir, 'escaped'), Not(FileExists()))
+
+
 class BuildPackagesTestCase(unit.TestCase):
 
     def setUp(self):
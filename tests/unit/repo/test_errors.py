@@ -22,6 +22,14 @@ from tests import unit
 class ErrorFormattingTestCase(unit.TestCase):
 
     scenarios = (
+        ('InvalidAptIndexTTLError', {
+            'exception': errors.InvalidAptIndexTTLError,
+            'kwargs': {'ttl': 'soon'},
+            'expected_message': (
+                "Invalid apt index TTL 'soon' set in "
+                "SNAPCRAFT_APT_INDEX_TTL.\n"
+                "Set it to a number of seconds (e.g. 3600), 0 updates the "
+                "index on every run.")}),
         ('SnapdConnectionError', {
             'exception': errors.SnapdConnectionError,
             'kwargs': {'snap_name': 'test', 'url': 'url'},
@@ -20,9 +20,10 @@ import fixtures
 from unittest import mock
 
 import requests
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileContains
 
 from snapcraft.internal import sources
+from snapcraft.internal.cache import FileCache
 from tests import unit
 
 
@@ -73,6 +74,33 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
             tar_source.pull()
             self.assertThat(download_spy.call_count, Equals(0))
 
+    @mock.patch('snapcraft.sources.Tar.provision')
+    def test_pull_corrupted_cache_downloads_again(self, mock_prov):
+        source = 'http://{}:{}/{file_name}'.format(
+            *self.server.server_address, file_name='test.tar')
+        expected_checksum = ('sha384/d9da1f5d54432edc8963cd817ceced83f7c6d61d3'
+                             '50ad76d1c2f50c4935d11d50211945ca0ecb980c04c98099'
+                             '085b0c3')
+        tar_source = sources.Tar(source, self.path,
+                                 source_checksum=expected_checksum)
+        tar_source.pull()
+        # As provisioning would.
+        os.remove(os.path.join(self.path, 'test.tar'))
+        cached_file = FileCache().get(
+            algorithm='sha384', hash=expected_checksum.split('/')[1])
+        with open(cached_file, 'w') as f:
+            f.write('Test fake')
+
+        with mock.patch(
+            'requests.get',
+                new=mock.Mock(wraps=requests.get)) as download_spy:
+            tar_source.pull()
+            self.assertThat(download_spy.call_count, Equals(1))
+
+        self.assertThat(os.path.join(self.path, 'test.tar'),
+                        FileContains('Test fake file'))
+        self.assertThat(cached_file, FileContains('Test fake file'))
+
     def test_strip_common_prefix(self):
         # Create tar file for testing
         os.makedirs(os.path.join('src', 'test_prefix'))
@@ -149,5 +177,59 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
         self.assertTrue(os.path.exists(os.path.join('dst', 'test.txt')))
         self.assertTrue(os.path.exists(os.path.join('dst', 'link.txt')))
 
+    def test_strip_common_prefix_compressed(self):
+        os.makedirs(os.path.join('src', 'test_prefix', 'dir'))
+        file_to_tar = os.path.join('src', 'test_prefix', 'dir', 'test.txt')
+        with open(file_to_tar, 'w') as f:
+            f.write('test')
+        with tarfile.open(os.path.join('src', 'test.tar.gz'), 'w:gz') as tar:
+            tar.add(os.path.join('src', 'test_prefix'))
+
+        tar_source = sources.Tar(os.path.join('src', 'test.tar.gz'), 'dst')
+        os.mkdir('dst')
+        # Whichever decompressor is available, make it external.
+        with mock.patch('snapcraft.internal.sources._tar._DECOMPRESSORS',
+                        [(b'\x1f\x8b', ['gzip', '-dc'])]):
+            tar_source.pull()
+
+        self.assertThat(os.path.join('dst', 'dir', 'test.txt'),
+                        FileContains('test'))
+        self.assertThat(os.listdir('dst'), Equals(['dir']))
+
+    def test_extract_on_top(self):
+        os.makedirs(os.path.join('src', 'test_prefix', 'dir'))
+        file_to_tar = os.path.join('src', 'test_prefix', 'dir', 'test.txt')
+        with open(file_to_tar, 'w') as f:
+            f.write('new')
+        with tarfile.open(os.path.join('src', 'test.tar'), 'w') as tar:
+            tar.add(os.path.join('src', 'test_prefix'))
+        os.makedirs(os.path.join('dst', 'dir'))
+        for name in ('test.txt', 'other.txt'):
+            with open(os.path.join('dst', 'dir', name), 'w') as f:
+                f.write('old')
+
+        tar_source = sources.Tar(os.path.join('src', 'test.tar'), 'dst')
+        tar_source.pull()
+
+        self.assertThat(os.path.join('dst', 'dir', 'test.txt'),
+                        FileContains('new'))
+        self.assertThat(os.path.join('dst', 'dir', 'other.txt'),
+                        FileContains('old'))
+
+    def test_provision_clean_target_keeps_tarball(self):
+        os.makedirs(os.path.join('src', 'test_prefix'))
+        open(os.path.join('src', 'test_prefix', 'test.txt'), 'w').close()
+        os.mkdir('dst')
+        open(os.path.join('dst', 'stale.txt'), 'w').close()
+        with tarfile.open(os.path.join('dst', 'test.tar'), 'w') as tar:
+            tar.add(os.path.join('src', 'test_prefix'))
+
+        tar_source = sources.Tar(os.path.join('dst', 'test.tar'), 'dst')
+        tar_source.provision('dst', keep_tarball=True,
+                             src=os.path.join('dst', 'test.tar'))
+
+        self.assertThat(sorted(os.listdir('dst')),
+                        Equals(['test.tar', 'test.txt']))
+
     def test_has_source_handler_entry(self):
         self.assertTrue(sources._source_handler['tar'] is sources.Tar)
@@ -0,0 +1,66 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2016-2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import Equals, HasLength
+
+from snapcraft.internal import states
+from tests import unit
+
+
+class MachineAssetsTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.assets = {
+            'uname': 'Linux test uname 4.10 x86_64',
+            'installed-packages': ['patchelf=0.9'],
+            'installed-snaps': [],
+        }
+
+    def test_save_and_get(self):
+        digest = states.save_machine_assets('parts', self.assets)
+
+        self.assertThat(states.get_machine_assets('parts', digest),
+                        Equals(self.assets))
+
+    def test_kept_once(self):
+        digests = {states.save_machine_assets('parts', dict(self.assets))
+                   for _ in range(3)}
+
+        self.assertThat(digests, HasLength(1))
+        self.assertThat(os.listdir(os.path.join('parts', '.machine-assets')),
+                        Equals(list(digests)))
+
+    def test_different_assets(self):
+        digest = states.save_machine_assets('parts', self.assets)
+        self.assets['installed-snaps'] = ['core=1']
+        other_digest = states.save_machine_assets('parts', self.assets)
+
+        self.assertFalse(digest == other_digest)
+        self.assertThat(
+            states.get_machine_assets('parts', other_digest)[
+                'installed-snaps'],
+            Equals(['core=1']))
+
+    def test_no_digest(self):
+        self.assertThat(states.get_machine_assets('parts', None),
+                        Equals({}))
+
+    def test_missing_assets(self):
+        self.assertThat(states.get_machine_assets('parts', 'digest'),
+                        Equals({}))
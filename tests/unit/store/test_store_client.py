@@ -203,6 +203,25 @@ class DownloadTestCase(StoreTestCase):
             'Successfully downloaded test-snap at {}'.format(download_path),
             self.fake_logger.output)
 
+    @mock.patch('snapcraft.storeapi._store_client.download_segmented')
+    @mock.patch('snapcraft.storeapi._store_client.probe_segmented_download')
+    def test_download_snap_segmented(self, mock_probe, mock_download):
+        mock_probe.return_value = (1000, '"v1"')
+        mock_download.return_value = {'sha512': (
+            '69d57dcacf4f126592d4e6ff689ad8bb8a083c7b9fe44f6e738ef'
+            'd22a956457f14146f7f067b47bd976cf0292f2993ad864ccb498b'
+            'fda4128234e4c201f28fe9')}
+        self.client.login('dummy', 'test correct password')
+        download_path = os.path.join(self.path, 'test-snap.snap')
+
+        self.client.download('test-snap', 'test-channel', download_path)
+
+        # Segments retry on the network errors of requests, not on the
+        # StoreNetworkError the client would raise instead.
+        mock_download.assert_called_once_with(
+            mock.ANY, download_path, size=1000, validator='"v1"',
+            session=self.client.cpi.session, algorithms=['sha512'])
+
     def test_download_from_branded_store_requires_login(self):
         err = self.assertRaises(
             errors.SnapNotFoundError,
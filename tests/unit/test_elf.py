@@ -16,6 +16,7 @@
 import fixtures
 import logging
 import os
+import struct
 import subprocess
 import tempfile
 import sys
@@ -349,6 +350,99 @@ class TestElfFileAttrs(TestElfBase):
         self.assertThat(openssl.versions, Equals({'OPENSSL_1.0.0'}))
 
 
+# e_machine for each ELF class and byte order, only to look realistic.
+_MACHINES = {(32, '<'): 3, (32, '>'): 20, (64, '<'): 62, (64, '>'): 21}
+
+_PT_LOAD = 1
+_PT_GNU_STACK = 0x6474e551
+_PF_X = 0x1
+_PF_W = 0x2
+_PF_R = 0x4
+
+
+def _write_elf(path, *, elfclass, byteorder, stack_flags):
+    """Write an ELF file with a PT_LOAD and a PT_GNU_STACK segment."""
+    if elfclass == 64:
+        header_format = byteorder + 'HHIQQQIHHHHHH'
+        phdr_format = byteorder + 'IIQQQQQQ'
+    else:
+        header_format = byteorder + 'HHIIIIIHHHHHH'
+        phdr_format = byteorder + 'IIIIIIII'
+    header_size = 16 + struct.calcsize(header_format)
+    phdr_size = struct.calcsize(phdr_format)
+
+    ident = b'\x7fELF' + bytes([
+        elfclass // 32, 1 if byteorder == '<' else 2, 1]) + bytes(9)
+    header = struct.pack(
+        header_format, 2, _MACHINES[elfclass, byteorder], 1, 0, header_size,
+        0, 0, header_size, phdr_size, 2, 0, 0, 0)
+
+    segments = [(_PT_LOAD, _PF_R | _PF_X), (_PT_GNU_STACK, stack_flags)]
+    with open(path, 'wb') as f:
+        f.write(ident + header)
+        for p_type, p_flags in segments:
+            if elfclass == 64:
+                f.write(struct.pack(
+                    phdr_format, p_type, p_flags, 0, 0, 0, 0, 0, 0))
+            else:
+                f.write(struct.pack(
+                    phdr_format, p_type, 0, 0, 0, 0, 0, p_flags, 0))
+
+
+class TestClearExecstack(unit.TestCase):
+
+    def _assert_cleared(self, *, elfclass, byteorder):
+        _write_elf('elf', elfclass=elfclass, byteorder=byteorder,
+                   stack_flags=_PF_R | _PF_W | _PF_X)
+        with open('elf', 'rb') as f:
+            contents = f.read()
+
+        elf_file = elf.ElfFile(path='elf')
+        self.assertThat(elf_file.execstack_set, Equals(True))
+        elf_file.clear_execstack()
+        self.assertThat(elf_file.execstack_set, Equals(False))
+
+        self.assertThat(elf.ElfFile(path='elf').execstack_set, Equals(False))
+        _write_elf('expected', elfclass=elfclass, byteorder=byteorder,
+                   stack_flags=_PF_R | _PF_W)
+        with open('elf', 'rb') as f, open('expected', 'rb') as g:
+            cleared = f.read()
+            self.assertThat(cleared, Equals(g.read()))
+        self.assertThat(len(cleared), Equals(len(contents)))
+
+    def test_64bit_little_endian(self):
+        self._assert_cleared(elfclass=64, byteorder='<')
+
+    def test_64bit_big_endian(self):
+        self._assert_cleared(elfclass=64, byteorder='>')
+
+    def test_32bit_little_endian(self):
+        self._assert_cleared(elfclass=32, byteorder='<')
+
+    def test_32bit_big_endian(self):
+        self._assert_cleared(elfclass=32, byteorder='>')
+
+    def test_hard_link_broken(self):
+        _write_elf('elf', elfclass=64, byteorder='<',
+                   stack_flags=_PF_R | _PF_W | _PF_X)
+        os.link('elf', 'link')
+
+        elf.ElfFile(path='elf').clear_execstack()
+
+        self.assertThat(elf.ElfFile(path='elf').execstack_set, Equals(False))
+        self.assertThat(elf.ElfFile(path='link').execstack_set, Equals(True))
+        self.assertThat(os.stat('elf').st_nlink, Equals(1))
+
+    def test_no_execstack_left_untouched(self):
+        _write_elf('elf', elfclass=64, byteorder='<',
+                   stack_flags=_PF_R | _PF_W)
+        os.link('elf', 'link')
+
+        elf.ElfFile(path='elf').clear_execstack()
+
+        self.assertThat(os.stat('elf').st_nlink, Equals(2))
+
+
 class TestPatcher(TestElfBase):
 
     def test_patch(self):
@@ -489,6 +489,18 @@ class ErrorFormattingTestCase(unit.TestCase):
                 "'pull' is the final step"
             )
         }),
+        ('InvalidPackageCacheSizeError', {
+            'exception': errors.InvalidPackageCacheSizeError,
+            'kwargs': {
+                'size': 'lots',
+            },
+            'expected_message': (
+                "Invalid package cache size 'lots' set in "
+                "SNAPCRAFT_PACKAGE_CACHE_SIZE.\n"
+                "Set it to a number of bytes, optionally followed by K, M or "
+                "G (e.g. 10G)."
+            )
+        }),
     )
 
     def test_error_formatting(self):
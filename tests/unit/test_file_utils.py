@@ -14,13 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import errno
 import os
 import re
+import stat
 import subprocess
 from unittest import mock
 
 import fixtures
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileContains
 
 from snapcraft import file_utils
 from snapcraft.internal.errors import (
@@ -88,6 +90,117 @@ class ReplaceInFileTestCase(unit.TestCase):
             self.assertThat(f.read(), Equals(file_info['expected']))
 
 
+class RewriteTreeTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs('dir')
+
+    def _write(self, name, contents):
+        path = os.path.join('dir', name)
+        with open(path, 'wb') as f:
+            f.write(contents)
+        return path
+
+    def test_rules_applied_in_order(self):
+        path = self._write('script', b'#!/usr/bin/foo\nfoo\n')
+
+        file_utils.rewrite_tree('dir', [
+            file_utils.RewriteRule(re.compile(rb'foo'), b'bar'),
+            file_utils.RewriteRule(re.compile(r'bar$', re.MULTILINE), 'baz'),
+        ])
+
+        self.assertThat(path, FileContains('#!/usr/bin/baz\nbaz\n'))
+
+    def test_file_pattern(self):
+        config_path = self._write('fooConfig.cmake', b'foo')
+        other_path = self._write('other', b'foo')
+
+        file_utils.rewrite_tree('dir', [file_utils.RewriteRule(
+            re.compile(rb'foo'), b'bar',
+            file_pattern=re.compile(r'.*Config.cmake$'))])
+
+        self.assertThat(config_path, FileContains('bar'))
+        self.assertThat(other_path, FileContains('foo'))
+
+    def test_header(self):
+        script_path = self._write('script', b'#!/bin/foo')
+        text_path = self._write('text', b'/bin/foo')
+
+        file_utils.rewrite_tree('dir', [file_utils.RewriteRule(
+            re.compile(rb'foo'), b'bar', header=b'#!')])
+
+        self.assertThat(script_path, FileContains('#!/bin/bar'))
+        self.assertThat(text_path, FileContains('/bin/foo'))
+
+    def test_binaries_skipped(self):
+        elf_path = self._write('elf', b'\x7fELF foo')
+        binary_path = self._write('binary', b'foo\0foo')
+
+        file_utils.rewrite_tree('dir', [file_utils.RewriteRule(
+            re.compile(rb'foo'), b'bar')])
+
+        self.assertThat(elf_path, FileContains('\x7fELF foo'))
+        self.assertThat(binary_path, FileContains('foo\0foo'))
+
+    def test_undecodable_file_skipped_for_text_rules(self):
+        path = self._write('latin1', b'foo \xe9')
+
+        file_utils.rewrite_tree('dir', [file_utils.RewriteRule(
+            re.compile(r'foo'), 'bar')])
+
+        with open(path, 'rb') as f:
+            self.assertThat(f.read(), Equals(b'foo \xe9'))
+
+    def test_large_file(self):
+        self.useFixture(fixtures.MockPatch(
+            'snapcraft.file_utils._REWRITE_MMAP_THRESHOLD', new=1024))
+        path = self._write('large', b'a' * 4096 + b'foo')
+
+        rewritten = file_utils.rewrite_file(path, [file_utils.RewriteRule(
+            re.compile(rb'foo'), b'bar')])
+
+        self.assertTrue(rewritten)
+        self.assertThat(path, FileContains('a' * 4096 + 'bar'))
+
+    def test_large_file_not_matching_left_alone(self):
+        self.useFixture(fixtures.MockPatch(
+            'snapcraft.file_utils._REWRITE_MMAP_THRESHOLD', new=1024))
+        path = self._write('large', b'a' * 4096)
+        os.link(path, 'link')
+
+        rewritten = file_utils.rewrite_file(path, [file_utils.RewriteRule(
+            re.compile(rb'foo'), b'bar')])
+
+        self.assertFalse(rewritten)
+        self.assertThat(os.stat(path).st_nlink, Equals(2))
+
+
+class BreakHardLinkTestCase(unit.TestCase):
+
+    def test_search_and_replace_breaks_hard_link(self):
+        with open('original', 'w') as f:
+            f.write('#!/foo/bar/baz/python')
+        os.link('original', 'link')
+
+        file_utils.search_and_replace_contents(
+            'link', re.compile(r'#!.*python'), r'#!/usr/bin/env python')
+
+        self.assertThat('link', FileContains('#!/usr/bin/env python'))
+        self.assertThat('original', FileContains('#!/foo/bar/baz/python'))
+
+    def test_break_hard_link_keeps_mode(self):
+        open('original', 'w').close()
+        os.chmod('original', 0o755)
+        os.link('original', 'link')
+
+        file_utils.break_hard_link('link')
+
+        self.assertThat(os.stat('link').st_nlink, Equals(1))
+        self.assertThat(os.stat('original').st_nlink, Equals(1))
+        self.assertThat(stat.S_IMODE(os.stat('link').st_mode), Equals(0o755))
+
+
 class TestLinkOrCopyTree(unit.TestCase):
 
     def setUp(self):
@@ -179,6 +292,42 @@ class TestLinkOrCopy(unit.TestCase):
         self.assertTrue(os.path.isfile('foo2/bar/baz/4'))
 
 
+class CloneOrCopyTestCase(unit.TestCase):
+
+    def test_clone_is_independent(self):
+        with open('original', 'w') as f:
+            f.write('original')
+        os.chmod('original', 0o755)
+
+        file_utils.clone_or_copy('original', os.path.join('foo', 'clone'))
+        with open(os.path.join('foo', 'clone'), 'w') as f:
+            f.write('edited')
+
+        self.assertThat('original', FileContains('original'))
+        self.assertThat(os.stat('original').st_nlink, Equals(1))
+        self.assertThat(
+            stat.S_IMODE(os.stat(os.path.join('foo', 'clone')).st_mode),
+            Equals(0o755))
+
+    def test_copy_if_clone_fails(self):
+        with open('original', 'w') as f:
+            f.write('original')
+
+        with mock.patch('fcntl.ioctl',
+                        side_effect=OSError(errno.EOPNOTSUPP, 'no clone')):
+            file_utils.clone_or_copy('original', 'copy')
+
+        self.assertThat('copy', FileContains('original'))
+
+    def test_clone_symlink(self):
+        open('original', 'w').close()
+        os.symlink('original', 'link')
+
+        file_utils.clone_or_copy('link', 'clone')
+
+        self.assertThat('clone', unit.LinkExists('original'))
+
+
 class ExecutableExistsTestCase(unit.TestCase):
 
     def test_file_does_not_exist(self):
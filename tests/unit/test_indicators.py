@@ -15,15 +15,19 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import fixtures
+import hashlib
+import http.server
+import json
 import os
 import progressbar
 import requests
+import threading
 from unittest.mock import patch
 
 from testtools.matchers import Equals
 
 from snapcraft.internal import indicators
-from tests import unit
+from tests import fake_servers, unit
 
 
 class DumbTerminalTests(unit.TestCase):
@@ -99,7 +103,149 @@ class IndicatorsDownloadTests(unit.FakeFileHTTPServerBasedTestCase):
 
         self.assertTrue(os.path.exists(self.dest_file))
 
+    def test_download_request_stream_digests(self):
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        digests = indicators.download_requests_stream(
+            request, self.dest_file, algorithms=['sha512', 'sha3_384'])
+
+        self.assertThat(digests, Equals({
+            'sha512': hashlib.sha512(b'Test fake file').hexdigest(),
+            'sha3_384': hashlib.sha3_384(b'Test fake file').hexdigest()}))
+
+    def test_download_request_stream_resumed_digests(self):
+        with open(self.dest_file, 'wb') as dest_file:
+            dest_file.write(b'Partial ')
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        digests = indicators.download_requests_stream(
+            request, self.dest_file, algorithms=['sha512'])
+
+        self.assertThat(digests, Equals({
+            'sha512': hashlib.sha512(b'Partial Test fake file').hexdigest()}))
+
     def test_download_urllib_source(self):
         indicators.download_urllib_source(self.source, self.dest_file)
 
         self.assertTrue(os.path.exists(self.dest_file))
+
+
+class SegmentedDownloadTests(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.useFixture(fixtures.EnvironmentVariable(
+            'no_proxy', 'localhost,127.0.0.1'))
+        self.useFixture(fixtures.MonkeyPatch(
+            'snapcraft.internal.indicators._MIN_SEGMENTED_SIZE', 1))
+        self.server = http.server.HTTPServer(
+            ('127.0.0.1', 0), fake_servers.FakeRangesHTTPRequestHandler)
+        self.server.payload = os.urandom(1000)
+        self.server.supports_ranges = True
+        self.server.etag = '"v1"'
+        self.server.requested_ranges = []
+        server_thread = threading.Thread(target=self.server.serve_forever)
+        self.addCleanup(server_thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        server_thread.start()
+
+        self.url = 'http://{}:{}/payload'.format(*self.server.server_address)
+        self.dest_file = 'payload'
+
+    def test_probe(self):
+        self.assertThat(indicators.probe_segmented_download(self.url),
+                        Equals((1000, '"v1"')))
+
+    def test_probe_weak_etag_not_used(self):
+        self.server.etag = 'W/"v1"'
+
+        self.assertThat(indicators.probe_segmented_download(self.url),
+                        Equals((1000, None)))
+
+    def test_probe_ranges_not_supported(self):
+        self.server.supports_ranges = False
+
+        self.assertThat(indicators.probe_segmented_download(self.url),
+                        Equals((0, None)))
+
+    def test_download(self):
+        digests = indicators.download_segmented(
+            self.url, self.dest_file, size=1000, algorithms=['sha512'])
+
+        with open(self.dest_file, 'rb') as dest_file:
+            self.assertThat(dest_file.read(), Equals(self.server.payload))
+        self.assertThat(digests, Equals(
+            {'sha512': hashlib.sha512(self.server.payload).hexdigest()}))
+        self.assertThat(sorted(self.server.requested_ranges), Equals(
+            [(0, 249), (250, 499), (500, 749), (750, 999)]))
+        self.assertFalse(os.path.exists(self.dest_file + '.segments'))
+
+    def test_download_resumes_segments(self):
+        with open(self.dest_file, 'wb') as dest_file:
+            dest_file.write(self.server.payload[:600])
+        with open(self.dest_file + '.segments', 'w') as journal_file:
+            json.dump({'url': self.url, 'size': 1000, 'validator': '"v1"',
+                       'segments': [[0, 499, 500], [500, 999, 100]]},
+                      journal_file)
+
+        indicators.download_segmented(self.url, self.dest_file, size=1000,
+                                      validator='"v1"')
+
+        with open(self.dest_file, 'rb') as dest_file:
+            self.assertThat(dest_file.read(), Equals(self.server.payload))
+        self.assertThat(self.server.requested_ranges, Equals([(600, 999)]))
+
+    def _write_stale_download(self):
+        with open(self.dest_file, 'wb') as dest_file:
+            dest_file.write(b'x' * 600)
+        with open(self.dest_file + '.segments', 'w') as journal_file:
+            json.dump({'url': self.url, 'size': 1000, 'validator': '"v0"',
+                       'segments': [[0, 499, 500], [500, 999, 100]]},
+                      journal_file)
+
+    def test_download_changed_since_journal_not_resumed(self):
+        self._write_stale_download()
+
+        indicators.download_segmented(self.url, self.dest_file, size=1000,
+                                      validator='"v1"')
+
+        with open(self.dest_file, 'rb') as dest_file:
+            self.assertThat(dest_file.read(), Equals(self.server.payload))
+        self.assertThat(sorted(self.server.requested_ranges), Equals(
+            [(0, 249), (250, 499), (500, 749), (750, 999)]))
+
+    def test_download_changed_since_probe_downloaded_whole(self):
+        self._write_stale_download()
+        self.server.etag = '"v2"'
+
+        digests = indicators.download_segmented(
+            self.url, self.dest_file, size=1000, validator='"v0"',
+            algorithms=['sha512'])
+
+        with open(self.dest_file, 'rb') as dest_file:
+            self.assertThat(dest_file.read(), Equals(self.server.payload))
+        self.assertThat(digests, Equals(
+            {'sha512': hashlib.sha512(self.server.payload).hexdigest()}))
+        self.assertThat(self.server.requested_ranges, Equals([]))
+        self.assertFalse(os.path.exists(self.dest_file + '.segments'))
+
+    def test_download_without_validator_not_resumed(self):
+        self._write_stale_download()
+
+        indicators.download_segmented(self.url, self.dest_file, size=1000)
+
+        with open(self.dest_file, 'rb') as dest_file:
+            self.assertThat(dest_file.read(), Equals(self.server.payload))
+        self.assertThat(len(self.server.requested_ranges), Equals(4))
+
+    def test_download_ranges_not_honoured(self):
+        self.server.supports_ranges = False
+
+        digests = indicators.download_segmented(
+            self.url, self.dest_file, size=1000, algorithms=['sha512'])
+
+        with open(self.dest_file, 'rb') as dest_file:
+            self.assertThat(dest_file.read(), Equals(self.server.payload))
+        self.assertThat(digests, Equals(
+            {'sha512': hashlib.sha512(self.server.payload).hexdigest()}))
+        self.assertFalse(os.path.exists(self.dest_file + '.segments'))
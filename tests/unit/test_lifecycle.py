@@ -21,7 +21,6 @@ import logging
 import os
 import re
 import shutil
-import subprocess
 import textwrap
 from unittest import mock
 
@@ -40,7 +39,10 @@ import snapcraft
 from snapcraft import config, storeapi
 from snapcraft.file_utils import calculate_sha3_384
 from snapcraft.internal import errors, pluginhandler, lifecycle, steps
-from snapcraft.internal.lifecycle._runner import _replace_in_part
+from snapcraft.internal.lifecycle._runner import (
+    _prune_package_caches,
+    _replace_in_part,
+)
 from tests import fixture_setup, unit
 from tests.fixture_setup.os_release import FakeOsRelease
 
@@ -773,6 +775,25 @@ class ExecutionTestCase(BaseLifecycleTestCase):
         # This should not fail
         lifecycle.execute(steps.PULL, self.project_options)
 
+    @mock.patch('snapcraft.internal.cache.PackageDownloadCache.prune_if_due')
+    @mock.patch('snapcraft.internal.cache.InitrdCache.prune')
+    @mock.patch('snapcraft.internal.cache.ToolchainCache.prune')
+    @mock.patch('snapcraft.internal.cache.AptUnpackedPackageCache.prune')
+    def test_caches_pruned(self, mock_unpacked_prune, mock_toolchain_prune,
+                           mock_initrd_prune, mock_download_prune):
+        mock_download_prune.return_value = []
+        mock_unpacked_prune.return_value = []
+        mock_toolchain_prune.return_value = []
+        mock_initrd_prune.return_value = []
+
+        _prune_package_caches()
+
+        mock_download_prune.assert_called_once_with(
+            budget=mock.ANY, interval=mock.ANY)
+        mock_unpacked_prune.assert_called_once_with(max_age=mock.ANY)
+        mock_toolchain_prune.assert_called_once_with(max_age=mock.ANY)
+        mock_initrd_prune.assert_called_once_with(max_age=mock.ANY)
+
 
 class DirtyBuildScriptletTestCase(BaseLifecycleTestCase):
 
@@ -912,17 +933,6 @@ class RecordManifestBaseTestCase(BaseLifecycleTestCase):
         check_output_patcher.start()
         self.addCleanup(check_output_patcher.stop)
 
-        original_check_call = subprocess.check_call
-
-        def _fake_dpkg_deb(command, *args, **kwargs):
-            if 'dpkg-deb' not in command:
-                return original_check_call(command, *args, **kwargs)
-
-        check_call_patcher = mock.patch(
-            'subprocess.check_call', side_effect=_fake_dpkg_deb)
-        check_call_patcher.start()
-        self.addCleanup(check_call_patcher.stop)
-
         self.fake_apt_cache = fixture_setup.FakeAptCache()
         self.useFixture(self.fake_apt_cache)
         self.fake_apt_cache.add_package(
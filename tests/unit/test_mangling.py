@@ -14,12 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
 import os
 import textwrap
+from unittest import mock
 
-from testtools.matchers import FileContains, FileExists, Not
+import fixtures
+from testtools.matchers import Contains, Equals, FileContains
 
-from snapcraft.internal import mangling
+from snapcraft.internal import elf, mangling
 from tests import unit, fixture_setup
 
 
@@ -116,26 +119,33 @@ class TestClearExecstack(unit.TestCase):
         self.fake_elf = fixture_setup.FakeElf(root_path=self.path)
         self.useFixture(self.fake_elf)
 
+        patcher = mock.patch.object(elf.ElfFile, 'clear_execstack')
+        self.clear_execstack_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_execstack_clears(self):
         elf_files = [self.fake_elf['fake_elf-with-execstack']]
 
         mangling.clear_execstack(elf_files=elf_files)
 
-        self.assertThat('{}.execstack'.format(elf_files[0].path),
-                        FileExists())
+        self.clear_execstack_mock.assert_called_once_with()
 
-    def test_bad_execstack_does_not_blow_up(self):
-        elf_files = [self.fake_elf['fake_elf-with-bad-execstack']]
+    def test_failure_to_clear_does_not_blow_up(self):
+        self.clear_execstack_mock.side_effect = PermissionError()
+        fake_logger = fixtures.FakeLogger(level=logging.WARNING)
+        self.useFixture(fake_logger)
+        elf_files = [self.fake_elf['fake_elf-with-bad-execstack'],
+                     self.fake_elf['fake_elf-with-execstack']]
 
         mangling.clear_execstack(elf_files=elf_files)
 
-        self.assertThat('{}.execstack'.format(elf_files[0].path),
-                        Not(FileExists()))
+        self.assertThat(self.clear_execstack_mock.call_count, Equals(2))
+        self.assertThat(fake_logger.output, Contains(
+            'Failed to clear execstack for {!r}'.format(elf_files[0].path)))
 
     def test_no_execstack_does_nothing(self):
         elf_files = [self.fake_elf['fake_elf-2.23']]
 
         mangling.clear_execstack(elf_files=elf_files)
 
-        self.assertThat('{}.execstack'.format(elf_files[0].path),
-                        Not(FileExists()))
+        self.clear_execstack_mock.assert_not_called()
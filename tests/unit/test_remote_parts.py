@@ -14,10 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import time
+from textwrap import dedent
 from unittest import mock
 
 import requests.exceptions
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileExists
 
 from snapcraft.internal import (
     errors,
@@ -41,3 +44,65 @@ class TestRemoteParts(unit.TestCase):
         self.assertThat(
             raised.message, Equals(
                 requests.exceptions.ConnectionError.__doc__))
+
+
+class RemotePartsIndexTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.parts_yaml = remote_parts._Base().parts_yaml
+        with open(self.parts_yaml, 'w') as parts_file:
+            parts_file.write(dedent("""\
+                curl:
+                  plugin: autotools
+                  source: http://curl.org
+                  description: curl
+                  maintainer: none
+                curl-custom:
+                  plugin: autotools
+                  source: http://curl.org
+                  description: custom curl
+                  maintainer: none
+                a-very-long-part-name-with-curl-in-it:
+                  plugin: nil
+                  description: long
+                  maintainer: none
+                libc:
+                  plugin: nil
+                  description: libc
+                  maintainer: none
+                """))
+
+    def test_index_built_on_load(self):
+        parts = remote_parts.get_remote_parts()
+
+        self.assertThat(parts.parts_index, FileExists())
+        self.assertThat(parts.get_part('curl'), Equals(
+            {'plugin': 'autotools', 'source': 'http://curl.org'}))
+
+    def test_get_part_missing(self):
+        self.assertRaises(errors.SnapcraftPartMissingError,
+                          remote_parts.get_remote_parts().get_part, 'missing')
+
+    def test_stale_index_rebuilt(self):
+        remote_parts.get_remote_parts()
+        with open(self.parts_yaml, 'w') as parts_file:
+            parts_file.write('new-part: {plugin: nil}\n')
+        os.utime(self.parts_yaml, (time.time() + 10, time.time() + 10))
+
+        self.assertThat(remote_parts.get_remote_parts().get_part(
+            'new-part', full=True), Equals({'plugin': 'nil'}))
+
+    def test_matches_for(self):
+        matches, max_len = remote_parts.get_remote_parts().matches_for(
+            'curl')
+
+        self.assertThat(sorted(matches.keys()), Equals([
+            'a-very-long-part-name-with-curl-in-it', 'curl', 'curl-custom']))
+        self.assertThat(max_len, Equals(37))
+
+    def test_matches_for_fuzzy(self):
+        matches, _ = remote_parts.get_remote_parts().matches_for('curk')
+
+        self.assertThat(sorted(matches.keys()), Equals(['curl']))
@@ -0,0 +1,117 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2016-2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import threading
+
+from testtools.matchers import Contains, Equals, Is
+
+from snapcraft.internal import tracing
+from tests import unit
+
+
+class TracingTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tracing.enable()
+        self.addCleanup(tracing.disable)
+
+    def load_trace(self):
+        tracing.write_chrome_trace('trace.json')
+        with open('trace.json') as trace_file:
+            return json.load(trace_file)['traceEvents']
+
+    def test_disabled(self):
+        tracing.disable()
+
+        with tracing.span('foo') as span:
+            tracing.count('bar')
+
+        self.assertFalse(tracing.is_enabled())
+        self.assertThat(span, Is(tracing._NULL_SPAN))
+        self.assertRaises(RuntimeError, tracing.write_chrome_trace,
+                          'trace.json')
+
+    def test_spans(self):
+        with tracing.span('build', category='step', part='part1'):
+            with tracing.span('scriptlet'):
+                pass
+
+        spans = [e for e in self.load_trace() if e['ph'] == 'X']
+        self.assertThat([s['name'] for s in spans],
+                        Equals(['scriptlet', 'build']))
+        self.assertThat(spans[1]['cat'], Equals('step'))
+        self.assertThat(spans[1]['args'], Equals({'part': 'part1'}))
+        self.assertTrue(spans[0]['ts'] >= spans[1]['ts'])
+        self.assertTrue(spans[0]['dur'] <= spans[1]['dur'])
+
+    def test_span_failing(self):
+        def fail():
+            with tracing.span('build'):
+                raise RuntimeError('failed')
+
+        self.assertRaises(RuntimeError, fail)
+
+        spans = [e for e in self.load_trace() if e['ph'] == 'X']
+        self.assertThat(spans[0]['args'], Equals({'error': 'RuntimeError'}))
+
+    def test_counters(self):
+        tracing.count('files-migrated', 10)
+        with tracing.span('stage'):
+            tracing.count('files-migrated', 5)
+            tracing.count('bytes-hashed', 1024)
+
+        counters = [e for e in self.load_trace() if e['ph'] == 'C']
+        self.assertThat(counters[-1]['args'], Equals(
+            {'files-migrated': 15, 'bytes-hashed': 1024}))
+
+    def test_counters_from_threads(self):
+        def count():
+            for _ in range(1000):
+                tracing.count('files-copied')
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertThat(tracing._tracer.counters['files-copied'],
+                        Equals(4000))
+
+    def test_enable_drops_previous_trace(self):
+        with tracing.span('build'):
+            pass
+        tracing.enable()
+
+        self.assertThat([e for e in self.load_trace() if e['ph'] == 'X'],
+                        Equals([]))
+
+    def test_summary(self):
+        for _ in range(2):
+            with tracing.span('build'):
+                pass
+        with tracing.span('pack'):
+            tracing.count('bytes-hashed', 2048)
+
+        summary = tracing.format_summary().splitlines()
+        self.assertThat(summary[0].split(), Equals(
+            ['Span', 'Calls', 'Total', '(s)', 'Max', '(s)']))
+        rows = {line.split()[0]: line.split()[1] for line in summary[1:3]}
+        self.assertThat(rows, Equals({'build': '2', 'pack': '1'}))
+        self.assertThat(summary, Contains(
+            '{:<32} {:>34}'.format('bytes-hashed', 2048)))
@@ -0,0 +1,151 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import logging
+import os
+import threading
+from unittest import mock
+
+import fixtures
+from testtools.matchers import (
+    DirExists,
+    Equals,
+    FileExists,
+    HasLength,
+    Not,
+)
+
+from snapcraft.internal import common, trash
+from tests import unit
+
+
+class TrashTestCase(unit.TestCase):
+
+    def make_tree(self, path):
+        for directory in ('a', os.path.join('a', 'b'), 'c'):
+            os.makedirs(os.path.join(path, directory))
+            for name in ('1', '2'):
+                open(os.path.join(path, directory, name), 'w').close()
+        os.symlink('a', os.path.join(path, 'd'))
+
+    def test_discard_directory(self):
+        self.make_tree('tree')
+
+        trash.discard('tree')
+
+        self.assertThat('tree', Not(DirExists()))
+        trash.wait()
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
+    def test_discard_returns_before_deleting(self):
+        self.make_tree('tree')
+        deleting = threading.Event()
+
+        real_empty_trash = trash._empty_trash
+
+        def _empty_trash(trash_dir):
+            deleting.wait()
+            real_empty_trash(trash_dir)
+
+        with mock.patch('snapcraft.internal.trash._empty_trash',
+                        side_effect=_empty_trash):
+            trash.discard('tree')
+            self.assertThat('tree', Not(DirExists()))
+            self.assertThat(os.listdir(common.SNAPCRAFT_TRASH_DIR),
+                            HasLength(1))
+            # The path can be used again right away.
+            self.make_tree('tree')
+
+            deleting.set()
+            trash.wait()
+
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+        self.assertThat(os.path.join('tree', 'a', '1'), FileExists())
+
+    def test_discard_read_only_directories(self):
+        self.make_tree('tree')
+        os.chmod(os.path.join('tree', 'a', 'b'), 0o555)
+        os.chmod(os.path.join('tree', 'c'), 0o555)
+
+        trash.discard('tree')
+        trash.wait()
+
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
+    def test_discard_file(self):
+        with open('file', 'w') as f:
+            f.write('file')
+
+        trash.discard('file')
+
+        self.assertThat('file', Not(FileExists()))
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
+    def test_discard_symlink_to_directory(self):
+        self.make_tree('tree')
+        os.symlink('tree', 'link')
+
+        trash.discard('link')
+        trash.wait()
+
+        self.assertFalse(os.path.lexists('link'))
+        self.assertThat(os.path.join('tree', 'a', '1'), FileExists())
+
+    def test_discard_missing_path(self):
+        trash.discard('missing')
+
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
+    def test_discard_deletes_in_place_if_not_renamed(self):
+        self.make_tree('tree')
+
+        with mock.patch('os.rename',
+                        side_effect=OSError(errno.EXDEV, 'cross-device')):
+            trash.discard('tree')
+
+        self.assertThat('tree', Not(DirExists()))
+
+    def test_purge_deletes_what_previous_runs_left(self):
+        self.make_tree(os.path.join(common.SNAPCRAFT_TRASH_DIR, 'left'))
+
+        trash.purge()
+        trash.wait()
+
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
+    def test_purge_without_trash(self):
+        trash.purge()
+        trash.wait()
+
+        self.assertThat(common.SNAPCRAFT_TRASH_DIR, Not(DirExists()))
+
+    def test_failed_deletion_warns(self):
+        fake_logger = fixtures.FakeLogger(level=logging.WARNING)
+        self.useFixture(fake_logger)
+        self.make_tree(os.path.join(common.SNAPCRAFT_TRASH_DIR, 'left'))
+
+        with mock.patch('snapcraft.internal.trash._delete_entry',
+                        side_effect=OSError(errno.EBUSY, 'busy')):
+            trash.purge()
+            trash.wait()
+
+        self.assertThat(os.path.join(common.SNAPCRAFT_TRASH_DIR, 'left'),
+                        DirExists())
+        self.assertThat(fake_logger.output, Equals(
+            'Unable to delete {!r}: [Errno 16] busy\n'.format(
+                os.path.abspath(os.path.join(
+                    common.SNAPCRAFT_TRASH_DIR, 'left')))))